@@ -29,9 +29,9 @@ from .user_program.models import UserProgram
 from .user_exercises.models import UserExercise
 from .user_training.models import UserTraining
 from .food_recognition.models import FoodRecognition
-from .meal_plans.models import MealPlan
+from .meal_plans.models import MealPlan, MealPlanCache
 from .calorie_calculator.models import CalorieCalculation
-from .food_progress.models import DailyTarget, Meal
+from .food_progress.models import DailyTarget, Meal, UserDailyNutrition
 
 __all__ = [
     'Base',
@@ -69,7 +69,9 @@ __all__ = [
     'UserTraining',
     'FoodRecognition',
     'MealPlan',
+    'MealPlanCache',
     'CalorieCalculation',
     'DailyTarget',
     'Meal',
+    'UserDailyNutrition',
 ]
\ No newline at end of file
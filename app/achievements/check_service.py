@@ -9,8 +9,7 @@ from app.achievements.dao import AchievementTypeDAO, AchievementDAO
 from app.achievements.models import AchievementType, Achievement
 from app.user_training.models import UserTraining, TrainingStatus
 from app.users.models import User
-from app.logger import logger
-from app.logger import logger
+from app.logger import log_enabled, logger
 
 
 class AchievementCheckService:
@@ -45,7 +44,7 @@ class AchievementCheckService:
         
         # Предзагружаем все необходимые атрибуты для всех achievement_types, чтобы избежать lazy loading после commit()
         # Это критично, так как после commit() объекты могут потерять связь с сессией
-        logger.info(f"[DEBUG] Предзагружаю атрибуты для {len(achievement_types)} типов достижений...")
+        logger.debug("Предзагружаю атрибуты для {} типов достижений...", len(achievement_types))
         achievement_types_data = []
         for at in achievement_types:
             try:
@@ -62,10 +61,10 @@ class AchievementCheckService:
                 }
                 achievement_types_data.append(at_data)
             except Exception as e:
-                logger.error(f"[DEBUG] Ошибка при предзагрузке атрибутов для achievement_type: {e}", exc_info=True)
+                logger.opt(exception=True).error("Ошибка при предзагрузке атрибутов для achievement_type: {}", e)
                 # Пропускаем этот achievement_type, если не удалось загрузить атрибуты
                 continue
-        logger.info(f"[DEBUG] Предзагрузка завершена, готово {len(achievement_types_data)} типов достижений")
+        logger.debug("Предзагрузка завершена, готово {} типов достижений", len(achievement_types_data))
         
         # Получаем пользователя для проверки дня рождения
         user_result = await self.session.execute(
@@ -85,7 +84,7 @@ class AchievementCheckService:
         user_score_preloaded = user.score or 0  # Предзагружаем текущий score
         
         # Проверяем каждое достижение
-        logger.info(f"[DEBUG] Начинаю проверку {len(achievement_types_data)} типов достижений")
+        logger.debug("Начинаю проверку {} типов достижений", len(achievement_types_data))
         for idx, at_data in enumerate(achievement_types_data, 1):
             try:
                 # Используем предзагруженные данные
@@ -98,23 +97,23 @@ class AchievementCheckService:
                 achievement_type_points_preloaded = at_data['points']
                 achievement_type_requirements_preloaded = at_data['requirements']
                 
-                logger.info(f"[DEBUG] ═══ ИТЕРАЦИЯ {idx}/{len(achievement_types_data)}: '{achievement_type_name_preloaded}' (категория: {achievement_type_category_preloaded}) ═══")
+                logger.debug("═══ ИТЕРАЦИЯ {}/{}: '{}' (категория: {}) ═══", idx, len(achievement_types_data), achievement_type_name_preloaded, achievement_type_category_preloaded)
                 
                 # Пропускаем неактивные достижения (используем предзагруженное значение)
                 if not achievement_type_is_active_preloaded:
-                    logger.debug(f"[DEBUG] Достижение '{achievement_type_name_preloaded}' неактивно, пропускаю")
+                    logger.debug("Достижение '{}' неактивно, пропускаю", achievement_type_name_preloaded)
                     continue
                 
                 # Пропускаем если уже есть достижение этого типа у пользователя (используем предзагруженный id)
-                logger.debug(f"[DEBUG] Проверяю наличие достижения '{achievement_type_name_preloaded}' у пользователя {user_training_user_id}...")
+                logger.debug("Проверяю наличие достижения '{}' у пользователя {}...", achievement_type_name_preloaded, user_training_user_id)
                 existing = await self.achievement_dao.find_by_user_and_type(
                     user_training_user_id,
                     achievement_type_id
                 )
                 if existing:
-                    logger.debug(f"[DEBUG] Достижение '{achievement_type_name_preloaded}' уже есть у пользователя {user_training_user_id}, пропускаю")
+                    logger.debug("Достижение '{}' уже есть у пользователя {}, пропускаю", achievement_type_name_preloaded, user_training_user_id)
                     continue
-                logger.debug(f"[DEBUG] Достижение '{achievement_type_name_preloaded}' отсутствует у пользователя, продолжаю проверку")
+                logger.debug("Достижение '{}' отсутствует у пользователя, продолжаю проверку", achievement_type_name_preloaded)
                 
                 # Проверяем в зависимости от категории (используем предзагруженную категорию)
                 should_create = False
@@ -161,7 +160,7 @@ class AchievementCheckService:
                     user_id = user_id_preloaded
                     fcm_token = user_fcm_token_preloaded
                     
-                    logger.info(f"🎉 Создаю достижение '{achievement_type_name}' (категория: {achievement_type_category}) для пользователя {user_id}")
+                    logger.info("🎉 Создаю достижение '{}' (категория: {}) для пользователя {}", achievement_type_name, achievement_type_category, user_id)
                     
                     try:
                         # Создаем достижение (без коммита пока)
@@ -169,7 +168,7 @@ class AchievementCheckService:
                         import uuid
                         from datetime import datetime
                         
-                        logger.info(f"[DEBUG] Создаю объект Achievement...")
+                        logger.debug("Создаю объект Achievement...")
                         achievement = Achievement(
                             uuid=str(uuid.uuid4()),
                             name=achievement_type_name,
@@ -180,7 +179,7 @@ class AchievementCheckService:
                             created_at=datetime.utcnow(),
                             updated_at=datetime.utcnow()
                         )
-                        logger.info(f"[DEBUG] Объект Achievement создан: {achievement.uuid}")
+                        logger.debug("Объект Achievement создан: {}", achievement.uuid)
                         
                         # Добавляем очки к рейтингу пользователя (используем предзагруженное значение и обновляем через SQL)
                         achievement_points = achievement_type_points
@@ -191,50 +190,50 @@ class AchievementCheckService:
                             from sqlalchemy import update as sql_update
                             update_query = sql_update(User).where(User.id == user_id).values(score=new_score)
                             await self.session.execute(update_query)
-                            logger.info(f"📊 Добавлено {achievement_points} очков к рейтингу пользователя {user_id} (было: {old_score}, стало: {new_score})")
+                            logger.info("📊 Добавлено {} очков к рейтингу пользователя {} (было: {}, стало: {})", achievement_points, user_id, old_score, new_score)
                             # Обновляем предзагруженное значение для следующих итераций
                             user_score_preloaded = new_score
                         
-                        logger.info(f"[DEBUG] Добавляю achievement в session...")
+                        logger.debug("Добавляю achievement в session...")
                         # Сохраняем достижение и обновление score одним коммитом
                         self.session.add(achievement)
-                        logger.info(f"[DEBUG] Achievement добавлен в session, начинаю commit...")
+                        logger.debug("Achievement добавлен в session, начинаю commit...")
                         await self.session.commit()
-                        logger.info(f"[DEBUG] Commit выполнен успешно, начинаю refresh...")
+                        logger.debug("Commit выполнен успешно, начинаю refresh...")
                         await self.session.refresh(achievement)
-                        logger.info(f"[DEBUG] Refresh выполнен успешно")
+                        logger.debug("Refresh выполнен успешно")
                         
                         # Сохраняем UUID до отключения от сессии, чтобы избежать проблем с lazy loading
-                        logger.info(f"[DEBUG] Получаю UUID достижения...")
+                        logger.debug("Получаю UUID достижения...")
                         achievement_uuid = achievement.uuid
-                        logger.info(f"[DEBUG] UUID получен: {achievement_uuid}")
+                        logger.debug("UUID получен: {}", achievement_uuid)
                         
                         # Отключаем achievement от сессии, чтобы избежать проблем с lazy loading в BackgroundTasks
                         # НЕ отключаем user, так как он может понадобиться в следующих итерациях цикла
-                        logger.info(f"[DEBUG] Отключаю achievement от сессии...")
+                        logger.debug("Отключаю achievement от сессии...")
                         self.session.expunge(achievement)
-                        logger.info(f"[DEBUG] Achievement отключен от сессии")
+                        logger.debug("Achievement отключен от сессии")
                         
-                        logger.info(f"[DEBUG] Добавляю achievement в список created_achievements...")
+                        logger.debug("Добавляю achievement в список created_achievements...")
                         created_achievements.append(achievement)
-                        logger.info(f"[DEBUG] Achievement добавлен в список")
+                        logger.debug("Achievement добавлен в список")
                         
-                        logger.info(f"✅ Достижение '{achievement_type_name}' создано (UUID: {achievement_uuid})")
+                        logger.info("✅ Достижение '{}' создано (UUID: {})", achievement_type_name, achievement_uuid)
                     except Exception as e:
-                        logger.error(f"[DEBUG] Ошибка при создании достижения '{achievement_type_name}': {type(e).__name__}: {e}", exc_info=True)
+                        logger.opt(exception=True).error("Ошибка при создании достижения '{}': {}: {}", achievement_type_name, type(e).__name__, e)
                         # Откатываем изменения для этого достижения, но продолжаем проверку остальных
                         try:
                             await self.session.rollback()
-                            logger.warning(f"⚠️ Откатил транзакцию после ошибки создания достижения '{achievement_type_name}', продолжаю проверку остальных достижений")
+                            logger.warning("⚠️ Откатил транзакцию после ошибки создания достижения '{}', продолжаю проверку остальных достижений", achievement_type_name)
                         except Exception as rollback_error:
-                            logger.error(f"❌ Ошибка при откате транзакции: {rollback_error}")
+                            logger.error("❌ Ошибка при откате транзакции: {}", rollback_error)
                         # Продолжаем цикл для проверки остальных достижений
                         continue
                     
-                    logger.info(f"[DEBUG] Проверяю наличие FCM токена...")
+                    logger.debug("Проверяю наличие FCM токена...")
                     # Отправляем push-уведомление пользователю
                     if fcm_token:
-                        logger.info(f"📤 Отправляю push-уведомление о достижении '{achievement_type_name}' пользователю {user_id}")
+                        logger.info("📤 Отправляю push-уведомление о достижении '{}' пользователю {}", achievement_type_name, user_id)
                         try:
                             from app.services.firebase_service import FirebaseService
                             FirebaseService.initialize()
@@ -246,7 +245,7 @@ class AchievementCheckService:
                                 'achievement_uuid': str(achievement_type_uuid)
                             }
                             
-                            logger.info(f"📝 Формирую push-уведомление: title='{title}', body='{body}', channel='achievements_channel', data={data}")
+                            logger.info("📝 Формирую push-уведомление: title='{}', body='{}', channel='achievements_channel', data={}", title, body, data)
                             
                             result = FirebaseService.send_notification(
                                 fcm_token=fcm_token,
@@ -260,22 +259,22 @@ class AchievementCheckService:
                             if result == "INVALID_TOKEN":
                                 # Не очищаем токен автоматически - может быть временная проблема
                                 # Просто логируем и продолжаем попытки отправки для остальных достижений
-                                logger.warning(f"⚠️ FCM токен невалиден для пользователя {user_id}, но продолжаю попытки отправки для остальных достижений. Токен НЕ очищен автоматически.")
+                                logger.warning("⚠️ FCM токен невалиден для пользователя {}, но продолжаю попытки отправки для остальных достижений. Токен НЕ очищен автоматически.", user_id)
                             elif result == True:
-                                logger.info(f"✅ Отправлено push-уведомление о достижении {achievement_type_name} пользователю {user_id}")
+                                logger.info("✅ Отправлено push-уведомление о достижении {} пользователю {}", achievement_type_name, user_id)
                             else:
-                                logger.warning(f"⚠️ Не удалось отправить push-уведомление о достижении {achievement_type_name} пользователю {user_id} (результат: {result})")
+                                logger.warning("⚠️ Не удалось отправить push-уведомление о достижении {} пользователю {} (результат: {})", achievement_type_name, user_id, result)
                         except Exception as e:
-                            logger.error(f"❌ Ошибка отправки push-уведомления о достижении '{achievement_type_name}': {type(e).__name__}: {e}", exc_info=True)
+                            logger.opt(exception=True).error("❌ Ошибка отправки push-уведомления о достижении '{}': {}: {}", achievement_type_name, type(e).__name__, e)
                             # Продолжаем проверку остальных достижений даже при ошибке отправки уведомления
-                            logger.info(f"[DEBUG] Продолжаю проверку остальных достижений после ошибки отправки уведомления")
+                            logger.debug("Продолжаю проверку остальных достижений после ошибки отправки уведомления")
                     else:
-                        logger.debug(f"[DEBUG] FCM токен отсутствует для пользователя {user_id}, пропускаю отправку уведомления для достижения '{achievement_type_name}'")
+                        logger.debug("FCM токен отсутствует для пользователя {}, пропускаю отправку уведомления для достижения '{}'", user_id, achievement_type_name)
                     
-                    logger.info(f"[DEBUG] ✅ Завершил обработку достижения '{achievement_type_name}', продолжаю цикл...")
+                    logger.debug("✅ Завершил обработку достижения '{}', продолжаю цикл...", achievement_type_name)
                 
                 # Логируем завершение проверки текущего достижения (используем предзагруженное имя)
-                logger.debug(f"[DEBUG] ═══ ЗАВЕРШЕНИЕ ИТЕРАЦИИ {idx}/{len(achievement_types_data)}: '{achievement_type_name_preloaded}' (should_create={should_create}) ═══")
+                logger.debug("═══ ЗАВЕРШЕНИЕ ИТЕРАЦИИ {}/{}: '{}' (should_create={}) ═══", idx, len(achievement_types_data), achievement_type_name_preloaded, should_create)
             except Exception as iteration_error:
                 error_type = type(iteration_error).__name__
                 error_msg = str(iteration_error)
@@ -284,22 +283,23 @@ class AchievementCheckService:
                     achievement_type_name_for_log = achievement_type_name_preloaded if 'achievement_type_name_preloaded' in locals() else f"достижение {idx}"
                 except Exception:
                     achievement_type_name_for_log = f"достижение {idx}"
-                logger.error(f"[DEBUG] ❌ ОШИБКА в итерации {idx}/{len(achievement_types_data)} для достижения '{achievement_type_name_for_log}': {error_type}: {error_msg}", exc_info=True)
+                logger.opt(exception=True).error("❌ ОШИБКА в итерации {}/{} для достижения '{}': {}: {}", idx, len(achievement_types_data), achievement_type_name_for_log, error_type, error_msg)
                 # Продолжаем цикл для проверки остальных достижений
-                logger.warning(f"[DEBUG] ⚠️ Продолжаю проверку остальных достижений после ошибки в итерации {idx}")
+                logger.warning("⚠️ Продолжаю проверку остальных достижений после ошибки в итерации {}", idx)
                 continue
         
-        logger.info(f"[DEBUG] Завершаю check_achievements_for_training, создано {len(created_achievements)} достижений")
+        logger.debug("Завершаю check_achievements_for_training, создано {} достижений", len(created_achievements))
         # Безопасное получение имен достижений, так как они могут быть expunged
-        try:
-            achievement_names = [getattr(a, 'name', str(a.uuid) if hasattr(a, 'uuid') else 'unknown') for a in created_achievements]
-            logger.info(f"[DEBUG] Список созданных достижений: {achievement_names}")
-        except Exception as e:
-            logger.warning(f"[DEBUG] Не удалось получить список имен достижений: {e}")
-            logger.info(f"[DEBUG] Создано {len(created_achievements)} достижений")
+        if log_enabled("DEBUG"):
+            try:
+                achievement_names = [getattr(a, 'name', str(a.uuid) if hasattr(a, 'uuid') else 'unknown') for a in created_achievements]
+                logger.debug("Список созданных достижений: {}", achievement_names)
+            except Exception as e:
+                logger.warning("Не удалось получить список имен достижений: {}", e)
+                logger.debug("Создано {} достижений", len(created_achievements))
         
         # Возвращаем список созданных достижений
-        logger.info(f"[DEBUG] Возвращаю список из {len(created_achievements)} достижений")
+        logger.debug("Возвращаю список из {} достижений", len(created_achievements))
         # НЕ вызываем expunge_all здесь - это будет сделано в роутере перед закрытием сессии
         return created_achievements
     
@@ -417,9 +417,9 @@ class AchievementCheckService:
         is_achieved = actual_count >= required_count
         
         if is_achieved:
-            logger.info(f"✅ Достижение '{achievement_type_name}': у пользователя {user_id} {actual_count} тренировок, требуется {required_count}")
+            logger.info("✅ Достижение '{}': у пользователя {} {} тренировок, требуется {}", achievement_type_name, user_id, actual_count, required_count)
         else:
-            logger.debug(f"❌ Достижение '{achievement_type_name}': у пользователя {user_id} {actual_count} тренировок, требуется {required_count}")
+            logger.debug("❌ Достижение '{}': у пользователя {} {} тренировок, требуется {}", achievement_type_name, user_id, actual_count, required_count)
         
         return is_achieved
     
@@ -466,9 +466,9 @@ class AchievementCheckService:
         is_achieved = actual_count >= required_count
         
         if is_achieved:
-            logger.info(f"✅ Достижение '{achievement_type_name}' (неделя {week_start} - {week_end}): у пользователя {user_id} {actual_count} тренировок, требуется {required_count}")
+            logger.info("✅ Достижение '{}' (неделя {} - {}): у пользователя {} {} тренировок, требуется {}", achievement_type_name, week_start, week_end, user_id, actual_count, required_count)
         else:
-            logger.debug(f"❌ Достижение '{achievement_type_name}' (неделя {week_start} - {week_end}): у пользователя {user_id} {actual_count} тренировок, требуется {required_count}")
+            logger.debug("❌ Достижение '{}' (неделя {} - {}): у пользователя {} {} тренировок, требуется {}", achievement_type_name, week_start, week_end, user_id, actual_count, required_count)
         
         return is_achieved
 
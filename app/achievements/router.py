@@ -11,6 +11,8 @@ from app.users.dao import UsersDAO
 from app.users.dependencies import get_current_admin_user
 from app.files.service import FileService
 from app.logger import logger
+from app.achievements.models import AchievementType
+from app.conditional_get import conditional_get, table_version
 from typing import List
 from uuid import UUID
 import uuid
@@ -144,7 +146,7 @@ async def create_achievement_type(
     )
 
 
-@router.get("/types", response_model=List[AchievementTypeDisplay])
+@router.get("/types", response_model=List[AchievementTypeDisplay], dependencies=[Depends(conditional_get(table_version(AchievementType), public=True))])
 async def get_achievement_types(
     category: str = None,
     active_only: bool = True,
@@ -6,6 +6,9 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from app.subscriptions.service import SubscriptionService
+from app.exercise_reference.dao import ExerciseReferenceDAO
+from app.files.gc import collect_garbage
+from app.files.transcode import requeue_pending_transcodes
 from app.logger import logger
 
 # Глобальный планировщик
@@ -58,9 +61,42 @@ def start_scheduler():
         replace_existing=True
     )
     
+    # Задача 3: Сверка usage_count справочника упражнений каждый час
+    # ExerciseDAO обновляет счётчик сразу, сверка ловит массовые и каскадные изменения exercise
+    scheduler.add_job(
+        ExerciseReferenceDAO.refresh_usage_counts,
+        IntervalTrigger(hours=1),
+        id='refresh_exercise_reference_usage_counts',
+        name='Сверка популярности упражнений справочника',
+        replace_existing=True
+    )
+    
+    # Задача 4: Возврат в очередь видео, ожидающих перекодирования
+    # Очередь в памяти ограничена и не переживает перезапуск, статус pending хранится в files
+    scheduler.add_job(
+        requeue_pending_transcodes,
+        IntervalTrigger(minutes=10),
+        id='requeue_pending_transcodes',
+        name='Возврат видео в очередь перекодирования',
+        replace_existing=True
+    )
+    
+    # Задача 5: Сборка мусора в uploads каждый день в 04:00
+    # Файлы без записей уходят в карантин, карантин старше недели удаляется
+    scheduler.add_job(
+        collect_garbage,
+        CronTrigger(hour=4, minute=0),
+        id='collect_uploads_garbage',
+        name='Сборка мусора в директории загрузок',
+        replace_existing=True
+    )
+    
     logger.info("Запланированные задачи:")
     logger.info("- Проверка истекших подписок: каждый день в 01:00")
     logger.info("- Очистка linecache: каждые 6 часов (предотвращение утечки памяти)")
+    logger.info("- Сверка популярности упражнений справочника: каждый час")
+    logger.info("- Возврат видео в очередь перекодирования: каждые 10 минут")
+    logger.info("- Сборка мусора в директории загрузок: каждый день в 04:00")
     
     # Запускаем планировщик
     scheduler.start()
@@ -0,0 +1,100 @@
+"""
+Простые in-memory кэши уровня воркера (без внешних зависимостей).
+
+TTLCache — ограниченный по размеру LRU-кэш с временем жизни записей.
+Кэш живёт в пределах одного процесса: при нескольких воркерах у каждого свой экземпляр,
+поэтому кэшировать можно только то, что допустимо отдавать слегка устаревшим (в пределах ttl).
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """LRU-кэш с ограничением maxsize и временем жизни ttl (секунды)."""
+
+    def __init__(self, maxsize: int = 128, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Удаляет записи, ключ которых удовлетворяет predicate. Возвращает число удалённых."""
+        keys = [k for k in self._data if predicate(k)]
+        for k in keys:
+            del self._data[k]
+        return len(keys)
+
+    def values(self):
+        now = time.monotonic()
+        return [v for expires_at, v in self._data.values() if expires_at >= now]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+_MISSING = object()
+
+
+class PerUserTTLCache:
+    """
+    Двухуровневый кэш: user_id -> TTLCache.
+    Ограничены и число пользователей (max_users), и число записей на пользователя (per_user_maxsize),
+    так что один активный пользователь не вытесняет кэш остальных.
+    """
+
+    def __init__(self, max_users: int = 1024, per_user_maxsize: int = 32, ttl: float = 60.0):
+        self.per_user_maxsize = per_user_maxsize
+        self.ttl = ttl
+        self._users = TTLCache(maxsize=max_users, ttl=ttl)
+
+    def get(self, user_id: Any, key: Hashable, default: Any = None) -> Any:
+        user_cache: Optional[TTLCache] = self._users.get(user_id)
+        if user_cache is None:
+            return default
+        return user_cache.get(key, default)
+
+    def set(self, user_id: Any, key: Hashable, value: Any) -> None:
+        user_cache: Optional[TTLCache] = self._users.get(user_id)
+        if user_cache is None:
+            user_cache = TTLCache(maxsize=self.per_user_maxsize, ttl=self.ttl)
+        # Перезаписываем, чтобы продлить жизнь пользовательского кэша вместе с новой записью
+        self._users.set(user_id, user_cache)
+        user_cache.set(key, value)
+
+    def invalidate_user(self, user_id: Any) -> None:
+        self._users.pop(user_id)
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Удаляет у всех пользователей записи, ключ которых удовлетворяет predicate."""
+        return sum(user_cache.discard_where(predicate) for user_cache in self._users.values())
+
+    def clear(self) -> None:
+        self._users.clear()
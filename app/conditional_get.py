@@ -0,0 +1,103 @@
+"""
+Условный GET (ETag) для каталогов и пользовательских списков.
+
+Мобильное приложение перезапрашивает одни и те же списки при каждом открытии экрана.
+Зависимость conditional_get до выполнения тяжёлого запроса и сериализации считает дешёвую
+версию данных — сигнатуру таблиц (count + max(updated_at), для пользовательских списков —
+только строки пользователя) — и строит из неё ETag вместе с путём, параметрами запроса
+и пользователем. Совпадение с If-None-Match отвечает 304 без тела; иначе обработчик
+выполняется как обычно, а ETag и Last-Modified добавляются к его ответу.
+
+If-Modified-Since не проверяется: max(updated_at) не замечает удалений, поэтому
+валидатором служит только ETag (в нём есть и count).
+"""
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Awaitable, Callable, Optional, Sequence
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import func, select
+
+from app.database import async_session_maker
+from app.users.dependencies import get_current_user_user
+
+# Источник версии: (request, user или None) -> значение, меняющееся вместе с данными ответа
+VersionSource = Callable[[Request, Any], Awaitable[Any]]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+
+def make_etag(*parts: Any) -> str:
+    payload = json.dumps(parts, ensure_ascii=False, separators=(",", ":"), default=str)
+    return f'"{hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]}"'
+
+
+def table_version(
+    model,
+    where: Optional[Callable[[Request, Any], Sequence[Any]]] = None,
+    extra: Sequence[Any] = (),
+) -> VersionSource:
+    """
+    Источник версии по таблице: count(id), max(updated_at) и дополнительные агрегаты extra
+    (для данных, которые меняются без updated_at).
+    where(request, user) возвращает условия отбора строк (например, только строки пользователя):
+    агрегат без условий по индексу читает всю таблицу на каждый GET.
+    """
+    async def source(request: Request, user: Any) -> tuple:
+        query = select(func.count(model.id), func.max(model.updated_at), *extra)
+        if where is not None:
+            query = query.where(*where(request, user))
+        async with async_session_maker() as session:
+            return tuple((await session.execute(query)).one())
+    return source
+
+
+def _last_modified(versions: Sequence[Any]) -> Optional[datetime]:
+    """Самая поздняя дата изменения среди версий (updated_at хранится в UTC без часового пояса)."""
+    moments = [
+        value for version in versions
+        for value in (version if isinstance(version, tuple) else (version,))
+        if isinstance(value, datetime)
+    ]
+    if not moments:
+        return None
+    latest = max(moment.replace(tzinfo=None) for moment in moments)
+    return latest.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+async def _check(request: Request, response: Response, user: Any, sources: Sequence[VersionSource]) -> None:
+    versions = [await source(request, user) for source in sources]
+    etag = make_etag(
+        request.url.path,
+        sorted(request.query_params.multi_items()),
+        getattr(user, "id", None),
+        versions,
+    )
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    last_modified = _last_modified(versions)
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+
+def conditional_get(*sources: VersionSource, public: bool = False):
+    """
+    Зависимость условного GET: dependencies=[Depends(conditional_get(...))].
+    public=True — для эндпоинтов без авторизации (версия не зависит от пользователя).
+    """
+    if public:
+        async def dependency(request: Request, response: Response) -> None:
+            await _check(request, response, None, sources)
+    else:
+        async def dependency(request: Request, response: Response, user_data=Depends(get_current_user_user)) -> None:
+            await _check(request, response, user_data, sources)
+    return dependency
@@ -9,6 +9,7 @@ from uuid import uuid4
 
 from sqlalchemy import select
 from app.database import async_session_maker
+from app.user_program_plan.similarity_graph import invalidate_similarity_graph
 from app.exercise_builder_equipment.models import ExerciseBuilderEquipment
 from app.exercise_builder_pool.models import ExerciseBuilderPool
 
@@ -60,4 +61,7 @@ async def import_from_csv(file_path: str | Path) -> int:
                 session.add(eq)
                 count += 1
         await session.commit()
+    # Граф похожести в этом процессе перестроится при следующем обращении;
+    # API-воркеры заметят импорт по сигнатуре пула (см. similarity_graph).
+    invalidate_similarity_graph()
     return count
@@ -7,6 +7,7 @@ from app.exercise_builder_equipment.schemas import (
     SExerciseBuilderEquipmentUpdate,
 )
 from app.users.dependencies import get_current_user_user
+from app.user_program_plan.similarity_graph import invalidate_similarity_graph
 
 router = APIRouter(prefix="/exercise-builder-equipment", tags=["Оборудование для пула упражнений"])
 
@@ -32,6 +33,7 @@ async def get_by_uuid(item_uuid: UUID, user_data=Depends(get_current_user_user))
 async def add(body: SExerciseBuilderEquipmentAdd, user_data=Depends(get_current_user_user)):
     values = body.model_dump()
     item_uuid = await ExerciseBuilderEquipmentDAO.add(**values)
+    invalidate_similarity_graph()
     item = await ExerciseBuilderEquipmentDAO.find_full_data(item_uuid)
     return {"message": "Запись создана", "uuid": str(item_uuid), "item": SExerciseBuilderEquipment.model_validate(item)}
 
@@ -42,6 +44,7 @@ async def update(item_uuid: UUID, body: SExerciseBuilderEquipmentUpdate, user_da
     if not values:
         raise HTTPException(status_code=400, detail="Нет данных для обновления")
     await ExerciseBuilderEquipmentDAO.update(item_uuid, **values)
+    invalidate_similarity_graph()
     item = await ExerciseBuilderEquipmentDAO.find_full_data(item_uuid)
     return {"message": "Запись обновлена", "item": SExerciseBuilderEquipment.model_validate(item)}
 
@@ -49,4 +52,5 @@ async def update(item_uuid: UUID, body: SExerciseBuilderEquipmentUpdate, user_da
 @router.delete("/delete/{item_uuid}", summary="Удалить запись")
 async def delete(item_uuid: UUID, user_data=Depends(get_current_user_user)):
     await ExerciseBuilderEquipmentDAO.delete_by_id(item_uuid)
+    invalidate_similarity_graph()
     return {"message": f"Запись {item_uuid} удалена"}
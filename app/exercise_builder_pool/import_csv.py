@@ -10,6 +10,7 @@ from uuid import uuid4
 
 from sqlalchemy import select
 from app.database import async_session_maker
+from app.user_program_plan.similarity_graph import invalidate_similarity_graph
 from app.exercise_builder_pool.models import ExerciseBuilderPool
 from app.exercise_reference.models import ExerciseReference
 
@@ -134,4 +135,7 @@ async def import_from_csv(file_path: str | Path) -> int:
                 session.add(pool)
                 count += 1
         await session.commit()
+    # Граф похожести в этом процессе перестроится при следующем обращении;
+    # API-воркеры заметят импорт по сигнатуре пула (см. similarity_graph).
+    invalidate_similarity_graph()
     return count
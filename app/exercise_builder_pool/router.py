@@ -3,6 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from app.exercise_builder_pool.dao import ExerciseBuilderPoolDAO
 from app.exercise_builder_pool.schemas import SExerciseBuilderPool, SExerciseBuilderPoolAdd, SExerciseBuilderPoolUpdate
 from app.users.dependencies import get_current_user_user
+from app.user_program_plan.similarity_graph import invalidate_similarity_graph
 
 router = APIRouter(prefix="/exercise-builder-pool", tags=["Пул упражнений для сборки тренировок"])
 
@@ -28,6 +29,7 @@ async def get_by_uuid(item_uuid: UUID, user_data=Depends(get_current_user_user))
 async def add(body: SExerciseBuilderPoolAdd, user_data=Depends(get_current_user_user)):
     values = body.model_dump()
     item_uuid = await ExerciseBuilderPoolDAO.add(**values)
+    invalidate_similarity_graph()
     item = await ExerciseBuilderPoolDAO.find_full_data(item_uuid)
     return {"message": "Запись создана", "uuid": str(item_uuid), "item": SExerciseBuilderPool.model_validate(item)}
 
@@ -38,6 +40,7 @@ async def update(item_uuid: UUID, body: SExerciseBuilderPoolUpdate, user_data=De
     if not values:
         raise HTTPException(status_code=400, detail="Нет данных для обновления")
     await ExerciseBuilderPoolDAO.update(item_uuid, **values)
+    invalidate_similarity_graph()
     item = await ExerciseBuilderPoolDAO.find_full_data(item_uuid)
     return {"message": "Запись обновлена", "item": SExerciseBuilderPool.model_validate(item)}
 
@@ -45,4 +48,5 @@ async def update(item_uuid: UUID, body: SExerciseBuilderPoolUpdate, user_data=De
 @router.delete("/delete/{item_uuid}", summary="Удалить запись")
 async def delete(item_uuid: UUID, user_data=Depends(get_current_user_user)):
     await ExerciseBuilderPoolDAO.delete_by_id(item_uuid)
+    invalidate_similarity_graph()
     return {"message": f"Запись {item_uuid} удалена"}
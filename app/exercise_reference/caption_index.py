@@ -0,0 +1,261 @@
+"""
+Индекс названий справочника упражнений для поиска и автодополнения.
+
+Системный справочник меняется редко, а пикер упражнений ищет по нему на каждое нажатие клавиши.
+Поэтому названия системных упражнений нормализуются (нижний регистр, ё -> е), разбиваются на
+токены и раскладываются в отсортированный массив суффиксов токенов: поиск слова запроса —
+бинарный поиск диапазона суффиксов с этим префиксом (компактная замена префиксного дерева),
+что даёт те же совпадения «слово входит в название», что и прежний ILIKE '%слово%'.
+Фильтры по группе мышц и оборудованию и сортировка (избранные, затем популярность)
+тоже считаются в памяти; из БД читается только страница результата по первичному ключу.
+
+Собственные упражнения пользователя в индекс не попадают: они загружаются на запрос
+(лёгкий запрос по user_id) и ищутся тем же кодом во временном индексе.
+
+Индекс живёт в памяти воркера и перестраивается после записи в справочник. Другие воркеры
+замечают изменения по сигнатуре системных упражнений (count + max(updated_at)), которая проверяется
+не чаще SIGNATURE_CHECK_INTERVAL_SECONDS. Популярность (usage_count; его пересчёт не меняет updated_at)
+обновляется отдельно, не чаще POPULARITY_REFRESH_SECONDS.
+Эти же сигнатура и популярность служат версией справочника для ETag (catalog_version).
+"""
+import asyncio
+import re
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+
+from app.database import async_session_maker
+from app.exercise_reference.models import ExerciseReference
+from app.logger import logger
+
+SIGNATURE_CHECK_INTERVAL_SECONDS = 60
+POPULARITY_REFRESH_SECONDS = 300
+SYSTEM_EXERCISE_TYPE = "system"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_text(value: Optional[str]) -> str:
+    return (value or "").lower().replace("ё", "е")
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(normalize_text(value))
+
+
+class CaptionEntry:
+    """Поля упражнения справочника, нужные для поиска и автодополнения."""
+
+    __slots__ = ("id", "uuid", "exercise_type", "user_id", "caption", "muscle_group", "equipment_name")
+
+    def __init__(self, id, uuid, exercise_type, user_id, caption, muscle_group, equipment_name):
+        self.id = id
+        self.uuid = uuid
+        self.exercise_type = exercise_type
+        self.user_id = user_id
+        self.caption = caption
+        self.muscle_group = muscle_group
+        self.equipment_name = equipment_name
+
+    @classmethod
+    def from_row(cls, row: Any) -> "CaptionEntry":
+        return cls(
+            row.id, row.uuid, row.exercise_type, row.user_id,
+            row.caption, row.muscle_group, row.equipment_name,
+        )
+
+
+class CaptionIndex:
+    """Индекс по названиям: отсортированные суффиксы токенов -> id, плюс значения фильтров -> id."""
+
+    def __init__(self, entries: Iterable[CaptionEntry], signature: Tuple = ()):
+        self.entries: Dict[int, CaptionEntry] = {e.id: e for e in entries}
+        self.signature = signature
+        self.built_at = time.monotonic()
+        self.popularity = {}
+
+        postings: Dict[str, Set[int]] = defaultdict(set)
+        vocabulary: Dict[str, int] = defaultdict(int)
+        muscle_groups: Dict[str, Set[int]] = defaultdict(set)
+        equipment: Dict[str, Set[int]] = defaultdict(set)
+        for entry in self.entries.values():
+            for token in set(tokenize(entry.caption)):
+                vocabulary[token] += 1
+                for i in range(len(token)):
+                    postings[token[i:]].add(entry.id)
+            if entry.muscle_group:
+                muscle_groups[normalize_text(entry.muscle_group)].add(entry.id)
+            if entry.equipment_name:
+                equipment[normalize_text(entry.equipment_name)].add(entry.id)
+
+        self._suffixes = sorted(postings)
+        self._suffix_ids = [frozenset(postings[s]) for s in self._suffixes]
+        self._tokens = sorted(vocabulary)
+        self._token_counts = [vocabulary[t] for t in self._tokens]
+        self._muscle_groups = dict(muscle_groups)
+        self._equipment = dict(equipment)
+
+    @property
+    def popularity(self) -> Dict[int, int]:
+        return self._popularity
+
+    @popularity.setter
+    def popularity(self, value: Dict[int, int]) -> None:
+        self._popularity = value
+        # Хэш целых чисел не зависит от процесса, поэтому версия совпадает во всех воркерах
+        self.popularity_version = hash(frozenset(value.items()))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _word_ids(self, word: str) -> Set[int]:
+        """id названий, в которых есть токен, содержащий word."""
+        ids: Set[int] = set()
+        i = bisect_left(self._suffixes, word)
+        while i < len(self._suffixes) and self._suffixes[i].startswith(word):
+            ids |= self._suffix_ids[i]
+            i += 1
+        return ids
+
+    @staticmethod
+    def _values_ids(values: Dict[str, Set[int]], terms: Iterable[str]) -> Set[int]:
+        """id записей, у которых значение содержит хотя бы один из terms (как прежний OR из LIKE)."""
+        normalized = [normalize_text(t) for t in terms]
+        ids: Set[int] = set()
+        for value, value_ids in values.items():
+            if any(term in value for term in normalized):
+                ids |= value_ids
+        return ids
+
+    def search(
+        self,
+        query: str = "",
+        muscle_groups: Optional[List[str]] = None,
+        equipment_names: Optional[List[str]] = None,
+    ) -> Set[int]:
+        """id упражнений, в названии которых есть все слова query, с учётом фильтров."""
+        ids: Optional[Set[int]] = None
+        for word in sorted(set(tokenize(query)), key=len, reverse=True):
+            word_ids = self._word_ids(word)
+            ids = word_ids if ids is None else ids & word_ids
+            if not ids:
+                return set()
+        if ids is None:
+            ids = set(self.entries)
+        if muscle_groups:
+            ids &= self._values_ids(self._muscle_groups, muscle_groups)
+        if equipment_names:
+            ids &= self._values_ids(self._equipment, equipment_names)
+        return ids
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """Токены словаря, начинающиеся с prefix (самые частые первыми)."""
+        prefix = normalize_text(prefix).strip()
+        if not prefix:
+            return []
+        matches = []
+        i = bisect_left(self._tokens, prefix)
+        while i < len(self._tokens) and self._tokens[i].startswith(prefix):
+            matches.append((self._token_counts[i], self._tokens[i]))
+            i += 1
+        matches.sort(key=lambda m: (-m[0], m[1]))
+        return [token for _, token in matches[:limit]]
+
+
+def order_ids(ids: Iterable[int], favorite_ids: Optional[Set[int]], popularity: Dict[int, int]) -> List[int]:
+    """Сортировка как в _add_sorting_by_favorite_and_popularity: избранные, затем популярные, затем по id."""
+    favorite_ids = favorite_ids or set()
+    return sorted(ids, key=lambda i: (i not in favorite_ids, -popularity.get(i, 0), i))
+
+
+_ENTRY_COLUMNS = (
+    ExerciseReference.id, ExerciseReference.uuid, ExerciseReference.exercise_type, ExerciseReference.user_id,
+    ExerciseReference.caption, ExerciseReference.muscle_group, ExerciseReference.equipment_name,
+)
+
+
+async def load_caption_entries(*filters) -> List[CaptionEntry]:
+    async with async_session_maker() as session:
+        result = await session.execute(select(*_ENTRY_COLUMNS).where(*filters))
+        return [CaptionEntry.from_row(row) for row in result.all()]
+
+
+async def load_popularity(exercise_reference_ids: Optional[List[int]] = None) -> Dict[int, int]:
+    """usage_count упражнений справочника (все использованные или только указанные id)."""
+    query = select(ExerciseReference.id, ExerciseReference.usage_count).where(ExerciseReference.usage_count > 0)
+    if exercise_reference_ids is not None:
+        if not exercise_reference_ids:
+            return {}
+        query = query.where(ExerciseReference.id.in_(exercise_reference_ids))
+    async with async_session_maker() as session:
+        result = await session.execute(query)
+        return {ref_id: count for ref_id, count in result.all()}
+
+
+_index: Optional[CaptionIndex] = None
+_index_stale = True
+_last_signature_check = 0.0
+_last_popularity_refresh = 0.0
+_rebuild_lock = asyncio.Lock()
+
+
+async def _load_system_signature() -> Tuple:
+    async with async_session_maker() as session:
+        row = (
+            await session.execute(
+                select(func.count(ExerciseReference.id), func.max(ExerciseReference.updated_at))
+                .where(ExerciseReference.exercise_type == SYSTEM_EXERCISE_TYPE)
+            )
+        ).one()
+    return tuple(row)
+
+
+def invalidate_caption_index() -> None:
+    """Помечает индекс устаревшим; следующий поиск перестроит его."""
+    global _index_stale
+    _index_stale = True
+
+
+async def rebuild_caption_index() -> CaptionIndex:
+    global _index, _index_stale, _last_signature_check, _last_popularity_refresh
+
+    async with _rebuild_lock:
+        signature = await _load_system_signature()
+        entries = await load_caption_entries(ExerciseReference.exercise_type == SYSTEM_EXERCISE_TYPE)
+        started = time.perf_counter()
+        index = CaptionIndex(entries, signature=signature)
+        build_ms = (time.perf_counter() - started) * 1000
+        index.popularity = await load_popularity()
+        _index = index
+        _index_stale = False
+        _last_signature_check = _last_popularity_refresh = time.monotonic()
+        logger.info(f"Индекс названий упражнений построен: {len(index)} упражнений за {build_ms:.0f} мс")
+        return index
+
+
+async def get_caption_index() -> CaptionIndex:
+    """Текущий индекс; перестраивается при инвалидации или смене сигнатуры системного справочника."""
+    global _last_signature_check, _last_popularity_refresh
+    if _index is None or _index_stale:
+        return await rebuild_caption_index()
+    now = time.monotonic()
+    if now - _last_signature_check >= SIGNATURE_CHECK_INTERVAL_SECONDS:
+        _last_signature_check = now
+        if await _load_system_signature() != _index.signature:
+            return await rebuild_caption_index()
+    if now - _last_popularity_refresh >= POPULARITY_REFRESH_SECONDS:
+        _last_popularity_refresh = now
+        _index.popularity = await load_popularity()
+    return _index
+
+
+async def catalog_version() -> Tuple:
+    """
+    Версия системного справочника для условного GET: сигнатура и популярность из индекса.
+    Запросов к БД нет, кроме проверок сигнатуры и популярности по их интервалам.
+    """
+    index = await get_caption_index()
+    return index.signature, index.popularity_version
@@ -1,5 +1,13 @@
 from app.dao.base import BaseDAO
 from app.exercise_reference.models import ExerciseReference
+from app.exercise_reference.caption_index import (
+    SYSTEM_EXERCISE_TYPE,
+    CaptionIndex,
+    get_caption_index,
+    load_caption_entries,
+    load_popularity,
+    order_ids,
+)
 from app.files.dao import FilesDAO
 from app.users.dao import UsersDAO
 from app.exercises.models import Exercise
@@ -8,9 +16,23 @@ from app.user_favorite_exercises.models import UserFavoriteExercise
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
 from app.database import async_session_maker
+from app.cache import PerUserTTLCache, TTLCache
 from fastapi import HTTPException, status
 from uuid import UUID
-from sqlalchemy import select, or_, func, case
+from sqlalchemy import JSON, select, or_, func, case, update, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from datetime import date
+
+# Фильтры (фасеты) справочника: системные — общие для воркера, собственные упражнения — по пользователю.
+# Сбрасываются при записи в справочник; ttl ограничивает расхождение между воркерами.
+FILTERS_CACHE_TTL_SECONDS = 300
+_system_filters_cache = TTLCache(maxsize=1, ttl=FILTERS_CACHE_TTL_SECONDS)
+_user_filters_cache = TTLCache(maxsize=1024, ttl=FILTERS_CACHE_TTL_SECONDS)
+
+# Статистика упражнений: на воркер, по пользователю; сбрасывается при изменении user_exercise пользователя
+STATISTICS_CACHE_TTL_SECONDS = 300
+_statistics_cache = PerUserTTLCache(max_users=1024, per_user_maxsize=32, ttl=STATISTICS_CACHE_TTL_SECONDS)
+
 
 class ExerciseReferenceDAO(BaseDAO):
     model = ExerciseReference
@@ -70,36 +92,48 @@ class ExerciseReferenceDAO(BaseDAO):
     def _add_sorting_by_favorite_and_popularity(cls, query, favorite_user_id: int = None):
         """Добавляет сортировку по избранным и популярности к запросу"""
         if favorite_user_id:
-            # Подзапрос для проверки избранного (возвращает count: 0 если не избранное, >0 если избранное)
-            is_favorite_subq = select(
-                func.count(UserFavoriteExercise.id)
-            ).where(
-                UserFavoriteExercise.exercise_reference_id == cls.model.id,
-                UserFavoriteExercise.user_id == favorite_user_id
-            ).scalar_subquery()
-            
-            # Подзапрос для подсчета популярности (количество exercise)
-            popularity_subq = select(
-                func.count(Exercise.id)
-            ).where(
-                Exercise.exercise_reference_id == cls.model.id,
-                Exercise.exercise_reference_id.isnot(None)
-            ).scalar_subquery()
-            
-            # Сортировка: сначала is_favorite DESC (1+ идет перед 0), затем popularity DESC
-            query = query.order_by(is_favorite_subq.desc(), popularity_subq.desc())
+            # Избранное пользователя — одним LEFT JOIN (пара user_id + exercise_reference_id уникальна)
+            query = query.outerjoin(
+                UserFavoriteExercise,
+                (UserFavoriteExercise.exercise_reference_id == cls.model.id)
+                & (UserFavoriteExercise.user_id == favorite_user_id)
+            )
+            # Сортировка: сначала избранные, затем по популярности (usage_count по индексу)
+            query = query.order_by(UserFavoriteExercise.id.is_(None), cls.model.usage_count.desc(), cls.model.id)
         else:
             # Если favorite_user_id не указан, сортируем только по популярности
-            popularity_subq = select(
-                func.count(Exercise.id)
-            ).where(
-                Exercise.exercise_reference_id == cls.model.id,
-                Exercise.exercise_reference_id.isnot(None)
-            ).scalar_subquery()
-            query = query.order_by(popularity_subq.desc())
+            query = query.order_by(cls.model.usage_count.desc(), cls.model.id)
         
         return query
 
+    @classmethod
+    async def refresh_usage_counts(cls, exercise_reference_ids=None) -> int:
+        """
+        Пересчитывает usage_count по таблице exercise (все записи или только указанные id).
+        Обновляются только изменившиеся строки; updated_at не трогается — это не правка справочника.
+        """
+        if exercise_reference_ids is not None:
+            exercise_reference_ids = [i for i in exercise_reference_ids if i is not None]
+            if not exercise_reference_ids:
+                return 0
+        
+        count_subq = select(func.count(Exercise.id)).where(
+            Exercise.exercise_reference_id == cls.model.id
+        ).scalar_subquery()
+        query = (
+            update(cls.model)
+            .where(cls.model.usage_count.is_distinct_from(count_subq))
+            .values(usage_count=count_subq, updated_at=cls.model.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        if exercise_reference_ids is not None:
+            query = query.where(cls.model.id.in_(exercise_reference_ids))
+        
+        async with async_session_maker() as session:
+            async with session.begin():
+                result = await session.execute(query)
+                return result.rowcount
+
     @classmethod
     async def find_all_paginated(cls, *, page: int = 1, size: int = 20, favorite_user_id: int = None, **filter_by):
         """Получение всех элементов с пагинацией"""
@@ -174,6 +208,13 @@ class ExerciseReferenceDAO(BaseDAO):
                     filters[fk_field] = related_obj.id
                 else:
                     return []
+        
+        # Поиск по системному справочнику отвечает индекс в памяти
+        if cls._is_system_catalog_query(filters):
+            index = await get_caption_index()
+            ids = cls._filter_entries(index, index.search(caption), filters)
+            return await cls._load_ordered(order_ids(ids, None, index.popularity))
+        
         async with async_session_maker() as session:
             query = select(cls.model).options(
                 joinedload(cls.model.image),
@@ -208,41 +249,8 @@ class ExerciseReferenceDAO(BaseDAO):
     @classmethod
     async def search_by_caption(cls, *, search_query: str, user_id: int):
         """Поиск по caption с учетом exercise_type и user_id"""
-        from sqlalchemy import or_
-        
-        async with async_session_maker() as session:
-            query = select(cls.model).options(
-                joinedload(cls.model.image),
-                joinedload(cls.model.video),
-                joinedload(cls.model.gif),
-                joinedload(cls.model.user)
-            ).filter(
-                or_(
-                    cls.model.exercise_type == "system",
-                    (cls.model.exercise_type == "user") & (cls.model.user_id == user_id)
-                )
-            )
-            
-            # Добавляем фильтр по поисковому запросу только если он не пустой
-            if search_query.strip():
-                # Разбиваем поисковый запрос на слова и ищем все слова в названии
-                search_words = [word.strip() for word in search_query.strip().split() if word.strip()]
-                if search_words:
-                    # Создаем условия для каждого слова (все слова должны присутствовать)
-                    word_conditions = [
-                        func.lower(cls.model.caption).like(f"%{word.lower()}%")
-                        for word in search_words
-                    ]
-                    # Объединяем все условия через AND
-                    search_filter = word_conditions[0]
-                    for condition in word_conditions[1:]:
-                        search_filter = search_filter & condition
-                    
-                    query = query.filter(search_filter)
-            
-            result = await session.execute(query)
-            objects = result.scalars().all()
-            return objects
+        ids, popularity = await cls._search_available(search_query, user_id)
+        return await cls._load_ordered(order_ids(ids, None, popularity))
 
     @classmethod
     async def find_by_caption_paginated(cls, *, caption: str, page: int = 1, size: int = 20, muscle_groups_filter: list = None, equipment_names_filter: list = None, favorite_user_id: int = None, **filter_by):
@@ -257,6 +265,14 @@ class ExerciseReferenceDAO(BaseDAO):
                 else:
                     return {"items": [], "total": 0, "page": page, "size": size, "pages": 0}
         
+        # Поиск по системному справочнику отвечает индекс в памяти
+        if cls._is_system_catalog_query(filters):
+            index = await get_caption_index()
+            ids = index.search(caption, muscle_groups_filter, equipment_names_filter)
+            ids = cls._filter_entries(index, ids, filters)
+            favorite_ids = await cls._get_favorite_ids(favorite_user_id) if favorite_user_id else None
+            return await cls._paginate_ids(order_ids(ids, favorite_ids, index.popularity), page, size)
+        
         async with async_session_maker() as session:
             # Базовый запрос для подсчета общего количества
             count_query = select(func.count(cls.model.id)).filter(
@@ -355,276 +371,263 @@ class ExerciseReferenceDAO(BaseDAO):
     @classmethod
     async def search_by_caption_paginated(cls, *, search_query: str, user_id: int, page: int = 1, size: int = 20, muscle_groups_filter: list = None, equipment_names_filter: list = None, favorite_user_id: int = None):
         """Поиск по caption с учетом exercise_type и user_id с пагинацией"""
-        from sqlalchemy import or_
+        ids, popularity = await cls._search_available(search_query, user_id, muscle_groups_filter, equipment_names_filter)
+        favorite_ids = await cls._get_favorite_ids(favorite_user_id) if favorite_user_id else None
+        return await cls._paginate_ids(order_ids(ids, favorite_ids, popularity), page, size)
+
+    @classmethod
+    def _is_system_catalog_query(cls, filters: dict) -> bool:
+        """Запрос только по системным упражнениям (с точными фильтрами по группе мышц/оборудованию) — его покрывает индекс"""
+        return (
+            filters.get("exercise_type") == SYSTEM_EXERCISE_TYPE
+            and set(filters) <= {"exercise_type", "muscle_group", "equipment_name"}
+        )
+
+    @classmethod
+    def _filter_entries(cls, index: CaptionIndex, ids: set, filters: dict) -> set:
+        """Точные фильтры по полям записи индекса (muscle_group, equipment_name)"""
+        exact = {k: v for k, v in filters.items() if k != "exercise_type"}
+        if not exact:
+            return ids
+        return {
+            i for i in ids
+            if all(getattr(index.entries[i], k) == v for k, v in exact.items())
+        }
+
+    @classmethod
+    async def _search_available(cls, search_query: str, user_id: int, muscle_groups_filter: list = None, equipment_names_filter: list = None):
+        """
+        id доступных пользователю упражнений (системные из индекса + его собственные) и их популярность.
+        Собственные упражнения загружаются лёгким запросом и ищутся во временном индексе.
+        """
+        index = await get_caption_index()
+        ids = index.search(search_query, muscle_groups_filter, equipment_names_filter)
+        popularity = index.popularity
         
+        user_entries = await load_caption_entries(
+            cls.model.exercise_type == "user",
+            cls.model.user_id == user_id
+        )
+        if user_entries:
+            user_ids = CaptionIndex(user_entries).search(search_query, muscle_groups_filter, equipment_names_filter)
+            if user_ids:
+                ids = ids | user_ids
+                popularity = {**popularity, **await load_popularity(list(user_ids))}
+        return ids, popularity
+
+    @classmethod
+    async def _get_favorite_ids(cls, user_id: int) -> set:
         async with async_session_maker() as session:
-            # Базовый запрос для подсчета общего количества
-            count_query = select(func.count(cls.model.id)).filter(
-                or_(
-                    cls.model.exercise_type == "system",
-                    (cls.model.exercise_type == "user") & (cls.model.user_id == user_id)
-                )
+            result = await session.execute(
+                select(UserFavoriteExercise.exercise_reference_id).where(UserFavoriteExercise.user_id == user_id)
             )
-            
-            # Запрос для получения данных
-            data_query = select(cls.model).options(
+            return set(result.scalars().all())
+
+    @classmethod
+    async def _load_ordered(cls, ids: list) -> list:
+        """Загружает упражнения по id с сохранением порядка ids"""
+        if not ids:
+            return []
+        async with async_session_maker() as session:
+            query = select(cls.model).options(
                 joinedload(cls.model.image),
                 joinedload(cls.model.video),
                 joinedload(cls.model.gif),
                 joinedload(cls.model.user)
-            ).filter(
-                or_(
-                    cls.model.exercise_type == "system",
-                    (cls.model.exercise_type == "user") & (cls.model.user_id == user_id)
-                )
-            )
-            
-            # Добавляем фильтр по поисковому запросу только если он не пустой
-            if search_query.strip():
-                # Разбиваем поисковый запрос на слова и ищем все слова в названии
-                search_words = [word.strip() for word in search_query.strip().split() if word.strip()]
-                if search_words:
-                    # Создаем условия для каждого слова (все слова должны присутствовать)
-                    word_conditions = [
-                        func.lower(cls.model.caption).like(f"%{word.lower()}%")
-                        for word in search_words
-                    ]
-                    # Объединяем все условия через AND
-                    search_filter = word_conditions[0]
-                    for condition in word_conditions[1:]:
-                        search_filter = search_filter & condition
-                    
-                    count_query = count_query.filter(search_filter)
-                    data_query = data_query.filter(search_filter)
-            
-            # Добавляем фильтр по группам мышц если они переданы (только по основной группе мышц)
-            if muscle_groups_filter and len(muscle_groups_filter) > 0:
-                muscle_conditions = [
-                    func.lower(cls.model.muscle_group).like(f"%{muscle_group.lower()}%")
-                    for muscle_group in muscle_groups_filter
-                ]
-                muscle_filter = or_(*muscle_conditions)
-                count_query = count_query.filter(muscle_filter)
-                data_query = data_query.filter(muscle_filter)
-            
-            # Добавляем фильтр по названиям оборудования если они переданы
-            if equipment_names_filter and len(equipment_names_filter) > 0:
-                equipment_conditions = []
-                for equipment_name in equipment_names_filter:
-                    equipment_conditions.append(
-                        func.lower(cls.model.equipment_name).like(f"%{equipment_name.lower()}%")
-                    )
-                equipment_filter = or_(*equipment_conditions)
-                count_query = count_query.filter(equipment_filter)
-                data_query = data_query.filter(equipment_filter)
-            
-            # Добавляем сортировку по избранным и популярности
-            if favorite_user_id:
-                data_query = cls._add_sorting_by_favorite_and_popularity(data_query, favorite_user_id)
-            
-            # Если пагинация не нужна (page=0 или size=0), возвращаем все элементы
-            if page == 0 or size == 0:
-                data_result = await session.execute(data_query)
-                objects = data_result.scalars().all()
-                total = len(objects)
-                return {
-                    "items": objects,
-                    "total": total,
-                    "page": 0,
-                    "size": 0,
-                    "pages": 1
-                }
-            
-            # Добавляем пагинацию ПОСЛЕ сортировки
-            data_query = data_query.offset((page - 1) * size).limit(size)
-            
-            # Выполняем запросы
-            count_result = await session.execute(count_query)
-            total = count_result.scalar()
-            
-            data_result = await session.execute(data_query)
-            objects = data_result.scalars().all()
-            
-            # Вычисляем количество страниц
-            pages = (total + size - 1) // size if total > 0 else 0
-            
+            ).where(cls.model.id.in_(ids))
+            result = await session.execute(query)
+            objects_by_id = {obj.id: obj for obj in result.scalars().all()}
+        # Запись могла быть удалена после построения индекса
+        return [objects_by_id[i] for i in ids if i in objects_by_id]
+
+    @classmethod
+    async def _paginate_ids(cls, ids: list, page: int, size: int) -> dict:
+        """Страница результата по уже отсортированным id (page=0 или size=0 — все элементы)"""
+        if page == 0 or size == 0:
+            objects = await cls._load_ordered(ids)
             return {
                 "items": objects,
-                "total": total,
-                "page": page,
-                "size": size,
-                "pages": pages
+                "total": len(objects),
+                "page": 0,
+                "size": 0,
+                "pages": 1
             }
+        
+        total = len(ids)
+        objects = await cls._load_ordered(ids[(page - 1) * size:page * size])
+        pages = (total + size - 1) // size if total > 0 else 0
+        return {
+            "items": objects,
+            "total": total,
+            "page": page,
+            "size": size,
+            "pages": pages
+        }
+
+    @classmethod
+    async def _count_facets(cls, *filters) -> dict:
+        """Значения muscle_group и equipment_name с количеством упражнений (GROUP BY вместо загрузки строк)"""
+        facets = {}
+        async with async_session_maker() as session:
+            for key, column in (("muscle_groups", cls.model.muscle_group), ("equipment_names", cls.model.equipment_name)):
+                query = (
+                    select(column, func.count(cls.model.id))
+                    .where(*filters, column.isnot(None), column != "")
+                    .group_by(column)
+                )
+                result = await session.execute(query)
+                facets[key] = dict(result.all())
+        return facets
+
+    @classmethod
+    def _facets_response(cls, *facet_counts: dict) -> dict:
+        """Объединяет счетчики фасетов и формирует ответ: отсортированные значения и количество по каждому"""
+        response = {}
+        for key in ("muscle_groups", "equipment_names"):
+            counts = {}
+            for facets in facet_counts:
+                for value, count in facets[key].items():
+                    counts[value] = counts.get(value, 0) + count
+            response[key] = sorted(counts)
+            response[f"{key}_counts"] = {value: counts[value] for value in response[key]}
+        return response
+
+    @classmethod
+    async def _get_system_facets(cls) -> dict:
+        facets = _system_filters_cache.get("system")
+        if facets is None:
+            facets = await cls._count_facets(cls.model.exercise_type == SYSTEM_EXERCISE_TYPE)
+            _system_filters_cache.set("system", facets)
+        return facets
+
+    @classmethod
+    def invalidate_exercise_filters(cls, user_id: int = None):
+        """Сбрасывает кэш фильтров: системных (user_id не указан) или собственных упражнений пользователя"""
+        if user_id is None:
+            _system_filters_cache.clear()
+        else:
+            _user_filters_cache.pop(user_id)
 
     @classmethod
     async def get_exercise_filters(cls, *, user_id: int):
         """Получить фильтры для упражнений пользователя"""
-        from sqlalchemy import or_, distinct
+        system_facets = await cls._get_system_facets()
         
-        async with async_session_maker() as session:
-            # Запрос для получения всех доступных упражнений
-            query = select(cls.model).filter(
-                or_(
-                    cls.model.exercise_type == "system",
-                    (cls.model.exercise_type == "user") & (cls.model.user_id == user_id)
-                )
+        # Собственные упражнения пользователя кэшируются отдельно от системных
+        user_facets = _user_filters_cache.get(user_id)
+        if user_facets is None:
+            user_facets = await cls._count_facets(
+                cls.model.exercise_type == "user",
+                cls.model.user_id == user_id
             )
-            
-            result = await session.execute(query)
-            exercises = result.scalars().all()
-            
-            # Извлекаем уникальные значения
-            muscle_groups = set()
-            equipment_names = set()
-            
-            for exercise in exercises:
-                if exercise.muscle_group:
-                    muscle_groups.add(exercise.muscle_group)
-                if exercise.equipment_name:
-                    equipment_names.add(exercise.equipment_name)
-            
-            return {
-                "muscle_groups": sorted(list(muscle_groups)),
-                "equipment_names": sorted(list(equipment_names))
-            }
+            _user_filters_cache.set(user_id, user_facets)
+        
+        return cls._facets_response(system_facets, user_facets)
 
     @classmethod
     async def get_system_exercise_filters(cls):
         """Получить фильтры только для системных упражнений"""
-        async with async_session_maker() as session:
-            # Запрос для получения только системных упражнений
-            query = select(cls.model).filter(
-                cls.model.exercise_type == "system"
+        return cls._facets_response(await cls._get_system_facets())
+
+    @classmethod
+    def _exercise_statistics_query(cls, exercise_reference_uuid: UUID, user_id: int, date_from: date = None, date_to: date = None, limit: int = None):
+        """
+        Один запрос: подходы PASSED пользователя по упражнению справочника, сгруппированные
+        по (training_date, training_id, exercise_id) — каждая группа одна строка истории с подходами в JSON.
+        Оконные функции считают max_sets_per_day и total_training_days по всем группам до LIMIT.
+        """
+        from app.trainings.models import Training
+        
+        sets_json = func.json_agg(
+            aggregate_order_by(
+                func.json_build_object(
+                    literal_column("'set_number'"), UserExercise.set_number,
+                    literal_column("'reps'"), UserExercise.reps,
+                    literal_column("'weight'"), UserExercise.weight,
+                    literal_column("'training_uuid'"), Training.uuid,
+                    literal_column("'exercise_uuid'"), Exercise.uuid
+                ),
+                UserExercise.set_number
+            ),
+            type_=JSON
+        )
+        groups = (
+            select(
+                UserExercise.training_date,
+                UserExercise.training_id,
+                UserExercise.exercise_id,
+                func.count(UserExercise.id).label("sets_count"),
+                sets_json.label("sets"),
+                func.dense_rank().over(order_by=UserExercise.training_date).label("day_rank")
             )
-            
-            result = await session.execute(query)
-            exercises = result.scalars().all()
-            
-            # Извлекаем уникальные значения
-            muscle_groups = set()
-            equipment_names = set()
-            
-            for exercise in exercises:
-                if exercise.muscle_group:
-                    muscle_groups.add(exercise.muscle_group)
-                if exercise.equipment_name:
-                    equipment_names.add(exercise.equipment_name)
-            
-            return {
-                "muscle_groups": sorted(list(muscle_groups)),
-                "equipment_names": sorted(list(equipment_names))
-            }
+            .join(Exercise, Exercise.id == UserExercise.exercise_id)
+            .join(cls.model, cls.model.id == Exercise.exercise_reference_id)
+            .outerjoin(Training, Training.id == UserExercise.training_id)
+            .where(
+                cls.model.uuid == exercise_reference_uuid,
+                UserExercise.user_id == user_id,
+                UserExercise.status == ExerciseStatus.PASSED
+            )
+            .group_by(UserExercise.training_date, UserExercise.training_id, UserExercise.exercise_id)
+        )
+        if date_from:
+            groups = groups.where(UserExercise.training_date >= date_from)
+        if date_to:
+            groups = groups.where(UserExercise.training_date <= date_to)
+        groups = groups.subquery("groups")
+        
+        query = (
+            select(
+                groups.c.training_date,
+                groups.c.sets,
+                func.max(groups.c.sets_count).over().label("max_sets_per_day"),
+                func.max(groups.c.day_rank).over().label("total_training_days")
+            )
+            .order_by(groups.c.training_date.desc(), groups.c.training_id.desc(), groups.c.exercise_id.desc())
+        )
+        if limit:
+            query = query.limit(limit)
+        return query
+
+    @classmethod
+    def invalidate_exercise_statistics(cls, user_id: int):
+        """Сбрасывает закэшированную статистику упражнений пользователя (после изменения его user_exercise)"""
+        _statistics_cache.invalidate_user(user_id)
 
     @classmethod
-    async def get_exercise_statistics(cls, exercise_reference_uuid: UUID, user_uuid: UUID):
-        """Получить статистику выполнения упражнения для конкретного пользователя"""
-        from app.user_exercises.models import UserExercise, ExerciseStatus
-        from app.exercises.models import Exercise
-        from app.users.models import User
-        from collections import defaultdict
+    async def get_exercise_statistics(cls, exercise_reference_uuid: UUID, user_uuid: UUID, *, user_id: int, date_from: date = None, date_to: date = None, limit: int = None):
+        """
+        Получить статистику выполнения упражнения для конкретного пользователя.
+        Опционально — только за период [date_from, date_to] и не больше limit записей истории (самые новые).
+        """
+        cache_key = (str(exercise_reference_uuid), date_from, date_to, limit)
+        statistics = _statistics_cache.get(user_id, cache_key)
+        if statistics is not None:
+            return statistics
         
         async with async_session_maker() as session:
-            # Получаем ID пользователя
-            user_query = select(User).filter_by(uuid=user_uuid)
-            user_result = await session.execute(user_query)
-            user = user_result.scalar_one_or_none()
-            if not user:
-                return None
-            
-            # Получаем ID exercise_reference
-            exercise_ref_query = select(cls.model).filter_by(uuid=exercise_reference_uuid)
-            exercise_ref_result = await session.execute(exercise_ref_query)
-            exercise_ref = exercise_ref_result.scalar_one_or_none()
-            if not exercise_ref:
-                return None
-            
-            # Получаем все упражнения, связанные с этим exercise_reference
-            exercises_query = select(Exercise).filter_by(exercise_reference_id=exercise_ref.id)
-            exercises_result = await session.execute(exercises_query)
-            exercises = exercises_result.scalars().all()
-            
-            if not exercises:
-                return {
-                    "exercise_reference_uuid": str(exercise_reference_uuid),
-                    "user_uuid": str(user_uuid),
-                    "max_sets_per_day": 0,
-                    "total_training_days": 0,
-                    "history": []
-                }
-            
-            exercise_ids = [ex.id for ex in exercises]
-            
-            # Создаем словарь для быстрого доступа к uuid упражнений
-            exercise_id_to_uuid = {ex.id: str(ex.uuid) for ex in exercises}
-            
-            # Получаем все записи user_exercise для этих упражнений с фильтром по пользователю и статусу PASSED
-            user_exercises_query = select(UserExercise).filter(
-                UserExercise.exercise_id.in_(exercise_ids),
-                UserExercise.user_id == user.id,
-                UserExercise.status == ExerciseStatus.PASSED
-            ).order_by(UserExercise.training_date.desc())
-            
-            user_exercises_result = await session.execute(user_exercises_query)
-            user_exercises = user_exercises_result.scalars().all()
-            
-            # Получаем все уникальные training_id
-            training_ids = list(set(ue.training_id for ue in user_exercises if ue.training_id))
-            
-            # Получаем uuid тренировок
-            from app.trainings.models import Training
-            training_id_to_uuid = {}
-            if training_ids:
-                trainings_query = select(Training).filter(Training.id.in_(training_ids))
-                trainings_result = await session.execute(trainings_query)
-                trainings = trainings_result.scalars().all()
-                training_id_to_uuid = {t.id: str(t.uuid) for t in trainings}
-            
-            # Группируем по уникальной комбинации (training_date, training_id, exercise_id)
-            history_by_group = defaultdict(list)
-            for ue in user_exercises:
-                # Генерируем уникальный ключ для группировки
-                key = (ue.training_date, ue.training_id, ue.exercise_id)
-                history_by_group[key].append({
-                    "set_number": ue.set_number,
-                    "reps": ue.reps,
-                    "weight": ue.weight,
-                    "training_uuid": training_id_to_uuid.get(ue.training_id),
-                    "exercise_uuid": exercise_id_to_uuid.get(ue.exercise_id)
-                })
-            
-            # Формируем результат и вычисляем статистику
-            history = []
-            max_sets_per_day = 0
-            
-            # Сортируем группы по дате (от новых к старым)
-            sorted_groups = sorted(history_by_group.keys(), key=lambda x: (x[0], x[1], x[2]), reverse=True)
-            
-            for training_date, training_id, exercise_id in sorted_groups:
-                sets = history_by_group[(training_date, training_id, exercise_id)]
-                # Сортируем подходы по номеру подхода
-                sets = sorted(sets, key=lambda x: x["set_number"])
-                sets_count = len(sets)
-                
-                # Обновляем максимальное количество подходов
-                if sets_count > max_sets_per_day:
-                    max_sets_per_day = sets_count
-                
-                history.append({
-                    "training_date": training_date.isoformat(),
-                    "sets": sets
-                })
-            
-            # Подсчитываем количество уникальных дней (по training_date)
-            unique_dates = set(training_date for training_date, _, _ in history_by_group.keys())
-            total_training_days = len(unique_dates)
-            
-            return {
-                "exercise_reference_uuid": str(exercise_reference_uuid),
-                "user_uuid": str(user_uuid),
-                "max_sets_per_day": max_sets_per_day,
-                "total_training_days": total_training_days,
-                "history": history
-            }
+            result = await session.execute(
+                cls._exercise_statistics_query(exercise_reference_uuid, user_id, date_from, date_to, limit)
+            )
+            rows = result.all()
+            if not rows:
+                # Пустая история — различаем «нет выполнений» и «нет такого упражнения»
+                exists_result = await session.execute(select(cls.model.id).filter_by(uuid=exercise_reference_uuid))
+                if exists_result.scalar_one_or_none() is None:
+                    return None
+        
+        statistics = {
+            "exercise_reference_uuid": str(exercise_reference_uuid),
+            "user_uuid": str(user_uuid),
+            "max_sets_per_day": rows[0].max_sets_per_day if rows else 0,
+            "total_training_days": rows[0].total_training_days if rows else 0,
+            "history": [
+                {"training_date": row.training_date.isoformat(), "sets": row.sets}
+                for row in rows
+            ]
+        }
+        _statistics_cache.set(user_id, cache_key, statistics)
+        return statistics
 
     @classmethod
     async def find_passed_exercises(cls, user_uuid: UUID, caption: str = None) -> list:
@@ -695,20 +698,13 @@ class ExerciseReferenceDAO(BaseDAO):
             return {}
         
         async with async_session_maker() as session:
-            # Подсчитываем количество exercise, которые используют каждое exercise_reference
-            query = select(
-                Exercise.exercise_reference_id,
-                func.count(Exercise.id).label('count')
-            ).where(
-                Exercise.exercise_reference_id.in_(exercise_reference_ids)
-            ).group_by(Exercise.exercise_reference_id)
-            
+            query = select(cls.model.id, cls.model.usage_count).where(cls.model.id.in_(exercise_reference_ids))
             result = await session.execute(query)
             popularity_dict = {row[0]: row[1] for row in result.all()}
             
-            # Добавляем 0 для упражнений, которые не используются ни в одном exercise
+            # Добавляем 0 для упражнений, которых нет в справочнике
             for ex_id in exercise_reference_ids:
                 if ex_id not in popularity_dict:
                     popularity_dict[ex_id] = 0
             
-            return popularity_dict
\ No newline at end of file
+            return popularity_dict
@@ -1,5 +1,5 @@
 from typing import Optional, TYPE_CHECKING
-from sqlalchemy import Text, ForeignKey
+from sqlalchemy import Text, ForeignKey, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base, int_pk, uuid_field
 
@@ -8,6 +8,10 @@ if TYPE_CHECKING:
 
 class ExerciseReference(Base):
     __tablename__ = 'exercise_reference'
+    __table_args__ = (
+        Index('ix_exercise_reference_usage_count', 'usage_count'),
+        Index('ix_exercise_reference_user_id', 'user_id'),
+    )
 
     id: Mapped[int_pk]
     uuid: Mapped[uuid_field]
@@ -23,6 +27,8 @@ class ExerciseReference(Base):
     image_id: Mapped[Optional[int]] = mapped_column(ForeignKey("files.id"), nullable=True)
     video_id: Mapped[Optional[int]] = mapped_column(ForeignKey("files.id"), nullable=True)
     gif_id: Mapped[Optional[int]] = mapped_column(ForeignKey("files.id"), nullable=True)
+    # Популярность: количество exercise, ссылающихся на упражнение справочника (поддерживает ExerciseDAO)
+    usage_count: Mapped[int] = mapped_column(default=0, server_default=text('0'))
 
     image: Mapped[Optional["File"]] = relationship("File", foreign_keys=[image_id])
     video: Mapped[Optional["File"]] = relationship("File", foreign_keys=[video_id])
@@ -1,7 +1,16 @@
 from uuid import UUID
+from datetime import date
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from app.exercise_reference.dao import ExerciseReferenceDAO
+from app.exercise_reference.caption_index import (
+    SYSTEM_EXERCISE_TYPE,
+    CaptionIndex,
+    catalog_version,
+    get_caption_index,
+    invalidate_caption_index,
+    load_caption_entries,
+)
 from app.exercise_reference.models import ExerciseReference
 from app.exercise_reference.rb import RBExerciseReference
 from app.exercise_reference.schemas import SExerciseReference, SExerciseReferenceAdd, SExerciseReferenceUpdate, SPaginationResponse, SExerciseStatistics, SExerciseFilters
@@ -13,12 +22,42 @@ from app.users.dependencies import (
 from app.files.dao import FilesDAO
 from app.files.service import FileService
 from app.users.dao import UsersDAO
+from app.users.models import User
 from app.user_favorite_exercises.dao import UserFavoriteExerciseDAO
+from app.user_favorite_exercises.models import UserFavoriteExercise
+from app.conditional_get import conditional_get, table_version
 from app.logger import logger
+from sqlalchemy import select
 
 router = APIRouter(prefix='/exercise_reference', tags=['Справочник упражнений'])
 
-@router.get('/', summary='Получить все упражнения справочника')
+def _own_exercises(request, user):
+    """Условия версии: упражнения пользователя из пути или фильтра user_uuid, иначе текущего"""
+    try:
+        user_uuid = UUID(str(request.path_params.get('user_uuid') or request.query_params.get('user_uuid', '')))
+    except ValueError:
+        return [ExerciseReference.user_id == user.id]
+    return [ExerciseReference.user_id == select(User.id).where(User.uuid == user_uuid).scalar_subquery()]
+
+
+# Условный GET для списков справочника: версия системного справочника из индекса названий
+# (сигнатура и популярность, без запросов к таблице на каждый GET), собственные упражнения
+# пользователя (по индексу user_id) и избранное текущего пользователя
+catalog_not_modified = conditional_get(
+    lambda request, user: catalog_version(),
+    table_version(ExerciseReference, where=_own_exercises),
+    table_version(UserFavoriteExercise, where=lambda request, user: [UserFavoriteExercise.user_id == user.id])
+)
+
+def _invalidate_catalog_caches(exercise_type: Optional[str], user_id: Optional[int]) -> None:
+    """Сбрасывает кэши справочника после записи: индекс названий и фильтры системных или пользовательских упражнений"""
+    if exercise_type == SYSTEM_EXERCISE_TYPE:
+        invalidate_caption_index()
+        ExerciseReferenceDAO.invalidate_exercise_filters()
+    elif user_id:
+        ExerciseReferenceDAO.invalidate_exercise_filters(user_id)
+
+@router.get('/', summary='Получить все упражнения справочника', dependencies=[Depends(catalog_not_modified)])
 async def get_all_exercise_references(
     page: int = Query(1, ge=0, description="Номер страницы (0 для получения всех элементов)"),
     size: int = Query(20, ge=0, description="Размер страницы (0 для получения всех элементов)"),
@@ -67,7 +106,7 @@ async def get_all_exercise_references(
         pages=result["pages"]
     )
 
-@router.get('/search/by-caption', summary='Поиск справочника упражнений по части названия (caption)')
+@router.get('/search/by-caption', summary='Поиск справочника упражнений по части названия (caption)', dependencies=[Depends(catalog_not_modified)])
 async def search_exercise_reference_by_caption(
     caption: Optional[str] = Query(None, description="Часть названия упражнения (поиск без учета регистра)"),
     muscle_groups: Optional[str] = Query(None, description="Фильтр по группам мышц (список через запятую, поиск только в основной группе мышц)"),
@@ -113,7 +152,7 @@ async def search_exercise_reference_by_caption(
         pages=result["pages"]
     )
 
-@router.get('/available/{user_uuid}', summary='Получить все доступные упражнения для пользователя')
+@router.get('/available/{user_uuid}', summary='Получить все доступные упражнения для пользователя', dependencies=[Depends(catalog_not_modified)])
 async def get_available_exercises(
     user_uuid: UUID,
     page: int = Query(1, ge=0, description="Номер страницы (0 для получения всех элементов)"),
@@ -158,7 +197,7 @@ async def get_available_exercises(
         pages=result["pages"]
     )
 
-@router.get('/available/{user_uuid}/search/by-caption', summary='Поиск доступных упражнений по части названия (caption)')
+@router.get('/available/{user_uuid}/search/by-caption', summary='Поиск доступных упражнений по части названия (caption)', dependencies=[Depends(catalog_not_modified)])
 async def search_available_exercises_by_caption(
     user_uuid: UUID,
     caption: Optional[str] = Query(None, description="Часть названия упражнения (поиск без учета регистра)"),
@@ -217,7 +256,33 @@ async def search_available_exercises_by_caption(
         pages=result["pages"]
     )
 
-@router.get('/filters/{user_uuid}', summary='Получить фильтры для упражнений пользователя')
+@router.get('/available/{user_uuid}/autocomplete', summary='Автодополнение названий доступных упражнений')
+async def autocomplete_available_exercises(
+    user_uuid: UUID,
+    query: str = Query(..., min_length=1, description="Начало слова из названия упражнения"),
+    limit: int = Query(10, ge=1, le=50, description="Максимальное количество подсказок"),
+    user_data = Depends(get_current_user_user)
+) -> list[str]:
+    """
+    Подсказки слов для пикера упражнений: слова из названий системных упражнений
+    и собственных упражнений пользователя, начинающиеся с query (самые частые первыми).
+    Отвечает индекс названий в памяти воркера.
+    """
+    if str(user_uuid) != str(user_data.uuid):
+        raise HTTPException(status_code=403, detail="Вы можете получить упражнения только для своего профиля")
+    
+    index = await get_caption_index()
+    suggestions = index.complete(query, limit)
+    user_entries = await load_caption_entries(
+        ExerciseReference.exercise_type == "user",
+        ExerciseReference.user_id == user_data.id
+    )
+    if user_entries:
+        user_suggestions = CaptionIndex(user_entries).complete(query, limit)
+        suggestions = user_suggestions + [s for s in suggestions if s not in user_suggestions]
+    return suggestions[:limit]
+
+@router.get('/filters/{user_uuid}', summary='Получить фильтры для упражнений пользователя', dependencies=[Depends(catalog_not_modified)])
 async def get_exercise_filters(
     user_uuid: UUID,
     user_data = Depends(get_current_user_user)
@@ -239,12 +304,9 @@ async def get_exercise_filters(
     # Получаем фильтры
     filters = await ExerciseReferenceDAO.get_exercise_filters(user_id=user.id)
     
-    return SExerciseFilters(
-        muscle_groups=filters["muscle_groups"],
-        equipment_names=filters["equipment_names"]
-    )
+    return SExerciseFilters(**filters)
 
-@router.get('/system/filters', summary='Получить фильтры для системных упражнений')
+@router.get('/system/filters', summary='Получить фильтры для системных упражнений', dependencies=[Depends(catalog_not_modified)])
 async def get_system_exercise_filters(
     user_data = Depends(get_current_user_user)
 ) -> SExerciseFilters:
@@ -257,10 +319,7 @@ async def get_system_exercise_filters(
     # Получаем фильтры только для системных упражнений
     filters = await ExerciseReferenceDAO.get_system_exercise_filters()
     
-    return SExerciseFilters(
-        muscle_groups=filters["muscle_groups"],
-        equipment_names=filters["equipment_names"]
-    )
+    return SExerciseFilters(**filters)
 
 @router.get('/{exercise_reference_uuid}', summary='Получить упражнение справочника по uuid')
 async def get_exercise_reference_by_id(
@@ -310,6 +369,7 @@ async def add_exercise_reference(exercise: SExerciseReferenceAdd, user_data = De
         values['user_id'] = user.id
     values.pop('user_uuid', None)
     exercise_uuid = await ExerciseReferenceDAO.add(**values)
+    _invalidate_catalog_caches(values.get('exercise_type'), values.get('user_id'))
     exercise_obj = await ExerciseReferenceDAO.find_full_data(exercise_uuid)
     return exercise_obj.to_dict()
 
@@ -398,6 +458,12 @@ async def update_exercise_reference(exercise_reference_uuid: UUID, exercise: SEx
                 await session.commit()
                 print(f"DEBUG: technique_description обновлен напрямую в БД: {technique_description_value}")
     
+    _invalidate_catalog_caches(existing_exercise.exercise_type, existing_exercise.user_id)
+    _invalidate_catalog_caches(
+        update_data.get('exercise_type', existing_exercise.exercise_type),
+        update_data.get('user_id', existing_exercise.user_id)
+    )
+    
     if check or technique_description_present:
         updated_exercise = await ExerciseReferenceDAO.find_full_data(exercise_reference_uuid)
         return updated_exercise.to_dict()
@@ -421,6 +487,7 @@ async def delete_exercise_reference_by_id(exercise_reference_uuid: UUID, user_da
             raise HTTPException(status_code=403, detail="Только администраторы могут удалять системные упражнения")
     
     check = await ExerciseReferenceDAO.delete_by_id(exercise_reference_uuid)
+    _invalidate_catalog_caches(existing_exercise.exercise_type, existing_exercise.user_id)
     if check:
         return {'message': f'Упражнение справочника с ID {exercise_reference_uuid} удалено!'}
     else:
@@ -623,18 +690,32 @@ async def delete_exercise_reference_gif(
 async def get_exercise_statistics(
     exercise_reference_uuid: UUID,
     user_uuid: UUID,
+    date_from: Optional[date] = Query(None, description="Начало периода (включительно)"),
+    date_to: Optional[date] = Query(None, description="Конец периода (включительно)"),
+    limit: Optional[int] = Query(None, ge=1, description="Максимальное количество записей истории (самые новые)"),
     user_data = Depends(get_current_user_user)
 ) -> SExerciseStatistics:
     """
     Получить статистику выполнения упражнения для конкретного пользователя.
     Возвращает историю выполнения упражнения с записями из таблицы user_exercise,
     где status = PASSED, сгруппированную по дням в порядке от новых к старым.
+    Период date_from/date_to ограничивает и историю, и статистику; limit — только историю.
     """
     # Проверяем права доступа - пользователь может получить статистику только для себя
     if str(user_uuid) != str(user_data.uuid):
         raise HTTPException(status_code=403, detail="Вы можете получить статистику только для своего профиля")
     
-    statistics = await ExerciseReferenceDAO.get_exercise_statistics(exercise_reference_uuid, user_uuid)
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from не может быть позже date_to")
+    
+    statistics = await ExerciseReferenceDAO.get_exercise_statistics(
+        exercise_reference_uuid,
+        user_uuid,
+        user_id=user_data.id,
+        date_from=date_from,
+        date_to=date_to,
+        limit=limit
+    )
     if statistics is None:
         raise HTTPException(status_code=404, detail="Упражнение или пользователь не найдены")
     
@@ -76,4 +76,6 @@ class SExerciseStatistics(BaseModel):
 class SExerciseFilters(BaseModel):
     """Схема для ответа с фильтрами упражнений"""
     muscle_groups: list[str] = Field(..., description="Список уникальных групп мышц")
-    equipment_names: list[str] = Field(..., description="Список уникальных названий оборудования") 
\ No newline at end of file
+    equipment_names: list[str] = Field(..., description="Список уникальных названий оборудования")
+    muscle_groups_counts: dict[str, int] = Field(default_factory=dict, description="Количество упражнений по группам мышц")
+    equipment_names_counts: dict[str, int] = Field(default_factory=dict, description="Количество упражнений по оборудованию")
\ No newline at end of file
@@ -75,3 +75,35 @@ class ExerciseDAO(BaseDAO):
             for obj in objects:
                 session.expunge(obj)
             return objects
+
+    @classmethod
+    async def _get_reference_ids(cls, object_uuid: UUID) -> set:
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(cls.model.exercise_reference_id).filter_by(uuid=object_uuid)
+            )
+            return set(result.scalars().all())
+
+    @classmethod
+    async def add(cls, **values):
+        exercise_uuid = await super().add(**values)
+        # Поддерживаем usage_count справочника
+        await ExerciseReferenceDAO.refresh_usage_counts(await cls._get_reference_ids(exercise_uuid))
+        return exercise_uuid
+
+    @classmethod
+    async def update(cls, object_uuid: UUID, **values):
+        if not {'exercise_reference_id', 'exercise_reference_uuid'} & values.keys():
+            return await super().update(object_uuid, **values)
+        reference_ids = await cls._get_reference_ids(object_uuid)
+        result = await super().update(object_uuid, **values)
+        reference_ids |= await cls._get_reference_ids(object_uuid)
+        await ExerciseReferenceDAO.refresh_usage_counts(reference_ids)
+        return result
+
+    @classmethod
+    async def delete_by_id(cls, object_uuid: UUID):
+        reference_ids = await cls._get_reference_ids(object_uuid)
+        result = await super().delete_by_id(object_uuid)
+        await ExerciseReferenceDAO.refresh_usage_counts(reference_ids)
+        return result
@@ -1,6 +1,6 @@
 from typing import Optional, List, TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, Text, text
+from sqlalchemy import ForeignKey, Index, Text, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base, str_uniq, int_pk, str_null_true, uuid_field
 from datetime import date
@@ -16,6 +16,9 @@ if TYPE_CHECKING:
 # создаем модель таблицы тренировок
 class Exercise(Base):
     __tablename__ = 'exercise'
+    __table_args__ = (
+        Index('ix_exercise_training_id', 'training_id'),
+    )
 
     id: Mapped[int_pk]
     uuid: Mapped[uuid_field]
@@ -1,22 +1,25 @@
 """
 Подбор замен для упражнения в тренировке: переиспользует app.user_program_plan.training_builder.
 """
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 from uuid import UUID
 
-from sqlalchemy import select, update as sqlalchemy_update
+from sqlalchemy import func, select, update as sqlalchemy_update
 from sqlalchemy.orm import joinedload
 
+from app.cache import PerUserTTLCache
 from app.database import async_session_maker
 from app.exercise_builder_pool.models import ExerciseBuilderPool
 from app.exercise_reference.models import ExerciseReference
 from app.exercises.models import Exercise
 from app.trainings.models import Training
 from app.user_program_plan.models import UserProgramPlan
+from app.user_program_plan.similarity_graph import get_similarity_graph
 from app.user_program_plan.training_builder import (
     build_training_builder_context,
     normalize_replacement_action,
     pool_difficulty_for_reference,
+    replacement_difficulty_order,
     replacement_duration_seconds,
     suggest_anchor_replacements,
     suggest_pool_replacements_for_slot,
@@ -26,6 +29,35 @@ from app.training_composition_rules.dao import TrainingCompositionRuleDAO
 # Сколько кандидатов ранжируем до пагинации (после — срез по page/page_size).
 MAX_REPLACEMENT_CANDIDATES_RANKED = 500
 
+# Кэш подбора замен (на воркер, по пользователю): контекст сборки тренировки и ранжированные
+# списки кандидатов. Пагинация и замены соседних упражнений той же тренировки отдаются из памяти.
+# Ключи начинаются с (plan_id, training_id, ...) и содержат сигнатуру упражнений тренировки
+# (count + max(updated_at)): любая запись упражнений — в т.ч. перегенерация программы или запрос
+# к другому воркеру — даёт новый ключ. invalidate_replacement_cache освобождает память сразу.
+REPLACEMENT_CACHE_TTL_SECONDS = 120
+_replacement_cache = PerUserTTLCache(max_users=256, per_user_maxsize=32, ttl=REPLACEMENT_CACHE_TTL_SECONDS)
+_CONTEXT_KEY = "__context__"
+
+
+def invalidate_replacement_cache(training_id: Optional[int]) -> None:
+    """Сбрасывает закэшированные кандидаты тренировки (после добавления/изменения/удаления её упражнений)."""
+    if training_id is None:
+        return
+    _replacement_cache.discard_where(lambda key: key[1] == training_id)
+
+
+async def _load_training_exercises_signature(training_id: int) -> Tuple:
+    """Дешёвая сигнатура упражнений тренировки для обнаружения изменений из других мест и воркеров."""
+    async with async_session_maker() as session:
+        row = (
+            await session.execute(
+                select(func.count(Exercise.id), func.max(Exercise.updated_at)).where(
+                    Exercise.training_id == training_id
+                )
+            )
+        ).one()
+    return tuple(row)
+
 
 async def _find_composition_rule(plan, training_type: str):
     all_rules = await TrainingCompositionRuleDAO.find_all(actual=True)
@@ -122,6 +154,81 @@ async def _pools_with_references(pool_ids: List[int]) -> Dict[int, ExerciseBuild
         return {p.id: p for p in rows}
 
 
+async def _rank_replacement_pools(
+    *,
+    ex,
+    training,
+    plan,
+    rule,
+    role: str,
+    action: str,
+    user_id: int,
+    exclude_refs: Set[int],
+    ctx: Dict[str, Any],
+) -> List[Any]:
+    """Отсортированный список кандидатов из пула для слота упражнения (до пагинации)."""
+    anchor_line = (ex.pool_difficulty_level or "").strip() or pool_difficulty_for_reference(
+        ctx["base_pool_items"], ex.exercise_reference_id
+    )
+
+    tt = (training.training_type or "").strip().lower()
+    limb = None
+    if "heavy_push" in tt:
+        limb = "push"
+    elif "heavy_pull" in tt:
+        limb = "pull"
+    elif "heavy_legs" in tt:
+        limb = "legs"
+
+    if role == "anchor" and not limb:
+        return []
+
+    async def _suggest(candidate_pool_ids: Optional[Set[int]]) -> List[Any]:
+        if role == "anchor":
+            return await suggest_anchor_replacements(
+                plan=plan,
+                training_type=training.training_type,
+                user_id=user_id,
+                plan_id=plan.id,
+                limb=limb,
+                exclude_exercise_reference_ids=exclude_refs,
+                anchor_diff_for_order=anchor_line,
+                action=action,
+                top_n=MAX_REPLACEMENT_CANDIDATES_RANKED,
+                ctx=ctx,
+                candidate_pool_ids=candidate_pool_ids,
+            )
+        return await suggest_pool_replacements_for_slot(
+            plan=plan,
+            rule=rule,
+            training_type=training.training_type,
+            user_id=user_id,
+            plan_id=plan.id,
+            slot_role=role,
+            action=action,
+            exclude_exercise_reference_ids=exclude_refs,
+            anchor_diff_for_order=anchor_line,
+            top_n=MAX_REPLACEMENT_CANDIDATES_RANKED,
+            ctx=ctx,
+            candidate_pool_ids=candidate_pool_ids,
+        )
+
+    # Быстрый путь: только соседи текущего упражнения из графа похожести (O(K)).
+    # Если у упражнения нет записи в пуле или среди соседей никто не прошёл фильтры — полный перебор пула.
+    graph = await get_similarity_graph()
+    pool_id = graph.pool_id_for_reference(ex.exercise_reference_id)
+    if pool_id is not None:
+        levels = replacement_difficulty_order(plan, anchor_line, action)
+        if normalize_replacement_action(action) == "replace":
+            levels = levels + ["any"]
+        neighbour_ids = graph.similar(pool_id, levels)
+        if neighbour_ids:
+            pools = await _suggest(set(neighbour_ids))
+            if pools:
+                return pools
+    return await _suggest(None)
+
+
 async def get_replacement_candidates(
     exercise_uuid: UUID,
     action: str,
@@ -148,64 +255,50 @@ async def get_replacement_candidates(
     if training.user_id != user_id:
         return {"error": "forbidden"}
 
-    rule = await _find_composition_rule(plan, training.training_type)
-    if rule is None:
-        return {"error": "no_matching_rule"}
-
-    exclude_refs = await sibling_exercise_reference_ids(training.id)
-    ctx = await build_training_builder_context(plan, training.training_type, user_id, plan.id)
-    anchor_line = (ex.pool_difficulty_level or "").strip() or pool_difficulty_for_reference(
-        ctx["base_pool_items"], ex.exercise_reference_id
-    )
-
     role = (ex.slot_type or "main").strip().lower()
-    tt = (training.training_type or "").strip().lower()
-    limb = None
-    if "heavy_push" in tt:
-        limb = "push"
-    elif "heavy_pull" in tt:
-        limb = "pull"
-    elif "heavy_legs" in tt:
-        limb = "legs"
-
-    if role == "anchor" and limb:
-        pools = await suggest_anchor_replacements(
-            plan=plan,
-            training_type=training.training_type,
-            user_id=user_id,
-            plan_id=plan.id,
-            limb=limb,
-            exclude_exercise_reference_ids=exclude_refs,
-            anchor_diff_for_order=anchor_line,
-            action=action,
-            top_n=MAX_REPLACEMENT_CANDIDATES_RANKED,
-            ctx=ctx,
-        )
-    elif role == "anchor":
-        pools = []
-    else:
-        pools = await suggest_pool_replacements_for_slot(
+    # updated_at плана в ключе: смена недели/сложности/оборудования даёт новый набор кандидатов
+    plan_version = getattr(plan, "updated_at", None)
+    exercises_version = await _load_training_exercises_signature(training.id)
+    ranked_key = (
+        plan.id, training.id, role, act, ex.exercise_reference_id, ex.pool_difficulty_level,
+        plan_version, exercises_version,
+    )
+    pool_ids = _replacement_cache.get(user_id, ranked_key)
+    if pool_ids is None:
+        context_key = (plan.id, training.id, _CONTEXT_KEY, plan_version, exercises_version)
+        cached_context = _replacement_cache.get(user_id, context_key)
+        if cached_context is None:
+            rule = await _find_composition_rule(plan, training.training_type)
+            if rule is None:
+                return {"error": "no_matching_rule"}
+            exclude_refs = await sibling_exercise_reference_ids(training.id)
+            ctx = await build_training_builder_context(plan, training.training_type, user_id, plan.id)
+            _replacement_cache.set(user_id, context_key, (rule, exclude_refs, ctx))
+        else:
+            rule, exclude_refs, ctx = cached_context
+
+        pools = await _rank_replacement_pools(
+            ex=ex,
+            training=training,
             plan=plan,
             rule=rule,
-            training_type=training.training_type,
-            user_id=user_id,
-            plan_id=plan.id,
-            slot_role=role,
+            role=role,
             action=action,
-            exclude_exercise_reference_ids=exclude_refs,
-            anchor_diff_for_order=anchor_line,
-            top_n=MAX_REPLACEMENT_CANDIDATES_RANKED,
+            user_id=user_id,
+            exclude_refs=exclude_refs,
             ctx=ctx,
         )
+        pool_ids = [p.id for p in pools]
+        _replacement_cache.set(user_id, ranked_key, pool_ids)
 
-    total = len(pools)
+    total = len(pool_ids)
     start = (page - 1) * page_size
-    page_pools = pools[start : start + page_size]
+    page_pool_ids = pool_ids[start : start + page_size]
 
-    by_id = await _pools_with_references([p.id for p in page_pools])
+    by_id = await _pools_with_references(page_pool_ids)
     items = []
-    for p in page_pools:
-        full = by_id.get(p.id)
+    for pool_id in page_pool_ids:
+        full = by_id.get(pool_id)
         if not full:
             continue
         items.append(
@@ -280,6 +373,7 @@ async def replace_exercise_from_pool(
                 .where(Exercise.uuid == exercise_uuid)
                 .values(duration_seconds=duration_sec)
             )
+    invalidate_replacement_cache(training.id)
     updated = await ExerciseDAO.find_full_data(exercise_uuid)
     data = updated.to_dict()
     data.pop("user_id", None)
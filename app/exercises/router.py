@@ -4,7 +4,11 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from pydantic import BaseModel, Field
 
 from app.exercises.dao import ExerciseDAO
-from app.exercises.replacement_service import get_replacement_candidates, replace_exercise_from_pool
+from app.exercises.replacement_service import (
+    get_replacement_candidates,
+    invalidate_replacement_cache,
+    replace_exercise_from_pool,
+)
 from app.exercises.rb import RBExercise
 from app.exercises.schemas import SExercise, SExerciseAdd, SExerciseUpdate
 from app.users.dependencies import (
@@ -134,6 +138,7 @@ async def add_exercise(exercise: SExerciseAdd, user_data = Depends(get_current_u
 
     exercise_uuid = await ExerciseDAO.add(**values)
     exercise_obj = await ExerciseDAO.find_full_data(exercise_uuid)
+    invalidate_replacement_cache(exercise_obj.training_id)
     
     # Формируем ответ как в get_exercise_by_id
     user = await UsersDAO.find_one_or_none(id=exercise_obj.user_id) if exercise_obj.user_id else None
@@ -204,6 +209,9 @@ async def update_exercise(exercise_uuid: UUID, exercise: SExerciseUpdate, user_d
     check = await ExerciseDAO.update(exercise_uuid, **update_data)
     if check:
         updated_exercise = await ExerciseDAO.find_full_data(exercise_uuid)
+        invalidate_replacement_cache(existing_exercise.training_id)
+        if updated_exercise.training_id != existing_exercise.training_id:
+            invalidate_replacement_cache(updated_exercise.training_id)
         user = await UsersDAO.find_one_or_none(id=updated_exercise.user_id) if updated_exercise.user_id else None
         
         data = updated_exercise.to_dict()
@@ -234,6 +242,7 @@ async def delete_exercise_by_id(exercise_uuid: UUID, user_data = Depends(get_cur
     
     check = await ExerciseDAO.delete_by_id(exercise_uuid)
     if check:
+        invalidate_replacement_cache(existing_exercise.training_id)
         return {"message": f"Упражнение с ID {exercise_uuid} удалено!"}
     else:
         return {"message": "Ошибка при удалении упражнения!"}
@@ -1,6 +1,14 @@
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
 from app.dao.base import BaseDAO
-from app.files.models import File
-from sqlalchemy import select, delete, desc, update
+from app.files.models import File, FileBlob
+from sqlalchemy import select, delete, desc, update, insert
 from app.programs.models import Program
 from app.trainings.models import Training
 from app.exercise_groups.models import ExerciseGroup
@@ -8,9 +16,184 @@ from app.exercises.models import Exercise
 from app.exercise_reference.models import ExerciseReference
 
 
+def _forget_served_files(file_uuids: Iterable[str]) -> None:
+    """Сбрасывает кэш метаданных отдачи файлов для удаленных записей"""
+    from app.files.serving import invalidate_file_meta
+    for file_uuid in file_uuids:
+        invalidate_file_meta(file_uuid)
+
+
+def _remove_blob_files(paths: List[str]) -> None:
+    from app.files.images import remove_image_variants
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        remove_image_variants(path)
+
+
 class FilesDAO(BaseDAO):
     model = File
     
+    @classmethod
+    async def add_with_blob(
+        cls,
+        sha256: str,
+        blob_path: str,
+        store_blob: Callable[[], Awaitable[None]],
+        file_size: int,
+        **values
+    ) -> str:
+        """
+        Создает запись File, ссылающуюся на содержимое с хэшем sha256 (FileBlob создается
+        или получает +1 к ref_count). store_blob кладет содержимое на диск внутри транзакции,
+        пока строка FileBlob заблокирована: параллельное удаление последней ссылки либо уже
+        завершилось (и строка создается заново), либо дождется коммита и увидит новую ссылку.
+        """
+        from app.database import async_session_maker
+        async with async_session_maker() as session:
+            async with session.begin():
+                blob_id = await cls._acquire_blob(session, sha256, blob_path, file_size)
+                file_uuid = (
+                    await session.execute(
+                        insert(cls.model)
+                        .values(blob_id=blob_id, file_path=blob_path, file_size=file_size, **values)
+                        .returning(cls.model.uuid)
+                    )
+                ).scalar_one()
+                await store_blob()
+                return file_uuid
+    
+    @classmethod
+    async def _acquire_blob(cls, session, sha256: str, blob_path: str, file_size: int) -> int:
+        """Создает FileBlob или добавляет ему ссылку; строка остается заблокированной до коммита"""
+        return (
+            await session.execute(
+                pg_insert(FileBlob)
+                .values(sha256=sha256, file_path=blob_path, file_size=file_size, ref_count=1)
+                .on_conflict_do_update(
+                    index_elements=[FileBlob.sha256],
+                    set_={"ref_count": FileBlob.ref_count + 1, "updated_at": datetime.utcnow()},
+                )
+                .returning(FileBlob.id)
+            )
+        ).scalar_one()
+    
+    @classmethod
+    async def swap_blob(
+        cls,
+        file_id: int,
+        old_blob_id: int,
+        sha256: str,
+        blob_path: str,
+        store_blob: Callable[[], Awaitable[None]],
+        file_size: int,
+        **values
+    ) -> bool:
+        """
+        Переключает запись File на новое содержимое (например, перекодированное видео),
+        если она все еще ссылается на old_blob_id. Старое содержимое освобождается.
+        Возвращает False, если запись удалена или ее содержимое уже заменили.
+        """
+        from app.database import async_session_maker
+        async with async_session_maker() as session:
+            async with session.begin():
+                current = (
+                    await session.execute(
+                        select(cls.model.id)
+                        .where(cls.model.id == file_id, cls.model.blob_id == old_blob_id)
+                        .with_for_update()
+                    )
+                ).scalar_one_or_none()
+                if current is None:
+                    return False
+                blob_id = await cls._acquire_blob(session, sha256, blob_path, file_size)
+                await store_blob()
+                await session.execute(
+                    update(cls.model)
+                    .where(cls.model.id == file_id)
+                    .values(blob_id=blob_id, file_path=blob_path, file_size=file_size, **values)
+                )
+                await cls._release_blobs(session, [old_blob_id])
+                return True
+    
+    @classmethod
+    async def claim_processing(cls, file_id: int, from_status: str, to_status: str):
+        """
+        Атомарно переводит файл из from_status в to_status (захват задачи обработки одним воркером).
+        Возвращает строку (id, uuid, file_path, blob_id, filename) или None, если файл уже захвачен.
+        """
+        from app.database import async_session_maker
+        async with async_session_maker() as session:
+            async with session.begin():
+                return (
+                    await session.execute(
+                        update(cls.model)
+                        .where(cls.model.id == file_id, cls.model.processing_status == from_status)
+                        .values(processing_status=to_status)
+                        .returning(cls.model.id, cls.model.uuid, cls.model.file_path, cls.model.blob_id, cls.model.filename)
+                    )
+                ).one_or_none()
+    
+    @classmethod
+    async def set_processing_status(cls, file_id: int, status: Optional[str]) -> None:
+        from app.database import async_session_maker
+        async with async_session_maker() as session:
+            async with session.begin():
+                await session.execute(
+                    update(cls.model).where(cls.model.id == file_id).values(processing_status=status)
+                )
+    
+    @classmethod
+    async def find_ids_by_processing_status(cls, status: str, limit: int) -> List[int]:
+        from app.database import async_session_maker
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(cls.model.id)
+                .where(cls.model.processing_status == status)
+                .order_by(cls.model.id)
+                .limit(limit)
+            )
+            return list(result.scalars().all())
+    
+    @classmethod
+    async def reset_stale_processing(cls, status: str, reset_to: str, older_than: datetime) -> int:
+        """Возвращает в очередь задачи, брошенные упавшим воркером (давно без изменений)."""
+        from app.database import async_session_maker
+        async with async_session_maker() as session:
+            async with session.begin():
+                result = await session.execute(
+                    update(cls.model)
+                    .where(cls.model.processing_status == status, cls.model.updated_at < older_than)
+                    .values(processing_status=reset_to)
+                )
+                return result.rowcount
+    
+    @classmethod
+    async def _release_blobs(cls, session, blob_ids: Iterable[Optional[int]]) -> List[str]:
+        """
+        Уменьшает ref_count содержимого удаленных записей File. Содержимое без ссылок удаляется
+        вместе с файлом на диске (до коммита, пока строка FileBlob заблокирована).
+        Возвращает пути удаленных файлов.
+        """
+        removed_paths = []
+        for blob_id, released in sorted(Counter(b for b in blob_ids if b is not None).items()):
+            blob = (
+                await session.execute(
+                    update(FileBlob)
+                    .where(FileBlob.id == blob_id)
+                    .values(ref_count=FileBlob.ref_count - released, updated_at=datetime.utcnow())
+                    .returning(FileBlob.ref_count, FileBlob.file_path)
+                )
+            ).one_or_none()
+            if blob is not None and blob.ref_count <= 0:
+                await session.execute(delete(FileBlob).where(FileBlob.id == blob_id))
+                removed_paths.append(blob.file_path)
+        if removed_paths:
+            await run_in_threadpool(_remove_blob_files, removed_paths)
+        return removed_paths
+    
     @classmethod
     async def find_by_entity(cls, entity_type: str, entity_id: int):
         """Поиск файлов по типу и ID сущности"""
@@ -57,7 +240,9 @@ class FilesDAO(BaseDAO):
                 await session.execute(
                     delete(cls.model).where(cls.model.uuid == file_uuid)
                 )
+                await cls._release_blobs(session, [file_to_delete.blob_id])
                 await session.commit()
+                _forget_served_files([file_uuid])
                 return file_uuid
     
     @classmethod
@@ -138,12 +323,14 @@ class FilesDAO(BaseDAO):
                         .values(video_id=None)
                     )
 
-                # Удаляем файл
+                # Удаляем файл; содержимое удаляется, если это была последняя ссылка
                 await session.execute(
                     delete(cls.model).where(cls.model.uuid == file_uuid)
                 )
+                await cls._release_blobs(session, [file_to_delete.blob_id])
                 
                 await session.commit()
+                _forget_served_files([file_uuid])
                 return file_uuid
     
     @classmethod
@@ -177,6 +364,8 @@ class FilesDAO(BaseDAO):
                         delete(cls.model).where(cls.model.id == avatar.id)
                     )
                     deleted_uuids.append(avatar.uuid)
+                await cls._release_blobs(session, [avatar.blob_id for avatar in avatars_to_delete])
                 
                 await session.commit()
+                _forget_served_files(deleted_uuids)
                 return deleted_uuids 
\ No newline at end of file
@@ -0,0 +1,288 @@
+"""
+Сборка мусора в директории загрузок.
+
+Файлы на диске и строки files/file_blobs расходятся: неудачные загрузки оставляют файлы без
+записей, а после замены картинок остаются записи, указывающие на отсутствующие файлы.
+Сборщик сверяет обе стороны слиянием отсортированных потоков, не держа в памяти полных списков:
+
+* диск обходится через os.scandir в лексикографическом порядке полных путей (содержимое
+  каждой директории сортируется, директории сравниваются по имени с «/» на конце), пачками
+  в пуле потоков, чтобы не блокировать event loop;
+* пути из БД читаются серверным курсором с ORDER BY file_path COLLATE "C" (побайтовый порядок
+  совпадает с порядком строк Python).
+
+Файл без записи, не менявшийся дольше GC_GRACE_SECONDS (защита от загрузок, которые ещё
+не закоммичены), перепроверяется в БД пачкой и переносится в uploads/.quarantine/<дата>/;
+карантин старше QUARANTINE_DAYS удаляется, его размер попадает в отчёт как освобождённое место.
+Записи без файлов только попадают в отчёт — ссылки на них чистит удаление файла.
+Варианты изображений и постеры (uploads/variants) — производный кэш: они удаляются сразу,
+если исходного файла больше нет на диске.
+
+Запуск: задача планировщика раз в сутки или вручную `python -m app.files.gc [--dry-run]`.
+"""
+import asyncio
+import os
+import shutil
+import time
+from datetime import date, datetime, timedelta
+from glob import escape, glob
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterator, List
+
+from sqlalchemy import select, union
+from starlette.concurrency import run_in_threadpool
+
+from app.logger import logger
+
+GC_GRACE_SECONDS = 6 * 3600
+QUARANTINE_DAYS = 7
+QUARANTINE_SUBDIR = ".quarantine"
+GC_BATCH_SIZE = 1000
+MISSING_SAMPLE_SIZE = 20
+
+
+class DiskEntry:
+    __slots__ = ("path", "size", "mtime")
+
+    def __init__(self, path: str, size: int, mtime: float):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+
+
+def walk_sorted(root: str, skip: tuple = ()) -> Iterator[DiskEntry]:
+    """
+    Файлы под root в лексикографическом порядке полных путей. Директории сортируются как
+    «имя/», поэтому uploads/ab.jpg идет раньше uploads/ab/... — как в ORDER BY file_path.
+    """
+    try:
+        with os.scandir(root) as it:
+            entries = sorted(
+                (entry.name + "/" if entry.is_dir(follow_symlinks=False) else entry.name, entry)
+                for entry in it
+                if entry.name not in skip
+            )
+    except FileNotFoundError:
+        return
+    for key, entry in entries:
+        if key.endswith("/"):
+            yield from walk_sorted(entry.path)
+        else:
+            try:
+                stat_result = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            yield DiskEntry(entry.path, stat_result.st_size, stat_result.st_mtime)
+
+
+async def _iterate_in_threadpool(iterator: Iterator, batch_size: int = GC_BATCH_SIZE) -> AsyncIterator:
+    """Обходит синхронный итератор (файловая система) пачками в пуле потоков."""
+    while batch := await run_in_threadpool(lambda: list(islice(iterator, batch_size))):
+        for item in batch:
+            yield item
+
+
+def _referenced_paths_query(prefix: str):
+    from app.files.models import File, FileBlob
+    files = select(File.file_path.label("file_path")).where(File.file_path.startswith(prefix, autoescape=True))
+    blobs = select(FileBlob.file_path.label("file_path")).where(FileBlob.file_path.startswith(prefix, autoescape=True))
+    paths = union(files, blobs).subquery()
+    return select(paths.c.file_path).order_by(paths.c.file_path.collate("C"))
+
+
+async def _stream_referenced_paths(prefix: str) -> AsyncIterator[str]:
+    """Пути из files и file_blobs в побайтовом порядке, серверным курсором."""
+    from app.database import async_session_maker
+    async with async_session_maker() as session:
+        result = await session.stream(
+            _referenced_paths_query(prefix).execution_options(yield_per=GC_BATCH_SIZE)
+        )
+        async for (file_path,) in result:
+            yield os.path.normpath(file_path)
+
+
+async def _still_unreferenced(paths: List[str]) -> List[str]:
+    """Перепроверка кандидатов перед карантином: файл мог получить запись после начала обхода."""
+    from app.database import async_session_maker
+    from app.files.models import File, FileBlob
+    async with async_session_maker() as session:
+        result = await session.execute(
+            union(
+                select(File.file_path).where(File.file_path.in_(paths)),
+                select(FileBlob.file_path).where(FileBlob.file_path.in_(paths)),
+            )
+        )
+        referenced = {os.path.normpath(p) for (p,) in result.all()}
+    return [p for p in paths if p not in referenced]
+
+
+async def merge_join(disk: AsyncIterator[DiskEntry], db: AsyncIterator[str]) -> AsyncIterator[tuple]:
+    """Слияние двух отсортированных потоков: (файл или None, путь из БД или None)."""
+    entry = await anext(disk, None)
+    path = await anext(db, None)
+    while entry is not None or path is not None:
+        if path is None or (entry is not None and entry.path < path):
+            yield entry, None
+            entry = await anext(disk, None)
+        elif entry is None or path < entry.path:
+            yield None, path
+            path = await anext(db, None)
+        else:
+            yield entry, path
+            entry = await anext(disk, None)
+            path = await anext(db, None)
+
+
+def _quarantine(upload_dir: str, paths: List[str], day: date) -> int:
+    """Переносит файлы в карантин дня (с сохранением относительных путей). Возвращает число байт."""
+    moved_bytes = 0
+    target_root = os.path.join(upload_dir, QUARANTINE_SUBDIR, day.isoformat())
+    for path in paths:
+        target = os.path.join(target_root, os.path.relpath(path, upload_dir))
+        try:
+            size = os.stat(path).st_size
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+        except FileNotFoundError:
+            continue
+        moved_bytes += size
+    return moved_bytes
+
+
+def _purge_quarantine(upload_dir: str, today: date) -> tuple[int, int]:
+    """Удаляет карантин старше QUARANTINE_DAYS. Возвращает (файлов, байт)."""
+    files = reclaimed = 0
+    quarantine_root = os.path.join(upload_dir, QUARANTINE_SUBDIR)
+    expire_before = today - timedelta(days=QUARANTINE_DAYS)
+    try:
+        days = sorted(os.listdir(quarantine_root))
+    except FileNotFoundError:
+        return 0, 0
+    for name in days:
+        try:
+            day = date.fromisoformat(name)
+        except ValueError:
+            continue
+        if day >= expire_before:
+            continue
+        day_dir = os.path.join(quarantine_root, name)
+        for entry in walk_sorted(day_dir):
+            files += 1
+            reclaimed += entry.size
+        shutil.rmtree(day_dir, ignore_errors=True)
+    return files, reclaimed
+
+
+def _variant_source_exists(upload_dir: str, name: str) -> bool:
+    """Есть ли на диске исходный файл варианта (<ключ>_<ширина>.<формат> или <ключ>_poster.jpg)."""
+    from app.files.service import FileService
+    key = name.rsplit("_", 1)[0]
+    if len(key) == 64 and os.path.exists(FileService.blob_path(key)):
+        return True
+    return bool(glob(os.path.join(escape(upload_dir), escape(key) + ".*")))
+
+
+def _remove_orphan_variants(upload_dir: str, variants_root: str, grace_before: float, dry_run: bool) -> tuple[int, int]:
+    removed = removed_bytes = 0
+    for entry in walk_sorted(variants_root):
+        name = os.path.basename(entry.path)
+        if name.startswith("."):
+            # Недописанный вариант (временный файл упавшей генерации)
+            orphan = entry.mtime < grace_before
+        else:
+            orphan = not _variant_source_exists(upload_dir, name)
+        if not orphan:
+            continue
+        if not dry_run:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+        removed += 1
+        removed_bytes += entry.size
+    return removed, removed_bytes
+
+
+async def collect_garbage(dry_run: bool = False) -> Dict[str, object]:
+    """Сверяет uploads с БД, переносит файлы-сироты в карантин и чистит старый карантин."""
+    from app.files.images import VARIANTS_SUBDIR
+    from app.files.service import FileService
+
+    started = time.perf_counter()
+    upload_dir = os.path.normpath(FileService.UPLOAD_DIR)
+    grace_before = time.time() - GC_GRACE_SECONDS
+    today = datetime.utcnow().date()
+    report: Dict[str, object] = {
+        "dry_run": dry_run,
+        "scanned_files": 0,
+        "scanned_bytes": 0,
+        "referenced_files": 0,
+        "orphan_files": 0,
+        "orphan_bytes": 0,
+        "quarantined_bytes": 0,
+        "recent_unreferenced_files": 0,
+        "missing_files": 0,
+        "missing_sample": [],
+    }
+
+    disk = _iterate_in_threadpool(walk_sorted(upload_dir, skip=(QUARANTINE_SUBDIR, VARIANTS_SUBDIR)))
+    db = _stream_referenced_paths(upload_dir + os.sep)
+    candidates: List[DiskEntry] = []
+
+    async def flush() -> None:
+        sizes = {c.path: c.size for c in candidates}
+        candidates.clear()
+        paths = await _still_unreferenced(list(sizes))
+        report["orphan_files"] += len(paths)
+        report["orphan_bytes"] += sum(sizes[p] for p in paths)
+        if not dry_run and paths:
+            report["quarantined_bytes"] += await run_in_threadpool(_quarantine, upload_dir, paths, today)
+
+    async for entry, path in merge_join(disk, db):
+        if entry is None:
+            report["missing_files"] += 1
+            if len(report["missing_sample"]) < MISSING_SAMPLE_SIZE:
+                report["missing_sample"].append(path)
+            continue
+        report["scanned_files"] += 1
+        report["scanned_bytes"] += entry.size
+        if path is not None:
+            report["referenced_files"] += 1
+        elif entry.mtime >= grace_before:
+            report["recent_unreferenced_files"] += 1
+        else:
+            candidates.append(entry)
+            if len(candidates) >= GC_BATCH_SIZE:
+                await flush()
+    if candidates:
+        await flush()
+
+    variants_root = os.path.join(upload_dir, VARIANTS_SUBDIR)
+    report["orphan_variants"], report["orphan_variant_bytes"] = await run_in_threadpool(
+        _remove_orphan_variants, upload_dir, variants_root, grace_before, dry_run
+    )
+
+    if dry_run:
+        report["purged_files"], report["reclaimed_bytes"] = 0, 0
+    else:
+        report["purged_files"], report["reclaimed_bytes"] = await run_in_threadpool(
+            _purge_quarantine, upload_dir, today
+        )
+        report["reclaimed_bytes"] += report["orphan_variant_bytes"]
+
+    report["duration_seconds"] = round(time.perf_counter() - started, 2)
+    logger.info(
+        f"Сборка мусора uploads{' (dry run)' if dry_run else ''}: "
+        f"просмотрено {report['scanned_files']} файлов, сирот {report['orphan_files']} "
+        f"({report['orphan_bytes']} байт в карантин), записей без файла {report['missing_files']}, "
+        f"лишних вариантов {report['orphan_variants']}, освобождено {report['reclaimed_bytes']} байт "
+        f"за {report['duration_seconds']} с"
+    )
+    return report
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    print(json.dumps(asyncio.run(collect_garbage(dry_run="--dry-run" in sys.argv)), ensure_ascii=False, indent=2))
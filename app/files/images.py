@@ -0,0 +1,203 @@
+"""
+Уменьшенные варианты изображений для списков и превью.
+
+Картинки упражнений, программ, рецептов и аватары загружаются в исходном размере, а экранам
+списков нужны миниатюры. Поэтому для изображения готовятся варианты шириной IMAGE_VARIANT_WIDTHS
+в WebP (или JPEG для клиентов без WebP) без метаданных: EXIF, ICC и прочее не копируются,
+ориентация из EXIF применяется к пикселям до сохранения. Увеличения нет — вариант шире
+оригинала просто перекодируется в исходном размере.
+
+Кодирование — CPU-работа, поэтому выполняется в отдельном пуле процессов (контекст spawn, как
+у пула генерации программ питания). После загрузки WebP-варианты готовятся в фоне; запрос
+GET /files/file/{uuid}?w= берёт ближайший вариант с диска, при его отсутствии генерирует его
+(параллельные запросы одного варианта в воркере ждут одну генерацию), а при ошибке отдаёт оригинал.
+
+Варианты лежат в uploads/variants/ab/<ключ>_<ширина>.<формат>, где ключ — имя исходного файла
+(sha256 для хранилища по хэшу), и удаляются вместе с содержимым. Там же лежат постеры видео
+(<ключ>_poster.jpg), которые готовит очередь перекодирования.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import uuid4
+
+from app.logger import logger
+
+IMAGE_VARIANT_WIDTHS = (128, 512, 1024)
+IMAGE_VARIANT_FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_WORKERS = max(1, min(2, os.cpu_count() or 1))
+IMAGE_VARIANT_TIMEOUT_SECONDS = 20
+VARIANTS_SUBDIR = "variants"
+
+# GIF может быть анимированным — его не пережимаем
+SOURCE_MIME_TYPES = {"image/jpeg", "image/jpg", "image/png", "image/webp"}
+
+_executor: Optional[ProcessPoolExecutor] = None
+_pending: Dict[Path, asyncio.Future] = {}
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def get_image_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.info(f"Пул обработки изображений запущен: {IMAGE_WORKERS} процесс(ов)")
+    return _executor
+
+
+def reset_image_executor() -> None:
+    """Сбрасывает пул (например, после BrokenProcessPool); следующий вызов создаст новый."""
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_image_executor() -> None:
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+        logger.info("Пул обработки изображений остановлен")
+
+
+def nearest_width(width: int) -> int:
+    """Наименьший вариант не уже запрошенной ширины (или самый широкий)."""
+    for variant_width in IMAGE_VARIANT_WIDTHS:
+        if variant_width >= width:
+            return variant_width
+    return IMAGE_VARIANT_WIDTHS[-1]
+
+
+def preferred_format(accept: Optional[str]) -> str:
+    return "webp" if accept and "image/webp" in accept else "jpeg"
+
+
+def variants_dir() -> Path:
+    from app.files.service import FileService
+    return Path(FileService.UPLOAD_DIR) / VARIANTS_SUBDIR
+
+
+def variant_path(source_path: str, width: int, image_format: str) -> Path:
+    key = Path(source_path).stem
+    return variants_dir() / key[:2] / f"{key}_{width}.{image_format}"
+
+
+def poster_path(video_path: str) -> Path:
+    """Постер видео (кадр в JPEG) хранится рядом с вариантами изображений."""
+    key = Path(video_path).stem
+    return variants_dir() / key[:2] / f"{key}_poster.jpg"
+
+
+def variant_paths(source_path: str) -> List[Path]:
+    """Все возможные варианты исходного файла (для удаления вместе с ним)."""
+    return [
+        variant_path(source_path, width, image_format)
+        for width in IMAGE_VARIANT_WIDTHS
+        for image_format in IMAGE_VARIANT_FORMATS
+    ] + [poster_path(source_path)]
+
+
+def render_variant(source_path: str, target_path: str, width: int, image_format: str) -> str:
+    """
+    Выполняется в процессе пула: уменьшает изображение до ширины width и сохраняет
+    в image_format без метаданных. Запись атомарная (временный файл + os.replace).
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.width > width:
+            image.thumbnail((width, image.height), Image.LANCZOS)
+        if image_format == "jpeg" and image.mode != "RGB":
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+        target = Path(target_path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = target.with_name(f".{uuid4()}.part")
+        try:
+            # exif/icc_profile не передаются — метаданные в вариант не попадают
+            image.save(temp_path, format=image_format.upper(), quality=IMAGE_VARIANT_QUALITY, optimize=True)
+            os.replace(temp_path, target)
+        finally:
+            if temp_path.exists():
+                os.remove(temp_path)
+    return target_path
+
+
+async def ensure_variant(source_path: str, width: int, image_format: str) -> Path:
+    """Путь готового варианта; при отсутствии на диске генерирует его в пуле процессов."""
+    target = variant_path(source_path, width, image_format)
+    if target.exists():
+        return target
+
+    pending = _pending.get(target)
+    if pending is None:
+        loop = asyncio.get_running_loop()
+        pending = loop.run_in_executor(
+            get_image_executor(), render_variant, source_path, str(target), width, image_format
+        )
+        _pending[target] = pending
+        pending.add_done_callback(lambda _: _pending.pop(target, None))
+    try:
+        await asyncio.wait_for(asyncio.shield(pending), timeout=IMAGE_VARIANT_TIMEOUT_SECONDS)
+    except BrokenProcessPool:
+        reset_image_executor()
+        raise
+    return target
+
+
+async def get_image_variant(
+    source_path: str, mime_type: Optional[str], width: int, accept: Optional[str]
+) -> Optional[Tuple[Path, str]]:
+    """
+    (путь, MIME) ближайшего варианта для запрошенной ширины или None, если отдавать
+    нужно оригинал (не растровое изображение или вариант не удалось построить).
+    """
+    if mime_type not in SOURCE_MIME_TYPES:
+        return None
+    image_format = preferred_format(accept)
+    try:
+        path = await ensure_variant(source_path, nearest_width(width), image_format)
+    except Exception as e:
+        logger.warning(f"Не удалось подготовить вариант изображения {source_path} (w={width}): {e}")
+        return None
+    return path, IMAGE_VARIANT_FORMATS[image_format]
+
+
+def schedule_image_variants(source_path: str, mime_type: Optional[str]) -> None:
+    """Готовит WebP-варианты загруженного изображения в фоне (JPEG — по первому запросу)."""
+    if mime_type not in SOURCE_MIME_TYPES:
+        return
+
+    async def generate() -> None:
+        for width in IMAGE_VARIANT_WIDTHS:
+            try:
+                await ensure_variant(source_path, width, "webp")
+            except Exception as e:
+                logger.warning(f"Не удалось подготовить вариант изображения {source_path} (w={width}): {e}")
+                return
+
+    task = asyncio.get_running_loop().create_task(generate())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def remove_image_variants(source_path: str) -> None:
+    for path in variant_paths(source_path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
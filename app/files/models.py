@@ -5,6 +5,19 @@ from sqlalchemy.orm import relationship
 from app.database import Base
 
 
+class FileBlob(Base):
+    """Содержимое файла на диске, общее для всех записей File с одинаковым sha256"""
+    __tablename__ = "file_blobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, nullable=False)  # Хэш содержимого
+    file_path = Column(String, nullable=False)  # uploads/ab/cd/<sha256>
+    file_size = Column(Integer, nullable=False)  # Размер в байтах
+    ref_count = Column(Integer, nullable=False, default=0, server_default="0")  # Число ссылающихся записей File
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class File(Base):
     __tablename__ = "files"
     
@@ -16,6 +29,10 @@ class File(Base):
     mime_type = Column(String, nullable=False)  # MIME тип файла
     entity_type = Column(String, nullable=False)  # Тип сущности (user, program, etc.)
     entity_id = Column(Integer, nullable=False)  # ID сущности
+    # Содержимое в хранилище по хэшу; NULL — старые файлы с собственным путем
+    blob_id = Column(Integer, ForeignKey("file_blobs.id"), nullable=True, index=True)
+    # Перекодирование видео: pending, processing, ready, failed; NULL — не требуется
+    processing_status = Column(String, nullable=True, index=True)
     # Убираем user_id чтобы избежать конфликта с avatar_id в User модели
     # user_id = Column(Integer, ForeignKey("user.id"), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
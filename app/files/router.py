@@ -1,6 +1,6 @@
 from uuid import UUID
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Request, status
 from app.users.dependencies import (
     get_current_user_user,
     get_current_user_or_valid_anonymous_session,
@@ -9,43 +9,81 @@ from app.users.models import User
 from app.files.service import FileService
 from app.files.schemas import FileUploadResponse, FileResponse as FileResponseSchema
 from app.files.dao import FilesDAO
+from app.files.images import get_image_variant, poster_path
+from app.files.serving import FileMeta, file_etag, get_file_meta, serve_file
+from app.files.transcode import TRANSCODE_READY
 from app.users.dao import UsersDAO
 import os
 
 router = APIRouter(prefix='/files', tags=['Files'])
 
 
-
+async def _get_accessible_file(file_uuid: str, access_data) -> FileMeta:
+    """Метаданные файла с проверкой прав доступа (аватары доступны только владельцу)"""
+    file_meta = await get_file_meta(file_uuid)
+    
+    # Проверяем права доступа
+    if file_meta.entity_type == "user":
+        if not hasattr(access_data, "id") or file_meta.entity_id != access_data.id:
+            raise HTTPException(status_code=403, detail="Нет доступа к этому файлу")
+    return file_meta
 
 
 @router.get('/file/{file_uuid}', summary='Получить файл по UUID')
 async def get_file_by_uuid(
     file_uuid: str,
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, le=4096, description="Ширина для списков: отдается ближайший уменьшенный вариант"),
     access_data=Depends(get_current_user_or_valid_anonymous_session),
 ):
-    print(f"Поиск файла с UUID: {file_uuid}")
-    file_record = await FilesDAO.find_by_uuid(file_uuid)
-    print(f"Результат поиска файла: ID={file_record.id if file_record else None}, UUID={file_record.uuid if file_record else None}")
-    
-    if not file_record:
-        raise HTTPException(status_code=404, detail="Файл не найден")
+    file_meta = await _get_accessible_file(file_uuid, access_data)
     
-    # Проверяем права доступа
-    if file_record.entity_type == "user":
-        if not hasattr(access_data, "id") or file_record.entity_id != access_data.id:
-            raise HTTPException(status_code=403, detail="Нет доступа к этому файлу")
+    # Уменьшенный вариант изображения (WebP, если клиент его принимает)
+    if w is not None:
+        variant = await get_image_variant(
+            file_meta.path, file_meta.mime_type, w, request.headers.get("accept")
+        )
+        if variant is not None:
+            variant_path, media_type = variant
+            return serve_file(
+                request,
+                variant_path,
+                media_type,
+                f"{os.path.splitext(file_meta.filename)[0]}{variant_path.suffix}",
+                etag=file_etag(variant_path),
+                vary="Accept",
+            )
     
-    # Проверяем существование файла на диске
-    if not os.path.exists(file_record.file_path):
-        raise HTTPException(status_code=404, detail="Файл не найден на диске")
+    # Возвращаем файл (Range, ETag, кэширование на клиенте)
+    return serve_file(
+        request,
+        file_meta.path,
+        file_meta.mime_type,
+        file_meta.filename,
+        etag=file_meta.etag,
+        cache_control=file_meta.cache_control,
+        stat_result=file_meta.stat_result,
+    )
+
+@router.get('/file/{file_uuid}/poster', summary='Получить постер видео по UUID')
+async def get_video_poster(
+    file_uuid: str,
+    request: Request,
+    access_data=Depends(get_current_user_or_valid_anonymous_session),
+):
+    file_meta = await _get_accessible_file(file_uuid, access_data)
     
-    print(f"Путь к файлу: {file_record.file_path}")
+    # Постер появляется после перекодирования видео
+    poster = poster_path(file_meta.path)
+    if file_meta.processing_status != TRANSCODE_READY or not os.path.exists(poster):
+        raise HTTPException(status_code=404, detail="Постер не найден")
     
-    # Возвращаем файл
-    return FileResponse(
-        path=file_record.file_path,
-        filename=file_record.filename,
-        media_type=file_record.mime_type
+    return serve_file(
+        request,
+        poster,
+        "image/jpeg",
+        f"{os.path.splitext(file_meta.filename)[0]}.jpg",
+        etag=file_etag(poster),
     )
 
 @router.delete('/file/{file_uuid}', summary='Удалить файл по UUID')
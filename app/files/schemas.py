@@ -10,6 +10,7 @@ class FileResponse(BaseModel):
     mime_type: str
     entity_type: str
     entity_id: int
+    processing_status: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     
@@ -1,16 +1,22 @@
+import hashlib
 import os
 import shutil
 from pathlib import Path
 from uuid import uuid4, UUID
 from typing import Optional
 from fastapi import UploadFile, HTTPException, status
+from starlette.concurrency import run_in_threadpool
 from app.files.dao import FilesDAO
+from app.files.images import remove_image_variants, schedule_image_variants
+from app.files.transcode import TRANSCODE_PENDING, enqueue_transcode, transcoding_enabled
 from app.files.models import File
+from app.logger import logger
 
 
 class FileService:
     UPLOAD_DIR = "uploads"
-    MAX_FILE_SIZE = 60 * 1024 * 1024  # 50MB
+    MAX_FILE_SIZE = 60 * 1024 * 1024  # 60MB
+    UPLOAD_CHUNK_SIZE = 1024 * 1024  # Чанк потоковой записи загрузки
     ALLOWED_IMAGE_TYPES = {
         "image/jpeg",
         "image/jpg", 
@@ -52,6 +58,116 @@ class FileService:
                 detail=f"Неподдерживаемый тип видео. Разрешены: {', '.join(cls.ALLOWED_VIDEO_TYPES)}"
             )
 
+    @classmethod
+    async def _stream_upload(cls, file: UploadFile) -> tuple[Path, int, str]:
+        """
+        Потоково сохраняет загрузку во временный файл в директории загрузок: крупные чанки
+        пишутся через пул потоков (event loop не блокируется), размер проверяется по ходу чтения,
+        sha256 считается инкрементально. Возвращает (временный путь, размер, sha256).
+        """
+        # Starlette знает размер загрузки заранее — заведомо большой файл не читаем вовсе
+        if file.size is not None and file.size > cls.MAX_FILE_SIZE:
+            cls._raise_too_large()
+        
+        upload_dir = cls.ensure_upload_dir()
+        temp_path = upload_dir / f".{uuid4()}.part"
+        
+        digest = hashlib.sha256()
+        file_size = 0
+        try:
+            out = await run_in_threadpool(open, temp_path, "wb")
+            try:
+                while chunk := await file.read(cls.UPLOAD_CHUNK_SIZE):
+                    file_size += len(chunk)
+                    if file_size > cls.MAX_FILE_SIZE:
+                        cls._raise_too_large()
+                    digest.update(chunk)
+                    await run_in_threadpool(out.write, chunk)
+            finally:
+                await run_in_threadpool(out.close)
+        except BaseException:
+            await run_in_threadpool(cls._remove_quietly, temp_path)
+            raise
+        
+        logger.debug("Загрузка принята: {}, размер: {} байт", file.filename, file_size)
+        return temp_path, file_size, digest.hexdigest()
+
+    @classmethod
+    def blob_path(cls, sha256: str) -> Path:
+        """Путь содержимого в хранилище по хэшу: uploads/ab/cd/<sha256>"""
+        return Path(cls.UPLOAD_DIR) / sha256[:2] / sha256[2:4] / sha256
+
+    @staticmethod
+    def _place_blob(temp_path: Path, blob_path: Path) -> None:
+        """
+        Атомарно кладет загрузку на место содержимого. Если такое содержимое уже есть,
+        файл просто перезаписывается тем же содержимым (заодно восстанавливается пропавший).
+        """
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, blob_path)
+
+    @classmethod
+    def _raise_too_large(cls):
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Файл слишком большой. Максимальный размер: {cls.MAX_FILE_SIZE // (1024*1024)}MB"
+        )
+
+    @staticmethod
+    def _remove_quietly(path: Path) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    async def _create_file_record(
+        cls,
+        file: UploadFile,
+        default_mime_type: str,
+        entity_type: str,
+        entity_id: int,
+        old_file_uuid: Optional[str] = None,
+        **extra_values
+    ) -> File:
+        """
+        Сохраняет загрузку в хранилище по хэшу содержимого и создает запись в БД.
+        Одинаковые файлы хранятся на диске один раз, записи File ссылаются на общий FileBlob.
+        """
+        temp_path, file_size, sha256 = await cls._stream_upload(file)
+        blob_path = cls.blob_path(sha256)
+        
+        try:
+            if old_file_uuid:
+                logger.debug("Удаляем старый файл: {}", old_file_uuid)
+                await cls.delete_file_by_uuid(old_file_uuid)
+            
+            file_data = {
+                "filename": file.filename or "unknown",
+                "file_size": file_size,
+                "mime_type": file.content_type or default_mime_type,
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+                **extra_values
+            }
+            logger.debug(
+                "Создаем запись в БД: filename={}, size={}, type={}",
+                file_data["filename"], file_data["file_size"], file_data["mime_type"],
+            )
+            
+            saved_file_uuid = await FilesDAO.add_with_blob(
+                sha256=sha256,
+                blob_path=str(blob_path),
+                store_blob=lambda: run_in_threadpool(cls._place_blob, temp_path, blob_path),
+                **file_data
+            )
+        finally:
+            # Временный файл остается только если до хранилища дело не дошло
+            await run_in_threadpool(cls._remove_quietly, temp_path)
+        logger.debug("Запись создана в БД, UUID: {}, содержимое: {}", saved_file_uuid, blob_path)
+        
+        return await FilesDAO.find_full_data(saved_file_uuid)
+
     @classmethod
     async def save_file(
         cls, 
@@ -61,74 +177,14 @@ class FileService:
         old_file_uuid: Optional[str] = None
     ) -> File:
         """Сохраняет файл и создает запись в БД (только для изображений)"""
-        print(f"Начинаем загрузку изображения: {file.filename}, тип: {file.content_type}")
+        logger.debug("Начинаем загрузку изображения: {}, тип: {}", file.filename, file.content_type)
         
         # Валидация файла
         cls.validate_image_file(file)
-        print("Валидация изображения пройдена")
         
-        # Проверка размера файла
-        file_size = 0
-        content = b""
-        chunk_count = 0
-        while chunk := await file.read(8192):
-            content += chunk
-            file_size += len(chunk)
-            chunk_count += 1
-            if chunk_count % 100 == 0:  # Логируем каждые 100 чанков
-                print(f"Прочитано чанков: {chunk_count}, размер: {file_size} байт")
-            if file_size > cls.MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    detail=f"Файл слишком большой. Максимальный размер: {cls.MAX_FILE_SIZE // (1024*1024)}MB"
-                )
-        
-        print(f"Файл полностью прочитан. Размер: {file_size} байт, чанков: {chunk_count}")
-        
-        # Создаем директорию если нужно
-        upload_dir = cls.ensure_upload_dir()
-        print(f"Директория для загрузки: {upload_dir}")
-        
-        # Генерируем уникальное имя файла
-        generated_uuid = str(uuid4())
-        file_extension = Path(file.filename).suffix if file.filename else ".jpg"
-        new_filename = f"{generated_uuid}{file_extension}"
-        file_path = upload_dir / new_filename
-        print(f"Путь к файлу: {file_path}")
-        
-        # Сохраняем файл
-        try:
-            with open(file_path, "wb") as f:
-                f.write(content)
-            print("Файл успешно сохранен на диск")
-        except UnicodeEncodeError as e:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Ошибка кодировки при сохранении файла: {str(e)}"
-            )
-        
-        # Удаляем старый файл если есть
-        if old_file_uuid:
-            print(f"Удаляем старый файл: {old_file_uuid}")
-            await cls.delete_file_by_uuid(old_file_uuid)
-        
-        # Создаем запись в БД
-        file_data = {
-            "filename": file.filename or "unknown",
-            "file_path": str(file_path),
-            "file_size": file_size,
-            "mime_type": file.content_type or "image/jpeg",
-            "entity_type": entity_type,
-            "entity_id": entity_id
-        }
-        print(f"Создаем запись в БД: filename={file_data['filename']}, size={file_data['file_size']}, type={file_data['mime_type']}")
-        
-        saved_file_uuid = await FilesDAO.add(**file_data)
-        print(f"Запись создана в БД, UUID: {saved_file_uuid}")
-        
-        result = await FilesDAO.find_full_data(saved_file_uuid)
-        print("Загружен файл")
-        return result
+        saved_file = await cls._create_file_record(file, "image/jpeg", entity_type, entity_id, old_file_uuid)
+        schedule_image_variants(saved_file.file_path, saved_file.mime_type)
+        return saved_file
 
     @classmethod
     async def save_video_file(
@@ -139,87 +195,50 @@ class FileService:
         old_file_uuid: Optional[str] = None
     ) -> File:
         """Сохраняет видео и создает запись в БД (только для видео)"""
-        print(f"Начинаем загрузку видео: {file.filename}, тип: {file.content_type}")
+        logger.debug("Начинаем загрузку видео: {}, тип: {}", file.filename, file.content_type)
         
         cls.validate_video_file(file)
-        print("Валидация видео пройдена")
-        
-        file_size = 0
-        content = b""
-        chunk_count = 0
-        while chunk := await file.read(8192):
-            content += chunk
-            file_size += len(chunk)
-            chunk_count += 1
-            if chunk_count % 100 == 0:  # Логируем каждые 100 чанков
-                print(f"Прочитано чанков: {chunk_count}, размер: {file_size} байт")
-            if file_size > cls.MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    detail=f"Файл слишком большой. Максимальный размер: {cls.MAX_FILE_SIZE // (1024*1024)}MB"
-                )
-        
-        print(f"Видео полностью прочитано. Размер: {file_size} байт, чанков: {chunk_count}")
-        
-        upload_dir = cls.ensure_upload_dir()
-        print(f"Директория для загрузки: {upload_dir}")
-        
-        generated_uuid = str(uuid4())
-        file_extension = Path(file.filename).suffix if file.filename else ".mp4"
-        new_filename = f"{generated_uuid}{file_extension}"
-        file_path = upload_dir / new_filename
-        print(f"Путь к файлу: {file_path}")
-        
-        with open(file_path, "wb") as f:
-            f.write(content)
-        print("Видео успешно сохранено на диск")
-        
-        if old_file_uuid:
-            print(f"Удаляем старое видео: {old_file_uuid}")
-            await cls.delete_file_by_uuid(old_file_uuid)
-        
-        file_data = {
-            "filename": file.filename or "unknown",
-            "file_path": str(file_path),
-            "file_size": file_size,
-            "mime_type": file.content_type or "video/mp4",
-            "entity_type": entity_type,
-            "entity_id": entity_id
-        }
-        print(f"Создаем запись в БД: filename={file_data['filename']}, size={file_data['file_size']}, type={file_data['mime_type']}")
-        
-        saved_file_uuid = await FilesDAO.add(**file_data)
-        print(f"Запись создана в БД, UUID: {saved_file_uuid}")
         
-        result = await FilesDAO.find_full_data(saved_file_uuid)
-        print("Загружен файл")
-        return result
+        # Перекодирование в faststart MP4 и постер готовятся в фоне, до тех пор отдается оригинал
+        processing_status = TRANSCODE_PENDING if transcoding_enabled() else None
+        saved_file = await cls._create_file_record(
+            file, "video/mp4", entity_type, entity_id, old_file_uuid, processing_status=processing_status
+        )
+        if processing_status:
+            enqueue_transcode(saved_file.id)
+        return saved_file
     
     @classmethod
     async def delete_file_by_uuid(cls, file_uuid: str) -> bool:
         """Удаляет файл по UUID"""
-        print(f"Удаляем файл с UUID: {file_uuid}")
+        logger.debug("Удаляем файл с UUID: {}", file_uuid)
         file_record = await FilesDAO.find_by_uuid(file_uuid)
-        print(f"Найден файл: ID={file_record.id if file_record else None}, UUID={file_record.uuid if file_record else None}")
+        logger.debug(
+            "Найден файл: ID={}, UUID={}",
+            file_record.id if file_record else None, file_record.uuid if file_record else None,
+        )
         
         if not file_record:
-            print("Файл не найден в БД")
+            logger.debug("Файл не найден в БД")
             return True  # Файл уже удален
         
-        # Удаляем файл с диска
+        # Файлы из хранилища по хэшу удаляет DAO, когда уходит последняя ссылка на содержимое
         file_path = str(file_record.file_path)
-        print(f"Путь к файлу: {file_path}")
+        logger.debug("Путь к файлу: {}", file_path)
         
-        if os.path.exists(file_path):
-            print(f"Удаляем файл с диска: {file_path}")
+        if file_record.blob_id is not None:
+            logger.debug("Содержимое общее, освобождается вместе с записью")
+        elif os.path.exists(file_path):
+            logger.debug("Удаляем файл с диска: {}", file_path)
             os.remove(file_path)
-            print("Файл удален с диска")
+            remove_image_variants(file_path)
+            logger.debug("Файл удален с диска")
         else:
-            print(f"Файл не найден на диске: {file_path}")
+            logger.debug("Файл не найден на диске: {}", file_path)
         
         # Удаляем запись из БД с очисткой ссылок в одной транзакции
         await FilesDAO.delete_file_with_cleanup(file_uuid)
-        print("Запись удалена из БД с очисткой ссылок")
+        logger.debug("Запись удалена из БД с очисткой ссылок")
         return True
     
     @classmethod
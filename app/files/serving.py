@@ -0,0 +1,184 @@
+"""
+Быстрая отдача файлов по UUID.
+
+Экраны списков запрашивают десятки картинок подряд, и каждая раньше стоила запроса в БД,
+os.path.exists и os.stat. Метаданные файла (путь, MIME, размер, mtime, владелец) кэшируются
+в LRU воркера на FILE_META_CACHE_TTL_SECONDS: на повторный запрос обработчик делает только
+проверку доступа. Содержимое за UUID не меняется (новая загрузка — новый UUID, содержимое
+хранится по хэшу), поэтому ответ получает ETag и Cache-Control immutable, а If-None-Match
+отвечает 304 без чтения файла. Исключение — видео, ожидающее перекодирования: его содержимое
+скоро сменится, такой ответ клиент перепроверяет (no-cache).
+
+Запросы Range (перемотка видео) обслуживает FileResponse. При X_ACCEL_REDIRECT_ENABLED байты
+отдаёт Nginx: ответ содержит только заголовок X-Accel-Redirect с внутренним адресом файла,
+Range и sendfile Nginx обрабатывает сам. Пример конфигурации Nginx:
+
+    location /protected-uploads/ {
+        internal;
+        alias /app/uploads/;
+    }
+
+Кэш живёт в пределах воркера: удаление и подмена файла сбрасывают запись в своём воркере.
+Остальные воркеры перед отдачей из кэша проверяют, что файл ещё на диске (одна проверка
+существования вместо запроса в БД); если его уже удалили, запись перечитывается из БД.
+"""
+import os
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.cache import TTLCache
+from app.conditional_get import etag_matches
+
+FILE_META_CACHE_MAXSIZE = 4096
+FILE_META_CACHE_TTL_SECONDS = 60
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+X_ACCEL_REDIRECT_ENABLED = False
+X_ACCEL_REDIRECT_PREFIX = "/protected-uploads/"
+
+# Статусы перекодирования, при которых содержимое за UUID еще сменится
+_MUTABLE_PROCESSING_STATUSES = {"pending", "processing"}
+
+_file_meta_cache = TTLCache(maxsize=FILE_META_CACHE_MAXSIZE, ttl=FILE_META_CACHE_TTL_SECONDS)
+
+
+class FileMeta:
+    """Все, что нужно для проверки доступа и отдачи файла без обращения к БД."""
+
+    __slots__ = (
+        "uuid", "path", "filename", "mime_type", "entity_type", "entity_id",
+        "processing_status", "stat_result",
+    )
+
+    def __init__(self, uuid, path, filename, mime_type, entity_type, entity_id, processing_status, stat_result):
+        self.uuid = uuid
+        self.path = path
+        self.filename = filename
+        self.mime_type = mime_type
+        self.entity_type = entity_type
+        self.entity_id = entity_id
+        self.processing_status = processing_status
+        self.stat_result = stat_result
+
+    @property
+    def etag(self) -> str:
+        return file_etag(self.path)
+
+    @property
+    def cache_control(self) -> str:
+        if self.processing_status in _MUTABLE_PROCESSING_STATUSES:
+            return REVALIDATE_CACHE_CONTROL
+        return IMMUTABLE_CACHE_CONTROL
+
+
+def file_etag(path) -> str:
+    """
+    ETag по имени файла: у содержимого в хранилище это sha256, у вариантов — sha256 с шириной
+    и форматом, у старых файлов — уникальный uuid4, с которым файл никогда не перезаписывается.
+    """
+    return f'"{Path(path).name}"'
+
+
+def _stat_or_none(path: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+async def get_file_meta(file_uuid: str) -> FileMeta:
+    """Метаданные файла из кэша воркера или из БД и с диска; 404, если файла нет."""
+    meta = _file_meta_cache.get(file_uuid)
+    if meta is not None:
+        # Другой воркер мог подменить содержимое (перекодирование) или удалить последнюю ссылку
+        # на него: старый файл уже удален, а запись кэша жива до TTL — тогда читаем запись заново
+        if await run_in_threadpool(os.path.exists, meta.path):
+            return meta
+        _file_meta_cache.pop(file_uuid)
+
+    from app.files.dao import FilesDAO
+    file_record = await FilesDAO.find_by_uuid(file_uuid)
+    if not file_record:
+        raise HTTPException(status_code=404, detail="Файл не найден")
+
+    stat_result = await run_in_threadpool(_stat_or_none, file_record.file_path)
+    if stat_result is None:
+        raise HTTPException(status_code=404, detail="Файл не найден на диске")
+
+    meta = FileMeta(
+        uuid=file_record.uuid,
+        path=file_record.file_path,
+        filename=file_record.filename,
+        mime_type=file_record.mime_type,
+        entity_type=file_record.entity_type,
+        entity_id=file_record.entity_id,
+        processing_status=file_record.processing_status,
+        stat_result=stat_result,
+    )
+    _file_meta_cache.set(file_uuid, meta)
+    return meta
+
+
+def invalidate_file_meta(file_uuid: Optional[str] = None) -> None:
+    """Сбрасывает метаданные файла (или весь кэш) в текущем воркере."""
+    if file_uuid is None:
+        _file_meta_cache.clear()
+    else:
+        _file_meta_cache.pop(str(file_uuid))
+
+
+def _accel_path(path: str) -> str:
+    from app.files.service import FileService
+    relative = os.path.relpath(path, FileService.UPLOAD_DIR).replace(os.sep, "/")
+    return X_ACCEL_REDIRECT_PREFIX + relative
+
+
+def _content_disposition(filename: str) -> str:
+    """Тот же Content-Disposition, что ставит FileResponse."""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def serve_file(
+    request: Request,
+    path,
+    media_type: str,
+    filename: str,
+    *,
+    etag: str,
+    cache_control: str = IMMUTABLE_CACHE_CONTROL,
+    stat_result: Optional[os.stat_result] = None,
+    vary: Optional[str] = None,
+) -> Response:
+    """
+    Ответ с файлом: 304 по If-None-Match, X-Accel-Redirect для Nginx или FileResponse
+    (с поддержкой Range; готовый stat_result избавляет от лишнего os.stat).
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if vary:
+        headers["Vary"] = vary
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if X_ACCEL_REDIRECT_ENABLED:
+        # Байты, Range и sendfile обслуживает Nginx; Content-Type он берет из ответа
+        headers["X-Accel-Redirect"] = _accel_path(str(path))
+        headers["Content-Disposition"] = _content_disposition(filename)
+        return Response(media_type=media_type, headers=headers)
+
+    return FileResponse(
+        path=path,
+        filename=filename,
+        media_type=media_type,
+        headers=headers,
+        stat_result=stat_result,
+    )
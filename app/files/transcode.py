@@ -0,0 +1,254 @@
+"""
+Очередь перекодирования загруженных видео.
+
+Видео упражнений загружаются как есть (MOV/MKV/AVI, высокий битрейт, moov-атом в конце файла),
+и клиент не может начать воспроизведение, пока не скачает файл целиком. Поэтому после загрузки
+видео ставится в очередь: локальный ffmpeg перекодирует его в H.264/AAC MP4 с faststart
+(moov-атом в начале) и ограниченным битрейтом и снимает постер-кадр в JPEG.
+
+Пока идёт перекодирование, отдаётся оригинал. Статус хранится в files.processing_status
+(pending -> processing -> ready/failed); готовая версия кладётся в хранилище по хэшу и
+подменяет содержимое записи File одной транзакцией, старое содержимое освобождается.
+
+Очередь ограничена (TRANSCODE_QUEUE_SIZE), одновременно работает не больше
+TRANSCODE_CONCURRENCY процессов ffmpeg на воркер, каждый с TRANSCODE_THREADS потоками
+и пониженным приоритетом (nice), чтобы перекодирование не отнимало CPU у обработки запросов.
+Задачи, не попавшие в очередь (переполнение, перезапуск воркера), подбирает периодическая
+задача requeue_pending_transcodes; захват задачи атомарный, поэтому несколько воркеров
+не перекодируют один файл дважды.
+"""
+import asyncio
+import hashlib
+import os
+import shutil
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+from uuid import uuid4
+
+from starlette.concurrency import run_in_threadpool
+
+from app.logger import logger
+
+FFMPEG_BINARY = "ffmpeg"
+TRANSCODE_CONCURRENCY = 1
+TRANSCODE_QUEUE_SIZE = 100
+TRANSCODE_THREADS = 2
+TRANSCODE_NICE = 10
+TRANSCODE_TIMEOUT_SECONDS = 900
+VIDEO_MAX_WIDTH = 1280
+VIDEO_MAX_BITRATE = "2500k"
+VIDEO_BUFFER_SIZE = "5000k"
+AUDIO_BITRATE = "128k"
+
+TRANSCODE_PENDING = "pending"
+TRANSCODE_PROCESSING = "processing"
+TRANSCODE_READY = "ready"
+TRANSCODE_FAILED = "failed"
+
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+
+
+def transcode_command(source_path: str, target_path: str) -> List[str]:
+    """H.264/AAC MP4 с moov-атомом в начале, шириной не больше VIDEO_MAX_WIDTH и ограниченным битрейтом."""
+    return [
+        FFMPEG_BINARY, "-hide_banner", "-nostdin", "-loglevel", "error", "-y",
+        "-i", source_path,
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-vf", f"scale='min({VIDEO_MAX_WIDTH},iw)':-2",
+        "-c:v", "libx264", "-preset", "veryfast", "-profile:v", "high", "-pix_fmt", "yuv420p",
+        "-crf", "23", "-maxrate", VIDEO_MAX_BITRATE, "-bufsize", VIDEO_BUFFER_SIZE,
+        "-c:a", "aac", "-b:a", AUDIO_BITRATE,
+        "-map_metadata", "-1",
+        "-movflags", "+faststart",
+        "-threads", str(TRANSCODE_THREADS),
+        "-f", "mp4", target_path,
+    ]
+
+
+def poster_command(source_path: str, target_path: str) -> List[str]:
+    """Характерный кадр из начала видео (фильтр thumbnail) в JPEG."""
+    return [
+        FFMPEG_BINARY, "-hide_banner", "-nostdin", "-loglevel", "error", "-y",
+        "-i", source_path,
+        "-vf", f"thumbnail,scale='min({VIDEO_MAX_WIDTH},iw)':-2",
+        "-frames:v", "1", "-q:v", "3",
+        "-threads", str(TRANSCODE_THREADS),
+        "-f", "image2", target_path,
+    ]
+
+
+def _low_priority(command: List[str]) -> List[str]:
+    nice = shutil.which("nice")
+    return [nice, "-n", str(TRANSCODE_NICE), *command] if nice else command
+
+
+async def run_ffmpeg(command: List[str], timeout: float = TRANSCODE_TIMEOUT_SECONDS) -> None:
+    process = await asyncio.create_subprocess_exec(
+        *_low_priority(command),
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except BaseException:
+        # Таймаут или отмена (остановка приложения) — ffmpeg не должен пережить задачу
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    if process.returncode != 0:
+        message = stderr.decode("utf-8", errors="replace").strip()[-500:]
+        raise RuntimeError(f"ffmpeg завершился с кодом {process.returncode}: {message}")
+
+
+def _hash_file(path: Path) -> tuple[int, str]:
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            size += len(chunk)
+            digest.update(chunk)
+    return size, digest.hexdigest()
+
+
+def _remove_quietly(*paths: Path) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def process_transcode(file_id: int) -> bool:
+    """
+    Перекодирует видео записи File и подменяет ее содержимое готовой версией.
+    Возвращает True, если запись переключена на перекодированное видео.
+    """
+    from app.files.dao import FilesDAO
+    from app.files.images import poster_path
+    from app.files.serving import invalidate_file_meta
+    from app.files.service import FileService
+
+    claimed = await FilesDAO.claim_processing(file_id, TRANSCODE_PENDING, TRANSCODE_PROCESSING)
+    if claimed is None:
+        return False
+
+    upload_dir = FileService.ensure_upload_dir()
+    video_temp = upload_dir / f".{uuid4()}.part"
+    poster_temp = upload_dir / f".{uuid4()}.part"
+    try:
+        await run_ffmpeg(transcode_command(claimed.file_path, str(video_temp)))
+        await run_ffmpeg(poster_command(str(video_temp), str(poster_temp)))
+        file_size, sha256 = await run_in_threadpool(_hash_file, video_temp)
+        blob_path = FileService.blob_path(sha256)
+        poster = poster_path(str(blob_path))
+
+        def place_rendition() -> None:
+            FileService._place_blob(video_temp, blob_path)
+            poster.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(poster_temp, poster)
+
+        swapped = await FilesDAO.swap_blob(
+            file_id=claimed.id,
+            old_blob_id=claimed.blob_id,
+            sha256=sha256,
+            blob_path=str(blob_path),
+            store_blob=lambda: run_in_threadpool(place_rendition),
+            file_size=file_size,
+            filename=f"{Path(claimed.filename).stem}.mp4",
+            mime_type="video/mp4",
+            processing_status=TRANSCODE_READY,
+        )
+    except asyncio.CancelledError:
+        # Остановка приложения: задачу подберет requeue_pending_transcodes после перезапуска
+        await FilesDAO.set_processing_status(claimed.id, TRANSCODE_PENDING)
+        raise
+    except Exception as e:
+        logger.warning(f"Не удалось перекодировать видео файла {claimed.id}: {e}")
+        await FilesDAO.set_processing_status(claimed.id, TRANSCODE_FAILED)
+        return False
+    finally:
+        await run_in_threadpool(_remove_quietly, video_temp, poster_temp)
+
+    if swapped:
+        invalidate_file_meta(claimed.uuid)
+        logger.info(f"Видео файла {claimed.id} перекодировано: {file_size} байт")
+    else:
+        logger.info(f"Видео файла {claimed.id} перекодировано, но запись уже удалена или заменена")
+    return swapped
+
+
+def transcoding_enabled() -> bool:
+    return _queue is not None
+
+
+def enqueue_transcode(file_id: int) -> bool:
+    """
+    Ставит файл в очередь перекодирования. False, если очередь не запущена или переполнена —
+    тогда файл остается в статусе pending до requeue_pending_transcodes.
+    """
+    if _queue is None:
+        return False
+    try:
+        _queue.put_nowait(file_id)
+    except asyncio.QueueFull:
+        logger.warning(f"Очередь перекодирования переполнена, файл {file_id} ждет следующего прохода")
+        return False
+    return True
+
+
+async def requeue_pending_transcodes() -> int:
+    """Возвращает в очередь ожидающие файлы и файлы, брошенные упавшим воркером."""
+    from app.files.dao import FilesDAO
+
+    stale_before = datetime.utcnow() - timedelta(seconds=TRANSCODE_TIMEOUT_SECONDS * 2)
+    await FilesDAO.reset_stale_processing(TRANSCODE_PROCESSING, TRANSCODE_PENDING, stale_before)
+    if _queue is None:
+        return 0
+    free_slots = _queue.maxsize - _queue.qsize()
+    if free_slots <= 0:
+        return 0
+    queued = 0
+    for file_id in await FilesDAO.find_ids_by_processing_status(TRANSCODE_PENDING, free_slots):
+        queued += enqueue_transcode(file_id)
+    return queued
+
+
+async def _worker() -> None:
+    while True:
+        file_id = await _queue.get()
+        try:
+            await process_transcode(file_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка очереди перекодирования (файл {file_id}): {e}")
+        finally:
+            _queue.task_done()
+
+
+def start_transcode_workers() -> None:
+    global _queue
+    if _queue is not None:
+        return
+    if shutil.which(FFMPEG_BINARY) is None:
+        logger.warning("ffmpeg не найден: видео будут отдаваться без перекодирования")
+        return
+    _queue = asyncio.Queue(maxsize=TRANSCODE_QUEUE_SIZE)
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(TRANSCODE_CONCURRENCY))
+    logger.info(f"Очередь перекодирования видео запущена: {TRANSCODE_CONCURRENCY} процесс(ов) ffmpeg")
+
+
+async def stop_transcode_workers() -> None:
+    global _queue
+    workers = list(_workers)
+    _workers.clear()
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    if _queue is not None:
+        _queue = None
+        logger.info("Очередь перекодирования видео остановлена")
@@ -1,15 +1,19 @@
 from app.dao.base import BaseDAO
-from app.food_progress.models import DailyTarget, Meal
+from app.food_progress.models import DailyTarget, Meal, UserDailyNutrition
 from app.users.dao import UsersDAO
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
-from sqlalchemy import desc, func, and_, or_
+from sqlalchemy import Date, cast, desc, func, and_, or_, literal, tuple_, update as sqlalchemy_update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import async_session_maker
+from app.text_search import decode_cursor, encode_cursor, name_search, search_words
 from fastapi import HTTPException, status
 from uuid import UUID
-from datetime import datetime, date
-from typing import Optional
+from datetime import datetime, date, timedelta
+from typing import List, Optional
+
+MACROS = ("calories", "proteins", "fats", "carbs")
 
 
 class DailyTargetDAO(BaseDAO):
@@ -213,134 +217,278 @@ class MealDAO(BaseDAO):
     @classmethod
     async def get_daily_totals(cls, user_id: int, target_date: date) -> dict:
         """
-        Получить суммарное количество съеденных КБЖУ за день
+        Получить суммарное количество съеденных КБЖУ за день (одна строка user_daily_nutrition)
         
         Returns:
             Словарь с суммами: calories, proteins, fats, carbs
         """
         async with async_session_maker() as session:
-            # Начало и конец дня
-            day_start = datetime.combine(target_date, datetime.min.time())
-            day_end = datetime.combine(target_date, datetime.max.time())
-            
-            query = (
-                select(
-                    func.sum(cls.model.calories).label('total_calories'),
-                    func.sum(cls.model.proteins).label('total_proteins'),
-                    func.sum(cls.model.fats).label('total_fats'),
-                    func.sum(cls.model.carbs).label('total_carbs')
-                )
-                .where(
-                    cls.model.user_id == user_id,
-                    cls.model.actual == True,
-                    cls.model.meal_datetime >= day_start,
-                    cls.model.meal_datetime <= day_end
-                )
+            query = select(UserDailyNutrition).where(
+                UserDailyNutrition.user_id == user_id,
+                UserDailyNutrition.day == target_date
             )
-            
             result = await session.execute(query)
-            row = result.first()
+            row = result.scalar_one_or_none()
             
             return {
-                "calories": float(row.total_calories or 0),
-                "proteins": float(row.total_proteins or 0),
-                "fats": float(row.total_fats or 0),
-                "carbs": float(row.total_carbs or 0)
+                macro: float(getattr(row, f"eaten_{macro}")) if row else 0.0
+                for macro in MACROS
             }
     
     @classmethod
-    async def search_by_name(cls, user_id: int, search_query: str, page: int = 1, size: int = 20):
+    async def add_meal(cls, target, **values) -> UUID:
+        """Создать прием пищи и в той же транзакции пересчитать остатки и сводку за день"""
+        async with async_session_maker() as session:
+            async with session.begin():
+                for macro in MACROS:
+                    # Временные значения: остатки выставит _refresh_day
+                    values[f"target_{macro}"] = getattr(target, f"target_{macro}")
+                    values[f"remaining_{macro}"] = getattr(target, f"target_{macro}")
+                meal = cls.model(**values)
+                session.add(meal)
+                await session.flush()
+                await cls._refresh_day(session, meal.user_id, meal.meal_datetime.date(), target)
+                return meal.uuid
+    
+    @classmethod
+    async def update_meal(cls, meal_uuid: UUID, target, **values) -> None:
         """
-        Поиск приемов пищи по названию (по вхождению подстрок разделенных пробелом без учета регистра)
+        Обновить прием пищи и в той же транзакции пересчитать затронутые дни (старую и новую дату)
+        
+        values — ровно переданные клиентом поля (model_dump(exclude_unset=True)): явный null
+        очищает необязательное поле, для обязательных — 400.
+        """
+        columns = cls.model.__table__.columns
+        for key, value in values.items():
+            if value is None and not columns[key].nullable:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Поле {key} не может быть пустым"
+                )
+        async with async_session_maker() as session:
+            async with session.begin():
+                meal = await cls._get_for_write(session, meal_uuid)
+                days = {meal.meal_datetime.date()}
+                for key, value in values.items():
+                    setattr(meal, key, value)
+                await session.flush()
+                days.add(meal.meal_datetime.date())
+                for day in sorted(days):
+                    await cls._refresh_day(session, meal.user_id, day, target)
+    
+    @classmethod
+    async def delete_meal(cls, meal_uuid: UUID, target) -> None:
+        """Удалить прием пищи и в той же транзакции пересчитать остатки и сводку за день"""
+        async with async_session_maker() as session:
+            async with session.begin():
+                meal = await cls._get_for_write(session, meal_uuid)
+                user_id, meal_date = meal.user_id, meal.meal_datetime.date()
+                await session.delete(meal)
+                await session.flush()
+                await cls._refresh_day(session, user_id, meal_date, target)
+    
+    @classmethod
+    async def _get_for_write(cls, session: AsyncSession, meal_uuid: UUID) -> Meal:
+        result = await session.execute(select(cls.model).filter_by(uuid=meal_uuid))
+        meal = result.scalar_one_or_none()
+        if not meal:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Объект {cls.model.__name__} с ID {meal_uuid} не найден"
+            )
+        return meal
+    
+    @classmethod
+    async def _refresh_day(cls, session: AsyncSession, user_id: int, meal_date: date, target) -> None:
+        """
+        Пересчитать остатки приемов пищи и строку user_daily_nutrition за день.
+        
+        Вызывается внутри транзакции записи приема пищи. Записи одного дня сериализуются
+        advisory-блокировкой (user_id, день), поэтому параллельные добавления не теряют друг друга.
+        Остатки считаются одним UPDATE ... FROM (SELECT SUM() OVER (ORDER BY meal_datetime)).
+        """
+        await session.execute(select(func.pg_advisory_xact_lock(user_id, meal_date.toordinal())))
+        
+        day_start = datetime.combine(meal_date, datetime.min.time())
+        day_filter = (
+            cls.model.user_id == user_id,
+            cls.model.actual.is_(True),
+            cls.model.meal_datetime >= day_start,
+            cls.model.meal_datetime < day_start + timedelta(days=1),
+        )
+        
+        # Нарастающие суммы по приемам пищи дня в порядке времени
+        running = (
+            select(
+                cls.model.id,
+                *[
+                    func.sum(getattr(cls.model, macro)).over(
+                        order_by=(cls.model.meal_datetime, cls.model.id), rows=(None, 0)
+                    ).label(macro)
+                    for macro in MACROS
+                ]
+            )
+            .where(*day_filter)
+            .subquery()
+        )
+        remainders = {}
+        for macro in MACROS:
+            target_value = getattr(target, f"target_{macro}")
+            remainders[f"remaining_{macro}"] = target_value - getattr(running.c, macro)
+            remainders[f"target_{macro}"] = target_value
+        await session.execute(
+            sqlalchemy_update(cls.model)
+            .where(cls.model.id == running.c.id)
+            .values(**remainders)
+            .execution_options(synchronize_session=False)
+        )
+        
+        # Сводка за день: агрегат без GROUP BY всегда возвращает строку (нули, если приемов пищи нет)
+        now = datetime.utcnow()
+        totals = select(
+            literal(user_id),
+            literal(meal_date),
+            *[func.coalesce(func.sum(getattr(cls.model, macro)), 0) for macro in MACROS],
+            func.count(cls.model.id),
+            literal(now),
+            literal(now),
+        ).where(*day_filter)
+        columns = ["user_id", "date", *[f"eaten_{macro}" for macro in MACROS], "meals_count", "created_at", "updated_at"]
+        insert_stmt = pg_insert(UserDailyNutrition).from_select(columns, totals)
+        await session.execute(
+            insert_stmt.on_conflict_do_update(
+                constraint="uq_user_daily_nutrition_user_date",
+                set_={
+                    column: insert_stmt.excluded[column]
+                    for column in columns
+                    if column not in ("user_id", "date", "created_at")
+                }
+            )
+        )
+    
+    @classmethod
+    async def search_by_name(
+        cls,
+        user_id: int,
+        search_query: str,
+        page: int = 1,
+        size: int = 20,
+        cursor: Optional[str] = None
+    ):
+        """
+        Поиск приемов пищи по названию (полнотекстовый по search_vector + триграммы для опечаток)
         
         Args:
             user_id: ID пользователя
-            search_query: Строка поиска (подстроки разделены пробелом)
-            page: Номер страницы (начиная с 1)
+            search_query: Строка поиска (все слова должны найтись как начала слов названия)
+            page: Номер страницы (начиная с 1), используется без cursor
             size: Размер страницы
+            cursor: Keyset-курсор из pagination.next_cursor предыдущей страницы
         
         Returns:
-            Словарь с items и pagination
+            Словарь с items и pagination. Результаты упорядочены по релевантности,
+            при пустом запросе — по дате приема пищи (самые новые первыми).
         """
+        filters = [cls.model.user_id == user_id, cls.model.actual == True]
+        if search_words(search_query):
+            condition, sort_key = name_search(cls.model.search_vector, cls.model.name, search_query)
+            filters.append(condition)
+        else:
+            sort_key = cls.model.meal_datetime
+        
+        query = (
+            select(cls.model, sort_key.label("sort_key"))
+            .options(joinedload(cls.model.user))
+            .where(*filters)
+            .order_by(sort_key.desc(), cls.model.id.desc())
+        )
+        if cursor:
+            sort_value, last_id = decode_cursor(cursor)
+            if sort_key is cls.model.meal_datetime:
+                sort_value = datetime.fromisoformat(sort_value)
+            query = query.where(tuple_(sort_key, cls.model.id) < tuple_(literal(sort_value), literal(last_id)))
+        else:
+            query = query.offset((page - 1) * size)
+        # Лишняя запись показывает, есть ли следующая страница
+        query = query.limit(size + 1)
+        
+        count_query = select(func.count(cls.model.id)).where(*filters)
+        
         async with async_session_maker() as session:
-            # Создаем базовый запрос
-            query = select(cls.model).options(
-                joinedload(cls.model.user)
-            ).filter(
-                cls.model.user_id == user_id,
-                cls.model.actual == True
-            )
-            
-            # Добавляем фильтр по поисковому запросу только если он не пустой
-            if search_query.strip():
-                # Разбиваем поисковый запрос на слова и ищем все слова в названии
-                search_words = [word.strip() for word in search_query.strip().split() if word.strip()]
-                if search_words:
-                    # Создаем условия для каждого слова (все слова должны присутствовать)
-                    word_conditions = [
-                        func.lower(cls.model.name).like(f"%{word.lower()}%")
-                        for word in search_words
-                    ]
-                    # Объединяем все условия через AND
-                    search_filter = word_conditions[0]
-                    for condition in word_conditions[1:]:
-                        search_filter = search_filter & condition
-                    
-                    query = query.filter(search_filter)
-            
-            # Запрос для подсчета общего количества
-            count_query = select(func.count(cls.model.id)).filter(
-                cls.model.user_id == user_id,
-                cls.model.actual == True
-            )
-            
-            # Применяем те же условия поиска для подсчета
-            if search_query.strip():
-                search_words = [word.strip() for word in search_query.strip().split() if word.strip()]
-                if search_words:
-                    word_conditions = [
-                        func.lower(cls.model.name).like(f"%{word.lower()}%")
-                        for word in search_words
-                    ]
-                    search_filter = word_conditions[0]
-                    for condition in word_conditions[1:]:
-                        search_filter = search_filter & condition
-                    
-                    count_query = count_query.filter(search_filter)
-            
-            # Сортировка по дате приема пищи, самые новые первыми
-            query = query.order_by(desc(cls.model.meal_datetime))
-            
-            # Получаем общее количество
             total_count_result = await session.execute(count_query)
             total_count = total_count_result.scalar() or 0
             
-            # Применяем пагинацию
-            offset = (page - 1) * size
-            query = query.offset(offset).limit(size)
-            
-            # Выполняем запрос
             result = await session.execute(query)
-            items = result.unique().scalars().all()
-            
-            # Вычисляем информацию о пагинации
-            total_pages = (total_count + size - 1) // size if total_count > 0 else 0
-            has_next = page < total_pages
-            has_prev = page > 1
+            rows = result.unique().all()
+            has_next = len(rows) > size
+            rows = rows[:size]
+            items = [row[0] for row in rows]
             
             # Отключаем объекты от сессии
             for item in items:
                 session.expunge(item)
-            
-            return {
-                "items": items,
-                "pagination": {
-                    "page": page,
-                    "size": size,
-                    "total_count": total_count,
-                    "total_pages": total_pages,
-                    "has_next": has_next,
-                    "has_prev": has_prev
-                }
+        
+        next_cursor = None
+        if has_next:
+            last_sort_value = rows[-1].sort_key
+            if isinstance(last_sort_value, datetime):
+                last_sort_value = last_sort_value.isoformat()
+            next_cursor = encode_cursor(last_sort_value, items[-1].id)
+        
+        total_pages = (total_count + size - 1) // size if total_count > 0 else 0
+        return {
+            "items": items,
+            "pagination": {
+                "page": page,
+                "size": size,
+                "total_count": total_count,
+                "total_pages": total_pages,
+                "has_next": has_next,
+                "has_prev": bool(cursor) or page > 1,
+                "next_cursor": next_cursor
             }
+        }
+
 
+class UserDailyNutritionDAO(BaseDAO):
+    model = UserDailyNutrition
+    
+    @classmethod
+    async def get_summary(cls, user_id: int, date_from: date, date_to: date, bucket: str) -> List[dict]:
+        """
+        Съеденное КБЖУ по периодам (day/week/month) одним GROUP BY date_trunc по сводке user_daily_nutrition
+        
+        Returns:
+            Список {"period_start", "calories", "proteins", "fats", "carbs", "meals_count", "days_with_meals"}
+            только для периодов, в которых были приемы пищи
+        """
+        # date_trunc от DATE возвращает timestamptz в часовом поясе сессии — приводим к DATE в SQL,
+        # иначе на БД не в UTC начало периода сдвигается на предыдущий день
+        period = cast(func.date_trunc(bucket, cls.model.day), Date).label("period")
+        query = (
+            select(
+                period,
+                *[func.sum(getattr(cls.model, f"eaten_{macro}")).label(macro) for macro in MACROS],
+                func.sum(cls.model.meals_count).label("meals_count"),
+                func.count(cls.model.id).label("days_with_meals"),
+            )
+            .where(
+                cls.model.user_id == user_id,
+                cls.model.day >= date_from,
+                cls.model.day <= date_to,
+                cls.model.meals_count > 0
+            )
+            .group_by(period)
+            .order_by(period)
+        )
+        async with async_session_maker() as session:
+            result = await session.execute(query)
+            return [
+                {
+                    "period_start": row.period,
+                    **{macro: float(getattr(row, macro) or 0) for macro in MACROS},
+                    "meals_count": int(row.meals_count or 0),
+                    "days_with_meals": int(row.days_with_meals or 0),
+                }
+                for row in result.all()
+            ]
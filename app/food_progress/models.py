@@ -1,7 +1,9 @@
 from typing import TYPE_CHECKING, Optional
-from sqlalchemy import ForeignKey, text
+from sqlalchemy import Computed, ForeignKey, Index, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base, int_pk, uuid_field
+from app.text_search import search_vector_expression
 from datetime import datetime, date
 
 if TYPE_CHECKING:
@@ -50,6 +52,11 @@ class DailyTarget(Base):
 class Meal(Base):
     """Приемы пищи"""
     __tablename__ = "meals"
+    __table_args__ = (
+        Index("ix_meals_user_id_meal_datetime", "user_id", "meal_datetime"),
+        Index("ix_meals_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_meals_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+    )
 
     id: Mapped[int_pk]
     uuid: Mapped[uuid_field]
@@ -64,6 +71,11 @@ class Meal(Base):
     meal_datetime: Mapped[datetime] = mapped_column(nullable=False)  # Дата и время приема пищи
     name: Mapped[Optional[str]] = mapped_column(nullable=True)  # Название приема пищи
     
+    # Поисковый вектор по названию (генерируется БД, см. app/text_search.py)
+    search_vector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR, Computed(search_vector_expression("name"), persisted=True), nullable=True, deferred=True
+    )
+    
     # КБЖУ в порции
     calories: Mapped[float] = mapped_column(nullable=False)
     proteins: Mapped[float] = mapped_column(nullable=False)
@@ -111,3 +123,29 @@ class Meal(Base):
             "remaining_carbs": self.remaining_carbs
         }
 
+
+class UserDailyNutrition(Base):
+    """
+    Сводка съеденного КБЖУ за день (rollup по meals).
+    
+    Пересчитывается в той же транзакции, что и запись приема пищи (MealDAO), поэтому
+    прогресс за день читается одной строкой по (user_id, date), без агрегации meals.
+    Учитываются только актуальные приемы пищи.
+    """
+    __tablename__ = "user_daily_nutrition"
+    __table_args__ = (
+        UniqueConstraint("user_id", "date", name="uq_user_daily_nutrition_user_date"),
+    )
+
+    id: Mapped[int_pk]
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
+    day: Mapped[date] = mapped_column("date", nullable=False)
+    
+    eaten_calories: Mapped[float] = mapped_column(default=0, server_default=text('0'), nullable=False)
+    eaten_proteins: Mapped[float] = mapped_column(default=0, server_default=text('0'), nullable=False)
+    eaten_fats: Mapped[float] = mapped_column(default=0, server_default=text('0'), nullable=False)
+    eaten_carbs: Mapped[float] = mapped_column(default=0, server_default=text('0'), nullable=False)
+    meals_count: Mapped[int] = mapped_column(default=0, server_default=text('0'), nullable=False)
+    
+    def __repr__(self):
+        return f"{self.__class__.__name__}(id={self.id}, user_id={self.user_id}, date={self.day})"
@@ -1,17 +1,21 @@
+import hashlib
+import json
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List
-from datetime import datetime, date
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from typing import List, Literal, Optional
+from datetime import datetime, date, timedelta
 
-from app.food_progress.dao import DailyTargetDAO, MealDAO
-from sqlalchemy import select, and_
+from app.food_progress.dao import DailyTargetDAO, MealDAO, UserDailyNutritionDAO, MACROS
 from app.food_progress.rb import RBDailyTarget, RBMeal
 from app.food_progress.schemas import (
     SDailyTarget, SDailyTargetAdd, SDailyTargetUpdate,
-    SMeal, SMealAdd, SMealUpdate, SDailyProgress
+    SMeal, SMealAdd, SMealUpdate, SDailyProgress, SNutritionSummary
 )
 from app.users.dependencies import get_current_user_user
 from app.users.models import User
+from app.conditional_get import etag_matches as _etag_matches
 from app.logger import logger
 
 router = APIRouter(prefix='/api/food-progress', tags=['Прогресс по еде'])
@@ -30,6 +34,50 @@ def get_target_or_default(target):
     return target if target else DefaultTarget()
 
 
+# Максимальная длина диапазона сводки КБЖУ
+SUMMARY_MAX_DAYS = 731
+
+
+def _period_start(day: date, bucket: str) -> date:
+    """Начало периода, как его считает date_trunc (неделя — с понедельника)"""
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_period_start(start: date, bucket: str) -> date:
+    if bucket == "week":
+        return start + timedelta(days=7)
+    if bucket == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _build_summary_periods(rows: List[dict], date_from: date, date_to: date, bucket: str, target) -> List[dict]:
+    """Непрерывный ряд периодов: пустые периоды заполняются нулями, цель — дневная цель × дни периода в диапазоне"""
+    eaten_by_period = {row["period_start"]: row for row in rows}
+    periods = []
+    start = _period_start(date_from, bucket)
+    while start <= date_to:
+        next_start = _next_period_start(start, bucket)
+        period_end = min(next_start - timedelta(days=1), date_to)
+        days = (period_end - max(start, date_from)).days + 1
+        row = eaten_by_period.get(start, {})
+        periods.append({
+            "period_start": start,
+            "period_end": period_end,
+            "days": days,
+            "days_with_meals": row.get("days_with_meals", 0),
+            "meals_count": row.get("meals_count", 0),
+            **{f"eaten_{macro}": row.get(macro, 0.0) for macro in MACROS},
+            **{f"target_{macro}": getattr(target, f"target_{macro}") * days for macro in MACROS},
+        })
+        start = next_start
+    return periods
+
+
 # ==================== DailyTarget методы ====================
 
 @router.get("/targets/", summary="Получить все целевые уровни")
@@ -204,28 +252,33 @@ async def get_all_meals(
 
 @router.get("/meals/search/", summary="Поиск приемов пищи по названию")
 async def search_meals_by_name(
-    query: str = Query(..., description="Строка поиска (подстроки разделены пробелом)"),
+    query: str = Query(..., description="Строка поиска (слова разделены пробелом)"),
     user_data: User = Depends(get_current_user_user),
     page: int = Query(1, ge=1, description="Номер страницы"),
-    size: int = Query(20, ge=1, le=100, description="Размер страницы")
+    size: int = Query(20, ge=1, le=100, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (pagination.next_cursor)")
 ) -> dict:
     """
     Поиск приемов пищи по названию.
-    Поиск выполняется по вхождению подстрок, разделенных пробелом, без учета регистра.
-    Все подстроки должны присутствовать в названии приема пищи.
+    Все слова запроса должны встречаться в названии как начала слов (с учетом словоформ);
+    при опечатках используется поиск по похожести. Результаты упорядочены по релевантности.
+    Для следующих страниц передавайте cursor из pagination.next_cursor.
     """
     try:
         result = await MealDAO.search_by_name(
             user_id=user_data.id,
             search_query=query,
             page=page,
-            size=size
+            size=size,
+            cursor=cursor
         )
         
         return {
             "items": [m.to_dict() for m in result["items"]],
             "pagination": result["pagination"]
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Ошибка при поиске приемов пищи: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -259,45 +312,15 @@ async def add_meal(
         # Получаем последний актуальный целевой уровень или используем нули по умолчанию
         target = get_target_or_default(await DailyTargetDAO.find_last_actual(user_data.id))
         
-        # Получаем сумму съеденного за день
-        meal_date = meal.meal_datetime.date()
-        daily_totals = await MealDAO.get_daily_totals(user_data.id, meal_date)
-        
-        # Рассчитываем остатки с учетом нового приема пищи
-        # Используем 0 для None значений
-        proteins_value = meal.proteins or 0
-        fats_value = meal.fats or 0
-        carbs_value = meal.carbs or 0
-        
-        total_calories = daily_totals["calories"] + meal.calories
-        total_proteins = daily_totals["proteins"] + proteins_value
-        total_fats = daily_totals["fats"] + fats_value
-        total_carbs = daily_totals["carbs"] + carbs_value
-        
-        remaining_calories = target.target_calories - total_calories
-        remaining_proteins = target.target_proteins - total_proteins
-        remaining_fats = target.target_fats - total_fats
-        remaining_carbs = target.target_carbs - total_carbs
-        
         values = meal.model_dump()
         # Убеждаемся, что None значения заменены на 0
-        values['proteins'] = proteins_value
-        values['fats'] = fats_value
-        values['carbs'] = carbs_value
+        values['proteins'] = meal.proteins or 0
+        values['fats'] = meal.fats or 0
+        values['carbs'] = meal.carbs or 0
         values['user_id'] = user_data.id
-        values['target_calories'] = target.target_calories
-        values['target_proteins'] = target.target_proteins
-        values['target_fats'] = target.target_fats
-        values['target_carbs'] = target.target_carbs
-        values['remaining_calories'] = remaining_calories
-        values['remaining_proteins'] = remaining_proteins
-        values['remaining_fats'] = remaining_fats
-        values['remaining_carbs'] = remaining_carbs
         
-        meal_uuid = await MealDAO.add(**values)
-        
-        # Пересчитываем остатки для всех приемов пищи за этот день
-        await _recalculate_day_remainders(user_data.id, meal_date, target)
+        # Остатки и сводка за день пересчитываются в той же транзакции
+        meal_uuid = await MealDAO.add_meal(target, **values)
         
         meal_obj = await MealDAO.find_full_data(meal_uuid)
         return meal_obj.to_dict()
@@ -320,15 +343,11 @@ async def update_meal(
         if not existing or existing.user_id != user_data.id:
             raise HTTPException(status_code=403, detail="Нет доступа")
         
-        # Получаем дату для пересчета остатков
-        meal_date = existing.meal_datetime.date()
         target = get_target_or_default(await DailyTargetDAO.find_last_actual(user_data.id))
         
+        # Остатки и сводка за день (старую и новую дату) пересчитываются в той же транзакции
         update_data = meal.model_dump(exclude_unset=True)
-        await MealDAO.update(meal_uuid, **update_data)
-        
-        # Пересчитываем остатки для всех приемов пищи за этот день
-        await _recalculate_day_remainders(user_data.id, meal_date, target)
+        await MealDAO.update_meal(meal_uuid, target, **update_data)
         
         updated = await MealDAO.find_full_data(meal_uuid)
         return updated.to_dict()
@@ -350,12 +369,9 @@ async def deactivate_meal(
         if not existing or existing.user_id != user_data.id:
             raise HTTPException(status_code=403, detail="Нет доступа")
         
-        meal_date = existing.meal_datetime.date()
         target = get_target_or_default(await DailyTargetDAO.find_last_actual(user_data.id))
         
-        await MealDAO.update(meal_uuid, actual=False)
-        
-        await _recalculate_day_remainders(user_data.id, meal_date, target)
+        await MealDAO.update_meal(meal_uuid, target, actual=False)
         
         return {"message": "Прием пищи деактуализирован", "uuid": str(meal_uuid)}
     except HTTPException:
@@ -376,12 +392,9 @@ async def activate_meal(
         if not existing or existing.user_id != user_data.id:
             raise HTTPException(status_code=403, detail="Нет доступа")
         
-        meal_date = existing.meal_datetime.date()
         target = get_target_or_default(await DailyTargetDAO.find_last_actual(user_data.id))
         
-        await MealDAO.update(meal_uuid, actual=True)
-        
-        await _recalculate_day_remainders(user_data.id, meal_date, target)
+        await MealDAO.update_meal(meal_uuid, target, actual=True)
         
         return {"message": "Прием пищи актуализирован", "uuid": str(meal_uuid)}
     except HTTPException:
@@ -402,12 +415,9 @@ async def delete_meal(
         if not existing or existing.user_id != user_data.id:
             raise HTTPException(status_code=403, detail="Нет доступа")
         
-        meal_date = existing.meal_datetime.date()
         target = get_target_or_default(await DailyTargetDAO.find_last_actual(user_data.id))
         
-        await MealDAO.delete_by_id(meal_uuid)
-        
-        await _recalculate_day_remainders(user_data.id, meal_date, target)
+        await MealDAO.delete_meal(meal_uuid, target)
         
         return {"message": f"Прием пищи с UUID {meal_uuid} удален"}
     except HTTPException:
@@ -429,7 +439,7 @@ async def get_daily_progress(
         # Получаем целевые уровни или используем нули по умолчанию
         target = get_target_or_default(await DailyTargetDAO.find_last_actual(user_data.id))
         
-        # Получаем суммарное количество съеденного за день
+        # Получаем суммарное количество съеденного за день (строка сводки user_daily_nutrition)
         daily_totals = await MealDAO.get_daily_totals(user_data.id, target_date)
         
         # Рассчитываем остатки
@@ -460,52 +470,44 @@ async def get_daily_progress(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def _recalculate_day_remainders(user_id: int, meal_date: date, target):
-    """Пересчитать остатки для всех приемов пищи за день"""
-    from sqlalchemy import and_
-    from app.database import async_session_maker
-    from app.food_progress.models import Meal
+@router.get("/summary", response_model=SNutritionSummary, summary="Сводка КБЖУ по дням, неделям или месяцам")
+async def get_nutrition_summary(
+    request: Request,
+    date_from: date = Query(..., alias="from", description="Начало диапазона"),
+    date_to: date = Query(..., alias="to", description="Конец диапазона (включительно)"),
+    bucket: Literal["day", "week", "month"] = Query("day", description="Размер периода: day, week или month"),
+    user_data: User = Depends(get_current_user_user)
+):
+    """
+    Съеденное и целевое КБЖУ за диапазон дат по периодам одним запросом (для графиков).
     
-    async with async_session_maker() as session:
-        day_start = datetime.combine(meal_date, datetime.min.time())
-        day_end = datetime.combine(meal_date, datetime.max.time())
-        
-        # Получаем все приемы пищи за день
-        query = select(Meal).where(
-            and_(
-                Meal.user_id == user_id,
-                Meal.actual == True,
-                Meal.meal_datetime >= day_start,
-                Meal.meal_datetime <= day_end
-            )
-        ).order_by(Meal.meal_datetime)
-        
-        result = await session.execute(query)
-        meals = result.scalars().all()
-        
-        # Накапливаем суммы по мере обработки приемов пищи
-        cumulative_calories = 0
-        cumulative_proteins = 0
-        cumulative_fats = 0
-        cumulative_carbs = 0
-        
-        for meal in meals:
-            cumulative_calories += meal.calories
-            cumulative_proteins += meal.proteins
-            cumulative_fats += meal.fats
-            cumulative_carbs += meal.carbs
-            
-            # Обновляем остатки
-            meal.remaining_calories = target.target_calories - cumulative_calories
-            meal.remaining_proteins = target.target_proteins - cumulative_proteins
-            meal.remaining_fats = target.target_fats - cumulative_fats
-            meal.remaining_carbs = target.target_carbs - cumulative_carbs
-            
-            # Обновляем целевые уровни
-            meal.target_calories = target.target_calories
-            meal.target_proteins = target.target_proteins
-            meal.target_fats = target.target_fats
-            meal.target_carbs = target.target_carbs
+    Поддерживает условный GET: при совпадении If-None-Match с ETag возвращается 304.
+    """
+    try:
+        if date_from > date_to:
+            raise ValueError("Параметр from не может быть позже to")
+        if (date_to - date_from).days + 1 > SUMMARY_MAX_DAYS:
+            raise ValueError(f"Диапазон не может превышать {SUMMARY_MAX_DAYS} дней")
         
-        await session.commit()
-
+        target = get_target_or_default(await DailyTargetDAO.find_last_actual(user_data.id))
+        rows = await UserDailyNutritionDAO.get_summary(user_data.id, date_from, date_to, bucket)
+        
+        content = jsonable_encoder({
+            "date_from": date_from,
+            "date_to": date_to,
+            "bucket": bucket,
+            "periods": _build_summary_periods(rows, date_from, date_to, bucket, target)
+        })
+        body = json.dumps(content, ensure_ascii=False, sort_keys=True)
+        etag = f'"{hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(content=content, headers=headers)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка при получении сводки КБЖУ: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
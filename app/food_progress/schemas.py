@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field, ConfigDict, model_validator
 from uuid import UUID
 from datetime import datetime, date
@@ -102,3 +102,27 @@ class SDailyProgress(BaseModel):
     remaining_fats: float = Field(..., description="Остаток жиров (или избыток если отрицательный)")
     remaining_carbs: float = Field(..., description="Остаток углеводов (или избыток если отрицательный)")
 
+
+class SNutritionSummaryPeriod(BaseModel):
+    """Съеденное и целевое КБЖУ за период (день, неделя или месяц)"""
+    period_start: date = Field(..., description="Начало периода")
+    period_end: date = Field(..., description="Конец периода (включительно, в пределах запрошенного диапазона)")
+    days: int = Field(..., description="Количество дней периода в запрошенном диапазоне")
+    days_with_meals: int = Field(..., description="Дней с приемами пищи")
+    meals_count: int = Field(..., description="Количество приемов пищи")
+    eaten_calories: float = Field(..., description="Съедено калорий")
+    eaten_proteins: float = Field(..., description="Съедено белков")
+    eaten_fats: float = Field(..., description="Съедено жиров")
+    eaten_carbs: float = Field(..., description="Съедено углеводов")
+    target_calories: float = Field(..., description="Целевой уровень калорий за период")
+    target_proteins: float = Field(..., description="Целевой уровень белков за период")
+    target_fats: float = Field(..., description="Целевой уровень жиров за период")
+    target_carbs: float = Field(..., description="Целевой уровень углеводов за период")
+
+
+class SNutritionSummary(BaseModel):
+    """Ряды съеденного и целевого КБЖУ по периодам"""
+    date_from: date = Field(..., description="Начало диапазона")
+    date_to: date = Field(..., description="Конец диапазона (включительно)")
+    bucket: Literal["day", "week", "month"] = Field(..., description="Размер периода")
+    periods: List[SNutritionSummaryPeriod] = Field(..., description="Периоды по возрастанию даты")
@@ -1,53 +1,275 @@
 """
 Настройка логирования для приложения
-Использует loguru для удобного и гибкого логирования с ротацией файлов
+Использует loguru: человекочитаемый вывод в консоль и структурированные JSON-события в файлы
+
+Файлы logs/app_<дата>.log и logs/errors_<дата>.log содержат по одному JSON-объекту на строку
+(ts, level, logger, func, line, msg, request_id, поля из logger.bind(...), exc).
+Запись идет из фонового потока пачками: sink только кладет событие в ограниченную очередь
+(поток запускается при первом событии).
+При переполнении очереди события ниже ERROR отбрасываются (их число попадает в лог отдельным
+событием), ERROR и выше ждут места не дольше LOG_BLOCK_TIMEOUT_SECONDS.
+
+request_id_var — идентификатор текущего запроса (ставит RequestLoggingMiddleware), он
+попадает во все события запроса, включая фоновые задачи, запущенные из него.
+
+Сообщения в горячих путях лучше писать с отложенным форматированием:
+logger.debug("Тренировка {} найдена", uuid) — строка не собирается, если уровень отключен;
+для дорогих аргументов — logger.opt(lazy=True) или проверка log_enabled("DEBUG").
 """
+import atexit
+import json
+import os
+import queue
 import sys
+import threading
+import traceback
+from contextvars import ContextVar
+from datetime import date, timedelta
+from glob import escape, glob
 from pathlib import Path
+from typing import Optional
+
 from loguru import logger
 
+LOG_LEVEL = "INFO"
+LOG_QUEUE_SIZE = 10000
+LOG_BATCH_SIZE = 500
+LOG_FLUSH_INTERVAL_SECONDS = 1.0
+LOG_BLOCK_TIMEOUT_SECONDS = 0.1
+LOG_TRACEBACK_LIMIT = 20
+
+# Идентификатор запроса для корреляции событий
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_EVENT_RESERVED_KEYS = {"ts", "level", "logger", "func", "line", "msg", "request_id", "exc"}
+_ERROR_LEVEL_NO = logger.level("ERROR").no
+
+
+def _format_exception(exception) -> str:
+    # Ограничиваем глубину traceback для предотвращения накопления в linecache
+    return "".join(
+        traceback.format_exception(exception.type, exception.value, exception.traceback, limit=LOG_TRACEBACK_LIMIT)
+    )
+
+
+def log_event(record) -> dict:
+    """JSON-событие из записи loguru (поля из logger.bind(...) переносятся как есть)."""
+    event = {
+        "ts": record["time"].isoformat(timespec="milliseconds"),
+        "level": record["level"].name,
+        "logger": record["name"],
+        "func": record["function"],
+        "line": record["line"],
+        "msg": record["message"],
+    }
+    for key, value in record["extra"].items():
+        if key == "request_id":
+            if value != "-":
+                event["request_id"] = value
+        elif key not in _EVENT_RESERVED_KEYS:
+            event[key] = value
+    if record["exception"] is not None:
+        event["exc"] = _format_exception(record["exception"])
+    return event
+
+
+class BatchedJsonSink:
+    """Sink loguru: ограниченная очередь событий и фоновый поток, пишущий их в файл пачками."""
+
+    def __init__(
+        self,
+        path_template: str,
+        retention_days: int,
+        queue_size: int = LOG_QUEUE_SIZE,
+        batch_size: int = LOG_BATCH_SIZE,
+        flush_interval: float = LOG_FLUSH_INTERVAL_SECONDS,
+    ):
+        self.path_template = path_template
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._file_day = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._run, name=f"log-writer:{self.path_template}", daemon=True)
+                thread.start()
+                self._thread = thread
+
+    def emit(self, message) -> None:
+        """Вызывается loguru в потоке, который пишет лог; не блокирует, кроме ERROR при полной очереди."""
+        self._ensure_started()
+        record = message.record
+        event = log_event(record)
+        try:
+            self._queue.put_nowait(event)
+            return
+        except queue.Full:
+            pass
+        if record["level"].no >= _ERROR_LEVEL_NO:
+            try:
+                self._queue.put(event, timeout=LOG_BLOCK_TIMEOUT_SECONDS)
+                return
+            except queue.Full:
+                pass
+        with self._dropped_lock:
+            self.dropped += 1
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Дописывает очередь и останавливает поток."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def _take_dropped(self) -> int:
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        return dropped
+
+    def _next_batch(self) -> tuple[list, bool]:
+        """Пачка событий (ждет первое не дольше flush_interval) и признак остановки."""
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return [], False
+        if first is None:
+            return [], True
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is None:
+                return batch, True
+            batch.append(event)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            dropped = self._take_dropped()
+            if dropped:
+                batch.append({
+                    "ts": batch[-1]["ts"] if batch else None,
+                    "level": "WARNING",
+                    "logger": __name__,
+                    "msg": f"Очередь логов переполнена, отброшено событий: {dropped}",
+                    "dropped": dropped,
+                })
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    print(f"Ошибка записи логов в {self.path_template}: {e}", file=sys.stderr)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, batch: list) -> None:
+        today = date.today()
+        if self._file is None or self._file_day != today:
+            self._rotate(today)
+        self._file.write("".join(json.dumps(event, ensure_ascii=False, default=str) + "\n" for event in batch))
+        self._file.flush()
+
+    def _rotate(self, today: date) -> None:
+        """Новый файл каждый день в полночь, файлы старше retention_days удаляются."""
+        if self._file is not None:
+            self._file.close()
+        path = Path(self.path_template.format(date=today.isoformat()))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._file_day = today
+
+        expire_before = (today - timedelta(days=self.retention_days)).isoformat()
+        prefix, suffix = self.path_template.split("{date}")
+        for old_path in glob(escape(prefix) + "*" + escape(suffix)):
+            day = old_path[len(prefix):len(old_path) - len(suffix)]
+            if len(day) == 10 and day < expire_before:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+
+def _add_request_id(record) -> None:
+    record["extra"].setdefault("request_id", request_id_var.get() or "-")
+
+
+def log_enabled(level: str) -> bool:
+    """Будет ли записано сообщение уровня level (для дорогой подготовки аргументов)."""
+    return logger.level(level).no >= logger.level(LOG_LEVEL).no
+
+
 # Создаем директорию для логов, если её нет
 logs_dir = Path("logs")
 logs_dir.mkdir(exist_ok=True)
 
 # Удаляем стандартный обработчик loguru
 logger.remove()
+logger.configure(patcher=_add_request_id)
 
-# Добавляем вывод в консоль (только для разработки, уровень DEBUG)
+# Добавляем вывод в консоль (только для разработки)
 logger.add(
     sys.stdout,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-    level="INFO",
+    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | {extra[request_id]} | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
+    level=LOG_LEVEL,
     colorize=True,
 )
 
-# Добавляем логирование в файл с ротацией по дням (INFO и выше)
-logger.add(
-    "logs/app_{time:YYYY-MM-DD}.log",
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-    level="INFO",
-    rotation="00:00",  # Новый файл каждый день в полночь
-    retention="10 days",  # Хранить логи 10 дней
-    # compression="zip",  # ОТКЛЮЧЕНО - архивация отключена из-за проблем с антивирусом
-    encoding="utf-8",
-    enqueue=True,  # Асинхронная запись (безопасно для многопоточности)
-)
+# JSON-события в файл с ротацией по дням, хранить 10 дней
+_app_sink = BatchedJsonSink("logs/app_{date}.log", retention_days=10)
+# Отдельный файл для ошибок (ERROR и CRITICAL), хранить 90 дней
+_error_sink = BatchedJsonSink("logs/errors_{date}.log", retention_days=90)
+_file_handler_ids = [
+    logger.add(_app_sink.emit, level=LOG_LEVEL, format="{message}", catch=True),
+    logger.add(_error_sink.emit, level="ERROR", format="{message}", catch=True),
+]
 
-# Добавляем отдельный файл для ошибок (ERROR и CRITICAL)
-# Ограничиваем глубину traceback для предотвращения накопления в linecache
-logger.add(
-    "logs/errors_{time:YYYY-MM-DD}.log",
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-    level="ERROR",
-    rotation="00:00",  # Новый файл каждый день в полночь
-    retention="90 days",  # Хранить логи ошибок 90 дней
-    # compression="zip",  # ОТКЛЮЧЕНО - архивация отключена из-за проблем с антивирусом
-    encoding="utf-8",
-    enqueue=True,
-    backtrace=True,  # Показывать полный traceback
-    diagnose=False,  # Отключаем детальную диагностику для экономии памяти (предотвращает накопление в linecache)
-)
 
-# Экспортируем logger для использования в других модулях
-__all__ = ["logger"]
+def shutdown_logging() -> None:
+    """Дописывает очереди файловых логов (остановка приложения)."""
+    while _file_handler_ids:
+        try:
+            logger.remove(_file_handler_ids.pop())
+        except ValueError:
+            pass
+    _app_sink.stop()
+    _error_sink.stop()
+
+
+atexit.register(shutdown_logging)
 
+
+def configure_worker_logging(level: str = "WARNING") -> None:
+    """
+    Логгер дочернего процесса пула (initializer ProcessPoolExecutor): только stderr уровня level.
+
+    Процесс spawn заново импортирует app.logger; файловые sinks снимаются до первого события,
+    поэтому их фоновые потоки в дочернем процессе не запускаются.
+    """
+    logger.remove()
+    _file_handler_ids.clear()
+    logger.add(
+        sys.stderr,
+        format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {extra[request_id]} | {name}:{function}:{line} - {message}",
+        level=level,
+    )
+
+# Экспортируем logger для использования в других модулях
+__all__ = ["logger", "request_id_var", "log_enabled", "shutdown_logging", "configure_worker_logging"]
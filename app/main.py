@@ -45,7 +45,8 @@ from app.public_training.router import router as router_public_training
 from app.user_selected_trainings.router import router as router_user_selected_trainings
 from app.telegram_bot.router import router as router_telegram_bot
 from app.config import settings
-from app.logger import logger
+from app.logger import logger, shutdown_logging
+from app.request_logging import RequestLoggingMiddleware
 from pydantic import EmailStr
 from app.email_service import email_service
 import tracemalloc
@@ -100,6 +101,20 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"❌ Ошибка инициализации сервисов: {e}")
 
+    # Граф похожести упражнений для подбора замен строим в фоне, чтобы не задерживать старт
+    async def _warm_similarity_graph():
+        try:
+            from app.user_program_plan.similarity_graph import rebuild_similarity_graph
+            await rebuild_similarity_graph()
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось построить граф похожести упражнений: {e}")
+
+    similarity_task = asyncio.create_task(_warm_similarity_graph())
+
+    # Очередь перекодирования видео (без ffmpeg видео отдаются как есть)
+    from app.files.transcode import start_transcode_workers, stop_transcode_workers
+    start_transcode_workers()
+
     poller_stop: Optional[asyncio.Event] = None
     poller_task: Optional[asyncio.Task] = None
     if str(settings.TELEGRAM_UPDATES_MODE).strip().lower() == "polling":
@@ -112,6 +127,9 @@ async def lifespan(app: FastAPI):
     yield
     
     # Остановка приложения
+    if not similarity_task.done():
+        similarity_task.cancel()
+
     if poller_task is not None and poller_stop is not None:
         poller_stop.set()
         poller_task.cancel()
@@ -122,6 +140,14 @@ async def lifespan(app: FastAPI):
 
     from app.background_tasks import stop_scheduler
     stop_scheduler()
+
+    await stop_transcode_workers()
+
+    from app.meal_plans.executor import shutdown_meal_plan_executor
+    shutdown_meal_plan_executor()
+
+    from app.files.images import shutdown_image_executor
+    shutdown_image_executor()
     
     # Останавливаем Scheduler
     try:
@@ -139,70 +165,12 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.warning(f"⚠️ Ошибка остановки tracemalloc: {e}")
 
-
-app = FastAPI(lifespan=lifespan)
+    # Дописываем очереди файловых логов последними
+    shutdown_logging()
 
 
-@app.middleware("http")
-async def log_request_data(request: Request, call_next):
-    # Проверяем, является ли это файловым запросом
-    is_file_upload = any(path in str(request.url) for path in [
-        '/upload-image', '/upload-video', '/upload-avatar'
-    ])
-    
-    # Проверяем, является ли это запросом на скачивание файла
-    is_file_download = any(path in str(request.url) for path in [
-        '/files/file/', '/logs/download'
-    ])
-    
-    if is_file_upload:
-        # Для файловых запросов логируем только метаданные (не читаем body в память)
-        # Не трогаем запрос вообще - FastAPI сам обработает body для файлов
-        logger.info(
-            f"Request: {request.method} {request.url}\n"
-            f"Headers: {dict(request.headers)}\n"
-            f"Body: [FILE UPLOAD - content not logged to save memory]"
-        )
-        response = await call_next(request)
-    elif is_file_download:
-        # Для запросов на скачивание файлов логируем только метаданные
-        logger.info(
-            f"Request: {request.method} {request.url}\n"
-            f"Headers: {dict(request.headers)}\n"
-            f"Body: [FILE DOWNLOAD - no body to log]"
-        )
-        response = await call_next(request)
-    else:
-        # Для остальных запросов читаем body только для логирования
-        # Но делаем это безопасно, чтобы не сломать запрос
-        try:
-            body = await request.body()
-            
-            # Ограничиваем размер логируемого body (первые 1000 символов)
-            body_preview = body.decode(errors='replace')[:1000]
-            if len(body) > 1000:
-                body_preview += "... [truncated]"
-            
-            logger.info(
-                f"Request: {request.method} {request.url}\n"
-                f"Headers: {dict(request.headers)}\n"
-                f"Body: {body_preview}"
-            )
-            
-            # Восстанавливаем body для downstream
-            async def receive():
-                return {"type": "http.request", "body": body}
-            request = Request(request.scope, receive)
-        except Exception as e:
-            # Если не удалось прочитать body, просто логируем без него
-            logger.warning(f"Could not read request body: {e}")
-        
-        response = await call_next(request)
-    
-    if response.status_code == 403:
-        response.delete_cookie("users_access_token")
-    
-    return response
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(RequestLoggingMiddleware)
 
 
 @app.exception_handler(RequestValidationError)
@@ -1,9 +1,14 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
 from app.dao.base import BaseDAO
-from app.meal_plans.models import MealPlan
+from app.meal_plans.models import MealPlan, MealPlanCache
+from app.meal_plans.plan_cache import MEAL_PLAN_CACHE_MAX_ENTRIES
 from app.users.dao import UsersDAO
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
-from sqlalchemy import desc
+from sqlalchemy import desc, delete, func, literal_column, update as sqlalchemy_update
+from sqlalchemy.dialects.postgresql import JSONPATH, insert as pg_insert
 from app.database import async_session_maker
 from fastapi import HTTPException, status
 from uuid import UUID
@@ -57,4 +62,82 @@ class MealPlanDAO(BaseDAO):
             for obj in objects:
                 session.expunge(obj)
             return objects
+    
+    @classmethod
+    async def deactivate_user_plans(cls, user_id: int, exclude_uuid: Optional[UUID] = None) -> int:
+        """Деактуализировать актуальные программы пользователя одним UPDATE (кроме exclude_uuid)."""
+        async with async_session_maker() as session:
+            query = (
+                sqlalchemy_update(cls.model)
+                .where(cls.model.user_id == user_id, cls.model.actual.is_(True))
+                .values(actual=False)
+            )
+            if exclude_uuid is not None:
+                query = query.where(cls.model.uuid != exclude_uuid)
+            result = await session.execute(query)
+            await session.commit()
+            return result.rowcount
+    
+    @classmethod
+    async def find_days(cls, object_uuid: UUID, from_day: int, to_day: int) -> Optional[Dict[str, Any]]:
+        """
+        Дни программы с номерами from_day..to_day (включительно), без чтения остальных дней.
+        
+        Дни выбираются в БД JSONB path-запросом по response_data; возвращается
+        {"user_id", "days_count", "days"} или None, если программы нет.
+        """
+        days_query = func.jsonb_path_query_array(
+            cls.model.response_data,
+            literal_column("'$.days[*] ? (@.day >= $from && @.day <= $to)'").cast(JSONPATH),
+            func.jsonb_build_object("from", from_day, "to", to_day),
+        )
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(cls.model.user_id, cls.model.days_count, days_query.label("days"))
+                .where(cls.model.uuid == object_uuid)
+            )
+            row = result.one_or_none()
+            if row is None:
+                return None
+            return {"user_id": row.user_id, "days_count": row.days_count, "days": row.days or []}
+
+
+class MealPlanCacheDAO(BaseDAO):
+    model = MealPlanCache
+
+    @classmethod
+    async def get_plan(cls, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Программа из кэша по ключу; одним запросом отмечает использование записи (для LRU)."""
+        async with async_session_maker() as session:
+            result = await session.execute(
+                sqlalchemy_update(cls.model)
+                .where(cls.model.cache_key == cache_key)
+                .values(last_used_at=datetime.utcnow(), hit_count=cls.model.hit_count + 1)
+                .returning(cls.model.plan_data)
+            )
+            plan_data = result.scalar_one_or_none()
+            await session.commit()
+            return plan_data
+
+    @classmethod
+    async def save_plan(
+        cls,
+        cache_key: str,
+        plan_data: Dict[str, Any],
+        max_entries: int = MEAL_PLAN_CACHE_MAX_ENTRIES
+    ) -> None:
+        """Сохраняет программу (параллельный запрос с тем же ключом не дублирует запись) и вытесняет лишнее по LRU."""
+        async with async_session_maker() as session:
+            await session.execute(
+                pg_insert(cls.model)
+                .values(cache_key=cache_key, plan_data=plan_data, last_used_at=datetime.utcnow())
+                .on_conflict_do_nothing(index_elements=[cls.model.cache_key])
+            )
+            evicted_ids = (
+                select(cls.model.id)
+                .order_by(desc(cls.model.last_used_at))
+                .offset(max_entries)
+            )
+            await session.execute(delete(cls.model).where(cls.model.id.in_(evicted_ids)))
+            await session.commit()
 
@@ -0,0 +1,51 @@
+"""
+Пул процессов для генерации программ питания.
+
+Генерация — чистая CPU-работа: в async-обработчике длинный план (14-30 дней) блокирует event loop
+воркера для всех остальных запросов. Поэтому пары дней batch cooking считаются в отдельных
+процессах, а обработчик только ждёт результат с таймаутом.
+
+Пул создаётся лениво (контекст spawn — без fork-а процесса с открытым event loop и соединениями БД)
+и закрывается при остановке приложения. Процессы пула пишут лог только в stderr (WARNING и выше),
+без файловых sinks и их фоновых потоков — см. configure_worker_logging.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from app.logger import configure_worker_logging, logger
+
+MEAL_PLAN_WORKERS = max(1, min(4, os.cpu_count() or 1))
+# Общий бюджет на генерацию одной программы питания
+MEAL_PLAN_TIMEOUT_SECONDS = 30
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_meal_plan_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=MEAL_PLAN_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=configure_worker_logging,
+        )
+        logger.info(f"Пул генерации программ питания запущен: {MEAL_PLAN_WORKERS} процесс(ов)")
+    return _executor
+
+
+def reset_meal_plan_executor() -> None:
+    """Сбрасывает пул (например, после BrokenProcessPool); следующий вызов создаст новый."""
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_meal_plan_executor() -> None:
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+        logger.info("Пул генерации программ питания остановлен")
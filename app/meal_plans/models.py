@@ -1,6 +1,7 @@
 from typing import TYPE_CHECKING, Optional
 import json
-from sqlalchemy import ForeignKey, Text, text
+from sqlalchemy import ForeignKey, Index, String, Text, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base, int_pk, uuid_field
 from datetime import datetime, date
@@ -32,11 +33,11 @@ class MealPlan(Base):
     # Использовать все доступные рецепты
     use_all_recipes: Mapped[bool] = mapped_column(default=False, server_default=text('false'), nullable=False)
     
-    # Целевые уровни КБЖУ (JSON объект с полями calories, proteins, fats, carbs)
-    target_nutrition: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON объект
+    # Целевые уровни КБЖУ (объект с полями calories, proteins, fats, carbs)
+    target_nutrition: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
     
-    # Полный ответ от внешнего сервиса (сохраняется целиком)
-    response_data: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON структура
+    # Сгенерированная программа ({"days": [...]}); JSONB — отдельные дни читаются path-запросами
+    response_data: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
     
     # Связи
     user: Mapped["User"] = relationship("User")
@@ -55,7 +56,31 @@ class MealPlan(Base):
             "days_count": self.days_count,
             "allowed_recipe_uuids": json.loads(self.allowed_recipe_uuids) if self.allowed_recipe_uuids else None,
             "use_all_recipes": self.use_all_recipes,
-            "target_nutrition": json.loads(self.target_nutrition) if self.target_nutrition else None,
-            "response_data": json.loads(self.response_data) if self.response_data else None
+            "target_nutrition": self.target_nutrition,
+            "response_data": self.response_data
         }
 
+
+class MealPlanCache(Base):
+    """
+    Кэш сгенерированных программ питания (content-addressed).
+    
+    Ключ — sha256 канонического набора входных параметров генерации (округлённые цели КБЖУ,
+    отсортированные allowed_recipe_uuids, days_count, версия доступного каталога рецептов, seed),
+    поэтому одинаковые запросы разных пользователей получают одну и ту же запись.
+    Вытесняются давно не использованные записи (LRU по last_used_at).
+    """
+    __tablename__ = "meal_plan_cache"
+    __table_args__ = (
+        UniqueConstraint("cache_key", name="uq_meal_plan_cache_cache_key"),
+        Index("ix_meal_plan_cache_last_used_at", "last_used_at"),
+    )
+
+    id: Mapped[int_pk]
+    cache_key: Mapped[str] = mapped_column(String(64), nullable=False)
+    plan_data: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    hit_count: Mapped[int] = mapped_column(default=0, server_default=text('0'), nullable=False)
+    last_used_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(id={self.id}, cache_key={self.cache_key}, hits={self.hit_count})"
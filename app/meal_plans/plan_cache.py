@@ -0,0 +1,42 @@
+"""
+Ключ кэша сгенерированных программ питания (таблица meal_plan_cache).
+
+Ключ — sha256 канонического JSON входных параметров генерации. Цели КБЖУ округляются
+до целых (генерация тоже идёт по округлённым целям, чтобы запись кэша совпадала с тем, что
+было бы сгенерировано заново). Версия каталога — хэш доступных пользователю рецептов
+(UserRecipeCatalog.version), поэтому правка рецепта инвалидирует только зависящие от него планы.
+MEAL_PLAN_ENGINE_VERSION повышается при изменениях алгоритма генерации — старые записи
+перестают совпадать и вытесняются по LRU.
+"""
+import hashlib
+import json
+from typing import Dict, Iterable, Optional
+
+MEAL_PLAN_ENGINE_VERSION = 1
+# Сколько записей держим в meal_plan_cache; лишние (давно не использованные) удаляются при вставке
+MEAL_PLAN_CACHE_MAX_ENTRIES = 5000
+
+MACRO_KEYS = ("calories", "proteins", "fats", "carbs")
+
+
+def round_targets(target_nutrition: Dict[str, float]) -> Dict[str, float]:
+    return {k: float(round(target_nutrition[k])) for k in MACRO_KEYS}
+
+
+def meal_plan_cache_key(
+    target_nutrition: Dict[str, float],
+    allowed_recipe_uuids: Optional[Iterable[str]],
+    days_count: int,
+    catalog_version: str,
+    seed: Optional[int],
+) -> str:
+    payload = {
+        "engine": MEAL_PLAN_ENGINE_VERSION,
+        "targets": [round_targets(target_nutrition)[k] for k in MACRO_KEYS],
+        "allowed": sorted(str(u) for u in allowed_recipe_uuids) if allowed_recipe_uuids else None,
+        "days": days_count,
+        "catalog": catalog_version,
+        "seed": seed,
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
@@ -0,0 +1,112 @@
+"""
+Векторный подбор порций для одного приёма пищи.
+
+Слот состоит из 1-2 блюд (MAIN + опциональный SIDE), порции каждого — целые 1..MAX_PORTIONS,
+поэтому все варианты перебираются целиком: сетка порций (5^n × n) умножается на матрицу КБЖУ
+блюд (n × 4), и macro-penalty считается для всех вариантов одной векторной операцией.
+
+Выбор: среди вариантов, проходящих коридоры валидности слота (калории 90-110%, для целей < 700 ккал
+95-105%; БЖУ 85-115%), — с минимальным penalty; если валидных нет — просто минимальный penalty.
+При равенстве выигрывает вариант, раньше стоящий в сетке (меньше порций у первых блюд).
+"""
+from itertools import product
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+MIN_PORTIONS = 1
+MAX_PORTIONS = 5
+# Полный перебор до 5^6 = 15625 вариантов; больших слотов генератор не собирает
+MAX_ENUMERATED_DISHES = 6
+
+MACRO_KEYS = ("calories", "proteins", "fats", "carbs")
+PER_PORTION_KEYS = tuple(f"{k}_per_portion" for k in MACRO_KEYS)
+# Веса macro-penalty (как в MealPlanService._calculate_macro_penalty)
+PENALTY_WEIGHTS = np.array([1.0, 1.5, 1.2, 1.0])
+
+_portion_grids: Dict[int, np.ndarray] = {}
+
+
+def portion_grid(dishes_count: int) -> np.ndarray:
+    """Все векторы порций для dishes_count блюд, shape (MAX_PORTIONS^n, n). Кэшируется по n."""
+    grid = _portion_grids.get(dishes_count)
+    if grid is None:
+        grid = np.array(
+            list(product(range(MIN_PORTIONS, MAX_PORTIONS + 1), repeat=dishes_count)),
+            dtype=np.float64,
+        )
+        grid.setflags(write=False)
+        _portion_grids[dishes_count] = grid
+    return grid
+
+
+def macro_matrix(meals: Sequence[Dict[str, float]]) -> np.ndarray:
+    """КБЖУ на порцию блюд слота, shape (n, 4)."""
+    return np.array([[meal.get(k) or 0.0 for k in PER_PORTION_KEYS] for meal in meals], dtype=np.float64)
+
+
+def target_vector(target: Dict[str, float]) -> np.ndarray:
+    return np.array([target[k] for k in MACRO_KEYS], dtype=np.float64)
+
+
+def macro_penalties(totals: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """macro-penalty для каждой строки totals (shape (m, 4))."""
+    return np.abs(totals - target) @ PENALTY_WEIGHTS
+
+
+def valid_mask(totals: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """Векторный аналог MealPlanService._is_slot_valid для каждой строки totals."""
+    if target[0] == 0:
+        return np.ones(len(totals), dtype=bool)
+    safe_target = np.where(target > 0, target, 1.0)
+    ratios = np.where(target > 0, totals / safe_target, 1.0)
+    cal_min, cal_max = (0.95, 1.05) if target[0] < 700 else (0.90, 1.10)
+    macro_ratios = ratios[:, 1:]
+    return (
+        (ratios[:, 0] >= cal_min) & (ratios[:, 0] <= cal_max)
+        & np.all((macro_ratios >= 0.85) & (macro_ratios <= 1.15), axis=1)
+    )
+
+
+def _coordinate_descent(macros: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """Запасной путь для слотов крупнее MAX_ENUMERATED_DISHES: по одному блюду перебираем все порции."""
+    portions = np.full(len(macros), MIN_PORTIONS, dtype=np.float64)
+    options = np.arange(MIN_PORTIONS, MAX_PORTIONS + 1, dtype=np.float64)
+    best = macro_penalties((portions @ macros)[None, :], target)[0]
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(macros)):
+            base = portions @ macros - portions[i] * macros[i]
+            scores = macro_penalties(base + options[:, None] * macros[i], target)
+            j = int(np.argmin(scores))
+            if scores[j] < best - 1e-9:
+                best = scores[j]
+                portions[i] = options[j]
+                improved = True
+    return portions
+
+
+def optimize_portions(meals: Sequence[Dict[str, float]], target: Dict[str, float]) -> Tuple[List[int], float, bool]:
+    """
+    Подобрать порции блюд слота.
+
+    Возвращает (порции по блюдам, macro-penalty, проходит ли слот коридоры валидности).
+    """
+    if not meals:
+        return [], 0.0, True
+    macros = macro_matrix(meals)
+    t = target_vector(target)
+
+    if len(meals) > MAX_ENUMERATED_DISHES:
+        portions = _coordinate_descent(macros, t)
+        totals = (portions @ macros)[None, :]
+        return [int(p) for p in portions], float(macro_penalties(totals, t)[0]), bool(valid_mask(totals, t)[0])
+
+    grid = portion_grid(len(meals))
+    totals = grid @ macros
+    penalties = macro_penalties(totals, t)
+    valid = valid_mask(totals, t)
+    has_valid = bool(valid.any())
+    idx = int(np.argmin(np.where(valid, penalties, np.inf) if has_valid else penalties))
+    return [int(p) for p in grid[idx]], float(penalties[idx]), has_valid
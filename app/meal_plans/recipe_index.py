@@ -0,0 +1,238 @@
+"""
+Индекс каталога рецептов для генерации программ питания.
+
+Все актуальные рецепты один раз приводятся к словарям генератора (тип рецепта уже
+сопоставлен с категорией) и раскладываются по корзинам (приём пищи, роль): какие рецепты
+допустимы для приёма пищи с учётом правил type/category, какие годятся в основное блюдо (MAIN),
+какие — в добавку (SIDE). КБЖУ на порцию хранятся в непрерывных массивах, поэтому оценка
+кандидатов не трогает словари.
+
+Доступность для пользователя (системные + его собственные рецепты, опционально — только
+allowed_recipe_uuids) накладывается маской поверх индекса: генерация больше не
+перефильтровывает весь каталог на каждый слот и день.
+
+Индекс живёт в памяти воркера и перестраивается после CRUD рецептов. Другие воркеры
+замечают изменения по сигнатуре таблицы (count + max(updated_at)), которая проверяется
+не чаще SIGNATURE_CHECK_INTERVAL_SECONDS.
+"""
+import asyncio
+import hashlib
+import time
+from array import array
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import desc, func, select
+
+from app.database import async_session_maker
+from app.logger import logger
+from app.recipes.models import Recipe
+
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snack")
+SIGNATURE_CHECK_INTERVAL_SECONDS = 60
+
+# Веса отклонений калорий, белков, жиров и углеводов при оценке блюда
+FIT_WEIGHTS = (1.0, 1.5, 1.2, 1.0)
+
+
+class RecipeIndex:
+    """Каталог рецептов, разложенный по корзинам (приём пищи, роль), с КБЖУ в массивах."""
+
+    def __init__(self, recipes: List[Dict[str, Any]], owner_ids: List[Optional[int]], signature: Tuple = ()):
+        from app.meal_plans.service import MealPlanService
+
+        self.recipes = recipes
+        self.signature = signature
+        self.built_at = time.monotonic()
+
+        self.uuids = [r["uuid"] for r in recipes]
+        self.position_by_uuid = {u: i for i, u in enumerate(self.uuids)}
+        self.calories = array("d", (float(r["calories_per_portion"] or 0) for r in recipes))
+        self.proteins = array("d", (float(r["proteins_per_portion"] or 0) for r in recipes))
+        self.fats = array("d", (float(r["fats_per_portion"] or 0) for r in recipes))
+        self.carbs = array("d", (float(r["carbs_per_portion"] or 0) for r in recipes))
+
+        # Владелец рецепта (None — системный) -> позиции в каталоге
+        positions_by_owner: Dict[Optional[int], List[int]] = defaultdict(list)
+        for i, owner_id in enumerate(owner_ids):
+            positions_by_owner[owner_id].append(i)
+        self.owner_ids = owner_ids
+        self.positions_by_owner = {k: array("i", v) for k, v in positions_by_owner.items()}
+
+        # (приём пищи, роль) -> позиции; роль None — все допустимые для приёма пищи рецепты
+        positions_by_id = {id(r): i for i, r in enumerate(recipes)}
+        self.buckets: Dict[Tuple[str, Optional[str]], array] = {}
+        for meal_type in MEAL_TYPES:
+            allowed = [positions_by_id[id(r)] for r in MealPlanService._filter_by_allowed_category(recipes, meal_type)]
+            self.buckets[(meal_type, None)] = array("i", allowed)
+            self.buckets[(meal_type, MealPlanService.ROLE_MAIN)] = array(
+                "i", [i for i in allowed if MealPlanService._is_main_candidate(recipes[i], meal_type)]
+            )
+            self.buckets[(meal_type, MealPlanService.ROLE_SIDE)] = array(
+                "i", [i for i in allowed if recipes[i]["type"] == "salad"]
+            )
+
+    def __len__(self) -> int:
+        return len(self.recipes)
+
+    def fit_scores(self, positions: Iterable[int], target: Dict[str, float]) -> List[float]:
+        """Взвешенное отклонение КБЖУ одной порции от target для каждой позиции (меньше — лучше)."""
+        w_cal, w_prot, w_fat, w_carb = FIT_WEIGHTS
+        t_cal, t_prot, t_fat, t_carb = target["calories"], target["proteins"], target["fats"], target["carbs"]
+        cal, prot, fat, carb = self.calories, self.proteins, self.fats, self.carbs
+        return [
+            abs(cal[i] - t_cal) * w_cal + abs(prot[i] - t_prot) * w_prot
+            + abs(fat[i] - t_fat) * w_fat + abs(carb[i] - t_carb) * w_carb
+            for i in positions
+        ]
+
+    def for_user(self, user_id: int, allowed_recipe_uuids: Optional[Iterable[str]] = None) -> "UserRecipeCatalog":
+        """Каталог, доступный пользователю: системные и его рецепты, опционально только из allowed_recipe_uuids."""
+        mask = bytearray(len(self.recipes))
+        if allowed_recipe_uuids:
+            for recipe_uuid in allowed_recipe_uuids:
+                pos = self.position_by_uuid.get(str(recipe_uuid))
+                if pos is not None and self.owner_ids[pos] in (None, user_id):
+                    mask[pos] = 1
+        else:
+            for owner_id in (None, user_id):
+                for pos in self.positions_by_owner.get(owner_id, ()):
+                    mask[pos] = 1
+        return UserRecipeCatalog(self, mask)
+
+
+class UserRecipeCatalog:
+    """Представление индекса для одного пользователя: маска доступности + лениво собранные корзины."""
+
+    def __init__(self, index: RecipeIndex, mask: bytearray):
+        self.index = index
+        self.mask = mask
+        self._positions: Dict[Tuple[str, Optional[str]], List[int]] = {}
+
+    def __len__(self) -> int:
+        return self.mask.count(1)
+
+    def positions(self, meal_type: str, role: Optional[str] = None) -> List[int]:
+        """Позиции доступных рецептов корзины (приём пищи, роль) в порядке каталога."""
+        key = (meal_type, role)
+        cached = self._positions.get(key)
+        if cached is None:
+            mask = self.mask
+            cached = [i for i in self.index.buckets.get(key, ()) if mask[i]]
+            self._positions[key] = cached
+        return cached
+
+    def recipes(self, meal_type: str, role: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [self.index.recipes[i] for i in self.positions(meal_type, role)]
+
+    def recipe(self, position: int) -> Dict[str, Any]:
+        """Копия словаря рецепта (генератор меняет в ней portions)."""
+        return self.index.recipes[position].copy()
+
+    def version(self) -> str:
+        """
+        Хэш содержимого доступных рецептов (всё, что попадает в результат генерации или влияет на него).
+        Меняется только при правке рецептов, которые видит пользователь.
+        """
+        digest = hashlib.sha256()
+        recipes = self.index.recipes
+        for i, available in enumerate(self.mask):
+            if available:
+                r = recipes[i]
+                digest.update(
+                    f"{r['uuid']}|{r['name']}|{r['type']}|{r['category']}|{r['calories_per_portion']}|"
+                    f"{r['proteins_per_portion']}|{r['fats_per_portion']}|{r['carbs_per_portion']}\n".encode("utf-8")
+                )
+        return digest.hexdigest()
+
+    def snapshot(self) -> "UserRecipeCatalog":
+        """
+        Компактная копия только доступных рецептов (порядок каталога сохраняется).
+        Её дёшево передавать в процессы-генераторы: пиклится лишь то, что видит пользователь.
+        """
+        positions = [i for i, available in enumerate(self.mask) if available]
+        index = RecipeIndex(
+            [self.index.recipes[i] for i in positions],
+            [self.index.owner_ids[i] for i in positions],
+            self.index.signature,
+        )
+        return UserRecipeCatalog(index, bytearray(b"\x01" * len(positions)))
+
+
+def build_recipe_index(recipes: List[Any], signature: Tuple = ()) -> RecipeIndex:
+    """Строит индекс по объектам рецептов (Recipe или строки с теми же атрибутами)."""
+    from app.meal_plans.service import MealPlanService
+
+    return RecipeIndex(
+        MealPlanService._recipes_to_dict(recipes),
+        [getattr(r, "user_id", None) for r in recipes],
+        signature,
+    )
+
+
+_index: Optional[RecipeIndex] = None
+_index_stale = True
+_last_signature_check = 0.0
+_rebuild_lock = asyncio.Lock()
+
+
+async def _load_recipes_signature() -> Tuple:
+    """Дешёвая сигнатура таблицы рецептов для обнаружения изменений из других процессов."""
+    async with async_session_maker() as session:
+        row = (await session.execute(select(func.count(Recipe.id), func.max(Recipe.updated_at)))).one()
+    return tuple(row)
+
+
+async def _load_actual_recipes() -> List[Any]:
+    """
+    Актуальные рецепты без связей: сначала системные, затем пользовательские,
+    внутри — самые новые первыми (тот же порядок, в котором генератор перебирал кандидатов).
+    """
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(
+                Recipe.uuid, Recipe.user_id, Recipe.name, Recipe.type, Recipe.category,
+                Recipe.calories_per_portion, Recipe.proteins_per_portion,
+                Recipe.fats_per_portion, Recipe.carbs_per_portion,
+            )
+            .where(Recipe.actual.is_(True))
+            .order_by(Recipe.user_id.isnot(None), desc(Recipe.created_at))
+        )
+        return list(result.all())
+
+
+def invalidate_recipe_index() -> None:
+    """Помечает индекс устаревшим; следующая генерация перестроит его."""
+    global _index_stale
+    _index_stale = True
+
+
+async def rebuild_recipe_index() -> RecipeIndex:
+    global _index, _index_stale, _last_signature_check
+
+    async with _rebuild_lock:
+        signature = await _load_recipes_signature()
+        recipes = await _load_actual_recipes()
+        started = time.perf_counter()
+        index = build_recipe_index(recipes, signature=signature)
+        _index = index
+        _index_stale = False
+        _last_signature_check = time.monotonic()
+        logger.info(
+            f"Индекс рецептов построен: {len(index)} рецептов "
+            f"за {(time.perf_counter() - started) * 1000:.0f} мс"
+        )
+        return index
+
+
+async def get_recipe_index() -> RecipeIndex:
+    """Текущий индекс; перестраивается при инвалидации или смене сигнатуры таблицы рецептов."""
+    global _last_signature_check
+    if _index is None or _index_stale:
+        return await rebuild_recipe_index()
+    now = time.monotonic()
+    if now - _last_signature_check >= SIGNATURE_CHECK_INTERVAL_SECONDS:
+        _last_signature_check = now
+        if await _load_recipes_signature() != _index.signature:
+            return await rebuild_recipe_index()
+    return _index
@@ -49,13 +49,12 @@ async def generate_meal_plan(
             target_calories=data.target_nutrition.calories,
             target_proteins=data.target_nutrition.proteins,
             target_fats=data.target_nutrition.fats,
-            target_carbs=data.target_nutrition.carbs
+            target_carbs=data.target_nutrition.carbs,
+            seed=data.seed
         )
         
         # Деактуализируем предыдущие программы
-        prev_plans = await MealPlanDAO.find_all(user_uuid=str(user.uuid), actual=True)
-        for prev in prev_plans:
-            await MealPlanDAO.update(prev.uuid, actual=False)
+        await MealPlanDAO.deactivate_user_plans(user.id)
         
         # Подсчитываем среднее количество приёмов пищи в день для сохранения в БД (опционально, для статистики)
         avg_meals_per_day = 3  # Минимум 3 (breakfast, lunch, dinner)
@@ -78,8 +77,8 @@ async def generate_meal_plan(
             "days_count": data.days_count,
             "allowed_recipe_uuids": json.dumps([str(uuid) for uuid in data.allowed_recipe_uuids], ensure_ascii=False) if data.allowed_recipe_uuids else None,
             "use_all_recipes": data.use_all_recipes,
-            "target_nutrition": json.dumps(target_nutrition, ensure_ascii=False),
-            "response_data": json.dumps(plan_data, ensure_ascii=False)  # Сохраняем plan_data в response_data
+            "target_nutrition": target_nutrition,
+            "response_data": plan_data  # Сохраняем plan_data в response_data (JSONB)
         }
         
         plan_uuid = await MealPlanDAO.add(**db_data)
@@ -93,6 +92,12 @@ async def generate_meal_plan(
         
     except HTTPException:
         raise
+    except TimeoutError as e:
+        logger.error(f"Таймаут генерации программы питания для пользователя {user.id}: {e}")
+        raise HTTPException(
+            status_code=504,
+            detail=str(e)
+        )
     except ValueError as e:
         logger.error(f"Ошибка валидации при генерации программы питания для пользователя {user.id}: {e}")
         raise HTTPException(
@@ -143,6 +148,59 @@ async def get_meal_plan_by_uuid(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _get_plan_days(plan_uuid: UUID, from_day: int, to_day: int, user: User) -> dict:
+    if from_day > to_day:
+        raise ValueError("from_day не может быть больше to_day")
+    result = await MealPlanDAO.find_days(plan_uuid, from_day, to_day)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Программа питания не найдена")
+    if result["user_id"] != user.id:
+        raise HTTPException(status_code=403, detail="Нет доступа")
+    return {
+        "plan_uuid": str(plan_uuid),
+        "days_count": result["days_count"],
+        "days": result["days"]
+    }
+
+
+@router.get("/{plan_uuid}/days", summary="Получить дни программы питания")
+async def get_meal_plan_days(
+    plan_uuid: UUID,
+    from_day: int = Query(1, ge=1, description="Первый день (с 1)"),
+    to_day: Optional[int] = Query(None, ge=1, description="Последний день включительно (по умолчанию from_day)"),
+    user: User = Depends(get_current_user_user)
+) -> dict:
+    """Получить дни программы питания с from_day по to_day без загрузки всей программы"""
+    try:
+        return await _get_plan_days(plan_uuid, from_day, to_day if to_day is not None else from_day, user)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка при получении дней программы питания: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{plan_uuid}/days/{day}", summary="Получить день программы питания")
+async def get_meal_plan_day(
+    plan_uuid: UUID,
+    day: int,
+    user: User = Depends(get_current_user_user)
+) -> dict:
+    """Получить один день программы питания"""
+    try:
+        result = await _get_plan_days(plan_uuid, day, day, user)
+        if not result["days"]:
+            raise HTTPException(status_code=404, detail=f"День {day} не найден в программе питания")
+        return result["days"][0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при получении дня программы питания: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.put("/{plan_uuid}/deactivate", summary="Деактуализировать программу питания")
 async def deactivate_meal_plan(
     plan_uuid: UUID,
@@ -174,10 +232,7 @@ async def activate_meal_plan(
             raise HTTPException(status_code=403, detail="Нет доступа")
         
         # Деактуализируем другие программы
-        prev_plans = await MealPlanDAO.find_all(user_uuid=str(user.uuid), actual=True)
-        for prev in prev_plans:
-            if prev.uuid != plan.uuid:
-                await MealPlanDAO.update(prev.uuid, actual=False)
+        await MealPlanDAO.deactivate_user_plans(user.id, exclude_uuid=plan.uuid)
         
         await MealPlanDAO.update(plan_uuid, actual=True)
         return {"message": "Программа питания актуализирована", "uuid": str(plan_uuid)}
@@ -40,6 +40,7 @@ class SMealPlanAdd(BaseModel):
     allowed_recipe_uuids: Optional[List[UUID]] = Field(None, description="Список UUID рецептов из которых выбирать (используется если use_all_recipes=False)")
     use_all_recipes: bool = Field(False, description="Использовать все доступные рецепты пользователя (системные и пользовательские)")
     target_nutrition: STargetNutrition = Field(..., description="Целевые уровни КБЖУ")
+    seed: Optional[int] = Field(None, description="Seed выбора блюд: тот же seed и те же параметры дают ту же программу (None — всегда ближайшие к целям блюда)")
 
 
 class SMealPlanUpdate(BaseModel):
@@ -10,11 +10,23 @@
 6. Роли блюд: MAIN (основное), SIDE (добавка), FILLER (добор калорий)
 7. Batch cooking для breakfast, lunch, dinner (готовка на 2 дня)
 """
-from typing import List, Dict, Any, Optional
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import random
 import json
+import time
 from itertools import product
-from app.recipes.dao import RecipeDAO
+from app.meal_plans.executor import (
+    MEAL_PLAN_TIMEOUT_SECONDS,
+    MEAL_PLAN_WORKERS,
+    get_meal_plan_executor,
+    reset_meal_plan_executor,
+)
+from app.meal_plans.dao import MealPlanCacheDAO
+from app.meal_plans.plan_cache import meal_plan_cache_key, round_targets
+from app.meal_plans.portion_optimizer import optimize_portions
+from app.meal_plans.recipe_index import UserRecipeCatalog, get_recipe_index
 from app.recipes.models import Recipe
 from app.logger import logger
 
@@ -54,6 +66,11 @@ class MealPlanService:
     ROLE_SIDE = "SIDE"      # Добавка (салат, гарнир)
     ROLE_FILLER = "FILLER"  # Добор калорий (десерт, перекус)
     
+    # Случайный выбор блюда (если задан seed): среди SELECTION_TOP_K лучших кандидатов,
+    # чья оценка хуже лучшей не более чем на SELECTION_TOLERANCE
+    SELECTION_TOP_K = 5
+    SELECTION_TOLERANCE = 0.15
+    
     @classmethod
     async def generate_meal_plan(
         cls,
@@ -63,7 +80,8 @@ class MealPlanService:
         target_calories: float,
         target_proteins: float,
         target_fats: float,
-        target_carbs: float
+        target_carbs: float,
+        seed: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Генерация программы питания
@@ -76,88 +94,175 @@ class MealPlanService:
             target_proteins: Целевой уровень белков
             target_fats: Целевой уровень жиров
             target_carbs: Целевой уровень углеводов
+            seed: Seed выбора блюд. None — всегда ближайшее к целям блюдо;
+                  число — разнообразие блюд между парами дней, воспроизводимое при том же seed
             
         Returns:
             Словарь с программой питания
         """
-        # Получаем доступные рецепты
-        recipes = await cls._get_available_recipes(user_id, allowed_recipe_uuids)
+        # Доступные рецепты (системные и пользовательские) — маска поверх кэшированного индекса
+        recipe_index = await get_recipe_index()
+        catalog = recipe_index.for_user(user_id, allowed_recipe_uuids)
         
-        if not recipes:
+        if not catalog:
             raise ValueError("Нет доступных рецептов для создания программы питания")
         
-        # Преобразуем рецепты в словари
-        recipes_dict = cls._recipes_to_dict(recipes)
-        
-        # Целевые КБЖУ для дня
-        target_nutrition = {
+        # Целевые КБЖУ для дня (округляем до целых — так же, как в ключе кэша)
+        target_nutrition = round_targets({
             "calories": target_calories,
             "proteins": target_proteins,
             "fats": target_fats,
             "carbs": target_carbs
+        })
+        
+        # Одинаковые входные параметры — та же программа: берём её из кэша
+        cache_key = meal_plan_cache_key(
+            target_nutrition, allowed_recipe_uuids, days_count, catalog.version(), seed
+        )
+        try:
+            cached_plan = await MealPlanCacheDAO.get_plan(cache_key)
+        except Exception as e:
+            logger.warning(f"Кэш программ питания недоступен: {e}")
+            cached_plan = None
+        if cached_plan is not None:
+            logger.info(f"Программа питания для пользователя {user_id} взята из кэша ({cache_key[:12]})")
+            return cached_plan
+        
+        # Пары дней (batch cooking) независимы — считаем их в пуле процессов, не блокируя event loop
+        days = await cls._generate_days_in_pool(catalog, target_nutrition, days_count, seed)
+        plan = {
+            "days": days
         }
         
-        # Создаём структуру дней с учётом batch cooking
-        # Breakfast, lunch, dinner готовятся на 2 дня
-        days = [None] * days_count  # Инициализируем список дней
+        try:
+            await MealPlanCacheDAO.save_plan(cache_key, plan)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить программу питания в кэш: {e}")
         
-        # Обрабатываем дни парами для batch cooking
-        for day_start in range(0, days_count, 2):
-            day_end = min(day_start + 1, days_count - 1)
-            
-            # Создаём батчи для breakfast, lunch, dinner
-            breakfast_batch = cls._build_meal_slot(
-                meal_type="breakfast",
-                recipes_dict=recipes_dict,
-                slot_target=cls._calculate_slot_target(target_nutrition, "breakfast"),
-                day_idx=day_start,
-                days_count=days_count
-            )
-            
-            lunch_batch = cls._build_meal_slot(
-                meal_type="lunch",
-                recipes_dict=recipes_dict,
-                slot_target=cls._calculate_slot_target(target_nutrition, "lunch"),
-                day_idx=day_start,
-                days_count=days_count
+        return plan
+    
+    @classmethod
+    async def _generate_days_in_pool(
+        cls,
+        catalog: UserRecipeCatalog,
+        target_nutrition: Dict[str, float],
+        days_count: int,
+        seed: Optional[int] = None,
+        timeout: float = MEAL_PLAN_TIMEOUT_SECONDS
+    ) -> List[Dict[str, Any]]:
+        """
+        Сгенерировать дни программы в пуле процессов
+        
+        Пары дней раскладываются по процессам пула (round-robin), каждому передаётся компактный
+        снимок доступных пользователю рецептов. Результаты собираются по номеру дня, поэтому
+        итог не зависит от того, в каком порядке отработали процессы.
+        
+        При превышении timeout ожидающие задачи отменяются, а уже запущенные прекращают работу
+        перед следующей парой дней (общий дедлайн) — поднимается TimeoutError.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = time.time() + timeout
+        snapshot = catalog.snapshot()
+        day_starts = list(range(0, days_count, 2))
+        chunks_count = min(MEAL_PLAN_WORKERS, len(day_starts))
+        chunks = [day_starts[i::chunks_count] for i in range(chunks_count)]
+        
+        executor = get_meal_plan_executor()
+        futures = [
+            loop.run_in_executor(
+                executor, _generate_day_pairs, snapshot, target_nutrition, chunk, days_count, seed, deadline
             )
-            
-            dinner_batch = cls._build_meal_slot(
-                meal_type="dinner",
-                recipes_dict=recipes_dict,
-                slot_target=cls._calculate_slot_target(target_nutrition, "dinner"),
-                day_idx=day_start,
-                days_count=days_count
+            for chunk in chunks
+        ]
+        try:
+            results = await asyncio.wait_for(asyncio.gather(*futures), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"Генерация программы питания на {days_count} дней не уложилась в {timeout:.0f} с"
             )
-            
-            # Создаём планы для обоих дней в батче
-            for day_idx in [day_start, day_end]:
-                if day_idx < days_count:
-                    day_plan = cls._build_day_plan_with_batches(
-                        day_idx=day_idx,
-                        recipes_dict=recipes_dict,
-                        target_nutrition=target_nutrition,
-                        days_count=days_count,
-                        breakfast_batch=breakfast_batch,
-                        lunch_batch=lunch_batch,
-                        dinner_batch=dinner_batch
-                    )
-                    days[day_idx] = day_plan
+        except BrokenProcessPool:
+            reset_meal_plan_executor()
+            raise
+        
+        days: List[Optional[Dict[str, Any]]] = [None] * days_count
+        for chunk_days in results:
+            for day_idx, day_plan in chunk_days:
+                days[day_idx] = day_plan
+        return days
+    
+    @classmethod
+    def _generate_day_pair(
+        cls,
+        catalog: UserRecipeCatalog,
+        target_nutrition: Dict[str, float],
+        day_start: int,
+        days_count: int,
+        seed: Optional[int] = None
+    ) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Сгенерировать пару дней batch cooking, начиная с day_start: [(индекс дня, план дня)]
         
-        return {
-            "days": days
-        }
+        Генератор случайных чисел у каждой пары свой и зависит только от (seed, day_start),
+        поэтому результат не зависит от того, как пары разложены по процессам пула.
+        """
+        rng = random.Random(f"{seed}:{day_start}") if seed is not None else None
+        day_end = min(day_start + 1, days_count - 1)
+        
+        # Создаём батчи для breakfast, lunch, dinner (готовятся на 2 дня)
+        breakfast_batch = cls._build_meal_slot(
+            meal_type="breakfast",
+            catalog=catalog,
+            slot_target=cls._calculate_slot_target(target_nutrition, "breakfast"),
+            day_idx=day_start,
+            days_count=days_count,
+            rng=rng
+        )
+        
+        lunch_batch = cls._build_meal_slot(
+            meal_type="lunch",
+            catalog=catalog,
+            slot_target=cls._calculate_slot_target(target_nutrition, "lunch"),
+            day_idx=day_start,
+            days_count=days_count,
+            rng=rng
+        )
+        
+        dinner_batch = cls._build_meal_slot(
+            meal_type="dinner",
+            catalog=catalog,
+            slot_target=cls._calculate_slot_target(target_nutrition, "dinner"),
+            day_idx=day_start,
+            days_count=days_count,
+            rng=rng
+        )
+        
+        # Создаём планы для обоих дней в батче (для нечётного числа дней последний батч — на 1 день)
+        pair_days = []
+        for day_idx in sorted({day_start, day_end}):
+            day_plan = cls._build_day_plan_with_batches(
+                day_idx=day_idx,
+                catalog=catalog,
+                target_nutrition=target_nutrition,
+                days_count=days_count,
+                breakfast_batch=breakfast_batch,
+                lunch_batch=lunch_batch,
+                dinner_batch=dinner_batch,
+                rng=rng
+            )
+            pair_days.append((day_idx, day_plan))
+        return pair_days
     
     @classmethod
     def _build_day_plan_with_batches(
         cls,
         day_idx: int,
-        recipes_dict: List[Dict[str, Any]],
+        catalog: UserRecipeCatalog,
         target_nutrition: Dict[str, float],
         days_count: int,
         breakfast_batch: Optional[List[Dict[str, Any]]],
         lunch_batch: Optional[List[Dict[str, Any]]],
-        dinner_batch: Optional[List[Dict[str, Any]]]
+        dinner_batch: Optional[List[Dict[str, Any]]],
+        rng: Optional[random.Random] = None
     ) -> Dict[str, Any]:
         """
         Построить план одного дня с использованием батчей для основных приёмов пищи
@@ -180,10 +285,11 @@ class MealPlanService:
             # Если батч не предоставлен, создаём заново
             breakfast_meals = cls._build_meal_slot(
                 meal_type="breakfast",
-                recipes_dict=recipes_dict,
+                catalog=catalog,
                 slot_target=cls._calculate_slot_target(target_nutrition, "breakfast"),
                 day_idx=day_idx,
-                days_count=days_count
+                days_count=days_count,
+                rng=rng
             )
             if breakfast_meals:
                 day_plan["meals"].append({
@@ -201,10 +307,11 @@ class MealPlanService:
         else:
             lunch_meals = cls._build_meal_slot(
                 meal_type="lunch",
-                recipes_dict=recipes_dict,
+                catalog=catalog,
                 slot_target=cls._calculate_slot_target(target_nutrition, "lunch"),
                 day_idx=day_idx,
-                days_count=days_count
+                days_count=days_count,
+                rng=rng
             )
             if lunch_meals:
                 day_plan["meals"].append({
@@ -222,10 +329,11 @@ class MealPlanService:
         else:
             dinner_meals = cls._build_meal_slot(
                 meal_type="dinner",
-                recipes_dict=recipes_dict,
+                catalog=catalog,
                 slot_target=cls._calculate_slot_target(target_nutrition, "dinner"),
                 day_idx=day_idx,
-                days_count=days_count
+                days_count=days_count,
+                rng=rng
             )
             if dinner_meals:
                 day_plan["meals"].append({
@@ -264,11 +372,12 @@ class MealPlanService:
             # Подбираем snack
             snack_meals = cls._build_meal_slot(
                 meal_type="snack",
-                recipes_dict=recipes_dict,
+                catalog=catalog,
                 slot_target=snack_target,
                 day_idx=day_idx,
                 days_count=days_count,
-                is_snack=True
+                is_snack=True,
+                rng=rng
             )
             
             if snack_meals:
@@ -319,9 +428,10 @@ class MealPlanService:
     def _build_day_plan(
         cls,
         day_idx: int,
-        recipes_dict: List[Dict[str, Any]],
+        catalog: UserRecipeCatalog,
         target_nutrition: Dict[str, float],
-        days_count: int
+        days_count: int,
+        rng: Optional[random.Random] = None
     ) -> Dict[str, Any]:
         """
         Построить план одного дня
@@ -346,28 +456,31 @@ class MealPlanService:
         # Breakfast
         breakfast_meals = cls._build_meal_slot(
             meal_type="breakfast",
-            recipes_dict=recipes_dict,
+            catalog=catalog,
             slot_target=cls._calculate_slot_target(target_nutrition, "breakfast"),
             day_idx=day_idx,
-            days_count=days_count
+            days_count=days_count,
+            rng=rng
         )
         
         # Lunch
         lunch_meals = cls._build_meal_slot(
             meal_type="lunch",
-            recipes_dict=recipes_dict,
+            catalog=catalog,
             slot_target=cls._calculate_slot_target(target_nutrition, "lunch"),
             day_idx=day_idx,
-            days_count=days_count
+            days_count=days_count,
+            rng=rng
         )
         
         # Dinner
         dinner_meals = cls._build_meal_slot(
             meal_type="dinner",
-            recipes_dict=recipes_dict,
+            catalog=catalog,
             slot_target=cls._calculate_slot_target(target_nutrition, "dinner"),
             day_idx=day_idx,
-            days_count=days_count
+            days_count=days_count,
+            rng=rng
         )
         
         # Добавляем обязательные приёмы в план дня
@@ -416,11 +529,12 @@ class MealPlanService:
             for snack_idx in range(snack_count):
                 snack_meals = cls._build_meal_slot(
                     meal_type="snack",
-                    recipes_dict=recipes_dict,
+                    catalog=catalog,
                     slot_target=snack_target_per_meal,
                     day_idx=day_idx,
                     days_count=days_count,
-                    is_snack=True
+                    is_snack=True,
+                    rng=rng
                 )
                 
                 if snack_meals:
@@ -529,30 +643,28 @@ class MealPlanService:
     def _build_meal_slot(
         cls,
         meal_type: str,
-        recipes_dict: List[Dict[str, Any]],
+        catalog: UserRecipeCatalog,
         slot_target: Dict[str, float],
         day_idx: int,
         days_count: int,
-        is_snack: bool = False
+        is_snack: bool = False,
+        rng: Optional[random.Random] = None
     ) -> List[Dict[str, Any]]:
         """
         Построить один приём пищи
         
         Логика:
-        1. Фильтруем рецепты по допустимым категориям
+        1. Берём рецепты, допустимые для приёма пищи (корзины индекса рецептов)
         2. Подбираем основное блюдо (MAIN)
         3. Опционально добавляем SIDE (салат/гарнир) если калорий не хватает
         4. Оптимизируем порции
         """
-        # Фильтруем рецепты по допустимым категориям
-        allowed_recipes = cls._filter_by_allowed_category(recipes_dict, meal_type)
-        
-        if not allowed_recipes:
+        if not catalog.positions(meal_type):
             logger.warning(f"Нет доступных рецептов для {meal_type} после фильтрации")
             return []
         
         # Подбираем основное блюдо
-        main_dish = cls._pick_main_dish(allowed_recipes, meal_type, slot_target)
+        main_dish = cls._pick_main_dish(catalog, meal_type, slot_target, rng)
         
         if not main_dish:
             logger.warning(f"Не удалось подобрать основное блюдо для {meal_type}")
@@ -565,7 +677,7 @@ class MealPlanService:
         
         if current_totals["calories"] < slot_target["calories"] * 0.9:
             # Пробуем добавить салат или гарнир
-            side_dish = cls._pick_side_dish(allowed_recipes, meal_type, slot_target, meals)
+            side_dish = cls._pick_side_dish(catalog, meal_type, slot_target, meals, rng)
             if side_dish:
                 meals.append(side_dish)
         
@@ -575,76 +687,64 @@ class MealPlanService:
         return optimized_meals
     
     @classmethod
-    def _pick_main_dish(
-        cls,
-        allowed_recipes: List[Dict[str, Any]],
-        meal_type: str,
-        slot_target: Dict[str, float]
-    ) -> Optional[Dict[str, Any]]:
-        """Подобрать основное блюдо (MAIN) с учётом категории"""
+    def _is_main_candidate(cls, recipe: Dict[str, Any], meal_type: str) -> bool:
+        """Может ли допустимый для приёма пищи рецепт быть основным блюдом (MAIN)"""
+        category = (recipe.get("category") or "").lower()
         # Для breakfast - ищем breakfast-тип
         if meal_type == "breakfast":
-            main_candidates = [
-                r for r in allowed_recipes
-                if r.get("type") == "breakfast"
-                and (not r.get("category") or r.get("category", "").lower() in ["завтрак", "breakfast"])
-            ]
+            return recipe.get("type") == "breakfast" and (not category or category in ["завтрак", "breakfast"])
         # Для lunch - ищем main-тип, но категория должна быть "обед" или "ужин" (не только "ужин")
-        elif meal_type == "lunch":
-            main_candidates = [
-                r for r in allowed_recipes
-                if r.get("type") == "main"
-                and (not r.get("category") or r.get("category", "").lower() in ["обед", "lunch", "ужин", "dinner"])
-            ]
+        if meal_type == "lunch":
+            return recipe.get("type") == "main" and (not category or category in ["обед", "lunch", "ужин", "dinner"])
         # Для dinner - ищем main-тип, но категория должна быть "ужин" (не "обед")
-        elif meal_type == "dinner":
-            main_candidates = [
-                r for r in allowed_recipes
-                if r.get("type") == "main"
-                and (not r.get("category") or r.get("category", "").lower() in ["ужин", "dinner"])
-            ]
+        if meal_type == "dinner":
+            return recipe.get("type") == "main" and (not category or category in ["ужин", "dinner"])
         # Для snack - любой подходящий тип
-        else:
-            main_candidates = allowed_recipes.copy()
+        return True
+    
+    @classmethod
+    def _pick_main_dish(
+        cls,
+        catalog: UserRecipeCatalog,
+        meal_type: str,
+        slot_target: Dict[str, float],
+        rng: Optional[random.Random] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Подобрать основное блюдо (MAIN) с учётом категории"""
+        main_candidates = catalog.positions(meal_type, cls.ROLE_MAIN)
         
         if not main_candidates:
             return None
         
         # Выбираем блюдо, наиболее близкое к целевым КБЖУ
-        # Приоритет белкам для snack
-        best_dish = None
-        best_score = float('inf')
-        
-        for dish in main_candidates:
-            # Оцениваем близость к целевым КБЖУ
-            score = cls._evaluate_dish_fit(dish, slot_target)
-            # Для snack приоритет белковым блюдам
-            if meal_type == "snack" and dish.get("proteins_per_portion", 0) > 15:
-                score *= 0.8  # Снижаем score для белковых блюд
-            if score < best_score:
-                best_score = score
-                best_dish = dish
-        
-        if best_dish:
-            return best_dish.copy()
-        
-        return None
+        scores = catalog.index.fit_scores(main_candidates, slot_target)
+        # Для snack приоритет белковым блюдам
+        if meal_type == "snack":
+            proteins = catalog.index.proteins
+            scores = [
+                score * 0.8 if proteins[pos] > 15 else score
+                for score, pos in zip(scores, main_candidates)
+            ]
+        
+        return catalog.recipe(main_candidates[cls._choose_candidate(scores, rng)])
     
     @classmethod
     def _pick_side_dish(
         cls,
-        allowed_recipes: List[Dict[str, Any]],
+        catalog: UserRecipeCatalog,
         meal_type: str,
         slot_target: Dict[str, float],
-        existing_meals: List[Dict[str, Any]]
+        existing_meals: List[Dict[str, Any]],
+        rng: Optional[random.Random] = None
     ) -> Optional[Dict[str, Any]]:
         """Подобрать дополнительное блюдо (SIDE) - салат или гарнир"""
-        # Исключаем уже использованные блюда
+        # Ищем салаты, исключая уже использованные блюда
         used_uuids = {m.get("uuid") for m in existing_meals}
-        available = [r for r in allowed_recipes if r.get("uuid") not in used_uuids]
-        
-        # Ищем салаты
-        salad_candidates = [r for r in available if r.get("type") == "salad"]
+        uuids = catalog.index.uuids
+        salad_candidates = [
+            pos for pos in catalog.positions(meal_type, cls.ROLE_SIDE)
+            if uuids[pos] not in used_uuids
+        ]
         
         if not salad_candidates:
             return None
@@ -658,29 +758,24 @@ class MealPlanService:
             "carbs": max(0, slot_target["carbs"] - current_totals["carbs"])
         }
         
-        best_side = None
-        best_score = float('inf')
-        
-        for side in salad_candidates:
-            score = cls._evaluate_dish_fit(side, remaining_target)
-            if score < best_score:
-                best_score = score
-                best_side = side
-        
-        if best_side:
-            return best_side.copy()
-        
-        return None
+        scores = catalog.index.fit_scores(salad_candidates, remaining_target)
+        return catalog.recipe(salad_candidates[cls._choose_candidate(scores, rng)])
     
     @classmethod
-    def _evaluate_dish_fit(cls, dish: Dict[str, Any], target: Dict[str, float]) -> float:
-        """Оценить, насколько блюдо подходит к целевым КБЖУ"""
-        cal_diff = abs((dish.get("calories_per_portion", 0) or 0) - target["calories"]) * 1.0
-        prot_diff = abs((dish.get("proteins_per_portion", 0) or 0) - target["proteins"]) * 1.5
-        fat_diff = abs((dish.get("fats_per_portion", 0) or 0) - target["fats"]) * 1.2
-        carb_diff = abs((dish.get("carbs_per_portion", 0) or 0) - target["carbs"]) * 1.0
+    def _choose_candidate(cls, scores: List[float], rng: Optional[random.Random] = None) -> int:
+        """
+        Выбрать индекс кандидата по оценкам (меньше — лучше)
         
-        return cal_diff + prot_diff + fat_diff + carb_diff
+        Без rng — первый кандидат с лучшей оценкой. С rng — случайный среди SELECTION_TOP_K лучших,
+        отстающих от лучшего не более чем на SELECTION_TOLERANCE.
+        """
+        best_idx = min(range(len(scores)), key=scores.__getitem__)
+        if rng is None:
+            return best_idx
+        
+        limit = scores[best_idx] * (1 + cls.SELECTION_TOLERANCE)
+        ranked = sorted(range(len(scores)), key=lambda i: (scores[i], i))[:cls.SELECTION_TOP_K]
+        return rng.choice([i for i in ranked if scores[i] <= limit])
     
     @classmethod
     def _final_day_correction(cls, day_plan: Dict[str, Any], target_nutrition: Dict[str, float]):
@@ -711,31 +806,6 @@ class MealPlanService:
                             if new_totals["calories"] >= target_nutrition["calories"] * 0.95:
                                 break
     
-    @classmethod
-    async def _get_available_recipes(
-        cls,
-        user_id: int,
-        allowed_recipe_uuids: Optional[List[str]]
-    ) -> List[Recipe]:
-        """Получить доступные рецепты (системные и пользовательские)"""
-        # Получаем системные рецепты (user_id = None)
-        system_recipes = await RecipeDAO.find_all(user_id=None, actual=True)
-        
-        # Получаем пользовательские рецепты
-        user_recipes = await RecipeDAO.find_all(user_id=user_id, actual=True)
-        
-        all_recipes = list(system_recipes) + list(user_recipes)
-        
-        # Фильтруем по allowed_recipe_uuids если указаны
-        if allowed_recipe_uuids:
-            allowed_uuids = [str(uuid) for uuid in allowed_recipe_uuids]
-            all_recipes = [
-                r for r in all_recipes
-                if str(r.uuid) in allowed_uuids
-            ]
-        
-        return all_recipes
-    
     @classmethod
     def _map_category_to_type(cls, category: str) -> str:
         """Маппинг категории на тип рецепта"""
@@ -867,66 +937,23 @@ class MealPlanService:
         """
         Оптимизировать один приём пищи с использованием macro-penalty
         
-        Алгоритм:
-        1. Начинаем с portions = 1 для всех блюд
-        2. Итеративно оптимизируем порции, минимизируя macro-penalty
-        3. Проверяем валидность слота (90-110% калории, 85-115% БЖУ)
+        Алгоритм (app/meal_plans/portion_optimizer.py):
+        1. Перебираем все векторы порций 1..5 для блюд слота одной матричной операцией
+        2. Среди валидных вариантов (90-110% калории, 85-115% БЖУ) берём минимальный macro-penalty
+        3. Если валидных нет — вариант с минимальным macro-penalty
         """
         if not meals:
             return []
         
-        # Инициализируем portions = 1
-        for meal in meals:
-            meal["portions"] = 1
-        
-        # Оптимизируем порции итеративно
-        max_iterations = 50
-        best_config = None
-        best_score = float('inf')
-        
-        for iteration in range(max_iterations):
-            totals = cls._calculate_totals(meals)
-            score = cls._calculate_macro_penalty(totals, slot_target)
-            
-            if score < best_score:
-                best_score = score
-                best_config = [(m["uuid"], m["portions"]) for m in meals]
-            
-            # Если слот валиден, можем остановиться
-            if cls._is_slot_valid(totals, slot_target):
-                break
-            
-            # Пытаемся улучшить, изменяя порции
-            improved = False
-            
-            # Приоритет 1: Балансируем макросы
-            if not cls._is_slot_valid(totals, slot_target):
-                improved = cls._balance_macros_iterative(meals, slot_target)
-            
-            # Приоритет 2: Корректируем калории
-            if not improved:
-                if totals["calories"] < slot_target["calories"] * 0.90:
-                    best_meal = cls._find_best_meal_to_increase(meals, slot_target, totals)
-                    if best_meal and best_meal["portions"] < 5:
-                        best_meal["portions"] += 1
-                        improved = True
-                
-                elif totals["calories"] > slot_target["calories"] * 1.10:
-                    best_meal = cls._find_best_meal_to_decrease(meals, slot_target, totals)
-                    if best_meal and best_meal["portions"] > 1:
-                        best_meal["portions"] -= 1
-                        improved = True
-            
-            if not improved:
-                break
-        
-        # Восстанавливаем лучшую конфигурацию, если нашли
-        if best_config:
-            for meal, (uuid, portions) in zip(meals, best_config):
-                if meal["uuid"] == uuid:
-                    meal["portions"] = portions
+        portions, _, _ = optimize_portions(meals, slot_target)
+        for meal, meal_portions in zip(meals, portions):
+            meal["portions"] = meal_portions
         
-        # Формируем финальный список с правильной структурой
+        return cls._format_slot_meals(meals)
+    
+    @classmethod
+    def _format_slot_meals(cls, meals: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Сформировать финальный список блюд слота с КБЖУ с учётом порций"""
         result = []
         for meal in meals:
             result.append({
@@ -942,60 +969,6 @@ class MealPlanService:
         
         return result
     
-    @classmethod
-    def _find_best_meal_to_increase(
-        cls,
-        meals: List[Dict[str, Any]],
-        slot_target: Dict[str, float],
-        current_totals: Dict[str, float]
-    ) -> Optional[Dict[str, Any]]:
-        """Найти лучшее блюдо для увеличения порции"""
-        best_meal = None
-        best_delta_score = float('inf')
-        current_score = cls._calculate_macro_penalty(current_totals, slot_target)
-        
-        for meal in meals:
-            if meal["portions"] < 5:
-                meal["portions"] += 1
-                new_totals = cls._calculate_totals(meals)
-                new_score = cls._calculate_macro_penalty(new_totals, slot_target)
-                delta_score = new_score - current_score
-                
-                if delta_score < best_delta_score:
-                    best_delta_score = delta_score
-                    best_meal = meal
-                
-                meal["portions"] -= 1
-        
-        return best_meal
-    
-    @classmethod
-    def _find_best_meal_to_decrease(
-        cls,
-        meals: List[Dict[str, Any]],
-        slot_target: Dict[str, float],
-        current_totals: Dict[str, float]
-    ) -> Optional[Dict[str, Any]]:
-        """Найти лучшее блюдо для уменьшения порции"""
-        best_meal = None
-        best_delta_score = float('inf')
-        current_score = cls._calculate_macro_penalty(current_totals, slot_target)
-        
-        for meal in meals:
-            if meal["portions"] > 1:
-                meal["portions"] -= 1
-                new_totals = cls._calculate_totals(meals)
-                new_score = cls._calculate_macro_penalty(new_totals, slot_target)
-                delta_score = new_score - current_score
-                
-                if delta_score < best_delta_score:
-                    best_delta_score = delta_score
-                    best_meal = meal
-                
-                meal["portions"] += 1
-        
-        return best_meal
-    
     @classmethod
     def _calculate_macro_penalty(
         cls,
@@ -1046,78 +1019,6 @@ class MealPlanService:
                 0.85 <= fat_ratio <= 1.15 and
                 0.85 <= carb_ratio <= 1.15)
     
-    @classmethod
-    def _balance_macros_iterative(
-        cls,
-        meals: List[Dict[str, Any]],
-        slot_target: Dict[str, float]
-    ) -> bool:
-        """
-        Итеративная балансировка макросов с приоритизацией
-        
-        Приоритет: белки → калории → углеводы → жиры
-        
-        Возвращает True, если было улучшение
-        """
-        totals = cls._calculate_totals(meals)
-        current_score = cls._calculate_macro_penalty(totals, slot_target)
-        
-        # Проверяем отклонения для каждого макро с приоритетом
-        macros_to_balance = []
-        
-        # Приоритет 1: Белки (самый важный)
-        prot_ratio = totals["proteins"] / slot_target["proteins"] if slot_target["proteins"] > 0 else 0
-        if prot_ratio < 0.85 or prot_ratio > 1.15:
-            macros_to_balance.append(("proteins", "proteins_per_portion", prot_ratio < 0.85, 1))
-        
-        # Приоритет 2: Калории
-        cal_ratio = totals["calories"] / slot_target["calories"] if slot_target["calories"] > 0 else 1.0
-        if cal_ratio < 0.90 or cal_ratio > 1.10:
-            macros_to_balance.append(("calories", "calories_per_portion", cal_ratio < 0.90, 2))
-        
-        # Приоритет 3: Углеводы
-        carb_ratio = totals["carbs"] / slot_target["carbs"] if slot_target["carbs"] > 0 else 0
-        if carb_ratio < 0.85 or carb_ratio > 1.15:
-            macros_to_balance.append(("carbs", "carbs_per_portion", carb_ratio < 0.85, 3))
-        
-        # Приоритет 4: Жиры (последний)
-        fat_ratio = totals["fats"] / slot_target["fats"] if slot_target["fats"] > 0 else 0
-        if fat_ratio < 0.85 or fat_ratio > 1.15:
-            macros_to_balance.append(("fats", "fats_per_portion", fat_ratio < 0.85, 4))
-        
-        # Сортируем по приоритету, затем по критичности отклонения
-        macros_to_balance.sort(
-            key=lambda x: (x[3], abs(1.0 - (totals[x[0]] / slot_target[x[0]] if slot_target[x[0]] > 0 else 0))),
-            reverse=False
-        )
-        
-        # Балансируем каждый макро по приоритету
-        for macro_name, macro_key, need_increase, priority in macros_to_balance:
-            if need_increase:
-                # Нужно увеличить макро
-                macro_rich = sorted(meals, key=lambda m: m.get(macro_key, 0), reverse=True)
-                for meal in macro_rich:
-                    if meal["portions"] < 5:
-                        meal["portions"] += 1
-                        new_totals = cls._calculate_totals(meals)
-                        new_score = cls._calculate_macro_penalty(new_totals, slot_target)
-                        if new_score < current_score:
-                            return True
-                        meal["portions"] -= 1
-            else:
-                # Нужно уменьшить макро
-                macro_rich = sorted(meals, key=lambda m: m.get(macro_key, 0), reverse=True)
-                for meal in macro_rich:
-                    if meal["portions"] > 1:
-                        meal["portions"] -= 1
-                        new_totals = cls._calculate_totals(meals)
-                        new_score = cls._calculate_macro_penalty(new_totals, slot_target)
-                        if new_score < current_score:
-                            return True
-                        meal["portions"] += 1
-        
-        return False
-    
     @classmethod
     def _calculate_totals(cls, meals: List[Dict[str, Any]]) -> Dict[str, float]:
         """Рассчитать суммарные КБЖУ"""
@@ -1182,3 +1083,20 @@ class MealPlanService:
             totals["carbs"] += recipe.get("carbs", 0) or 0
         
         return totals
+
+
+def _generate_day_pairs(
+    catalog: UserRecipeCatalog,
+    target_nutrition: Dict[str, float],
+    day_starts: List[int],
+    days_count: int,
+    seed: Optional[int],
+    deadline: float
+) -> List[Tuple[int, Dict[str, Any]]]:
+    """Точка входа процесса пула: генерирует пары дней по очереди, пока не истёк общий дедлайн."""
+    result = []
+    for day_start in day_starts:
+        if time.time() > deadline:
+            raise TimeoutError("Генерация программы питания прервана по таймауту")
+        result.extend(MealPlanService._generate_day_pair(catalog, target_nutrition, day_start, days_count, seed))
+    return result
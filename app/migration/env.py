@@ -22,7 +22,7 @@ from app.exercises.models import Exercise
 from app.user_program.models import UserProgram
 from app.user_training.models import UserTraining
 from app.user_exercises.models import UserExercise
-from app.files.models import File
+from app.files.models import File, FileBlob
 # Import UserFavoriteExercise BEFORE ExerciseReference to ensure it's registered with SQLAlchemy first
 from app.user_favorite_exercises.models import UserFavoriteExercise
 from app.exercise_reference.models import ExerciseReference
@@ -35,9 +35,9 @@ from app.promo_codes.models import PromoCode
 from app.recipes.models import Recipe
 from app.user_favorite_recipes.models import UserFavoriteRecipe
 from app.food_recognition.models import FoodRecognition
-from app.meal_plans.models import MealPlan
+from app.meal_plans.models import MealPlan, MealPlanCache
 from app.calorie_calculator.models import CalorieCalculation
-from app.food_progress.models import DailyTarget, Meal
+from app.food_progress.models import DailyTarget, Meal, UserDailyNutrition
 from app.last_values.models import LastValue
 from app.training_composition_rules.models import TrainingCompositionRule
 from app.exercise_builder_pool.models import ExerciseBuilderPool
@@ -0,0 +1,39 @@
+"""add meal_plan_cache table
+
+Revision ID: 0eee82142d22
+Revises: a8b9c0d1e2f3
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "0eee82142d22"
+down_revision: Union[str, Sequence[str], None] = "a8b9c0d1e2f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "meal_plan_cache",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("cache_key", sa.String(length=64), nullable=False),
+        sa.Column("plan_data", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("hit_count", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("last_used_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("cache_key", name="uq_meal_plan_cache_cache_key"),
+    )
+    op.create_index("ix_meal_plan_cache_last_used_at", "meal_plan_cache", ["last_used_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_meal_plan_cache_last_used_at", table_name="meal_plan_cache")
+    op.drop_table("meal_plan_cache")
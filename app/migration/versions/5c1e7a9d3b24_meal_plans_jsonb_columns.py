@@ -0,0 +1,42 @@
+"""meal_plans target_nutrition and response_data to jsonb
+
+Revision ID: 5c1e7a9d3b24
+Revises: 0eee82142d22
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "5c1e7a9d3b24"
+down_revision: Union[str, Sequence[str], None] = "0eee82142d22"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for column in ("target_nutrition", "response_data"):
+        op.alter_column(
+            "meal_plans",
+            column,
+            type_=postgresql.JSONB(astext_type=sa.Text()),
+            existing_type=sa.Text(),
+            existing_nullable=True,
+            postgresql_using=f"{column}::jsonb",
+        )
+
+
+def downgrade() -> None:
+    for column in ("response_data", "target_nutrition"):
+        op.alter_column(
+            "meal_plans",
+            column,
+            type_=sa.Text(),
+            existing_type=postgresql.JSONB(astext_type=sa.Text()),
+            existing_nullable=True,
+            postgresql_using=f"{column}::text",
+        )
@@ -0,0 +1,57 @@
+"""add user_daily_nutrition rollup table
+
+Revision ID: 7d2b4f6a8c10
+Revises: 5c1e7a9d3b24
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "7d2b4f6a8c10"
+down_revision: Union[str, Sequence[str], None] = "5c1e7a9d3b24"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_daily_nutrition",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("eaten_calories", sa.Float(), server_default=sa.text("0"), nullable=False),
+        sa.Column("eaten_proteins", sa.Float(), server_default=sa.text("0"), nullable=False),
+        sa.Column("eaten_fats", sa.Float(), server_default=sa.text("0"), nullable=False),
+        sa.Column("eaten_carbs", sa.Float(), server_default=sa.text("0"), nullable=False),
+        sa.Column("meals_count", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "date", name="uq_user_daily_nutrition_user_date"),
+    )
+    op.create_index("ix_meals_user_id_meal_datetime", "meals", ["user_id", "meal_datetime"], unique=False)
+
+    # Заполняем сводку по уже существующим приемам пищи
+    op.execute(
+        """
+        INSERT INTO user_daily_nutrition (
+            user_id, date, eaten_calories, eaten_proteins, eaten_fats, eaten_carbs,
+            meals_count, created_at, updated_at
+        )
+        SELECT user_id, meal_datetime::date, SUM(calories), SUM(proteins), SUM(fats), SUM(carbs),
+               COUNT(*), timezone('utc', now()), timezone('utc', now())
+        FROM meals
+        WHERE actual
+        GROUP BY user_id, meal_datetime::date
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_meals_user_id_meal_datetime", table_name="meals")
+    op.drop_table("user_daily_nutrition")
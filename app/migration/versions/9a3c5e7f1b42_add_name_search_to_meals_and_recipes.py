@@ -0,0 +1,53 @@
+"""add full-text and trigram name search to meals and recipes
+
+Revision ID: 9a3c5e7f1b42
+Revises: 7d2b4f6a8c10
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "9a3c5e7f1b42"
+down_revision: Union[str, Sequence[str], None] = "7d2b4f6a8c10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR_EXPRESSION = (
+    "to_tsvector('russian'::regconfig, coalesce(name, '')) || "
+    "to_tsvector('simple'::regconfig, coalesce(name, ''))"
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table in ("meals", "recipes"):
+        op.add_column(
+            table,
+            sa.Column(
+                "search_vector",
+                postgresql.TSVECTOR(),
+                sa.Computed(SEARCH_VECTOR_EXPRESSION, persisted=True),
+                nullable=True,
+            ),
+        )
+        op.create_index(f"ix_{table}_search_vector", table, ["search_vector"], unique=False, postgresql_using="gin")
+        op.create_index(
+            f"ix_{table}_name_trgm",
+            table,
+            ["name"],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    for table in ("recipes", "meals"):
+        op.drop_index(f"ix_{table}_name_trgm", table_name=table)
+        op.drop_index(f"ix_{table}_search_vector", table_name=table)
+        op.drop_column(table, "search_vector")
@@ -0,0 +1,43 @@
+"""add usage_count to exercise_reference
+
+Revision ID: b4e6d8f0a2c3
+Revises: 9a3c5e7f1b42
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "b4e6d8f0a2c3"
+down_revision: Union[str, Sequence[str], None] = "9a3c5e7f1b42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "exercise_reference",
+        sa.Column("usage_count", sa.Integer(), nullable=False, server_default=sa.text("0")),
+    )
+    op.execute(
+        """
+        UPDATE exercise_reference AS er
+        SET usage_count = counts.usage_count
+        FROM (
+            SELECT exercise_reference_id, count(*) AS usage_count
+            FROM exercise
+            WHERE exercise_reference_id IS NOT NULL
+            GROUP BY exercise_reference_id
+        ) AS counts
+        WHERE counts.exercise_reference_id = er.id
+        """
+    )
+    op.create_index("ix_exercise_reference_usage_count", "exercise_reference", ["usage_count"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_exercise_reference_usage_count", table_name="exercise_reference")
+    op.drop_column("exercise_reference", "usage_count")
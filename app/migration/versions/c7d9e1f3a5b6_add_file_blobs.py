@@ -0,0 +1,45 @@
+"""add file_blobs for content-addressed uploads
+
+Revision ID: c7d9e1f3a5b6
+Revises: b4e6d8f0a2c3
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "c7d9e1f3a5b6"
+down_revision: Union[str, Sequence[str], None] = "b4e6d8f0a2c3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "file_blobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("file_path", sa.String(), nullable=False),
+        sa.Column("file_size", sa.Integer(), nullable=False),
+        sa.Column("ref_count", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("sha256"),
+    )
+    op.create_index(op.f("ix_file_blobs_id"), "file_blobs", ["id"], unique=False)
+    # Существующие файлы остаются со своими путями (blob_id = NULL)
+    op.add_column("files", sa.Column("blob_id", sa.Integer(), nullable=True))
+    op.create_foreign_key("fk_files_blob_id", "files", "file_blobs", ["blob_id"], ["id"])
+    op.create_index(op.f("ix_files_blob_id"), "files", ["blob_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_files_blob_id"), table_name="files")
+    op.drop_constraint("fk_files_blob_id", "files", type_="foreignkey")
+    op.drop_column("files", "blob_id")
+    op.drop_index(op.f("ix_file_blobs_id"), table_name="file_blobs")
+    op.drop_table("file_blobs")
@@ -0,0 +1,27 @@
+"""add processing_status to files
+
+Revision ID: d8e0f2a4b6c7
+Revises: c7d9e1f3a5b6
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "d8e0f2a4b6c7"
+down_revision: Union[str, Sequence[str], None] = "c7d9e1f3a5b6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("files", sa.Column("processing_status", sa.String(), nullable=True))
+    op.create_index(op.f("ix_files_processing_status"), "files", ["processing_status"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_files_processing_status"), table_name="files")
+    op.drop_column("files", "processing_status")
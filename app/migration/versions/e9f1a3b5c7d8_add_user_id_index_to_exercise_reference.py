@@ -0,0 +1,24 @@
+"""add user_id index to exercise_reference
+
+Revision ID: e9f1a3b5c7d8
+Revises: d8e0f2a4b6c7
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "e9f1a3b5c7d8"
+down_revision: Union[str, Sequence[str], None] = "d8e0f2a4b6c7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_exercise_reference_user_id", "exercise_reference", ["user_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_exercise_reference_user_id", table_name="exercise_reference")
@@ -0,0 +1,24 @@
+"""add training_id index to exercise
+
+Revision ID: f0a2b4c6d8e9
+Revises: e9f1a3b5c7d8
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "f0a2b4c6d8e9"
+down_revision: Union[str, Sequence[str], None] = "e9f1a3b5c7d8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_exercise_training_id", "exercise", ["training_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_exercise_training_id", table_name="exercise")
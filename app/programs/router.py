@@ -9,11 +9,14 @@ from app.categories.dao import CategoryDAO
 from app.users.dao import UsersDAO
 from app.files.dao import FilesDAO
 from app.files.service import FileService
+from app.programs.models import Program
+from app.categories.models import Category
+from app.conditional_get import conditional_get, table_version
 
 router = APIRouter(prefix='/programs', tags=['Работа с программами'])
 
 
-@router.get("/", summary="Получить все программы")
+@router.get("/", summary="Получить все программы", dependencies=[Depends(conditional_get(table_version(Program), table_version(Category)))])
 async def get_all_programs(request_body: RBProgram = Depends(), user_data = Depends(get_current_user_user)) -> list[dict]:
     # Используем оптимизированный метод вместо find_all
     programs = await ProgramDAO.find_all_with_categories_and_users(**request_body.to_dict())
@@ -5,10 +5,12 @@ from app.files.dao import FilesDAO
 from app.user_favorite_recipes.models import UserFavoriteRecipe
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
-from sqlalchemy import desc, or_, func
+from sqlalchemy import desc, or_, func, literal, tuple_
 from app.database import async_session_maker
+from app.text_search import decode_cursor, encode_cursor, name_search, search_words
 from fastapi import HTTPException, status
 from uuid import UUID
+from datetime import datetime
 from typing import Optional, Tuple
 
 
@@ -75,8 +77,9 @@ class RecipeDAO(BaseDAO):
         category: Optional[str] = None,
         name: Optional[str] = None,
         page: int = 1,
-        size: int = 10
-    ) -> Tuple[list, int]:
+        size: int = 10,
+        cursor: Optional[str] = None
+    ) -> Tuple[list, int, Optional[str]]:
         """
         Найти все рецепты, доступные пользователю:
         - Системные рецепты (user_id IS NULL)
@@ -85,11 +88,12 @@ class RecipeDAO(BaseDAO):
         Параметры:
         - actual: Опциональная фильтрация по актуальности
         - category: Опциональная фильтрация по категории
-        - name: Опциональный поиск по названию (без пробелов и без учета регистра)
-        - page: Номер страницы (начиная с 1)
+        - name: Опциональный поиск по названию (слова как начала слов с учетом словоформ, опечатки — по похожести)
+        - page: Номер страницы (начиная с 1), используется без cursor
         - size: Размер страницы
+        - cursor: Keyset-курсор из pagination.next_cursor предыдущей страницы
         
-        Возвращает: (список рецептов, общее количество)
+        Возвращает: (список рецептов, общее количество, курсор следующей страницы или None)
         """
         async with async_session_maker() as session:
             # Базовое условие для доступных рецептов
@@ -98,7 +102,7 @@ class RecipeDAO(BaseDAO):
                 cls.model.user_id == user_id  # Пользовательские рецепты
             )
             
-            # Запрос для получения рецептов
+            # Запрос для получения рецептов (ключ сортировки добавляется ниже)
             query = select(cls.model).options(
                 joinedload(cls.model.user),
                 joinedload(cls.model.image)
@@ -117,27 +121,12 @@ class RecipeDAO(BaseDAO):
                 query = query.where(cls.model.category == category)
                 count_query = count_query.where(cls.model.category == category)
             
-            # Опциональный поиск по name (поиск по вхождению слов без пробелов и без учета регистра)
-            if name is not None:
-                # Разбиваем поисковый запрос на слова и убираем пробелы из каждого слова
-                search_words = [word.strip().lower() for word in name.split() if word.strip()]
-                
-                if search_words:
-                    # Исключаем записи с NULL name при поиске
-                    query = query.where(cls.model.name.isnot(None))
-                    count_query = count_query.where(cls.model.name.isnot(None))
-                    
-                    # Для каждого слова проверяем, что оно входит в название (без пробелов и без учета регистра)
-                    # Используем COALESCE для обработки NULL значений
-                    recipe_name_without_spaces = func.lower(
-                        func.replace(func.coalesce(cls.model.name, ""), " ", "")
-                    )
-                    
-                    # Проверяем, что каждое слово из поискового запроса входит в название рецепта
-                    for search_word in search_words:
-                        name_filter = recipe_name_without_spaces.contains(search_word)
-                        query = query.where(name_filter)
-                        count_query = count_query.where(name_filter)
+            # Опциональный поиск по name (полнотекстовый + триграммы для опечаток), с ранжированием
+            rank = None
+            if name is not None and search_words(name):
+                name_filter, rank = name_search(cls.model.search_vector, cls.model.name, name)
+                query = query.where(name_filter)
+                count_query = count_query.where(name_filter)
             
             # Получаем общее количество
             count_result = await session.execute(count_query)
@@ -151,20 +140,47 @@ class RecipeDAO(BaseDAO):
                 UserFavoriteRecipe.user_id == user_id
             ).scalar_subquery()
             
-            # Сортировка: сначала избранные (is_favorite DESC), затем по дате создания (самые новые первыми)
-            query = query.order_by(
-                is_favorite_subq.desc(),  # Сначала избранные (1), затем не избранные (0)
-                desc(cls.model.created_at)  # Затем по дате создания
-            )
+            # Сортировка: сначала избранные (is_favorite DESC), при поиске — по релевантности,
+            # затем по дате создания (самые новые первыми) и id для однозначного порядка
+            sort_keys = [is_favorite_subq]  # Сначала избранные (1), затем не избранные (0)
+            if rank is not None:
+                sort_keys.append(rank)
+            sort_keys.append(cls.model.created_at)  # Затем по дате создания
+            query = query.add_columns(
+                *[key.label(f"sort_key_{i}") for i, key in enumerate(sort_keys)]
+            ).order_by(*[key.desc() for key in sort_keys], cls.model.id.desc())
             
-            # Применяем пагинацию
-            offset = (page - 1) * size
-            query = query.offset(offset).limit(size)
+            # Применяем пагинацию: по курсору (keyset) или по номеру страницы
+            if cursor:
+                sort_values, last_id = decode_cursor(cursor)
+                if (
+                    not isinstance(sort_values, list)
+                    or len(sort_values) != len(sort_keys)
+                    or not isinstance(sort_values[-1], str)
+                ):
+                    raise ValueError("Некорректный курсор пагинации")
+                sort_values[-1] = datetime.fromisoformat(sort_values[-1])
+                query = query.where(
+                    tuple_(*sort_keys, cls.model.id) < tuple_(*[literal(v) for v in sort_values], literal(last_id))
+                )
+            else:
+                query = query.offset((page - 1) * size)
+            # Лишняя запись показывает, есть ли следующая страница
+            query = query.limit(size + 1)
             
             result = await session.execute(query)
-            objects = result.unique().scalars().all()
+            rows = result.unique().all()
+            has_next = len(rows) > size
+            rows = rows[:size]
+            objects = [row[0] for row in rows]
             for obj in objects:
                 session.expunge(obj)
-            
-            return objects, total_count
+        
+        next_cursor = None
+        if has_next:
+            last_sort_values = list(rows[-1][1:])
+            last_sort_values[-1] = last_sort_values[-1].isoformat()
+            next_cursor = encode_cursor(last_sort_values, objects[-1].id)
+        
+        return objects, total_count, next_cursor
 
@@ -1,8 +1,10 @@
 from typing import TYPE_CHECKING, Optional
 import json
-from sqlalchemy import ForeignKey, Text, text
+from sqlalchemy import Computed, ForeignKey, Index, Text, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base, int_pk, uuid_field
+from app.text_search import search_vector_expression
 from datetime import datetime
 
 if TYPE_CHECKING:
@@ -13,6 +15,10 @@ if TYPE_CHECKING:
 
 class Recipe(Base):
     __tablename__ = "recipes"
+    __table_args__ = (
+        Index("ix_recipes_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_recipes_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+    )
 
     id: Mapped[int_pk]
     uuid: Mapped[uuid_field]
@@ -27,6 +33,10 @@ class Recipe(Base):
     category: Mapped[Optional[str]] = mapped_column(nullable=True)  # Категория (например, "завтрак", "обед", "ужин", "супы")
     type: Mapped[Optional[str]] = mapped_column(nullable=True)  # Тип рецепта
     name: Mapped[Optional[str]] = mapped_column(nullable=True)  # Название рецепта
+    # Поисковый вектор по названию (генерируется БД, см. app/text_search.py)
+    search_vector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR, Computed(search_vector_expression("name"), persisted=True), nullable=True, deferred=True
+    )
     ingredients: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # Словарь ключ-значение в формате JSON
     recipe: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # Текст рецепта (до 2000 символов)
     
@@ -16,19 +16,30 @@ from app.users.dao import UsersDAO
 from app.files.dao import FilesDAO
 from app.files.service import FileService
 from app.user_favorite_recipes.dao import UserFavoriteRecipeDAO
+from app.user_favorite_recipes.models import UserFavoriteRecipe
+from app.conditional_get import conditional_get, table_version
 from app.logger import logger
+from app.text_search import search_words
+from app.meal_plans.recipe_index import invalidate_recipe_index
 from fastapi import status
 
 router = APIRouter(prefix='/api/recipes', tags=['Рецепты'])
 
+# Условный GET: доступные пользователю рецепты (системные и его) и его избранное
+recipes_not_modified = conditional_get(
+    table_version(Recipe, where=lambda request, user: [(Recipe.user_id.is_(None)) | (Recipe.user_id == user.id)]),
+    table_version(UserFavoriteRecipe, where=lambda request, user: [UserFavoriteRecipe.user_id == user.id])
+)
 
-@router.get("/grouped-by-category", summary="Получить рецепты, сгруппированные по категориям")
+
+@router.get("/grouped-by-category", summary="Получить рецепты, сгруппированные по категориям", dependencies=[Depends(recipes_not_modified)])
 async def get_recipes_grouped_by_category(
     actual: Optional[bool] = Query(None, description="Фильтр по актуальности записи"),
     category: Optional[str] = Query(None, description="Фильтр по категории"),
-    name: Optional[str] = Query(None, description="Поиск по названию (без пробелов и без учета регистра)"),
+    name: Optional[str] = Query(None, description="Поиск по названию (с учетом словоформ и опечаток)"),
     page: int = Query(1, ge=1, description="Номер страницы"),
     size: int = Query(10, ge=1, le=100, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (pagination.next_cursor)"),
     user_data: User = Depends(get_current_user_user)
 ) -> Dict[str, Any]:
     """
@@ -41,9 +52,10 @@ async def get_recipes_grouped_by_category(
     Параметры:
     - actual: Опциональный фильтр по актуальности (True/False)
     - category: Опциональный фильтр по категории
-    - name: Опциональный поиск по названию (поиск по вхождению слов без пробелов и без учета регистра)
+    - name: Опциональный поиск по названию (полнотекстовый с учетом словоформ, опечатки — по похожести; результаты ранжируются)
     - page: Номер страницы (начиная с 1)
     - size: Размер страницы (от 1 до 100)
+    - cursor: Курсор следующей страницы из pagination.next_cursor (глубина страницы не влияет на скорость)
     
     Результат: Объект с группированными рецептами и информацией о пагинации.
     Ключ в data - категория, значение - список рецептов в этой категории.
@@ -51,13 +63,14 @@ async def get_recipes_grouped_by_category(
     """
     try:
         # Получаем доступные рецепты пользователя с пагинацией
-        recipes, total_count = await RecipeDAO.find_user_available_recipes(
+        recipes, total_count, next_cursor = await RecipeDAO.find_user_available_recipes(
             user_id=user_data.id,
             actual=actual,
             category=category,
             name=name,
             page=page,
-            size=size
+            size=size,
+            cursor=cursor
         )
         
         # Получаем список ID избранных рецептов для текущего пользователя
@@ -73,31 +86,33 @@ async def get_recipes_grouped_by_category(
             recipe_category = recipe.category if recipe.category else "Без категории"
             grouped_recipes[recipe_category].append(recipe_dict)
         
-        # Сортируем рецепты внутри каждой категории: сначала избранные, затем по дате создания (новые первыми)
-        for category in grouped_recipes:
-            grouped_recipes[category].sort(
-                key=lambda x: (
-                    not x.get('is_favorite', False),  # Сначала избранные (True), затем не избранные (False)
-                    x.get('created_at', '') or ''  # Затем по дате создания (пустая строка будет в конце)
-                ),
-                reverse=False  # False означает: сначала True (избранные), затем False (не избранные)
-            )
-            # Дополнительно сортируем по дате создания в обратном порядке (новые первыми) внутри каждой группы
-            # Разделяем на избранные и не избранные
-            favorites = [r for r in grouped_recipes[category] if r.get('is_favorite', False)]
-            non_favorites = [r for r in grouped_recipes[category] if not r.get('is_favorite', False)]
+        # Сортируем рецепты внутри каждой категории: сначала избранные, затем по дате создания (новые первыми).
+        # При поиске по name сохраняется порядок DAO (избранные, затем по релевантности)
+        if not search_words(name or ""):
+            for category in grouped_recipes:
+                grouped_recipes[category].sort(
+                    key=lambda x: (
+                        not x.get('is_favorite', False),  # Сначала избранные (True), затем не избранные (False)
+                        x.get('created_at', '') or ''  # Затем по дате создания (пустая строка будет в конце)
+                    ),
+                    reverse=False  # False означает: сначала True (избранные), затем False (не избранные)
+                )
+                # Дополнительно сортируем по дате создания в обратном порядке (новые первыми) внутри каждой группы
+                # Разделяем на избранные и не избранные
+                favorites = [r for r in grouped_recipes[category] if r.get('is_favorite', False)]
+                non_favorites = [r for r in grouped_recipes[category] if not r.get('is_favorite', False)]
             
-            # Сортируем каждую группу по дате создания (новые первыми)
-            favorites.sort(key=lambda x: x.get('created_at', '') or '', reverse=True)
-            non_favorites.sort(key=lambda x: x.get('created_at', '') or '', reverse=True)
+                # Сортируем каждую группу по дате создания (новые первыми)
+                favorites.sort(key=lambda x: x.get('created_at', '') or '', reverse=True)
+                non_favorites.sort(key=lambda x: x.get('created_at', '') or '', reverse=True)
             
-            # Объединяем: сначала избранные, затем не избранные
-            grouped_recipes[category] = favorites + non_favorites
+                # Объединяем: сначала избранные, затем не избранные
+                grouped_recipes[category] = favorites + non_favorites
         
         # Вычисляем информацию о пагинации
         total_pages = (total_count + size - 1) // size if total_count > 0 else 0
-        has_next = page < total_pages
-        has_prev = page > 1
+        has_next = next_cursor is not None
+        has_prev = bool(cursor) or page > 1
         
         # Возвращаем результат с пагинацией
         return {
@@ -108,10 +123,13 @@ async def get_recipes_grouped_by_category(
                 "total_count": total_count,
                 "total_pages": total_pages,
                 "has_next": has_next,
-                "has_prev": has_prev
+                "has_prev": has_prev,
+                "next_cursor": next_cursor
             }
         }
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Ошибка при получении рецептов по категориям: {e}")
         raise HTTPException(
@@ -252,6 +270,7 @@ async def add_recipe(
         
         # Создаем рецепт
         recipe_uuid = await RecipeDAO.add(**values)
+        invalidate_recipe_index()
         recipe_obj = await RecipeDAO.find_full_data(recipe_uuid)
         
         return recipe_obj.to_dict()
@@ -317,6 +336,7 @@ async def update_recipe(
         
         # Обновляем рецепт
         check = await RecipeDAO.update(recipe_uuid, **update_data)
+        invalidate_recipe_index()
         if check:
             updated_recipe = await RecipeDAO.find_full_data(recipe_uuid)
             return updated_recipe.to_dict()
@@ -366,6 +386,7 @@ async def deactivate_recipe(
         
         # Деактуализируем рецепт
         await RecipeDAO.update(recipe_uuid, actual=False)
+        invalidate_recipe_index()
         
         return {"message": "Рецепт деактуализирован", "uuid": str(recipe_uuid)}
         
@@ -412,6 +433,7 @@ async def activate_recipe(
         
         # Актуализируем рецепт
         await RecipeDAO.update(recipe_uuid, actual=True)
+        invalidate_recipe_index()
         
         return {"message": "Рецепт актуализирован", "uuid": str(recipe_uuid)}
         
@@ -458,6 +480,7 @@ async def delete_recipe_by_uuid(
         
         # Удаляем рецепт
         check = await RecipeDAO.delete_by_id(recipe_uuid)
+        invalidate_recipe_index()
         if check:
             return {"message": f"Рецепт с UUID {recipe_uuid} удален!"}
         else:
@@ -0,0 +1,172 @@
+"""
+Логирование HTTP-запросов на уровне ASGI.
+
+Раньше каждый запрос (кроме файловых) целиком вычитывался в память ради превью тела,
+Request пересоздавался, а в лог уходили все заголовки многострочным сообщением — через
+медленный путь BaseHTTPMiddleware. Теперь middleware только оборачивает receive/send:
+
+* тело не буферизуется — из потока receive копируются первые REQUEST_LOG_BODY_BYTES байт
+  того, что прочитал сам обработчик, остальные сообщения проходят как есть;
+* тело пишется только для текстовых запросов (JSON, формы, text/*), multipart-загрузки
+  и скачивания файлов не трогаются;
+* логируется выборка запросов: доля задается по префиксу пути в REQUEST_LOG_SAMPLE_RATES
+  (первый совпавший префикс), для остальных — REQUEST_LOG_DEFAULT_SAMPLE_RATE. Ошибки 5xx
+  и медленные запросы (дольше SLOW_REQUEST_MS) логируются всегда;
+* на запрос пишется одна строка: метод, путь, статус, длительность, клиент и превью тела
+  (те же значения — полями JSON-события).
+
+Запросу назначается идентификатор корреляции: X-Request-ID клиента (если он похож на
+идентификатор) или новый uuid4. Он ставится в request_id_var на время обработки запроса,
+попадает во все события лога и возвращается в заголовке ответа X-Request-ID.
+
+Ответ 403 по-прежнему удаляет cookie users_access_token.
+"""
+import random
+import re
+import time
+from typing import Optional
+from uuid import uuid4
+
+from starlette.responses import Response
+
+from app.logger import logger, request_id_var
+
+REQUEST_LOG_BODY_BYTES = 1000
+REQUEST_LOG_DEFAULT_SAMPLE_RATE = 1.0
+REQUEST_LOG_SAMPLE_RATES = (
+    # Картинки и видео списков: десятки запросов на экран
+    ("/files/file/", 0.05),
+    ("/logs/download", 1.0),
+)
+SLOW_REQUEST_MS = 1000
+
+_TEXT_CONTENT_TYPES = (b"application/json", b"application/x-www-form-urlencoded", b"text/")
+_REQUEST_ID_PATTERN = re.compile(rb"[A-Za-z0-9._-]{8,64}")
+
+
+def _delete_cookie_header(key: str) -> tuple:
+    """Заголовок Set-Cookie, который ставит Response.delete_cookie."""
+    response = Response()
+    response.delete_cookie(key)
+    return next((name, value) for name, value in response.raw_headers if name == b"set-cookie")
+
+
+_DELETE_ACCESS_TOKEN_COOKIE = _delete_cookie_header("users_access_token")
+
+
+def sample_rate(path: str) -> float:
+    for prefix, rate in REQUEST_LOG_SAMPLE_RATES:
+        if path.startswith(prefix):
+            return rate
+    return REQUEST_LOG_DEFAULT_SAMPLE_RATE
+
+
+def _content_type(scope) -> bytes:
+    for name, value in scope.get("headers", ()):
+        if name == b"content-type":
+            return value.lower()
+    return b""
+
+
+def _is_text_body(scope) -> bool:
+    return _content_type(scope).startswith(_TEXT_CONTENT_TYPES)
+
+
+def request_id_from_scope(scope) -> str:
+    """X-Request-ID клиента или прокси, если он похож на идентификатор, иначе новый."""
+    for name, value in scope.get("headers", ()):
+        if name == b"x-request-id" and _REQUEST_ID_PATTERN.fullmatch(value):
+            return value.decode("ascii")
+    return uuid4().hex
+
+
+class BodyPreview:
+    """Первые limit байт тела запроса без буферизации остального."""
+
+    __slots__ = ("limit", "data", "total")
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.data = bytearray()
+        self.total = 0
+
+    def feed(self, chunk: bytes) -> None:
+        if len(self.data) < self.limit:
+            self.data.extend(chunk[: self.limit - len(self.data)])
+        self.total += len(chunk)
+
+    def __str__(self) -> str:
+        text = self.data.decode(errors="replace")
+        if self.total > self.limit:
+            text += "... [truncated]"
+        return text
+
+
+class RequestLoggingMiddleware:
+    """Строка лога на запрос с задержкой и статусом; удаление cookie токена на 403."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_id = request_id_from_scope(scope)
+        request_id_token = request_id_var.set(request_id)
+        path = scope["path"]
+        sampled = random.random() < sample_rate(path)
+        preview: Optional[BodyPreview] = None
+        status_code = 500
+
+        if sampled and _is_text_body(scope):
+            preview = BodyPreview(REQUEST_LOG_BODY_BYTES)
+
+            async def receive_with_preview():
+                message = await receive()
+                if message["type"] == "http.request":
+                    preview.feed(message.get("body", b""))
+                return message
+        else:
+            receive_with_preview = receive
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = [*message.get("headers", ()), (b"x-request-id", request_id.encode("ascii"))]
+                if status_code == 403:
+                    headers.append(_DELETE_ACCESS_TOKEN_COOKIE)
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive_with_preview, send_with_status)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if sampled or status_code >= 500 or duration_ms >= SLOW_REQUEST_MS:
+                _log_request(scope, status_code, duration_ms, preview)
+            request_id_var.reset(request_id_token)
+
+
+def _log_request(scope, status_code: int, duration_ms: float, preview: Optional[BodyPreview]) -> None:
+    target = scope["path"]
+    if scope.get("query_string"):
+        target += "?" + scope["query_string"].decode("latin-1")
+    client = scope.get("client")
+    client_host = client[0] if client else "-"
+    line = f"{scope['method']} {target} {status_code} {duration_ms:.1f}ms client={client_host}"
+    if preview is not None and preview.total:
+        line += f" body={preview}"
+    request_logger = logger.bind(
+        method=scope["method"], path=scope["path"], status=status_code,
+        duration_ms=round(duration_ms, 1), client=client_host,
+    )
+    if status_code >= 500:
+        request_logger.error(line)
+    elif duration_ms >= SLOW_REQUEST_MS:
+        request_logger.warning(line)
+    else:
+        request_logger.info(line)
@@ -0,0 +1,67 @@
+"""
+Полнотекстовый поиск по названиям (meals.name, recipes.name).
+
+В таблицах есть генерируемая колонка search_vector: to_tsvector по конфигурациям russian
+(стемминг: «куриный» находит «курица») и simple (слова как есть — бренды, латиница, цифры)
+с GIN-индексом. Для опечаток есть запасной вариант на pg_trgm: name %> запрос
+(word_similarity выше порога pg_trgm.word_similarity_threshold) по GIN-индексу gin_trgm_ops.
+
+Результаты ранжируются: ts_rank_cd + word_similarity. Для постраничной выдачи используется
+keyset-курсор (значение ключа сортировки + id последней записи), поэтому глубина страницы
+не влияет на стоимость запроса.
+"""
+import base64
+import json
+import re
+from typing import Any, List, Tuple
+
+from sqlalchemy import func, literal
+
+SEARCH_CONFIGS = ("russian", "simple")
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_vector_expression(column: str) -> str:
+    """SQL-выражение генерируемой колонки search_vector для текстовой колонки column."""
+    return " || ".join(f"to_tsvector('{config}'::regconfig, coalesce({column}, ''))" for config in SEARCH_CONFIGS)
+
+
+def search_words(query: str) -> List[str]:
+    """Слова поискового запроса в нижнем регистре (спецсимволы tsquery отбрасываются)."""
+    return _WORD_RE.findall((query or "").lower())
+
+
+def name_search(vector_column, name_column, query: str) -> Tuple[Any, Any]:
+    """
+    Условие поиска и выражение ранга.
+
+    Совпадение — все слова запроса как префиксы (в любой из конфигураций) или похожесть
+    по триграммам для запросов с опечатками.
+    """
+    words = search_words(query)
+    if not words:
+        raise ValueError("Пустой поисковый запрос")
+    prefix_query = " & ".join(f"{word}:*" for word in words)
+    ts_query = func.to_tsquery(SEARCH_CONFIGS[0], prefix_query).op("||")(
+        func.to_tsquery(SEARCH_CONFIGS[1], prefix_query)
+    )
+    phrase = literal(" ".join(words))
+    condition = vector_column.op("@@")(ts_query) | name_column.op("%>")(phrase)
+    rank = func.ts_rank_cd(vector_column, ts_query) + func.word_similarity(phrase, func.coalesce(name_column, ""))
+    return condition, rank
+
+
+def encode_cursor(sort_value: Any, last_id: int) -> str:
+    payload = json.dumps([sort_value, last_id], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """(значение ключа сортировки, id) из курсора; ValueError для повреждённого курсора."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return sort_value, int(last_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Некорректный курсор пагинации") from e
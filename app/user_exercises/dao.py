@@ -4,6 +4,7 @@ from app.programs.dao import ProgramDAO
 from app.trainings.dao import TrainingDAO
 from app.users.dao import UsersDAO
 from app.exercises.dao import ExerciseDAO
+from app.exercise_reference.dao import ExerciseReferenceDAO
 from app.database import async_session_maker
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
@@ -26,6 +27,36 @@ class UserExerciseDAO(BaseDAO):
         'exercise_id': (ExerciseDAO, 'exercise_uuid')
     }
 
+    @classmethod
+    async def _invalidate_statistics(cls, user_exercise_uuids) -> None:
+        """Сбрасывает кэш статистики упражнений пользователей, которым принадлежат записи"""
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(cls.model.user_id).where(cls.model.uuid.in_(list(user_exercise_uuids))).distinct()
+            )
+            for user_id in result.scalars().all():
+                if user_id is not None:
+                    ExerciseReferenceDAO.invalidate_exercise_statistics(user_id)
+
+    @classmethod
+    async def add(cls, **values):
+        user_exercise_uuid = await super().add(**values)
+        await cls._invalidate_statistics([user_exercise_uuid])
+        return user_exercise_uuid
+
+    @classmethod
+    async def update(cls, object_uuid: UUID, **values):
+        if 'user_id' in values or 'user_uuid' in values:
+            await cls._invalidate_statistics([object_uuid])
+        result = await super().update(object_uuid, **values)
+        await cls._invalidate_statistics([object_uuid])
+        return result
+
+    @classmethod
+    async def delete_by_id(cls, object_uuid: UUID):
+        await cls._invalidate_statistics([object_uuid])
+        return await super().delete_by_id(object_uuid)
+
     @classmethod
     async def find_all_with_relations(cls, **filter_by):
         """Оптимизированный метод для загрузки user_exercises с предзагруженными связанными данными"""
@@ -180,6 +211,9 @@ class UserExerciseDAO(BaseDAO):
                 errors.append(f"Ошибка batch обновления: {str(e)}")
                 success_uuids = []
         
+        if success_uuids:
+            await cls._invalidate_statistics(success_uuids)
+        
         return {
             'success_count': len(success_uuids),
             'failed_count': len(failed_uuids),
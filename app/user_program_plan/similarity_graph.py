@@ -0,0 +1,246 @@
+"""
+Граф похожести упражнений пула (exercise_builder_pool) для быстрого подбора замен.
+
+Для каждой записи пула заранее считаются top-K «соседей» отдельно по каждому уровню сложности
+соседа: общий variation_group_code, основная/вспомогательные группы мышц, роль, пересечение
+оборудования и расстояние по сложности. Подбор замены смотрит только соседей (O(K)),
+а не перефильтровывает весь пул.
+
+Граф живёт в памяти воркера: строится при старте приложения, после CSV-импорта и
+изменений пула. Другие процессы (скрипт импорта, соседние воркеры) замечают изменения по
+сигнатуре таблиц (count + max(updated_at)), которая проверяется не чаще SIGNATURE_CHECK_INTERVAL_SECONDS.
+"""
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+
+from app.database import async_session_maker
+from app.exercise_builder_equipment.models import ExerciseBuilderEquipment
+from app.exercise_builder_pool.models import ExerciseBuilderPool
+from app.logger import logger
+from app.user_program_plan.training_builder import (
+    _DIFF_LEVEL_ORDER,
+    _load_pool_equipment_map,
+    _normalize_difficulty,
+    _normalize_equipment_code,
+)
+
+# Сколько соседей храним на каждый уровень сложности соседа
+SIMILARITY_TOP_K = 48
+SIGNATURE_CHECK_INTERVAL_SECONDS = 60
+
+
+def _split_muscles(raw: Optional[str]) -> Set[str]:
+    if not raw:
+        return set()
+    parts = str(raw).replace(";", ",").replace("|", ",").split(",")
+    return {p.strip().lower() for p in parts if p.strip()}
+
+
+class SimilarityGraph:
+    """Соседи записей пула: pool_id -> {уровень сложности соседа -> [pool_id по убыванию похожести]}."""
+
+    def __init__(
+        self,
+        neighbours: Dict[int, Dict[str, List[int]]],
+        pool_ids_by_reference: Dict[int, List[int]],
+        signature: Tuple,
+    ):
+        self.neighbours = neighbours
+        self.pool_ids_by_reference = pool_ids_by_reference
+        self.signature = signature
+        self.built_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.neighbours)
+
+    def pool_id_for_reference(self, exercise_reference_id: Optional[int]) -> Optional[int]:
+        if not exercise_reference_id:
+            return None
+        ids = self.pool_ids_by_reference.get(exercise_reference_id)
+        return ids[0] if ids else None
+
+    def similar(self, pool_id: int, difficulty_levels: Optional[Iterable[str]] = None) -> List[int]:
+        """Соседи pool_id (по убыванию похожести), опционально только указанных уровней сложности."""
+        by_level = self.neighbours.get(pool_id) or {}
+        if difficulty_levels is None:
+            levels = list(by_level.keys())
+        else:
+            levels = [_normalize_difficulty(d) for d in difficulty_levels]
+        out: List[int] = []
+        seen = set()
+        for level in levels:
+            for nid in by_level.get(level, ()):
+                if nid not in seen:
+                    seen.add(nid)
+                    out.append(nid)
+        return out
+
+
+def similarity_score(a: Any, b: Any, equipment_map: Dict[int, List[str]]) -> float:
+    """
+    Похожесть двух записей пула (больше — ближе):
+    + общий variation_group_code, + совпадение основной группы мышц, + пересечение вспомогательных,
+    + та же preferred_role, + доля общего оборудования, + одинаковые uses_external_load / is_time_based,
+    - расстояние по сложности.
+    """
+    score = 0.0
+    vg_a = (getattr(a, "variation_group_code", None) or "").strip()
+    vg_b = (getattr(b, "variation_group_code", None) or "").strip()
+    if vg_a and vg_a == vg_b:
+        score += 30
+
+    pm_a = (getattr(a, "primary_muscle_group", None) or "").strip().lower()
+    pm_b = (getattr(b, "primary_muscle_group", None) or "").strip().lower()
+    if pm_a and pm_a == pm_b:
+        score += 20
+    muscles_a = _split_muscles(getattr(a, "auxiliary_muscle_groups", None)) | ({pm_a} if pm_a else set())
+    muscles_b = _split_muscles(getattr(b, "auxiliary_muscle_groups", None)) | ({pm_b} if pm_b else set())
+    score += min(len(muscles_a & muscles_b), 3) * 3
+
+    pr_a = (getattr(a, "preferred_role", None) or "").strip().lower()
+    pr_b = (getattr(b, "preferred_role", None) or "").strip().lower()
+    if pr_a and pr_a == pr_b:
+        score += 10
+
+    eq_a = {_normalize_equipment_code(c) for c in equipment_map.get(a.id, [])} or {"none"}
+    eq_b = {_normalize_equipment_code(c) for c in equipment_map.get(b.id, [])} or {"none"}
+    score += 10 * len(eq_a & eq_b) / len(eq_a | eq_b)
+
+    if getattr(a, "uses_external_load", None) == getattr(b, "uses_external_load", None):
+        score += 3
+    if bool(getattr(a, "is_time_based", None)) == bool(getattr(b, "is_time_based", None)):
+        score += 2
+
+    d_a = _DIFF_LEVEL_ORDER.get(_normalize_difficulty(getattr(a, "difficulty_level", "") or ""))
+    d_b = _DIFF_LEVEL_ORDER.get(_normalize_difficulty(getattr(b, "difficulty_level", "") or ""))
+    if d_a is not None and d_b is not None:
+        score -= abs(d_a - d_b) * 10
+    return score
+
+
+def build_similarity_graph(
+    pool_items: List[Any],
+    equipment_map: Dict[int, List[str]],
+    *,
+    top_k: int = SIMILARITY_TOP_K,
+    signature: Tuple = (),
+) -> SimilarityGraph:
+    """
+    Строит граф по списку записей пула. Пары сравниваются только внутри общих корзин
+    (variation_group_code / основная группа мышц), поэтому на типичном пуле это далеко не O(n²).
+    """
+    buckets: Dict[Tuple[str, str], List[Any]] = defaultdict(list)
+    for p in pool_items:
+        vg = (getattr(p, "variation_group_code", None) or "").strip()
+        pm = (getattr(p, "primary_muscle_group", None) or "").strip().lower()
+        if vg:
+            buckets[("vg", vg)].append(p)
+        if pm:
+            buckets[("pm", pm)].append(p)
+
+    candidates: Dict[int, Dict[int, Any]] = defaultdict(dict)
+    for members in buckets.values():
+        for p in members:
+            peers = candidates[p.id]
+            for q in members:
+                if q.id != p.id:
+                    peers[q.id] = q
+
+    by_id = {p.id: p for p in pool_items}
+    neighbours: Dict[int, Dict[str, List[int]]] = {}
+    for pid, peers in candidates.items():
+        p = by_id[pid]
+        scored_by_level: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+        for qid, q in peers.items():
+            level = _normalize_difficulty(getattr(q, "difficulty_level", "") or "")
+            scored_by_level[level].append((similarity_score(p, q, equipment_map), qid))
+        neighbours[pid] = {
+            level: [qid for _, qid in sorted(scored, key=lambda x: (-x[0], x[1]))[:top_k]]
+            for level, scored in scored_by_level.items()
+        }
+
+    pool_ids_by_reference: Dict[int, List[int]] = defaultdict(list)
+    for p in pool_items:
+        ref_id = getattr(p, "exercise_id", None)
+        if ref_id:
+            pool_ids_by_reference[ref_id].append(p.id)
+
+    return SimilarityGraph(neighbours, dict(pool_ids_by_reference), signature)
+
+
+_graph: Optional[SimilarityGraph] = None
+_graph_stale = True
+# Счётчик инвалидаций: инвалидация во время построения не теряется
+_invalidations = 0
+_last_signature_check = 0.0
+_rebuild_lock = asyncio.Lock()
+
+
+async def _load_pool_signature() -> Tuple:
+    """Дешёвая сигнатура содержимого пула и оборудования для обнаружения изменений из других процессов."""
+    async with async_session_maker() as session:
+        pool_row = (
+            await session.execute(
+                select(func.count(ExerciseBuilderPool.id), func.max(ExerciseBuilderPool.updated_at))
+            )
+        ).one()
+        eq_row = (
+            await session.execute(
+                select(func.count(ExerciseBuilderEquipment.id), func.max(ExerciseBuilderEquipment.updated_at))
+            )
+        ).one()
+    return tuple(pool_row) + tuple(eq_row)
+
+
+def invalidate_similarity_graph() -> None:
+    """Помечает граф устаревшим; следующий запрос перестроит его."""
+    global _graph_stale, _invalidations
+    _graph_stale = True
+    _invalidations += 1
+
+
+async def rebuild_similarity_graph() -> SimilarityGraph:
+    """
+    Перестраивает граф по актуальным записям пула (actual=True, is_active=True).
+
+    Сам расчёт (попарное сравнение внутри корзин) идёт в отдельном потоке, чтобы не блокировать
+    event loop. Вызовы, дождавшиеся блокировки, пока граф строился, получают уже готовый граф.
+    """
+    global _graph, _graph_stale, _last_signature_check
+    from app.exercise_builder_pool.dao import ExerciseBuilderPoolDAO
+
+    async with _rebuild_lock:
+        signature = await _load_pool_signature()
+        if _graph is not None and not _graph_stale and _graph.signature == signature:
+            _last_signature_check = time.monotonic()
+            return _graph
+        invalidations = _invalidations
+        pool_items = await ExerciseBuilderPoolDAO.find_all(actual=True, is_active=True)
+        equipment_map = await _load_pool_equipment_map()
+        started = time.perf_counter()
+        graph = await asyncio.to_thread(build_similarity_graph, pool_items, equipment_map, signature=signature)
+        _graph = graph
+        _graph_stale = _invalidations != invalidations
+        _last_signature_check = time.monotonic()
+        logger.info(
+            "Граф похожести упражнений построен: {} записей пула за {:.0f} мс",
+            len(graph), (time.perf_counter() - started) * 1000,
+        )
+        return graph
+
+
+async def get_similarity_graph() -> SimilarityGraph:
+    """Текущий граф; перестраивается при инвалидации или смене сигнатуры пула."""
+    global _last_signature_check
+    if _graph is None or _graph_stale:
+        return await rebuild_similarity_graph()
+    now = time.monotonic()
+    if now - _last_signature_check >= SIGNATURE_CHECK_INTERVAL_SECONDS:
+        _last_signature_check = now
+        if await _load_pool_signature() != _graph.signature:
+            return await rebuild_similarity_graph()
+    return _graph
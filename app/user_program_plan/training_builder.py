@@ -529,10 +529,12 @@ async def suggest_pool_replacements_for_slot(
     anchor_diff_for_order: Optional[str],
     top_n: int = 24,
     ctx: Optional[Dict[str, Any]] = None,
+    candidate_pool_ids: Optional[Set[int]] = None,
 ) -> List[Any]:
     """
     Кандидаты из пула для замены одного слота с учётом action (simplify/replace/complicate).
     Исключаются записи с exercise_id из exclude_exercise_reference_ids (уже в тренировке).
+    candidate_pool_ids — если задан, рассматриваются только эти записи пула (соседи из графа похожести).
     """
     if ctx is None:
         ctx = await build_training_builder_context(plan, training_type, user_id, plan_id)
@@ -552,6 +554,8 @@ async def suggest_pool_replacements_for_slot(
         return []
 
     sel_var = variation_codes_for_reference_ids(base_pool_items, exclude_exercise_reference_ids)
+    if candidate_pool_ids is not None:
+        base_pool_items = [p for p in base_pool_items if p.id in candidate_pool_ids]
 
     scored: List[Tuple] = []
     seen_pool_ids = set()
@@ -616,8 +620,12 @@ async def suggest_anchor_replacements(
     action: str,
     top_n: int = 24,
     ctx: Optional[Dict[str, Any]] = None,
+    candidate_pool_ids: Optional[Set[int]] = None,
 ) -> List[Any]:
-    """Замена якоря: та же сортировка якорей, другой порядок сложности по action."""
+    """
+    Замена якоря: та же сортировка якорей, другой порядок сложности по action.
+    candidate_pool_ids — как в suggest_pool_replacements_for_slot.
+    """
     if ctx is None:
         ctx = await build_training_builder_context(plan, training_type, user_id, plan_id)
     gym_mode = ctx["gym_mode"]
@@ -636,7 +644,12 @@ async def suggest_anchor_replacements(
     out: List[Any] = []
     seen = set()
     for diff in diff_steps:
-        candidates = [p for p in base_pool_items if getattr(p, "is_anchor_candidate", False)]
+        candidates = [
+            p
+            for p in base_pool_items
+            if getattr(p, "is_anchor_candidate", False)
+            and (candidate_pool_ids is None or p.id in candidate_pool_ids)
+        ]
         candidates.sort(
             key=lambda p: (
                 tier_order.get((getattr(p, tier_attr) or "").strip().lower(), 99),
@@ -5,6 +5,7 @@ import asyncio
 import threading
 
 from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, status
+from sqlalchemy import select
 from app.user_training.dao import UserTrainingDAO
 from app.user_training.rb import RBUserTraining
 from app.user_training.schemas import (
@@ -25,11 +26,63 @@ from app.users.dao import UsersDAO
 from app.user_exercises.dao import UserExerciseDAO
 from app.user_exercises.models import ExerciseStatus
 from app.services.schedule_generator import ScheduleGenerator
+from app.user_training.models import UserTraining
+from app.user_program.models import UserProgram
+from app.programs.models import Program
+from app.trainings.models import Training
+from app.users.models import User
+from app.conditional_get import conditional_get, table_version
 from app.logger import logger
 
 router = APIRouter(prefix='/user_trainings', tags=['Работа с пользовательскими тренировками'])
 
 
+def _filtered_user_id(request):
+    """id пользователя из фильтра user_uuid (подзапрос) или None, если фильтра нет"""
+    try:
+        user_uuid = UUID(request.query_params.get('user_uuid', ''))
+    except ValueError:
+        return None
+    return select(User.id).where(User.uuid == user_uuid).scalar_subquery()
+
+
+def _owned_by_filtered_user(model):
+    """Условия версии: строки пользователя из фильтра user_uuid, без фильтра — вся таблица"""
+    def where(request, user):
+        user_id = _filtered_user_id(request)
+        return [] if user_id is None else [model.user_id == user_id]
+    return where
+
+
+def _referenced_by_filtered_user(model, reference):
+    """
+    Условия версии: строки model, на которые ссылаются тренировки пользователя из фильтра
+    user_uuid (reference — колонка UserTraining), без фильтра — вся таблица
+    """
+    def where(request, user):
+        user_id = _filtered_user_id(request)
+        if user_id is None:
+            return []
+        return [model.id.in_(select(reference).where(UserTraining.user_id == user_id))]
+    return where
+
+
+def _filtered_user(request, user):
+    user_id = _filtered_user_id(request)
+    return [] if user_id is None else [User.id == user_id]
+
+
+# Условный GET списка: тренировки и программы пользователя из фильтра плюс встроенные в ответ
+# данные тренировок, шаблонов программ и пользователя
+user_trainings_not_modified = conditional_get(
+    table_version(UserTraining, where=_owned_by_filtered_user(UserTraining)),
+    table_version(UserProgram, where=_owned_by_filtered_user(UserProgram)),
+    table_version(Training, where=_referenced_by_filtered_user(Training, UserTraining.training_id)),
+    table_version(Program, where=_referenced_by_filtered_user(Program, UserTraining.program_id)),
+    table_version(User, where=_filtered_user)
+)
+
+
 async def activate_next_training(user_training):
     """Активирует следующую тренировку по дате для той же программы"""
     try:
@@ -201,7 +254,7 @@ async def create_next_stage_if_needed(user_training):
         return False, None
 
 
-@router.get("/", summary="Получить все пользовательские тренировки")
+@router.get("/", summary="Получить все пользовательские тренировки", dependencies=[Depends(user_trainings_not_modified)])
 async def get_all_user_trainings(
     request_body: RBUserTraining = Depends(), 
     user_data = Depends(get_current_user_user),
@@ -500,21 +553,21 @@ async def pass_user_training(
     from app.logger import logger
     
     actor = getattr(access_data, "id", f"anonymous_session={access_data.get('anonymous_session_id')}" if isinstance(access_data, dict) else "unknown")
-    logger.info(f"Попытка завершить тренировку {user_training_uuid} для пользователя {actor}")
+    logger.debug("Попытка завершить тренировку {} для пользователя {}", user_training_uuid, actor)
     
     # Получаем user_training
     user_training = await UserTrainingDAO.find_full_data(user_training_uuid)
     if not user_training:
-        logger.warning(f"Тренировка {user_training_uuid} не найдена")
+        logger.warning("Тренировка {} не найдена", user_training_uuid)
         raise HTTPException(status_code=404, detail="Пользовательская тренировка не найдена")
     
-    logger.info(f"Тренировка {user_training_uuid} найдена, текущий статус: {user_training.status}, тип статуса: {type(user_training.status)}")
+    logger.debug("Тренировка {} найдена, текущий статус: {}, тип статуса: {}", user_training_uuid, user_training.status, type(user_training.status))
     
     # Проверяем, что тренировка в активном статусе
     # Обрабатываем как Enum, так и строку
     current_status = user_training.status.value if hasattr(user_training.status, 'value') else str(user_training.status)
     if current_status != 'ACTIVE':
-        logger.warning(f"Тренировка {user_training_uuid} уже имеет статус {current_status}, нельзя завершить")
+        logger.warning("Тренировка {} уже имеет статус {}, нельзя завершить", user_training_uuid, current_status)
         raise HTTPException(status_code=400, detail=f"Тренировка уже имеет статус {current_status}")
     
     # Обновляем статус на PASSED и заполняем completed_at
@@ -533,9 +586,9 @@ async def pass_user_training(
         # Поэтому можно напрямую вычитать
         duration_seconds = (current_time - training_created_at).total_seconds()
         duration_minutes = max(1, int(duration_seconds / 60))  # Минимум 1 минута, округление вниз
-        logger.info(f"Рассчитана длительность тренировки {user_training_uuid}: {duration_minutes} минут (program_id отсутствует, created_at: {training_created_at}, completed_at: {current_time}, разница: {duration_seconds} сек)")
+        logger.debug("Рассчитана длительность тренировки {}: {} минут (program_id отсутствует, created_at: {}, completed_at: {}, разница: {} сек)", user_training_uuid, duration_minutes, training_created_at, current_time, duration_seconds)
     else:
-        logger.info(f"Расчет длительности не требуется для тренировки {user_training_uuid} (program_id={user_training.program_id})")
+        logger.debug("Расчет длительности не требуется для тренировки {} (program_id={})", user_training_uuid, user_training.program_id)
     
     update_data = {
         'status': 'PASSED',
@@ -546,45 +599,45 @@ async def pass_user_training(
     if duration_minutes is not None:
         update_data['duration'] = duration_minutes
     
-    logger.info(f"Обновляю статус тренировки {user_training_uuid} на PASSED")
+    logger.debug("Обновляю статус тренировки {} на PASSED", user_training_uuid)
     check = await UserTrainingDAO.update(user_training_uuid, **update_data)
     if not check:
-        logger.error(f"Ошибка при обновлении статуса тренировки {user_training_uuid}")
+        logger.error("Ошибка при обновлении статуса тренировки {}", user_training_uuid)
         raise HTTPException(status_code=500, detail="Ошибка при обновлении статуса тренировки")
     
-    logger.info(f"Статус тренировки {user_training_uuid} успешно обновлен на PASSED")
+    logger.info("Статус тренировки {} успешно обновлен на PASSED", user_training_uuid)
 
     # План программы: если тренировка привязана к плану — пересчёт недели / следующей даты
     try:
         from app.user_program_plan.on_training_passed import update_plan_on_training_passed
 
         plan_result = await update_plan_on_training_passed(user_training_uuid)
-        logger.info(f"user_program_plan после PASSED: {plan_result}")
+        logger.debug("user_program_plan после PASSED: {}", plan_result)
     except Exception as e:
-        logger.error(f"Ошибка обновления плана после PASSED: {e}", exc_info=True)
+        logger.opt(exception=True).error("Ошибка обновления плана после PASSED: {}", e)
 
     # Обновляем статус всех связанных user_exercise на PASSED
     if user_training.training_id is not None:
-        logger.info(f"Ищу связанные user_exercise с training_id={user_training.training_id} и status=ACTIVE")
+        logger.debug("Ищу связанные user_exercise с training_id={} и status=ACTIVE", user_training.training_id)
         active_exercises = await UserExerciseDAO.find_all(
             training_id=user_training.training_id,
             status=ExerciseStatus.ACTIVE
         )
         
         if active_exercises:
-            logger.info(f"Найдено {len(active_exercises)} активных подходов для обновления статуса")
+            logger.debug("Найдено {} активных подходов для обновления статуса", len(active_exercises))
             updated_count = 0
             for exercise in active_exercises:
                 update_result = await UserExerciseDAO.update(exercise.uuid, status=ExerciseStatus.PASSED)
                 if update_result:
                     updated_count += 1
                 else:
-                    logger.warning(f"Не удалось обновить статус user_exercise {exercise.uuid}")
-            logger.info(f"Успешно обновлено {updated_count} из {len(active_exercises)} подходов на статус PASSED")
+                    logger.warning("Не удалось обновить статус user_exercise {}", exercise.uuid)
+            logger.debug("Успешно обновлено {} из {} подходов на статус PASSED", updated_count, len(active_exercises))
         else:
-            logger.info(f"Не найдено активных подходов для training_id={user_training.training_id}")
+            logger.debug("Не найдено активных подходов для training_id={}", user_training.training_id)
     else:
-        logger.info(f"У тренировки {user_training_uuid} отсутствует training_id, пропускаю обновление user_exercise")
+        logger.debug("У тренировки {} отсутствует training_id, пропускаю обновление user_exercise", user_training_uuid)
 
     # Агрегаты user_exercise_stats (в фоне; план уже обновлён выше синхронно)
     async def update_stats_after_pass():
@@ -592,9 +645,9 @@ async def pass_user_training(
             from app.user_exercise_stats.service import upsert_on_training_passed
 
             result = await upsert_on_training_passed(user_training_uuid)
-            logger.info(f"[Background] user_exercise_stats upsert: {result}")
+            logger.debug("[Background] user_exercise_stats upsert: {}", result)
         except Exception as e:
-            logger.error(f"[Background] Ошибка upsert user_exercise_stats: {e}", exc_info=True)
+            logger.opt(exception=True).error("[Background] Ошибка upsert user_exercise_stats: {}", e)
 
     background_tasks.add_task(update_stats_after_pass)
     
@@ -616,34 +669,34 @@ async def pass_user_training(
                 )
                 
                 if result == True:
-                    logger.info(f"✅ Уведомление о тренировке успешно удалено для user_training {user_training_uuid}")
+                    logger.debug("✅ Уведомление о тренировке успешно удалено для user_training {}", user_training_uuid)
                 elif result == "INVALID_TOKEN":
-                    logger.warning(f"⚠️ FCM токен невалиден при удалении уведомления для пользователя {user.uuid}")
+                    logger.warning("⚠️ FCM токен невалиден при удалении уведомления для пользователя {}", user.uuid)
                 else:
-                    logger.error(f"❌ Не удалось удалить уведомление о тренировке для user_training {user_training_uuid}")
+                    logger.error("❌ Не удалось удалить уведомление о тренировке для user_training {}", user_training_uuid)
         except Exception as e:
-            logger.error(f"❌ Ошибка при удалении уведомления о тренировке: {e}", exc_info=True)
+            logger.opt(exception=True).error("❌ Ошибка при удалении уведомления о тренировке: {}", e)
             # Не прерываем выполнение, если уведомление не удалилось
     
     # Добавляем +1 к score пользователя
-    logger.info(f"Обновляю score пользователя {user_training.user_id}")
+    logger.debug("Обновляю score пользователя {}", user_training.user_id)
     user = await UsersDAO.find_one_or_none_by_id(user_training.user_id)
     if user:
         current_score = user.score if user.score else 0
         new_score = current_score + 1
-        logger.info(f"Текущий score: {current_score}, новый score: {new_score}")
+        logger.debug("Текущий score: {}, новый score: {}", current_score, new_score)
         await UsersDAO.update(user.uuid, score=new_score)
-        logger.info(f"Score пользователя {user.uuid} обновлен на {new_score}")
+        logger.debug("Score пользователя {} обновлен на {}", user.uuid, new_score)
     else:
-        logger.warning(f"Пользователь {user_training.user_id} не найден для обновления score")
+        logger.warning("Пользователь {} не найден для обновления score", user_training.user_id)
     
     # Получаем user_training заново с новым статусом
     user_training = await UserTrainingDAO.find_full_data(user_training_uuid)
     
     # Запускаем фоновую задачу для проверки достижений (только если не день отдыха)
-    logger.info(f"is_rest_day: {user_training.is_rest_day}")
+    logger.debug("is_rest_day: {}", user_training.is_rest_day)
     if not user_training.is_rest_day:
-        logger.info(f"Запускаю фоновую задачу проверки достижений для тренировки {user_training_uuid}")
+        logger.debug("Запускаю фоновую задачу проверки достижений для тренировки {}", user_training_uuid)
         
         async def check_achievements_task():
             from app.achievements.check_service import AchievementCheckService
@@ -651,80 +704,80 @@ async def pass_user_training(
             from sqlalchemy import select
             from app.user_training.models import UserTraining
             
-            logger.info(f"[Background] Создаю сессию для проверки достижений...")
+            logger.debug("[Background] Создаю сессию для проверки достижений...")
             session = None
             try:
                 async with async_session_maker() as session:
-                    logger.info(f"[Background] Сессия создана, начинаю проверку достижений для тренировки {user_training_uuid}")
-                    logger.info(f"[Background] Выполняю запрос для загрузки UserTraining...")
+                    logger.debug("[Background] Сессия создана, начинаю проверку достижений для тренировки {}", user_training_uuid)
+                    logger.debug("[Background] Выполняю запрос для загрузки UserTraining...")
                     # Загружаем тренировку напрямую через сессию, чтобы она была привязана к той же сессии
                     result = await session.execute(
                         select(UserTraining).where(UserTraining.uuid == user_training_uuid)
                     )
-                    logger.info(f"[Background] Запрос выполнен, получаю результат...")
+                    logger.debug("[Background] Запрос выполнен, получаю результат...")
                     updated_training = result.scalar_one_or_none()
-                    logger.info(f"[Background] Тренировка {'найдена' if updated_training else 'не найдена'}")
+                    logger.debug("[Background] Тренировка {}", 'найдена' if updated_training else 'не найдена')
                     
                     if updated_training:
-                        logger.info(f"[Background] Создаю AchievementCheckService...")
+                        logger.debug("[Background] Создаю AchievementCheckService...")
                         check_service = AchievementCheckService(session)
-                        logger.info(f"[Background] Вызываю check_achievements_for_training...")
+                        logger.debug("[Background] Вызываю check_achievements_for_training...")
                         achievements = None
                         try:
-                            logger.info(f"[Background] ════════════════════════════════════════════════════")
-                            logger.info(f"[Background] НАЧАЛО проверки достижений для тренировки {user_training_uuid}")
-                            logger.info(f"[Background] ════════════════════════════════════════════════════")
+                            logger.debug("[Background] ════════════════════════════════════════════════════")
+                            logger.debug("[Background] НАЧАЛО проверки достижений для тренировки {}", user_training_uuid)
+                            logger.debug("[Background] ════════════════════════════════════════════════════")
                             achievements = await check_service.check_achievements_for_training(updated_training)
-                            logger.info(f"[Background] ════════════════════════════════════════════════════")
-                            logger.info(f"[Background] ЗАВЕРШЕНИЕ проверки достижений, функция вернула результат")
-                            logger.info(f"[Background] ════════════════════════════════════════════════════")
+                            logger.debug("[Background] ════════════════════════════════════════════════════")
+                            logger.debug("[Background] ЗАВЕРШЕНИЕ проверки достижений, функция вернула результат")
+                            logger.debug("[Background] ════════════════════════════════════════════════════")
                         except Exception as check_error:
-                            logger.error(f"[Background] ❌ ИСКЛЮЧЕНИЕ в check_achievements_for_training: {type(check_error).__name__}: {check_error}", exc_info=True)
+                            logger.opt(exception=True).error("[Background] ❌ ИСКЛЮЧЕНИЕ в check_achievements_for_training: {}: {}", type(check_error).__name__, check_error)
                             raise
                         finally:
                             # ВСЕГДА отключаем все объекты от сессии сразу после вызова функции
                             # Это предотвратит проблемы при закрытии сессии
-                            logger.info(f"[Background] ════════════════════════════════════════════════════")
-                            logger.info(f"[Background] БЛОК FINALLY: Начинаю отключение объектов от сессии")
-                            logger.info(f"[Background] ════════════════════════════════════════════════════")
+                            logger.debug("[Background] ════════════════════════════════════════════════════")
+                            logger.debug("[Background] БЛОК FINALLY: Начинаю отключение объектов от сессии")
+                            logger.debug("[Background] ════════════════════════════════════════════════════")
                             try:
-                                logger.info(f"[Background] Вызываю session.expunge_all()...")
+                                logger.debug("[Background] Вызываю session.expunge_all()...")
                                 session.expunge_all()
-                                logger.info(f"[Background] ✅ session.expunge_all() выполнен успешно")
+                                logger.debug("[Background] ✅ session.expunge_all() выполнен успешно")
                             except Exception as expunge_error:
                                 error_type = type(expunge_error).__name__
                                 error_msg = str(expunge_error)
-                                logger.warning(f"[Background] ⚠️ Ошибка при expunge_all: {error_type}: {error_msg}")
+                                logger.warning("[Background] ⚠️ Ошибка при expunge_all: {}: {}", error_type, error_msg)
                                 logger.warning(f"[Background] Stack trace:", exc_info=True)
                         
                         # Логируем результат после expunge_all
-                        logger.info(f"[Background] ════════════════════════════════════════════════════")
-                        logger.info(f"[Background] РЕЗУЛЬТАТ проверки достижений:")
+                        logger.debug("[Background] ════════════════════════════════════════════════════")
+                        logger.debug("[Background] РЕЗУЛЬТАТ проверки достижений:")
                         if achievements is not None:
-                            logger.info(f"[Background]   - Получено достижений: {len(achievements)}")
-                            logger.info(f"[Background]   - Список: {[a.name if hasattr(a, 'name') else str(a) for a in achievements]}")
+                            logger.debug("[Background]   - Получено достижений: {}", len(achievements))
+                            logger.opt(lazy=True).info("[Background]   - Список: {}", lambda: [a.name if hasattr(a, 'name') else str(a) for a in achievements])
                         else:
-                            logger.info(f"[Background]   - achievements = None")
-                        logger.info(f"[Background] ════════════════════════════════════════════════════")
+                            logger.debug("[Background]   - achievements = None")
+                        logger.debug("[Background] ════════════════════════════════════════════════════")
                     else:
-                        logger.warning(f"[Background] Тренировка {user_training_uuid} не найдена для проверки достижений")
+                        logger.warning("[Background] Тренировка {} не найдена для проверки достижений", user_training_uuid)
                     
-                    logger.info(f"[Background] Выход из async with...")
+                    logger.debug("[Background] Выход из async with...")
             except Exception as e:
                 error_type = type(e).__name__
                 # Игнорируем MissingGreenlet ошибки - они не критичны, достижения уже сохранены
                 if "MissingGreenlet" in error_type or "greenlet_spawn" in str(e):
-                    logger.warning(f"[Background] Игнорирую некритичную ошибку при закрытии сессии: {error_type}: {e}")
+                    logger.warning("[Background] Игнорирую некритичную ошибку при закрытии сессии: {}: {}", error_type, e)
                 else:
-                    logger.error(f"[Background] Ошибка при проверке достижений для {user_training_uuid}: {error_type}: {e}", exc_info=True)
+                    logger.opt(exception=True).error("[Background] Ошибка при проверке достижений для {}: {}: {}", user_training_uuid, error_type, e)
             finally:
-                logger.info(f"[Background] Финальная очистка завершена")
+                logger.debug("[Background] Финальная очистка завершена")
         
         # Используем BackgroundTasks с async функцией
         # FastAPI правильно обрабатывает async функции в BackgroundTasks
         background_tasks.add_task(check_achievements_task)
     else:
-        logger.info(f"Тренировка {user_training_uuid} - день отдыха, пропускаю проверку достижений")
+        logger.debug("Тренировка {} - день отдыха, пропускаю проверку достижений", user_training_uuid)
     
     # Активируем следующую тренировку
     next_activated, next_training = await activate_next_training(user_training)
@@ -0,0 +1,184 @@
+"""
+Бенчмарк генератора программ питания: скорость и качество вместе.
+
+БД не нужна. На фиксированном каталоге рецептов (синтетическом с заданным seed либо из JSON-файла)
+прогоняются тысячи случайных дневных целей КБЖУ; для каждой генерируется программа на --days дней
+тем же кодом, что выполняется в процессах пула (_generate_day_pairs). Выводятся:
+  - планов и дней в секунду, перцентили времени на план;
+  - распределение ошибки КБЖУ дня относительно target_nutrition (|actual/target - 1|, p50/p90/p99),
+    смещение (средняя знаковая ошибка) и доля дней в коридорах ±5% / ±10% по калориям.
+
+Запуск (из корня проекта):
+  python -m scripts.benchmark_meal_plan_generation
+  python -m scripts.benchmark_meal_plan_generation --profiles 5000 --days 14 --plan-seed 1 \\
+      --output bench/meal_plan_generation_baseline.json
+  python -m scripts.benchmark_meal_plan_generation --compare bench/meal_plan_generation_baseline.json
+  python -m scripts.benchmark_meal_plan_generation --catalog recipes.json   # [{category, type, *_per_portion}, ...]
+
+Одинаковые --seed/--plan-seed дают одинаковые программы, поэтому изменения оптимизатора
+можно сравнивать по baseline и по скорости, и по качеству.
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+# Корень проекта — родитель каталога scripts
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.benchmark_meal_plan_optimizer import _daily_target, _percentile, _synthetic_recipes  # noqa: E402
+
+DEFAULT_OUTPUT = PROJECT_ROOT / "bench" / "meal_plan_generation_baseline.json"
+MACROS = ("calories", "proteins", "fats", "carbs")
+
+
+def _load_catalog(path: Path) -> list:
+    raw = json.loads(path.read_text(encoding="utf-8"))
+    return [
+        SimpleNamespace(
+            uuid=str(item.get("uuid") or f"recipe-{i}"),
+            user_id=None,
+            name=item.get("name") or "",
+            type=item.get("type"),
+            category=item.get("category"),
+            calories_per_portion=item.get("calories_per_portion"),
+            proteins_per_portion=item.get("proteins_per_portion"),
+            fats_per_portion=item.get("fats_per_portion"),
+            carbs_per_portion=item.get("carbs_per_portion"),
+        )
+        for i, item in enumerate(raw)
+    ]
+
+
+def _error_stats(errors: list) -> dict:
+    abs_errors = [abs(e) for e in errors]
+    return {
+        "mean_abs": round(sum(abs_errors) / len(abs_errors), 4) if abs_errors else 0.0,
+        "bias": round(sum(errors) / len(errors), 4) if errors else 0.0,
+        **{f"p{q}": round(_percentile(abs_errors, q), 4) for q in (50, 90, 99)},
+    }
+
+
+def run(catalog, profiles: int, days: int, seed: int, plan_seed) -> dict:
+    from app.meal_plans.service import _generate_day_pairs
+
+    rng = random.Random(seed)
+    day_starts = list(range(0, days, 2))
+    errors = {m: [] for m in MACROS}
+    within_5 = within_10 = 0
+    timings = []
+    started = time.perf_counter()
+    for i in range(profiles):
+        target = _daily_target(rng)
+        engine_seed = None if plan_seed is None else plan_seed + i
+        plan_started = time.perf_counter()
+        plan_days = _generate_day_pairs(catalog, target, day_starts, days, engine_seed, math.inf)
+        timings.append((time.perf_counter() - plan_started) * 1000)
+        for _, day in plan_days:
+            actual = day["actual_nutrition"]
+            for m in MACROS:
+                if target[m] > 0:
+                    errors[m].append(actual[m] / target[m] - 1)
+            kcal_error = abs(actual["calories"] / target["calories"] - 1)
+            within_5 += kcal_error <= 0.05
+            within_10 += kcal_error <= 0.10
+    elapsed = time.perf_counter() - started
+    total_days = profiles * days
+    return {
+        "plans_per_sec": round(profiles / elapsed, 1),
+        "days_per_sec": round(total_days / elapsed, 1),
+        "plan_ms": {f"p{q}": round(_percentile(timings, q), 3) for q in (50, 90, 99)},
+        "error": {m: _error_stats(errors[m]) for m in MACROS},
+        "kcal_within_5pct": round(within_5 / total_days, 4),
+        "kcal_within_10pct": round(within_10 / total_days, 4),
+    }
+
+
+def _print(result: dict) -> None:
+    print(
+        f"Скорость: {result['plans_per_sec']} планов/с, {result['days_per_sec']} дней/с; "
+        f"план p50={result['plan_ms']['p50']}ms p90={result['plan_ms']['p90']}ms p99={result['plan_ms']['p99']}ms"
+    )
+    for m in MACROS:
+        e = result["error"][m]
+        print(
+            f"  {m:<9} |ошибка| mean={e['mean_abs'] * 100:6.2f}% p50={e['p50'] * 100:6.2f}% "
+            f"p90={e['p90'] * 100:6.2f}% p99={e['p99'] * 100:6.2f}%  смещение={e['bias'] * 100:+6.2f}%"
+        )
+    print(
+        f"  калории в ±5%: {result['kcal_within_5pct'] * 100:.1f}% дней, "
+        f"в ±10%: {result['kcal_within_10pct'] * 100:.1f}% дней"
+    )
+
+
+def _compare(result: dict, baseline_path: Path, max_regression: float, max_error_growth: float) -> int:
+    """Регрессия — падение планов/с больше чем на max_regression или рост средней ошибки больше max_error_growth (п.п.)."""
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))["result"]
+    regressions = 0
+    if result["plans_per_sec"] < baseline["plans_per_sec"] * (1 - max_regression):
+        regressions += 1
+        print(f"РЕГРЕССИЯ скорости: {baseline['plans_per_sec']} -> {result['plans_per_sec']} планов/с")
+    for m in MACROS:
+        prev, cur = baseline["error"][m]["mean_abs"], result["error"][m]["mean_abs"]
+        if cur > prev + max_error_growth:
+            regressions += 1
+            print(f"РЕГРЕССИЯ качества {m}: средняя |ошибка| {prev * 100:.2f}% -> {cur * 100:.2f}%")
+    if regressions:
+        print(f"Найдено регрессий: {regressions}")
+        return 1
+    print("Регрессий относительно baseline не найдено.")
+    return 0
+
+
+def main():
+    from app.meal_plans.recipe_index import build_recipe_index
+
+    parser = argparse.ArgumentParser(description="Бенчмарк генератора программ питания: скорость и качество")
+    parser.add_argument("--catalog", type=Path, default=None, help="JSON со списком рецептов (иначе синтетический)")
+    parser.add_argument("--recipes", type=int, default=300, help="Размер синтетического каталога")
+    parser.add_argument("--profiles", type=int, default=2000, help="Число дневных целей КБЖУ")
+    parser.add_argument("--days", type=int, default=7, help="Дней в программе")
+    parser.add_argument("--seed", type=int, default=42, help="Seed каталога и целей КБЖУ")
+    parser.add_argument("--plan-seed", type=int, default=None, help="Seed выбора блюд (None — детерминированный выбор)")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="Куда сохранить JSON с результатами")
+    parser.add_argument("--compare", type=Path, default=None, help="JSON baseline для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Допустимое падение планов/с (доля)")
+    parser.add_argument("--max-error-growth", type=float, default=0.005, help="Допустимый рост средней |ошибки| (доля)")
+    args = parser.parse_args()
+
+    recipes = _load_catalog(args.catalog) if args.catalog else _synthetic_recipes(args.recipes, random.Random(args.seed))
+    catalog = build_recipe_index(recipes).for_user(0)
+    print(f"Каталог: {len(catalog)} рецептов, профилей: {args.profiles}, дней: {args.days}")
+
+    result = run(catalog, args.profiles, args.days, args.seed, args.plan_seed)
+    _print(result)
+
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": sys.version.split()[0],
+            "catalog": str(args.catalog) if args.catalog else f"synthetic:{args.recipes}",
+            "profiles": args.profiles,
+            "days": args.days,
+            "seed": args.seed,
+            "plan_seed": args.plan_seed,
+        },
+        "result": result,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Результаты сохранены: {args.output}")
+
+    if args.compare:
+        return _compare(result, args.compare, args.max_regression, args.max_error_growth)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+"""
+Бенчмарк подбора порций слота: векторный перебор (MealPlanService._optimize_slot)
+против прежнего жадного цикла (_optimize_slot_greedy ниже — перенесён сюда из сервиса,
+генератор его больше не использует).
+
+БД не нужна: строится синтетический каталог рецептов, для случайных дневных целей КБЖУ
+собираются слоты breakfast/lunch/dinner/snack так же, как в генераторе (MAIN + опциональный SIDE),
+и оба оптимизатора получают одинаковые блюда. Для каждого выводятся перцентили задержки на слот,
+распределение macro-penalty, доля валидных слотов и доля слотов, где векторный вариант
+не хуже жадного.
+
+Запуск (из корня проекта):
+  python -m scripts.benchmark_meal_plan_optimizer
+  python -m scripts.benchmark_meal_plan_optimizer --profiles 2000 --recipes 500 --output bench/meal_plan_optimizer.json
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+# Корень проекта — родитель каталога scripts
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.meal_plans.recipe_index import build_recipe_index  # noqa: E402
+from app.meal_plans.service import MealPlanService  # noqa: E402
+
+CATEGORIES = ["завтрак", "обед", "ужин", "салат", "десерт", "перекус", "суп"]
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def _synthetic_recipes(count: int, rng: random.Random) -> list:
+    recipes = []
+    for i in range(count):
+        category = rng.choice(CATEGORIES)
+        calories = rng.uniform(60, 250) if category in ("салат", "десерт", "перекус") else rng.uniform(200, 750)
+        proteins = rng.uniform(0.05, 0.35) * calories / 4
+        fats = rng.uniform(0.15, 0.45) * calories / 9
+        carbs = max(0.0, (calories - proteins * 4 - fats * 9) / 4)
+        recipes.append(SimpleNamespace(
+            uuid=f"recipe-{i}",
+            user_id=None,
+            name=f"Рецепт {i}",
+            type=None,
+            category=category,
+            calories_per_portion=round(calories, 1),
+            proteins_per_portion=round(proteins, 1),
+            fats_per_portion=round(fats, 1),
+            carbs_per_portion=round(carbs, 1),
+        ))
+    return recipes
+
+
+def _daily_target(rng: random.Random) -> dict:
+    calories = rng.uniform(1400, 3600)
+    return {
+        "calories": calories,
+        "proteins": rng.uniform(0.15, 0.35) * calories / 4,
+        "fats": rng.uniform(0.20, 0.35) * calories / 9,
+        "carbs": rng.uniform(0.30, 0.55) * calories / 4,
+    }
+
+
+def _slot_cases(catalog, profiles: int, rng: random.Random) -> list:
+    """Слоты (блюда + цель), собранные как в MealPlanService._build_meal_slot до подбора порций."""
+    cases = []
+    for _ in range(profiles):
+        daily = _daily_target(rng)
+        for meal_type in ("breakfast", "lunch", "dinner", "snack"):
+            if meal_type == "snack":
+                target = {k: v * 0.10 for k, v in daily.items()}
+            else:
+                target = MealPlanService._calculate_slot_target(daily, meal_type)
+            main_dish = MealPlanService._pick_main_dish(catalog, meal_type, target)
+            if not main_dish:
+                continue
+            meals = [main_dish]
+            if MealPlanService._calculate_totals(meals)["calories"] < target["calories"] * 0.9:
+                side_dish = MealPlanService._pick_side_dish(catalog, meal_type, target, meals)
+                if side_dish:
+                    meals.append(side_dish)
+            cases.append((meals, target))
+    return cases
+
+
+# ==================== Прежний жадный подбор порций ====================
+
+def _optimize_slot_greedy(
+    meals: List[Dict[str, Any]],
+    slot_target: Dict[str, float]
+) -> List[Dict[str, Any]]:
+    """Прежний жадный подбор порций генератора (±1 порция за итерацию, до 50 итераций)."""
+    if not meals:
+        return []
+
+    # Инициализируем portions = 1
+    for meal in meals:
+        meal["portions"] = 1
+
+    # Оптимизируем порции итеративно
+    max_iterations = 50
+    best_config = None
+    best_score = float('inf')
+
+    for iteration in range(max_iterations):
+        totals = MealPlanService._calculate_totals(meals)
+        score = MealPlanService._calculate_macro_penalty(totals, slot_target)
+
+        if score < best_score:
+            best_score = score
+            best_config = [(m["uuid"], m["portions"]) for m in meals]
+
+        # Если слот валиден, можем остановиться
+        if MealPlanService._is_slot_valid(totals, slot_target):
+            break
+
+        # Пытаемся улучшить, изменяя порции
+        improved = False
+
+        # Приоритет 1: Балансируем макросы
+        if not MealPlanService._is_slot_valid(totals, slot_target):
+            improved = _balance_macros_iterative(meals, slot_target)
+
+        # Приоритет 2: Корректируем калории
+        if not improved:
+            if totals["calories"] < slot_target["calories"] * 0.90:
+                best_meal = _find_best_meal_to_increase(meals, slot_target, totals)
+                if best_meal and best_meal["portions"] < 5:
+                    best_meal["portions"] += 1
+                    improved = True
+
+            elif totals["calories"] > slot_target["calories"] * 1.10:
+                best_meal = _find_best_meal_to_decrease(meals, slot_target, totals)
+                if best_meal and best_meal["portions"] > 1:
+                    best_meal["portions"] -= 1
+                    improved = True
+
+        if not improved:
+            break
+
+    # Восстанавливаем лучшую конфигурацию, если нашли
+    if best_config:
+        for meal, (uuid, portions) in zip(meals, best_config):
+            if meal["uuid"] == uuid:
+                meal["portions"] = portions
+
+    return MealPlanService._format_slot_meals(meals)
+
+
+def _find_best_meal_to_increase(
+    meals: List[Dict[str, Any]],
+    slot_target: Dict[str, float],
+    current_totals: Dict[str, float]
+) -> Optional[Dict[str, Any]]:
+    """Найти лучшее блюдо для увеличения порции"""
+    best_meal = None
+    best_delta_score = float('inf')
+    current_score = MealPlanService._calculate_macro_penalty(current_totals, slot_target)
+
+    for meal in meals:
+        if meal["portions"] < 5:
+            meal["portions"] += 1
+            new_totals = MealPlanService._calculate_totals(meals)
+            new_score = MealPlanService._calculate_macro_penalty(new_totals, slot_target)
+            delta_score = new_score - current_score
+
+            if delta_score < best_delta_score:
+                best_delta_score = delta_score
+                best_meal = meal
+
+            meal["portions"] -= 1
+
+    return best_meal
+
+
+def _find_best_meal_to_decrease(
+    meals: List[Dict[str, Any]],
+    slot_target: Dict[str, float],
+    current_totals: Dict[str, float]
+) -> Optional[Dict[str, Any]]:
+    """Найти лучшее блюдо для уменьшения порции"""
+    best_meal = None
+    best_delta_score = float('inf')
+    current_score = MealPlanService._calculate_macro_penalty(current_totals, slot_target)
+
+    for meal in meals:
+        if meal["portions"] > 1:
+            meal["portions"] -= 1
+            new_totals = MealPlanService._calculate_totals(meals)
+            new_score = MealPlanService._calculate_macro_penalty(new_totals, slot_target)
+            delta_score = new_score - current_score
+
+            if delta_score < best_delta_score:
+                best_delta_score = delta_score
+                best_meal = meal
+
+            meal["portions"] += 1
+
+    return best_meal
+
+
+def _balance_macros_iterative(
+    meals: List[Dict[str, Any]],
+    slot_target: Dict[str, float]
+) -> bool:
+    """
+    Итеративная балансировка макросов с приоритизацией
+
+    Приоритет: белки → калории → углеводы → жиры
+
+    Возвращает True, если было улучшение
+    """
+    totals = MealPlanService._calculate_totals(meals)
+    current_score = MealPlanService._calculate_macro_penalty(totals, slot_target)
+
+    # Проверяем отклонения для каждого макро с приоритетом
+    macros_to_balance = []
+
+    # Приоритет 1: Белки (самый важный)
+    prot_ratio = totals["proteins"] / slot_target["proteins"] if slot_target["proteins"] > 0 else 0
+    if prot_ratio < 0.85 or prot_ratio > 1.15:
+        macros_to_balance.append(("proteins", "proteins_per_portion", prot_ratio < 0.85, 1))
+
+    # Приоритет 2: Калории
+    cal_ratio = totals["calories"] / slot_target["calories"] if slot_target["calories"] > 0 else 1.0
+    if cal_ratio < 0.90 or cal_ratio > 1.10:
+        macros_to_balance.append(("calories", "calories_per_portion", cal_ratio < 0.90, 2))
+
+    # Приоритет 3: Углеводы
+    carb_ratio = totals["carbs"] / slot_target["carbs"] if slot_target["carbs"] > 0 else 0
+    if carb_ratio < 0.85 or carb_ratio > 1.15:
+        macros_to_balance.append(("carbs", "carbs_per_portion", carb_ratio < 0.85, 3))
+
+    # Приоритет 4: Жиры (последний)
+    fat_ratio = totals["fats"] / slot_target["fats"] if slot_target["fats"] > 0 else 0
+    if fat_ratio < 0.85 or fat_ratio > 1.15:
+        macros_to_balance.append(("fats", "fats_per_portion", fat_ratio < 0.85, 4))
+
+    # Сортируем по приоритету, затем по критичности отклонения
+    macros_to_balance.sort(
+        key=lambda x: (x[3], abs(1.0 - (totals[x[0]] / slot_target[x[0]] if slot_target[x[0]] > 0 else 0))),
+        reverse=False
+    )
+
+    # Балансируем каждый макро по приоритету
+    for macro_name, macro_key, need_increase, priority in macros_to_balance:
+        if need_increase:
+            # Нужно увеличить макро
+            macro_rich = sorted(meals, key=lambda m: m.get(macro_key, 0), reverse=True)
+            for meal in macro_rich:
+                if meal["portions"] < 5:
+                    meal["portions"] += 1
+                    new_totals = MealPlanService._calculate_totals(meals)
+                    new_score = MealPlanService._calculate_macro_penalty(new_totals, slot_target)
+                    if new_score < current_score:
+                        return True
+                    meal["portions"] -= 1
+        else:
+            # Нужно уменьшить макро
+            macro_rich = sorted(meals, key=lambda m: m.get(macro_key, 0), reverse=True)
+            for meal in macro_rich:
+                if meal["portions"] > 1:
+                    meal["portions"] -= 1
+                    new_totals = MealPlanService._calculate_totals(meals)
+                    new_score = MealPlanService._calculate_macro_penalty(new_totals, slot_target)
+                    if new_score < current_score:
+                        return True
+                    meal["portions"] += 1
+
+    return False
+
+
+def _run(name: str, optimize, cases: list) -> dict:
+    timings, penalties, valid, per_case = [], [], 0, []
+    for meals, target in cases:
+        work = [m.copy() for m in meals]
+        started = time.perf_counter()
+        result = optimize(work, target)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+        totals = MealPlanService._calculate_totals(result)
+        penalty = MealPlanService._calculate_macro_penalty(totals, target)
+        penalties.append(penalty)
+        per_case.append(penalty)
+        if MealPlanService._is_slot_valid(totals, target):
+            valid += 1
+    return {
+        "name": name,
+        "slots": len(cases),
+        "latency_us": {q: round(_percentile(timings, q), 1) for q in (50, 90, 99)},
+        "penalty": {
+            "mean": round(sum(penalties) / len(penalties), 2) if penalties else 0.0,
+            **{f"p{q}": round(_percentile(penalties, q), 2) for q in (50, 90, 99)},
+        },
+        "valid_share": round(valid / len(cases), 4) if cases else 0.0,
+        "_per_case": per_case,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк подбора порций слота: векторный перебор vs жадный цикл")
+    parser.add_argument("--recipes", type=int, default=300, help="Размер синтетического каталога")
+    parser.add_argument("--profiles", type=int, default=1000, help="Число дневных целей КБЖУ")
+    parser.add_argument("--seed", type=int, default=42, help="Seed генератора синтетических данных")
+    parser.add_argument("--output", type=Path, default=None, help="Куда сохранить JSON с результатами")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    catalog = build_recipe_index(_synthetic_recipes(args.recipes, rng)).for_user(0)
+    cases = _slot_cases(catalog, args.profiles, rng)
+    if not cases:
+        print("Не удалось собрать ни одного слота")
+        return 1
+
+    greedy = _run("greedy", _optimize_slot_greedy, cases)
+    vectorized = _run("vectorized", MealPlanService._optimize_slot, cases)
+    not_worse = sum(1 for v, g in zip(vectorized["_per_case"], greedy["_per_case"]) if v <= g + 1e-9)
+
+    results = []
+    for r in (greedy, vectorized):
+        r.pop("_per_case")
+        results.append(r)
+        print(
+            f"{r['name']:<11} slots={r['slots']:<6} "
+            f"latency p50={r['latency_us'][50]:>8.1f}us p90={r['latency_us'][90]:>8.1f}us p99={r['latency_us'][99]:>8.1f}us  "
+            f"penalty mean={r['penalty']['mean']:>7.2f} p50={r['penalty']['p50']:>7.2f} p90={r['penalty']['p90']:>7.2f}  "
+            f"valid={r['valid_share'] * 100:.1f}%"
+        )
+    print(f"vectorized не хуже greedy в {not_worse / len(cases) * 100:.2f}% слотов")
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"seed": args.seed, "recipes": args.recipes, "profiles": args.profiles,
+                   "results": results, "not_worse_share": round(not_worse / len(cases), 4)}
+        args.output.write_text(json.dumps(payload, ensure_ascii=False, indent=2))
+        print(f"Результаты сохранены в {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,563 @@
+"""
+Бенчмарк сборщика тренировок на синтетических данных.
+
+Наполняет отдельную (!) локальную БД Postgres синтетическим пулом упражнений, оборудованием,
+правилами состава и пользователями с историей тренировок, затем замеряет:
+  - build_training_exercises
+  - suggest_pool_replacements_for_slot
+  - create_training_by_program
+Для каждого сценария (размер пула × размер истории) выводит перцентили задержки, число SQL-запросов
+и пик выделенной памяти на вызов, сохраняет JSON-baseline и может сравнить с предыдущим.
+
+Запуск (из корня проекта):
+  python -m scripts.benchmark_training_builder --db-name ninja_bench
+  python -m scripts.benchmark_training_builder --pool-sizes 100,1000,5000 --history-sizes 0,100,1000 \\
+      --iterations 30 --output bench/training_builder_baseline.json
+  python -m scripts.benchmark_training_builder --compare bench/training_builder_baseline.json \\
+      --output bench/training_builder_current.json
+
+С --compare результаты сохраняются только при явном --output, отличном от файла baseline.
+
+Внимание: таблицы БД бенчмарка очищаются (TRUNCATE) перед каждым сценарием.
+Имя БД должно содержать «bench» — защита от запуска на рабочей базе (--force отключает проверку).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from uuid import uuid4
+
+# Корень проекта — родитель каталога scripts
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+DEFAULT_OUTPUT = PROJECT_ROOT / "bench" / "training_builder_baseline.json"
+
+TRAINING_TYPES = ["heavy_push", "heavy_pull", "heavy_legs", "light_recovery", "light_pump", "light_core"]
+ROLES = ["main", "accessory", "core", "mobility"]
+DIFFICULTIES = ["beginner", "intermediate", "advanced", "any"]
+MUSCLES = ["chest", "back", "legs", "shoulders", "arms", "core", "glutes"]
+EQUIPMENT = ["none", "dumbbells", "pullup_bar", "bands", "barbell", "cable", "smith_machine"]
+PROGRAM_GOAL = "maintenance"
+DURATION_MINUTES = 45
+EXERCISES_PER_HISTORY_TRAINING = 6
+
+BENCH_TABLES = [
+    "user_exercise_stats",
+    "exercise",
+    "user_training",
+    "training",
+    "user_program_plan",
+    "exercise_builder_equipment",
+    "exercise_builder_pool",
+    "training_composition_rules",
+    "exercise_reference",
+    "user",
+]
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def _parse_sizes(raw: str):
+    return [int(x) for x in raw.split(",") if x.strip()]
+
+
+async def _ensure_database(db_name: str):
+    """Создаёт БД бенчмарка, если её нет (подключение к служебной БД postgres)."""
+    import asyncpg
+    from app.config import settings
+
+    conn = await asyncpg.connect(
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        database="postgres",
+    )
+    try:
+        exists = await conn.fetchval("SELECT 1 FROM pg_database WHERE datname = $1", db_name)
+        if not exists:
+            await conn.execute(f'CREATE DATABASE "{db_name}"')
+            print(f"Создана БД {db_name}")
+    finally:
+        await conn.close()
+
+
+async def _prepare_schema():
+    import app  # noqa: F401 — регистрирует все модели в Base.metadata
+    from app.database import Base, engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def _truncate():
+    from sqlalchemy import text
+    from app.database import async_session_maker
+
+    tables = ", ".join(f'"{t}"' for t in BENCH_TABLES)
+    async with async_session_maker() as session:
+        await session.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+        await session.commit()
+
+
+async def _seed_scenario(pool_size: int, history_sizes, rng: random.Random) -> dict:
+    """Синтетический пул + оборудование + правила + по одному пользователю на каждый размер истории."""
+    from sqlalchemy import insert
+    from app.database import async_session_maker
+    from app.exercise_builder_equipment.models import ExerciseBuilderEquipment
+    from app.exercise_builder_pool.models import ExerciseBuilderPool
+    from app.exercise_reference.models import ExerciseReference
+    from app.exercises.models import Exercise
+    from app.training_composition_rules.models import TrainingCompositionRule
+    from app.trainings.models import Training
+    from app.user_exercise_stats.models import UserExerciseStats
+    from app.user_program_plan.models import UserProgramPlan
+    from app.user_training.models import UserTraining
+    from app.users.models import User
+
+    now = datetime.utcnow()
+    async with async_session_maker() as session:
+        await session.execute(
+            insert(ExerciseReference),
+            [
+                {
+                    "uuid": uuid4(),
+                    "exercise_type": "system",
+                    "caption": f"Bench exercise {i}",
+                    "muscle_group": rng.choice(MUSCLES),
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for i in range(1, pool_size + 1)
+            ],
+        )
+
+        pool_rows = []
+        for i in range(1, pool_size + 1):
+            muscle = rng.choice(MUSCLES)
+            row = {
+                "uuid": uuid4(),
+                "actual": True,
+                "is_active": True,
+                "exercise_id": i,
+                "exercise_caption": f"Bench exercise {i}",
+                "difficulty_level": rng.choice(DIFFICULTIES),
+                "primary_muscle_group": muscle,
+                "auxiliary_muscle_groups": ",".join(rng.sample(MUSCLES, 2)),
+                "preferred_role": rng.choice(ROLES),
+                "is_anchor_candidate": rng.random() < 0.1,
+                "uses_external_load": rng.random() < 0.6,
+                "is_time_based": rng.random() < 0.15,
+                "default_min_reps": 6,
+                "default_max_reps": 15,
+                "default_min_sets": 2,
+                "default_max_sets": 5,
+                "estimated_time_per_set_seconds": rng.choice([45, 60, 90]),
+                "variation_group_code": f"{muscle}_{rng.randint(1, max(1, pool_size // 20))}",
+                "base_priority": rng.randint(0, 50),
+                "goal_fat_loss_weight": 1,
+                "goal_mass_gain_weight": 1,
+                "goal_maintenance_weight": 1,
+                "week1_weight": 1,
+                "week2_weight": 1,
+                "week3_weight": 1,
+                "week4_weight": 1,
+                "fatigue_cost": rng.randint(0, 5),
+                "role_rank_in_slot": rng.randint(1, 10),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for tt in TRAINING_TYPES:
+                row[f"can_use_in_{tt}"] = rng.random() < 0.5
+            for limb in ("push", "pull", "legs"):
+                row[f"can_be_secondary_in_heavy_{limb}"] = rng.random() < 0.3
+                row[f"anchor_priority_tier_{limb}"] = rng.choice(["primary", "secondary", "backup"])
+                row[f"anchor_order_{limb}"] = rng.randint(1, 50)
+            pool_rows.append(row)
+        await session.execute(insert(ExerciseBuilderPool), pool_rows)
+
+        await session.execute(
+            insert(ExerciseBuilderEquipment),
+            [
+                {
+                    "uuid": uuid4(),
+                    "actual": True,
+                    "exercise_builder_id": pool_id,
+                    "equipment_code": code,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for pool_id in range(1, pool_size + 1)
+                for code in rng.sample(EQUIPMENT, rng.randint(1, 2))
+            ],
+        )
+
+        await session.execute(
+            insert(TrainingCompositionRule),
+            [
+                {
+                    "uuid": uuid4(),
+                    "actual": True,
+                    "training_type": tt,
+                    "program_goal": PROGRAM_GOAL,
+                    "program_week_index": week,
+                    "duration_target_minutes": DURATION_MINUTES,
+                    "anchor_slots_count": 2 if tt.startswith("heavy") else 0,
+                    "main_slots_count": 2,
+                    "accessory_slots_count": 2,
+                    "core_slots_count": 1,
+                    "mobility_slots_count": 1,
+                    "anchor_sets": 4, "anchor_reps_min": 5, "anchor_reps_max": 8, "anchor_rest_seconds": 120,
+                    "main_sets": 3, "main_reps_min": 8, "main_reps_max": 12, "main_rest_seconds": 90,
+                    "accessory_sets": 3, "accessory_reps_min": 10, "accessory_reps_max": 15, "accessory_rest_seconds": 60,
+                    "core_sets": 2, "core_reps_min": 12, "core_reps_max": 20, "core_rest_seconds": 45,
+                    "mobility_sets": 2, "mobility_reps_min": 10, "mobility_reps_max": 15, "mobility_rest_seconds": 30,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for tt in TRAINING_TYPES
+                for week in range(1, 5)
+            ],
+        )
+        await session.flush()
+
+        users = []
+        for history_size in history_sizes:
+            user_uuid = uuid4()
+            user_id = (
+                await session.execute(
+                    insert(User)
+                    .values(
+                        uuid=user_uuid,
+                        email=f"bench_{user_uuid.hex}@example.com",
+                        login=f"bench_{user_uuid.hex}",
+                        password="bench",
+                        subscription_status="active",
+                        created_at=now,
+                        updated_at=now,
+                    )
+                    .returning(User.id)
+                )
+            ).scalar_one()
+            plan_id = (
+                await session.execute(
+                    insert(UserProgramPlan)
+                    .values(
+                        uuid=uuid4(),
+                        actual=True,
+                        user_id=user_id,
+                        has_dumbbells=True,
+                        has_pullup_bar=True,
+                        duration_target_minutes=DURATION_MINUTES,
+                        difficulty_level="intermediate",
+                        program_goal=PROGRAM_GOAL,
+                        start_date=date.today() - timedelta(days=history_size * 2 + 1),
+                        training_days_per_week=3,
+                        current_week_index=1,
+                        completed_heavy_training_count=0,
+                        created_at=now,
+                        updated_at=now,
+                    )
+                    .returning(UserProgramPlan.id)
+                )
+            ).scalar_one()
+
+            used_refs = set()
+            for h in range(history_size):
+                tt = TRAINING_TYPES[h % len(TRAINING_TYPES)]
+                completed_at = now - timedelta(days=history_size - h)
+                training_id = (
+                    await session.execute(
+                        insert(Training)
+                        .values(
+                            uuid=uuid4(),
+                            training_type=tt,
+                            user_id=user_id,
+                            caption=f"{tt} (bench)",
+                            muscle_group="",
+                            duration=DURATION_MINUTES,
+                            actual=True,
+                            user_program_plan_id=plan_id,
+                            created_at=now,
+                            updated_at=now,
+                        )
+                        .returning(Training.id)
+                    )
+                ).scalar_one()
+                refs = rng.sample(range(1, pool_size + 1), min(EXERCISES_PER_HISTORY_TRAINING, pool_size))
+                used_refs.update(refs)
+                await session.execute(
+                    insert(Exercise),
+                    [
+                        {
+                            "uuid": uuid4(),
+                            "exercise_type": "strength",
+                            "caption": f"Bench exercise {ref_id}",
+                            "muscle_group": "",
+                            "order": order,
+                            "training_id": training_id,
+                            "exercise_reference_id": ref_id,
+                            "created_at": now,
+                            "updated_at": now,
+                        }
+                        for order, ref_id in enumerate(refs)
+                    ],
+                )
+                await session.execute(
+                    insert(UserTraining).values(
+                        uuid=uuid4(),
+                        training_id=training_id,
+                        user_program_plan_id=plan_id,
+                        training_type=tt,
+                        user_id=user_id,
+                        training_date=completed_at.date(),
+                        status="PASSED",
+                        completed_at=completed_at,
+                        created_at=now,
+                        updated_at=now,
+                    )
+                )
+            if used_refs:
+                await session.execute(
+                    insert(UserExerciseStats),
+                    [
+                        {
+                            "uuid": uuid4(),
+                            "user_id": user_id,
+                            "exercise_reference_id": ref_id,
+                            "total_usage_count": rng.randint(1, 20),
+                            "usage_ring_last_shift_date": date.today(),
+                            **{f"usage_day_{i}": rng.randint(0, 1) for i in range(28)},
+                            "created_at": now,
+                            "updated_at": now,
+                        }
+                        for ref_id in used_refs
+                    ],
+                )
+            users.append({"history_size": history_size, "user_id": user_id, "user_uuid": str(user_uuid), "plan_id": plan_id})
+        await session.commit()
+    return {"users": users}
+
+
+class _QueryCounter:
+    """Счётчик SQL-запросов через событие before_cursor_execute движка."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+async def _measure(name: str, call, iterations: int, alloc_iterations: int, counter: _QueryCounter) -> dict:
+    # Прогрев (соединения пула, кэши SQLAlchemy)
+    for _ in range(2):
+        await call()
+
+    latencies = []
+    queries = []
+    for _ in range(iterations):
+        q0 = counter.count
+        t0 = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - t0) * 1000)
+        queries.append(counter.count - q0)
+
+    # Память меряем отдельным проходом: tracemalloc заметно замедляет выполнение
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_iterations):
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await call()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(max(0, peak - base))
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "function": name,
+        "iterations": iterations,
+        "p50_ms": round(_percentile(latencies, 50), 3),
+        "p90_ms": round(_percentile(latencies, 90), 3),
+        "p99_ms": round(_percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "queries_per_call": round(statistics.mean(queries), 2),
+        "peak_alloc_kb": round(statistics.mean(peaks) / 1024, 1) if peaks else None,
+    }
+
+
+async def _run_scenario(pool_size: int, users: list, args, counter: _QueryCounter) -> list:
+    from app.training_composition_rules.dao import TrainingCompositionRuleDAO
+    from app.user_program_plan.dao import UserProgramPlanDAO
+    from app.user_program_plan.logic import create_training_by_program
+    from app.user_program_plan.training_builder import (
+        build_training_exercises,
+        suggest_pool_replacements_for_slot,
+    )
+
+    results = []
+    for u in users:
+        plan = await UserProgramPlanDAO.find_actual_by_user_id(u["user_id"])
+        for training_type in args.training_types:
+            rule = await TrainingCompositionRuleDAO.find_one_or_none(
+                training_type=training_type,
+                program_goal=PROGRAM_GOAL,
+                program_week_index=1,
+                duration_target_minutes=DURATION_MINUTES,
+            )
+            scenario = f"pool={pool_size},history={u['history_size']},type={training_type}"
+
+            async def _build():
+                return await build_training_exercises(plan, rule, training_type, u["user_id"], plan.id)
+
+            async def _suggest():
+                return await suggest_pool_replacements_for_slot(
+                    plan=plan,
+                    rule=rule,
+                    training_type=training_type,
+                    user_id=u["user_id"],
+                    plan_id=plan.id,
+                    slot_role="main",
+                    action="replace",
+                    exclude_exercise_reference_ids=set(),
+                    anchor_diff_for_order=plan.difficulty_level,
+                )
+
+            async def _create():
+                return await create_training_by_program(u["user_uuid"], training_type)
+
+            for name, call in (
+                ("build_training_exercises", _build),
+                ("suggest_pool_replacements_for_slot", _suggest),
+                ("create_training_by_program", _create),
+            ):
+                row = await _measure(name, call, args.iterations, args.alloc_iterations, counter)
+                row.update({"scenario": scenario, "pool_size": pool_size, "history_size": u["history_size"]})
+                results.append(row)
+                print(
+                    f"{scenario:<45} {name:<38} p50={row['p50_ms']:>8.2f}ms p90={row['p90_ms']:>8.2f}ms "
+                    f"p99={row['p99_ms']:>8.2f}ms queries={row['queries_per_call']:>6} "
+                    f"peak={row['peak_alloc_kb']}KB"
+                )
+    return results
+
+
+def _compare(results: list, baseline: dict, max_regression: float) -> int:
+    """Сравнение с baseline: регрессия — рост p50 больше чем на max_regression или рост числа запросов."""
+    old = {(r["scenario"], r["function"]): r for r in baseline.get("results", [])}
+    regressions = 0
+    for r in results:
+        prev = old.get((r["scenario"], r["function"]))
+        if not prev:
+            continue
+        slower = prev["p50_ms"] > 0 and r["p50_ms"] > prev["p50_ms"] * (1 + max_regression)
+        more_queries = r["queries_per_call"] > prev["queries_per_call"]
+        if slower or more_queries:
+            regressions += 1
+            print(
+                f"РЕГРЕССИЯ {r['scenario']} {r['function']}: p50 {prev['p50_ms']} -> {r['p50_ms']} ms, "
+                f"queries {prev['queries_per_call']} -> {r['queries_per_call']}"
+            )
+    if regressions:
+        print(f"Найдено регрессий: {regressions}")
+        return 1
+    print("Регрессий относительно baseline не найдено.")
+    return 0
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк сборщика тренировок на синтетических данных")
+    parser.add_argument("--db-name", default="ninja_bench", help="Имя отдельной БД для бенчмарка")
+    parser.add_argument("--force", action="store_true", help="Разрешить имя БД без «bench»")
+    parser.add_argument("--pool-sizes", default="100,1000,5000", help="Размеры пула через запятую")
+    parser.add_argument("--history-sizes", default="0,100,1000", help="Число завершённых тренировок у пользователей")
+    parser.add_argument("--training-types", default="heavy_push,light_core", help="Типы тренировок через запятую")
+    parser.add_argument("--iterations", type=int, default=20, help="Замеров задержки на функцию")
+    parser.add_argument("--alloc-iterations", type=int, default=3, help="Замеров памяти (tracemalloc) на функцию")
+    parser.add_argument("--seed", type=int, default=42, help="Seed генератора синтетических данных")
+    parser.add_argument(
+        "--output", type=Path, default=None,
+        help=f"Куда сохранить JSON с результатами (по умолчанию {DEFAULT_OUTPUT.relative_to(PROJECT_ROOT)}, "
+             "с --compare — не сохранять)",
+    )
+    parser.add_argument("--compare", type=Path, default=None, help="JSON baseline для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Допустимый рост p50 (доля)")
+    args = parser.parse_args()
+    args.training_types = [t.strip() for t in args.training_types.split(",") if t.strip()]
+
+    baseline = None
+    if args.compare:
+        if args.output is not None and args.output.resolve() == args.compare.resolve():
+            print("--output совпадает с --compare: baseline был бы перезаписан результатами сравнения.")
+            return 1
+        # Baseline читаем до замеров, чтобы неверный путь проявился сразу
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+    elif args.output is None:
+        args.output = DEFAULT_OUTPUT
+
+    if "bench" not in args.db_name and not args.force:
+        print(f"Имя БД {args.db_name!r} не содержит «bench»: таблицы будут очищены. Используйте --force.")
+        return 1
+
+    # Настройки читаются при импорте app.config — подменяем БД до импорта приложения
+    os.environ["DB_NAME"] = args.db_name
+    await _ensure_database(args.db_name)
+    await _prepare_schema()
+
+    from app.database import engine
+
+    counter = _QueryCounter(engine)
+    history_sizes = _parse_sizes(args.history_sizes)
+    results = []
+    for pool_size in _parse_sizes(args.pool_sizes):
+        await _truncate()
+        seed_started = time.perf_counter()
+        seeded = await _seed_scenario(pool_size, history_sizes, random.Random(args.seed + pool_size))
+        print(f"Сценарий pool={pool_size}: данные созданы за {time.perf_counter() - seed_started:.1f} с")
+        results.extend(await _run_scenario(pool_size, seeded["users"], args, counter))
+
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": sys.version.split()[0],
+            "iterations": args.iterations,
+            "seed": args.seed,
+            "pool_sizes": _parse_sizes(args.pool_sizes),
+            "history_sizes": history_sizes,
+            "training_types": args.training_types,
+        },
+        "results": results,
+    }
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"Результаты сохранены: {args.output}")
+
+    await engine.dispose()
+    if baseline is not None:
+        return _compare(results, baseline, args.max_regression)
+    return 0
+
+
+if __name__ == "__main__":
+    exit_code = asyncio.run(main())
+    sys.exit(exit_code)
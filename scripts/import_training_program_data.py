@@ -66,6 +66,13 @@ async def main():
     else:
         print("Пропуск exercise_builder_equipment")
 
+    if not (args.skip_pool and args.skip_equipment):
+        # Проверяем, что граф похожести строится на новых данных (API-воркеры перестроят свой по сигнатуре пула)
+        from app.user_program_plan.similarity_graph import rebuild_similarity_graph
+
+        graph = await rebuild_similarity_graph()
+        print(f"Граф похожести упражнений: {len(graph)} записей пула")
+
     print("Импорт завершён.")
     return 0
 
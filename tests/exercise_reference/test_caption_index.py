@@ -0,0 +1,85 @@
+from app.exercise_reference.caption_index import CaptionEntry, CaptionIndex, normalize_text, order_ids, tokenize
+
+
+def _entry(id, caption, muscle_group=None, equipment_name=None):
+    return CaptionEntry(id, f"uuid-{id}", "system", None, caption, muscle_group, equipment_name)
+
+
+def _index():
+    return CaptionIndex([
+        _entry(1, "Жим штанги лёжа", "Грудь", "Штанга"),
+        _entry(2, "Жим гантелей лежа на наклонной скамье", "Грудь", "Гантели"),
+        _entry(3, "Приседания со штангой", "Ноги", "Штанга"),
+        _entry(4, "Подтягивания", "Спина", None),
+        _entry(5, "Жим ногами", "Ноги", "Тренажёр"),
+    ])
+
+
+class TestNormalization:
+    """Тесты нормализации названий"""
+
+    def test_lowercase_and_yo(self):
+        """Регистр и ё не влияют на поиск"""
+        assert normalize_text("Жим Лёжа") == "жим лежа"
+        assert normalize_text(None) == ""
+
+    def test_tokenize(self):
+        """Название разбивается на слова, знаки препинания отбрасываются"""
+        assert tokenize("Жим-лёжа (узким хватом)") == ["жим", "лежа", "узким", "хватом"]
+
+
+class TestCaptionSearch:
+    """Тесты поиска по индексу названий"""
+
+    def test_all_words_must_match(self):
+        """Находятся названия, содержащие все слова запроса"""
+        assert _index().search("жим лежа") == {1, 2}
+
+    def test_substring_inside_word(self):
+        """Слово запроса может быть частью слова названия, как в прежнем ILIKE '%слово%'"""
+        assert _index().search("тяг") == {4}
+        assert _index().search("штанг") == {1, 3}
+
+    def test_yo_in_query(self):
+        """ё в запросе находит е в названии и наоборот"""
+        assert _index().search("лёжа") == {1, 2}
+
+    def test_empty_query_returns_all(self):
+        """Пустой запрос возвращает весь каталог"""
+        assert _index().search("") == {1, 2, 3, 4, 5}
+
+    def test_no_match(self):
+        """Слово, которого нет ни в одном названии, даёт пустой результат"""
+        assert _index().search("жим бицепс") == set()
+
+    def test_muscle_group_and_equipment_filters(self):
+        """Фильтры по группе мышц и оборудованию — OR внутри фильтра, AND между фильтрами"""
+        index = _index()
+        assert index.search("жим", muscle_groups=["ноги"]) == {5}
+        assert index.search("", muscle_groups=["грудь", "спина"]) == {1, 2, 4}
+        assert index.search("", muscle_groups=["ноги"], equipment_names=["штанга"]) == {3}
+        assert index.search("", equipment_names=["тренажер"]) == {5}
+
+
+class TestAutocomplete:
+    """Тесты автодополнения"""
+
+    def test_prefix_completion_by_frequency(self):
+        """Подсказки — слова с заданным началом, самые частые первыми"""
+        assert _index().complete("жи") == ["жим"]
+        assert _index().complete("п") == ["подтягивания", "приседания"]
+        assert _index().complete("Ле", limit=1) == ["лежа"]
+
+    def test_empty_prefix(self):
+        """Пустой запрос не даёт подсказок"""
+        assert _index().complete("  ") == []
+
+
+class TestOrdering:
+    """Тесты сортировки результатов"""
+
+    def test_favorites_then_popularity(self):
+        """Сначала избранные, затем популярные, при равенстве — по id"""
+        popularity = {1: 10, 2: 3, 3: 10, 5: 1}
+        assert order_ids({1, 2, 3, 4, 5}, {5}, popularity) == [5, 1, 3, 2, 4]
+        assert order_ids({1, 2, 3, 4, 5}, None, popularity) == [1, 3, 2, 5, 4]
@@ -0,0 +1,98 @@
+import asyncio
+
+from sqlalchemy.dialects import postgresql
+
+import app.exercise_reference.dao as exercise_reference_dao
+from app.exercise_reference.dao import ExerciseReferenceDAO
+
+
+class FacetResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class FacetSession:
+    """Сессия, которая компилирует запросы и отдает заранее заданные счетчики фасетов"""
+
+    def __init__(self, rows_by_column):
+        self.rows_by_column = rows_by_column
+        self.statements = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.statements.append(sql)
+        column = "muscle_group" if "GROUP BY exercise_reference.muscle_group" in sql else "equipment_name"
+        return FacetResult(self.rows_by_column[column])
+
+
+class TestExerciseFilters:
+    """Тесты фильтров (фасетов) справочника упражнений"""
+
+    def setup_method(self):
+        exercise_reference_dao._system_filters_cache.clear()
+        exercise_reference_dao._user_filters_cache.clear()
+
+    def _patch(self, monkeypatch, rows_by_column):
+        sessions = []
+
+        def session_maker():
+            session = FacetSession(rows_by_column)
+            sessions.append(session)
+            return session
+
+        monkeypatch.setattr(exercise_reference_dao, "async_session_maker", session_maker)
+        return sessions
+
+    def test_system_facets_grouped_with_counts(self, monkeypatch):
+        """Значения считаются GROUP BY-запросами и возвращаются с количеством"""
+        sessions = self._patch(monkeypatch, {
+            "muscle_group": [("Спина", 4), ("Грудь", 3)],
+            "equipment_name": [("Штанга", 5)],
+        })
+        filters = asyncio.run(ExerciseReferenceDAO.get_system_exercise_filters())
+        assert filters == {
+            "muscle_groups": ["Грудь", "Спина"],
+            "muscle_groups_counts": {"Грудь": 3, "Спина": 4},
+            "equipment_names": ["Штанга"],
+            "equipment_names_counts": {"Штанга": 5},
+        }
+        statements = sessions[0].statements
+        assert len(statements) == 2
+        assert all("count(exercise_reference.id)" in sql for sql in statements)
+        assert all("exercise_reference.exercise_type = %(exercise_type_1)s" in sql for sql in statements)
+
+    def test_system_facets_cached(self, monkeypatch):
+        """Системные фильтры кэшируются до инвалидации"""
+        sessions = self._patch(monkeypatch, {"muscle_group": [("Ноги", 1)], "equipment_name": []})
+        asyncio.run(ExerciseReferenceDAO.get_system_exercise_filters())
+        asyncio.run(ExerciseReferenceDAO.get_system_exercise_filters())
+        assert len(sessions) == 1
+        ExerciseReferenceDAO.invalidate_exercise_filters()
+        asyncio.run(ExerciseReferenceDAO.get_system_exercise_filters())
+        assert len(sessions) == 2
+
+    def test_user_facets_merged_and_cached_per_user(self, monkeypatch):
+        """Фильтры пользователя — системные плюс его упражнения; кэш сбрасывается только для этого пользователя"""
+        sessions = self._patch(monkeypatch, {"muscle_group": [("Ноги", 2)], "equipment_name": [("Гантели", 1)]})
+        filters = asyncio.run(ExerciseReferenceDAO.get_exercise_filters(user_id=7))
+        assert filters["muscle_groups_counts"] == {"Ноги": 4}
+        assert filters["equipment_names_counts"] == {"Гантели": 2}
+        assert "exercise_reference.user_id = %(user_id_1)s" in sessions[1].statements[0]
+
+        asyncio.run(ExerciseReferenceDAO.get_exercise_filters(user_id=7))
+        assert len(sessions) == 2
+        ExerciseReferenceDAO.invalidate_exercise_filters(8)
+        asyncio.run(ExerciseReferenceDAO.get_exercise_filters(user_id=7))
+        assert len(sessions) == 2
+        ExerciseReferenceDAO.invalidate_exercise_filters(7)
+        asyncio.run(ExerciseReferenceDAO.get_exercise_filters(user_id=7))
+        assert len(sessions) == 3
@@ -0,0 +1,132 @@
+import asyncio
+import uuid
+from datetime import date
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+import app.exercise_reference.dao as exercise_reference_dao
+from app.exercise_reference.dao import ExerciseReferenceDAO
+
+REFERENCE_UUID = uuid.UUID("00000000-0000-0000-0000-000000000001")
+USER_UUID = uuid.UUID("00000000-0000-0000-0000-000000000002")
+
+
+class StatisticsResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+    def scalar_one_or_none(self):
+        return self._rows[0] if self._rows else None
+
+
+class StatisticsSession:
+    """Сессия, которая отдает заранее заданные строки истории и считает запросы"""
+
+    def __init__(self, rows, reference_exists=True):
+        self.rows = rows
+        self.reference_exists = reference_exists
+        self.statements = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        if len(self.statements) == 1:
+            return StatisticsResult(self.rows)
+        return StatisticsResult([1] if self.reference_exists else [])
+
+
+def _sql(**kwargs) -> str:
+    query = ExerciseReferenceDAO._exercise_statistics_query(REFERENCE_UUID, 7, **kwargs)
+    return str(query.compile(dialect=postgresql.dialect()))
+
+
+class TestExerciseStatisticsQuery:
+    """Тесты запроса статистики упражнения"""
+
+    def test_single_grouped_query(self):
+        """История собирается одним запросом с группировкой по (дата, тренировка, упражнение)"""
+        sql = _sql()
+        assert "GROUP BY user_exercise.training_date, user_exercise.training_id, user_exercise.exercise_id" in sql
+        assert "json_agg(json_build_object('set_number', user_exercise.set_number" in sql
+        assert "ORDER BY user_exercise.set_number) AS sets" in sql
+        assert "JOIN exercise_reference ON exercise_reference.id = exercise.exercise_reference_id" in sql
+
+    def test_window_aggregates(self):
+        """max_sets_per_day и total_training_days считаются оконными функциями"""
+        sql = _sql()
+        assert "max(groups.sets_count) OVER () AS max_sets_per_day" in sql
+        assert "dense_rank() OVER (ORDER BY user_exercise.training_date) AS day_rank" in sql
+        assert "max(groups.day_rank) OVER () AS total_training_days" in sql
+        assert "ORDER BY groups.training_date DESC" in sql
+
+    def test_date_range_and_limit(self):
+        """Период ограничивает подходы, limit — количество записей истории"""
+        sql = _sql(date_from=date(2026, 1, 1), date_to=date(2026, 2, 1), limit=5)
+        assert "user_exercise.training_date >= " in sql
+        assert "user_exercise.training_date <= " in sql
+        assert "LIMIT %(param_1)s" in sql
+        assert "LIMIT" not in _sql()
+
+
+class TestExerciseStatisticsCache:
+    """Тесты кэширования статистики"""
+
+    def setup_method(self):
+        exercise_reference_dao._statistics_cache.clear()
+
+    def _patch(self, monkeypatch, rows, reference_exists=True):
+        sessions = []
+
+        def session_maker():
+            session = StatisticsSession(rows, reference_exists)
+            sessions.append(session)
+            return session
+
+        monkeypatch.setattr(exercise_reference_dao, "async_session_maker", session_maker)
+        return sessions
+
+    def _get(self, **kwargs):
+        return asyncio.run(ExerciseReferenceDAO.get_exercise_statistics(REFERENCE_UUID, USER_UUID, user_id=7, **kwargs))
+
+    def test_rows_to_history(self, monkeypatch):
+        """Строки запроса превращаются в историю без дополнительной обработки"""
+        sets = [{"set_number": 1, "reps": 10, "weight": 50.0, "training_uuid": "t", "exercise_uuid": "e"}]
+        rows = [
+            SimpleNamespace(training_date=date(2026, 3, 2), sets=sets, max_sets_per_day=3, total_training_days=2),
+            SimpleNamespace(training_date=date(2026, 3, 1), sets=sets * 3, max_sets_per_day=3, total_training_days=2),
+        ]
+        self._patch(monkeypatch, rows)
+        statistics = self._get()
+        assert statistics["max_sets_per_day"] == 3
+        assert statistics["total_training_days"] == 2
+        assert [h["training_date"] for h in statistics["history"]] == ["2026-03-02", "2026-03-01"]
+        assert statistics["history"][0]["sets"] == sets
+
+    def test_memoized_until_invalidated(self, monkeypatch):
+        """Повторный запрос отдается из кэша; сброс по пользователю вызывает новый запрос"""
+        sessions = self._patch(monkeypatch, [])
+        empty = self._get()
+        assert empty["history"] == [] and empty["max_sets_per_day"] == 0
+        self._get()
+        assert len(sessions) == 1
+        self._get(limit=5)
+        assert len(sessions) == 2
+        ExerciseReferenceDAO.invalidate_exercise_statistics(7)
+        self._get()
+        assert len(sessions) == 3
+
+    def test_unknown_reference(self, monkeypatch):
+        """Для несуществующего упражнения возвращается None и ничего не кэшируется"""
+        sessions = self._patch(monkeypatch, [], reference_exists=False)
+        assert self._get() is None
+        assert self._get() is None
+        assert len(sessions) == 2
@@ -0,0 +1,86 @@
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+import app.exercise_reference.dao as exercise_reference_dao
+from app.exercise_reference.dao import ExerciseReferenceDAO
+from app.exercise_reference.models import ExerciseReference
+
+
+class RecordingResult:
+    rowcount = 0
+
+
+class RecordingSession:
+    """Сессия, которая только компилирует выполняемые запросы"""
+
+    def __init__(self):
+        self.statements = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def begin(self):
+        return self
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return RecordingResult()
+
+
+def _compile(query) -> str:
+    return str(query.compile(dialect=postgresql.dialect()))
+
+
+class TestPopularitySorting:
+    """Тесты сортировки справочника по избранным и популярности"""
+
+    def test_favorites_by_left_join(self):
+        """Избранное подключается одним LEFT JOIN, популярность — колонка usage_count"""
+        sql = _compile(ExerciseReferenceDAO._add_sorting_by_favorite_and_popularity(select(ExerciseReference), 7))
+        assert "LEFT OUTER JOIN user_favorite_exercises ON" in sql
+        assert "user_favorite_exercises.user_id = %(user_id_1)s" in sql
+        assert "ORDER BY user_favorite_exercises.id IS NULL, exercise_reference.usage_count DESC, exercise_reference.id" in sql
+        assert "count(" not in sql
+
+    def test_popularity_only(self):
+        """Без пользователя сортировка идёт только по usage_count"""
+        sql = _compile(ExerciseReferenceDAO._add_sorting_by_favorite_and_popularity(select(ExerciseReference)))
+        assert "JOIN" not in sql
+        assert "ORDER BY exercise_reference.usage_count DESC, exercise_reference.id" in sql
+
+    def test_usage_count_indexed(self):
+        """Для сортировки по популярности есть индекс"""
+        indexes = {i.name: [c.name for c in i.columns] for i in ExerciseReference.__table__.indexes}
+        assert indexes["ix_exercise_reference_usage_count"] == ["usage_count"]
+
+
+class TestRefreshUsageCounts:
+    """Тесты пересчета usage_count"""
+
+    def _run(self, monkeypatch, ids=None):
+        session = RecordingSession()
+        monkeypatch.setattr(exercise_reference_dao, "async_session_maker", lambda: session)
+        asyncio.run(ExerciseReferenceDAO.refresh_usage_counts(ids))
+        return session.statements
+
+    def test_recount_changed_rows_only(self, monkeypatch):
+        """Пересчет одним UPDATE, только для строк с изменившимся счетчиком, без смены updated_at"""
+        (sql,) = self._run(monkeypatch)
+        assert sql.startswith("UPDATE exercise_reference SET usage_count=(SELECT count(exercise.id)")
+        assert "updated_at=exercise_reference.updated_at" in sql
+        assert "IS DISTINCT FROM" in sql
+        assert "IN (" not in sql
+
+    def test_recount_selected_references(self, monkeypatch):
+        """Можно пересчитать только указанные упражнения справочника"""
+        (sql,) = self._run(monkeypatch, {3, None})
+        assert "exercise_reference.id IN (__[POSTCOMPILE_id_1])" in sql
+
+    def test_nothing_to_recount(self, monkeypatch):
+        """Пустой набор id не выполняет запросов"""
+        assert self._run(monkeypatch, {None}) == []
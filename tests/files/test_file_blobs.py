@@ -0,0 +1,174 @@
+import asyncio
+
+from sqlalchemy.dialects import postgresql
+
+from app.files import dao as dao_module
+from app.files.dao import FilesDAO
+
+
+class Result:
+    def __init__(self, row=None, scalar=None):
+        self.row = row
+        self.scalar = scalar
+
+    def one_or_none(self):
+        return self.row
+
+    def scalar_one(self):
+        return self.scalar
+
+    def scalar_one_or_none(self):
+        return self.scalar
+
+
+class Row:
+    def __init__(self, ref_count, file_path):
+        self.ref_count = ref_count
+        self.file_path = file_path
+
+
+class BlobSession:
+    """Сессия, которая компилирует запросы и отвечает остатком ref_count"""
+
+    def __init__(self, ref_counts):
+        self.ref_counts = ref_counts
+        self.statements = []
+
+    async def execute(self, statement):
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.statements.append(sql)
+        if sql.startswith("UPDATE file_blobs"):
+            blob_id = statement.compile().params["id_1"]
+            return Result(Row(self.ref_counts[blob_id], f"uploads/{blob_id}"))
+        return Result(scalar=1)
+
+
+class TestReleaseBlobs:
+    """Тесты освобождения содержимого при удалении записей File"""
+
+    def _run(self, ref_counts, blob_ids, monkeypatch):
+        removed = []
+        monkeypatch.setattr(dao_module, "_remove_blob_files", removed.extend)
+        session = BlobSession(ref_counts)
+        paths = asyncio.run(FilesDAO._release_blobs(session, blob_ids))
+        return session.statements, paths, removed
+
+    def test_blob_kept_while_referenced(self, monkeypatch):
+        """Пока на содержимое есть ссылки, файл на диске остается"""
+        statements, paths, removed = self._run({5: 2}, [5], monkeypatch)
+        assert statements[0].startswith("UPDATE file_blobs SET ref_count=(file_blobs.ref_count - %(ref_count_1)s::INTEGER)")
+        assert len(statements) == 1
+        assert paths == removed == []
+
+    def test_last_reference_removes_blob(self, monkeypatch):
+        """Последняя ссылка удаляет строку FileBlob и файл на диске"""
+        statements, paths, removed = self._run({5: 0}, [5], monkeypatch)
+        assert statements[1].startswith("DELETE FROM file_blobs WHERE file_blobs.id")
+        assert paths == removed == ["uploads/5"]
+
+    def test_legacy_files_without_blob_ignored(self, monkeypatch):
+        """Старые файлы без blob_id не трогают хранилище"""
+        statements, paths, removed = self._run({}, [None, None], monkeypatch)
+        assert statements == [] and paths == [] and removed == []
+
+    def test_references_released_in_one_update(self, monkeypatch):
+        """Несколько записей с одним содержимым уменьшают ref_count одним запросом"""
+        statements, _, _ = self._run({5: 1, 7: 0}, [7, 5, 7], monkeypatch)
+        updates = [s for s in statements if s.startswith("UPDATE")]
+        assert len(updates) == 2
+
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class RecordingSessionMaker:
+    """async_session_maker, сессии которого пишут скомпилированные запросы в общий список"""
+
+    def __init__(self, file_exists=True):
+        self.statements = []
+        self.file_exists = file_exists
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def begin(self):
+        return FakeTransaction()
+
+    async def execute(self, statement):
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.statements.append(sql)
+        if sql.startswith("UPDATE file_blobs"):
+            return Result(Row(0, "uploads/old"))
+        if "FOR UPDATE" in sql and not self.file_exists:
+            return Result()
+        return Result(scalar=len(self.statements))
+
+
+class TestAddWithBlob:
+    """Тесты создания записи File со ссылкой на содержимое"""
+
+    def test_blob_upserted_then_stored_in_transaction(self, monkeypatch):
+        """Содержимое создается или получает +1 к ref_count, файл кладется до коммита"""
+        maker = RecordingSessionMaker()
+        monkeypatch.setattr("app.database.async_session_maker", maker)
+        stored = []
+
+        async def store_blob():
+            stored.append(len(maker.statements))
+
+        file_uuid = asyncio.run(FilesDAO.add_with_blob(
+            sha256="a" * 64, blob_path="uploads/aa/aa/" + "a" * 64, store_blob=store_blob,
+            file_size=10, filename="a.png", mime_type="image/png", entity_type="user", entity_id=1,
+        ))
+        upsert, insert = maker.statements
+        assert "ON CONFLICT (sha256) DO UPDATE SET ref_count = (file_blobs.ref_count + %(ref_count_1)s::INTEGER)" in upsert
+        assert insert.startswith("INSERT INTO files") and "blob_id" in insert
+        assert stored == [2]
+        assert file_uuid == 2
+
+
+class TestSwapBlob:
+    """Тесты подмены содержимого записи File (перекодированное видео)"""
+
+    def _swap(self, monkeypatch, file_exists=True):
+        maker = RecordingSessionMaker(file_exists=file_exists)
+        monkeypatch.setattr("app.database.async_session_maker", maker)
+        monkeypatch.setattr(dao_module, "_remove_blob_files", lambda paths: None)
+        stored = []
+
+        async def store_blob():
+            stored.append(True)
+
+        swapped = asyncio.run(FilesDAO.swap_blob(
+            file_id=7, old_blob_id=3, sha256="b" * 64, blob_path="uploads/bb/bb/" + "b" * 64,
+            store_blob=store_blob, file_size=10, mime_type="video/mp4",
+        ))
+        return swapped, maker.statements, stored
+
+    def test_swaps_and_releases_old_blob(self, monkeypatch):
+        """Запись блокируется, получает новое содержимое, старое освобождается"""
+        swapped, statements, stored = self._swap(monkeypatch)
+        assert swapped is True and stored == [True]
+        assert statements[0].endswith("FOR UPDATE")
+        assert "files.blob_id = %(blob_id_1)s::INTEGER" in statements[0]
+        assert statements[1].startswith("INSERT INTO file_blobs")
+        assert statements[2].startswith("UPDATE files SET")
+        assert statements[3].startswith("UPDATE file_blobs SET ref_count=(file_blobs.ref_count -")
+        assert statements[4].startswith("DELETE FROM file_blobs")
+
+    def test_skipped_when_file_replaced(self, monkeypatch):
+        """Удаленная или замененная запись не трогается"""
+        swapped, statements, stored = self._swap(monkeypatch, file_exists=False)
+        assert swapped is False and stored == []
+        assert len(statements) == 1
@@ -0,0 +1,135 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.files import serving
+from app.files.dao import FilesDAO
+from app.files.router import router
+from app.files.service import FileService
+from app.users.dependencies import get_current_user_or_valid_anonymous_session
+
+SHA256 = "ab" * 32
+
+
+class Lookups(list):
+    """UUID, по которым DAO обращался к БД (records — записи files)"""
+
+
+@pytest.fixture
+def stored(tmp_path, monkeypatch):
+    """Файл в хранилище по хэшу и DAO, который считает обращения к БД"""
+    monkeypatch.setattr(FileService, "UPLOAD_DIR", str(tmp_path))
+    blob_path = FileService.blob_path(SHA256)
+    blob_path.parent.mkdir(parents=True)
+    blob_path.write_bytes(b"0123456789")
+
+    records = {
+        "image-uuid": SimpleNamespace(
+            uuid="image-uuid", file_path=str(blob_path), filename="squat.jpg", mime_type="image/jpeg",
+            entity_type="exercise", entity_id=5, processing_status=None,
+        ),
+        "avatar-uuid": SimpleNamespace(
+            uuid="avatar-uuid", file_path=str(blob_path), filename="me.jpg", mime_type="image/jpeg",
+            entity_type="user", entity_id=2, processing_status=None,
+        ),
+        "video-uuid": SimpleNamespace(
+            uuid="video-uuid", file_path=str(blob_path), filename="squat.mov", mime_type="video/quicktime",
+            entity_type="exercise", entity_id=5, processing_status="pending",
+        ),
+    }
+    lookups = Lookups()
+
+    async def find_by_uuid(file_uuid):
+        lookups.append(file_uuid)
+        return records.get(file_uuid)
+
+    monkeypatch.setattr(FilesDAO, "find_by_uuid", find_by_uuid)
+    serving.invalidate_file_meta()
+    lookups.records = records
+    yield lookups
+    serving.invalidate_file_meta()
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_current_user_or_valid_anonymous_session] = lambda: SimpleNamespace(id=1)
+    return TestClient(app)
+
+
+class TestFileServing:
+    """Тесты отдачи файлов по UUID"""
+
+    def test_metadata_cached_per_worker(self, stored, client):
+        """Повторный запрос не обращается к БД"""
+        assert client.get("/files/file/image-uuid").status_code == 200
+        assert client.get("/files/file/image-uuid").status_code == 200
+        assert stored == ["image-uuid"]
+
+    def test_immutable_with_content_etag(self, stored, client):
+        """Ответ кэшируется клиентом навсегда, ETag — хэш содержимого"""
+        response = client.get("/files/file/image-uuid")
+        assert response.content == b"0123456789"
+        assert response.headers["etag"] == f'"{SHA256}"'
+        assert "immutable" in response.headers["cache-control"]
+
+    def test_not_modified(self, stored, client):
+        """Совпадение If-None-Match — 304 без тела"""
+        response = client.get("/files/file/image-uuid", headers={"If-None-Match": f'"{SHA256}"'})
+        assert response.status_code == 304
+        assert response.content == b""
+
+    def test_range_for_seeking(self, stored, client):
+        """Range отдает часть файла"""
+        response = client.get("/files/file/image-uuid", headers={"Range": "bytes=2-5"})
+        assert response.status_code == 206
+        assert response.content == b"2345"
+        assert response.headers["content-range"] == "bytes 2-5/10"
+
+    def test_pending_video_revalidated(self, stored, client):
+        """Видео до перекодирования не кэшируется как неизменное"""
+        response = client.get("/files/file/video-uuid")
+        assert response.headers["cache-control"] == serving.REVALIDATE_CACHE_CONTROL
+
+    def test_foreign_avatar_forbidden_from_cache(self, stored, client):
+        """Проверка доступа выполняется и для закэшированных метаданных"""
+        assert client.get("/files/file/avatar-uuid").status_code == 403
+        assert client.get("/files/file/avatar-uuid").status_code == 403
+        assert stored == ["avatar-uuid"]
+
+    def test_missing_file(self, stored, client):
+        """Неизвестный UUID — 404"""
+        assert client.get("/files/file/unknown").status_code == 404
+
+    def test_x_accel_redirect(self, stored, client, monkeypatch):
+        """С X-Accel-Redirect байты отдает Nginx, приложение возвращает только заголовки"""
+        monkeypatch.setattr(serving, "X_ACCEL_REDIRECT_ENABLED", True)
+        response = client.get("/files/file/image-uuid")
+        assert response.status_code == 200
+        assert response.content == b""
+        assert response.headers["x-accel-redirect"] == f"/protected-uploads/ab/ab/{SHA256}"
+        assert response.headers["content-type"] == "image/jpeg"
+        assert response.headers["etag"] == f'"{SHA256}"'
+
+    def test_swapped_in_other_worker(self, stored, client, tmp_path):
+        """Файл из кэша удален другим воркером (подмена содержимого) — запись перечитывается"""
+        assert client.get("/files/file/image-uuid").content == b"0123456789"
+        new_path = tmp_path / "new.jpg"
+        new_path.write_bytes(b"new")
+        os.remove(stored.records["image-uuid"].file_path)
+        stored.records["image-uuid"].file_path = str(new_path)
+
+        response = client.get("/files/file/image-uuid")
+        assert response.status_code == 200
+        assert response.content == b"new"
+        assert stored == ["image-uuid", "image-uuid"]
+
+    def test_deleted_in_other_worker(self, stored, client):
+        """Файл из кэша удален вместе с записью — 404, а не ошибка отдачи"""
+        assert client.get("/files/file/image-uuid").status_code == 200
+        os.remove(stored.records.pop("image-uuid").file_path)
+        assert client.get("/files/file/image-uuid").status_code == 404
@@ -0,0 +1,122 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.files import images
+from app.files.service import FileService
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(FileService, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Генерация в потоке вместо процесса: записывает вызовы и создает пустой вариант"""
+    calls = []
+
+    def render(source_path, target_path, width, image_format):
+        calls.append((source_path, width, image_format))
+        target = images.Path(target_path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(b"variant")
+        return target_path
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(images, "render_variant", render)
+    monkeypatch.setattr(images, "get_image_executor", lambda: executor)
+    yield calls
+    executor.shutdown()
+
+
+class TestVariantSelection:
+    """Тесты выбора варианта изображения"""
+
+    def test_nearest_width(self):
+        """Берется наименьший вариант не уже запрошенного, иначе самый широкий"""
+        assert images.nearest_width(100) == 128
+        assert images.nearest_width(128) == 128
+        assert images.nearest_width(300) == 512
+        assert images.nearest_width(3000) == 1024
+
+    def test_webp_only_when_accepted(self):
+        """WebP отдается только клиентам, которые его принимают"""
+        assert images.preferred_format("image/avif,image/webp,*/*") == "webp"
+        assert images.preferred_format("*/*") == "jpeg"
+        assert images.preferred_format(None) == "jpeg"
+
+    def test_variant_path_keyed_by_source_name(self, upload_dir):
+        """Вариант лежит в кэше по имени исходного файла"""
+        sha256 = "ab" * 32
+        path = images.variant_path(f"uploads/ab/ab/{sha256}", 128, "webp")
+        assert path == upload_dir / "variants" / "ab" / f"{sha256}_128.webp"
+
+
+class TestImageVariantCache:
+    """Тесты ленивой генерации и дискового кэша вариантов"""
+
+    def test_generated_once_then_served_from_disk(self, upload_dir, renders):
+        """Вариант генерируется при первом запросе и дальше берется с диска"""
+        async def request_twice():
+            first = await images.get_image_variant("uploads/a.png", "image/png", 100, "image/webp")
+            second = await images.get_image_variant("uploads/a.png", "image/png", 120, "image/webp")
+            return first, second
+
+        first, second = asyncio.run(request_twice())
+        assert first == second == (images.variant_path("uploads/a.png", 128, "webp"), "image/webp")
+        assert renders == [("uploads/a.png", 128, "webp")]
+
+    def test_concurrent_requests_share_generation(self, upload_dir, renders):
+        """Параллельные запросы одного варианта ждут одну генерацию"""
+        async def request_concurrently():
+            return await asyncio.gather(*[
+                images.get_image_variant("uploads/a.jpg", "image/jpeg", 500, None) for _ in range(5)
+            ])
+
+        results = asyncio.run(request_concurrently())
+        assert len(set(results)) == 1
+        assert renders == [("uploads/a.jpg", 512, "jpeg")]
+
+    def test_original_served_for_video_and_gif(self, upload_dir, renders):
+        """Видео и GIF отдаются как есть"""
+        assert asyncio.run(images.get_image_variant("uploads/a.mp4", "video/mp4", 128, None)) is None
+        assert asyncio.run(images.get_image_variant("uploads/a.gif", "image/gif", 128, None)) is None
+        assert renders == []
+
+    def test_original_served_when_generation_fails(self, upload_dir, monkeypatch):
+        """Ошибка генерации не ломает запрос — отдается оригинал"""
+        def broken(*args):
+            raise OSError("битый файл")
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        monkeypatch.setattr(images, "render_variant", broken)
+        monkeypatch.setattr(images, "get_image_executor", lambda: executor)
+        assert asyncio.run(images.get_image_variant("uploads/a.png", "image/png", 128, None)) is None
+        executor.shutdown()
+
+    def test_variants_removed_with_source(self, upload_dir, renders):
+        """Варианты удаляются вместе с исходным файлом"""
+        asyncio.run(images.get_image_variant("uploads/a.png", "image/png", 128, None))
+        images.remove_image_variants("uploads/a.png")
+        assert not any(p.is_file() for p in (upload_dir / "variants").rglob("*"))
+
+
+class TestRenderVariant:
+    """Тесты кодирования варианта"""
+
+    def test_resized_without_metadata(self, tmp_path):
+        """Вариант уменьшается по ширине и сохраняется без EXIF"""
+        Image = pytest.importorskip("PIL.Image")
+        source = tmp_path / "source.jpg"
+        exif = Image.Exif()
+        exif[0x010F] = "camera"
+        Image.new("RGB", (2000, 1000), (200, 10, 10)).save(source, exif=exif)
+
+        target = tmp_path / "variant.webp"
+        images.render_variant(str(source), str(target), 512, "webp")
+        with Image.open(target) as variant:
+            assert variant.size == (512, 256)
+            assert not variant.getexif()
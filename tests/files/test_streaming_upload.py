@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import io
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+from app.files import service as service_module
+from app.files.service import FileService
+
+
+class FakeFilesDAO:
+    """DAO, который запоминает созданные записи вместо записи в БД"""
+
+    def __init__(self, fail=False):
+        self.added = []
+        self.fail = fail
+
+    async def add_with_blob(self, sha256, blob_path, store_blob, **values):
+        if self.fail:
+            raise RuntimeError("БД недоступна")
+        await store_blob()
+        self.added.append(dict(values, sha256=sha256, file_path=blob_path))
+        return "file-uuid"
+
+    async def find_full_data(self, file_uuid):
+        return SimpleNamespace(**self.added[-1])
+
+
+def make_upload(content: bytes, filename="clip.mp4", content_type="video/mp4", size=None):
+    return UploadFile(
+        file=io.BytesIO(content),
+        filename=filename,
+        size=size,
+        headers=Headers({"content-type": content_type}),
+    )
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(FileService, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(FileService, "UPLOAD_CHUNK_SIZE", 1024)
+    return tmp_path
+
+
+@pytest.fixture
+def dao(monkeypatch):
+    fake = FakeFilesDAO()
+    fake.scheduled = []
+    monkeypatch.setattr(service_module, "FilesDAO", fake)
+    monkeypatch.setattr(service_module, "schedule_image_variants", lambda *args: fake.scheduled.append(args))
+    return fake
+
+
+class TestStreamingUpload:
+    """Тесты потоковой загрузки файлов"""
+
+    def test_file_saved_by_chunks_with_hash(self, upload_dir, dao):
+        """Файл из нескольких чанков сохраняется целиком, sha256 считается по содержимому"""
+        content = bytes(range(256)) * 20
+        temp_path, file_size, sha256 = asyncio.run(FileService._stream_upload(make_upload(content)))
+        assert temp_path.parent == upload_dir
+        assert temp_path.read_bytes() == content
+        assert file_size == len(content)
+        assert sha256 == hashlib.sha256(content).hexdigest()
+
+    def test_size_limit_enforced_mid_stream(self, upload_dir, monkeypatch):
+        """Превышение лимита по ходу чтения — 413, временный файл удаляется"""
+        monkeypatch.setattr(FileService, "MAX_FILE_SIZE", 2048)
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(FileService._stream_upload(make_upload(b"x" * 5000)))
+        assert exc.value.status_code == 413
+        assert list(upload_dir.iterdir()) == []
+
+    def test_declared_size_rejected_before_reading(self, upload_dir, monkeypatch):
+        """Заранее известный размер больше лимита отклоняется без чтения"""
+        monkeypatch.setattr(FileService, "MAX_FILE_SIZE", 10)
+        upload = make_upload(b"x" * 5, size=100)
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(FileService._stream_upload(upload))
+        assert exc.value.status_code == 413
+        assert upload.file.tell() == 0
+
+    def test_save_video_creates_record(self, upload_dir, dao):
+        """save_video_file сохраняет видео и создает запись с реальным размером"""
+        result = asyncio.run(FileService.save_video_file(make_upload(b"video" * 100), "exercise", 1))
+        assert result.file_size == 500
+        assert result.mime_type == "video/mp4"
+        assert result.entity_type == "exercise"
+        assert dao.scheduled == []
+
+    def test_file_removed_when_record_fails(self, upload_dir, dao, monkeypatch):
+        """Если запись в БД не создалась, временный файл удаляется"""
+        monkeypatch.setattr(service_module, "FilesDAO", FakeFilesDAO(fail=True))
+        upload = make_upload(b"\x89PNG" * 10, filename="a.png", content_type="image/png")
+        with pytest.raises(RuntimeError):
+            asyncio.run(FileService.save_file(upload, "user", 1))
+        assert list(upload_dir.iterdir()) == []
+
+
+class TestContentAddressedStorage:
+    """Тесты хранения загрузок по хэшу содержимого"""
+
+    def test_blob_path_sharded_by_hash(self, upload_dir):
+        """Содержимое лежит в uploads/ab/cd/<sha256>"""
+        sha256 = hashlib.sha256(b"avatar").hexdigest()
+        assert FileService.blob_path(sha256) == upload_dir / sha256[:2] / sha256[2:4] / sha256
+
+    def test_identical_uploads_share_blob(self, upload_dir, dao):
+        """Одинаковые загрузки хранятся на диске одним файлом"""
+        content = b"\x89PNG" * 100
+        for entity_id in (1, 2):
+            upload = make_upload(content, filename=f"{entity_id}.png", content_type="image/png")
+            asyncio.run(FileService.save_file(upload, "program", entity_id))
+        sha256 = hashlib.sha256(content).hexdigest()
+        assert [r["sha256"] for r in dao.added] == [sha256, sha256]
+        assert {r["file_path"] for r in dao.added} == {str(FileService.blob_path(sha256))}
+        files = [p for p in upload_dir.rglob("*") if p.is_file()]
+        assert files == [FileService.blob_path(sha256)]
+        assert files[0].read_bytes() == content
+        assert dao.scheduled == [(str(FileService.blob_path(sha256)), "image/png")] * 2
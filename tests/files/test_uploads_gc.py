@@ -0,0 +1,139 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.files import gc
+from app.files.images import variant_path
+from app.files.service import FileService
+
+OLD = time.time() - gc.GC_GRACE_SECONDS - 60
+
+
+def write(path, content=b"x", mtime=OLD):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    """uploads во временной директории и БД из множества путей"""
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    monkeypatch.setattr(FileService, "UPLOAD_DIR", str(upload_dir))
+    referenced = set()
+
+    async def stream(prefix):
+        for path in sorted(referenced):
+            yield path
+
+    async def still_unreferenced(paths):
+        return [p for p in paths if p not in referenced]
+
+    monkeypatch.setattr(gc, "_stream_referenced_paths", stream)
+    monkeypatch.setattr(gc, "_still_unreferenced", still_unreferenced)
+    return upload_dir, referenced
+
+
+class TestSortedWalk:
+    """Тесты обхода директории загрузок"""
+
+    def test_walk_matches_path_order(self, tmp_path):
+        """Порядок обхода совпадает с сортировкой полных путей (как ORDER BY COLLATE "C")"""
+        for name in ("ab.jpg", "ab/cd/ff", "ab/cd/00", ".tmp.part", "b", "a-b"):
+            write(tmp_path / name)
+        paths = [entry.path for entry in gc.walk_sorted(str(tmp_path))]
+        assert len(paths) == 6
+        assert paths == sorted(paths)
+
+    def test_referenced_paths_in_byte_order(self):
+        """Пути из БД читаются в побайтовом порядке"""
+        sql = str(gc._referenced_paths_query("uploads/").compile(dialect=postgresql.dialect()))
+        assert "UNION" in sql
+        assert sql.endswith('ORDER BY anon_1.file_path COLLATE "C"')
+
+
+class TestMergeJoin:
+    """Тесты слияния диска и БД"""
+
+    def test_merge(self):
+        """Совпадения, файлы без записей и записи без файлов"""
+        async def disk():
+            for path in ("a", "c", "d"):
+                yield gc.DiskEntry(path, 1, OLD)
+
+        async def db():
+            for path in ("b", "c", "e"):
+                yield path
+
+        async def collect():
+            return [(e.path if e else None, p) async for e, p in gc.merge_join(disk(), db())]
+
+        assert asyncio.run(collect()) == [("a", None), (None, "b"), ("c", "c"), ("d", None), (None, "e")]
+
+
+class TestCollectGarbage:
+    """Тесты сборки мусора"""
+
+    def test_orphans_quarantined(self, uploads):
+        """Старые файлы без записей уходят в карантин, остальные остаются"""
+        upload_dir, referenced = uploads
+        kept = write(FileService.blob_path("ab" * 32), b"kept")
+        orphan = write(FileService.blob_path("cd" * 32), b"orphan")
+        legacy_orphan = write(upload_dir / "old.jpg", b"legacy")
+        recent = write(upload_dir / ".upload.part", b"recent", mtime=time.time())
+        referenced.update({str(kept), str(upload_dir / "gone.jpg")})
+
+        report = asyncio.run(gc.collect_garbage())
+        assert kept.exists() and recent.exists()
+        assert not orphan.exists() and not legacy_orphan.exists()
+        quarantine = upload_dir / gc.QUARANTINE_SUBDIR / datetime.utcnow().date().isoformat()
+        assert (quarantine / os.path.relpath(orphan, upload_dir)).read_bytes() == b"orphan"
+        assert report["orphan_files"] == 2
+        assert report["orphan_bytes"] == report["quarantined_bytes"] == len(b"orphan") + len(b"legacy")
+        assert report["referenced_files"] == 1
+        assert report["recent_unreferenced_files"] == 1
+        assert report["missing_files"] == 1
+        assert report["missing_sample"] == [str(upload_dir / "gone.jpg")]
+
+    def test_orphan_variants_removed(self, uploads):
+        """Варианты без исходного файла удаляются, остальные остаются"""
+        upload_dir, referenced = uploads
+        source = write(FileService.blob_path("ab" * 32))
+        referenced.add(str(source))
+        kept = write(variant_path(str(source), 128, "webp"))
+        orphan = write(variant_path(str(FileService.blob_path("cd" * 32)), 128, "webp"), b"12345")
+
+        report = asyncio.run(gc.collect_garbage())
+        assert kept.exists() and not orphan.exists()
+        assert report["orphan_variants"] == 1
+        assert report["reclaimed_bytes"] == 5
+
+    def test_old_quarantine_purged(self, uploads):
+        """Карантин старше QUARANTINE_DAYS удаляется, его размер — освобожденное место"""
+        upload_dir, _ = uploads
+        old_day = (datetime.utcnow().date() - timedelta(days=gc.QUARANTINE_DAYS + 1)).isoformat()
+        fresh_day = datetime.utcnow().date().isoformat()
+        write(upload_dir / gc.QUARANTINE_SUBDIR / old_day / "ab" / "cd" / "x", b"1234")
+        fresh = write(upload_dir / gc.QUARANTINE_SUBDIR / fresh_day / "y", b"1")
+
+        report = asyncio.run(gc.collect_garbage())
+        assert not (upload_dir / gc.QUARANTINE_SUBDIR / old_day).exists()
+        assert fresh.exists()
+        assert report["purged_files"] == 1
+        assert report["reclaimed_bytes"] == 4
+        assert report["scanned_files"] == 0
+
+    def test_dry_run_changes_nothing(self, uploads):
+        """Пробный запуск только считает"""
+        upload_dir, _ = uploads
+        orphan = write(upload_dir / "old.jpg", b"legacy")
+        report = asyncio.run(gc.collect_garbage(dry_run=True))
+        assert orphan.exists()
+        assert report["orphan_files"] == 1
+        assert report["quarantined_bytes"] == 0
@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+from types import SimpleNamespace
+
+import pytest
+
+from app.files import transcode
+from app.files.images import poster_path
+from app.files.service import FileService
+
+
+class FakeFilesDAO:
+    """DAO перекодирования: захват, подмена содержимого и статусы в памяти"""
+
+    def __init__(self, claimed=True, swapped=True):
+        self.claimed = claimed
+        self.swapped = swapped
+        self.swaps = []
+        self.statuses = []
+
+    async def claim_processing(self, file_id, from_status, to_status):
+        if not self.claimed:
+            return None
+        return SimpleNamespace(id=file_id, uuid="video-uuid", file_path="uploads/source.mov", blob_id=3, filename="squat.mov")
+
+    async def swap_blob(self, store_blob, **values):
+        self.swaps.append(values)
+        if self.swapped:
+            await store_blob()
+        return self.swapped
+
+    async def set_processing_status(self, file_id, status):
+        self.statuses.append((file_id, status))
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(FileService, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def ffmpeg(monkeypatch):
+    """ffmpeg, который пишет в выходной файл содержимое по имени команды"""
+    commands = []
+
+    async def run(command, timeout=None):
+        commands.append(command)
+        output = command[-1]
+        with open(output, "wb") as f:
+            f.write(b"poster" if "thumbnail" in " ".join(command) else b"faststart-mp4")
+
+    monkeypatch.setattr(transcode, "run_ffmpeg", run)
+    return commands
+
+
+def use_dao(monkeypatch, dao):
+    monkeypatch.setattr("app.files.dao.FilesDAO", dao)
+    return dao
+
+
+class TestCommands:
+    """Тесты параметров ffmpeg"""
+
+    def test_transcode_is_faststart_h264_with_capped_bitrate(self):
+        """Видео перекодируется в H.264 MP4 с moov-атомом в начале и ограниченным битрейтом"""
+        command = transcode.transcode_command("in.mov", "out.part")
+        assert command[command.index("-c:v") + 1] == "libx264"
+        assert command[command.index("-movflags") + 1] == "+faststart"
+        assert command[command.index("-maxrate") + 1] == transcode.VIDEO_MAX_BITRATE
+        assert command[command.index("-threads") + 1] == str(transcode.TRANSCODE_THREADS)
+        assert command[-3:] == ["-f", "mp4", "out.part"]
+
+    def test_poster_is_single_jpeg_frame(self):
+        """Постер — один кадр в JPEG"""
+        command = transcode.poster_command("in.mp4", "poster.part")
+        assert command[command.index("-frames:v") + 1] == "1"
+        assert command[-3:] == ["-f", "image2", "poster.part"]
+
+
+class TestProcessTranscode:
+    """Тесты перекодирования одного файла"""
+
+    def test_rendition_swapped_in(self, upload_dir, ffmpeg, monkeypatch):
+        """Готовое видео кладется в хранилище по хэшу и подменяет содержимое записи"""
+        dao = use_dao(monkeypatch, FakeFilesDAO())
+        assert asyncio.run(transcode.process_transcode(7)) is True
+
+        sha256 = hashlib.sha256(b"faststart-mp4").hexdigest()
+        blob_path = FileService.blob_path(sha256)
+        swap = dao.swaps[0]
+        assert swap["file_id"] == 7 and swap["old_blob_id"] == 3
+        assert swap["blob_path"] == str(blob_path)
+        assert swap["filename"] == "squat.mp4"
+        assert swap["mime_type"] == "video/mp4"
+        assert swap["processing_status"] == transcode.TRANSCODE_READY
+        assert blob_path.read_bytes() == b"faststart-mp4"
+        assert poster_path(str(blob_path)).read_bytes() == b"poster"
+        assert not list(upload_dir.glob(".*.part"))
+
+    def test_deleted_file_not_swapped(self, upload_dir, ffmpeg, monkeypatch):
+        """Если запись удалили во время перекодирования, результат выбрасывается"""
+        use_dao(monkeypatch, FakeFilesDAO(swapped=False))
+        assert asyncio.run(transcode.process_transcode(7)) is False
+        assert [p for p in upload_dir.rglob("*") if p.is_file()] == []
+
+    def test_failure_marks_file_failed(self, upload_dir, monkeypatch):
+        """Ошибка ffmpeg помечает файл failed, оригинал остается"""
+        async def broken(command, timeout=None):
+            raise RuntimeError("ffmpeg завершился с кодом 1")
+
+        monkeypatch.setattr(transcode, "run_ffmpeg", broken)
+        dao = use_dao(monkeypatch, FakeFilesDAO())
+        assert asyncio.run(transcode.process_transcode(7)) is False
+        assert dao.statuses == [(7, transcode.TRANSCODE_FAILED)]
+        assert dao.swaps == []
+
+    def test_claimed_file_skipped(self, upload_dir, ffmpeg, monkeypatch):
+        """Файл, захваченный другим воркером, не перекодируется повторно"""
+        use_dao(monkeypatch, FakeFilesDAO(claimed=False))
+        assert asyncio.run(transcode.process_transcode(7)) is False
+        assert ffmpeg == []
+
+
+class TestQueue:
+    """Тесты очереди перекодирования"""
+
+    def test_queue_is_bounded(self, monkeypatch):
+        """Переполненная очередь не принимает задачи — файл ждет периодического прохода"""
+        async def fill():
+            monkeypatch.setattr(transcode, "_queue", asyncio.Queue(maxsize=1))
+            return transcode.enqueue_transcode(1), transcode.enqueue_transcode(2)
+
+        assert asyncio.run(fill()) == (True, False)
+
+    def test_disabled_without_workers(self, monkeypatch):
+        """Без запущенной очереди (нет ffmpeg) задачи не ставятся"""
+        monkeypatch.setattr(transcode, "_queue", None)
+        assert transcode.transcoding_enabled() is False
+        assert transcode.enqueue_transcode(1) is False
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.food_progress import dao as food_progress_dao
+from app.food_progress.dao import MealDAO
+from app.food_progress.models import UserDailyNutrition
+
+
+class Target:
+    target_calories = 2000.0
+    target_proteins = 120.0
+    target_fats = 70.0
+    target_carbs = 220.0
+
+
+class RecordingSession:
+    """Сессия, которая только компилирует выполняемые запросы"""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+
+
+class TestRefreshDay:
+    """Тесты пересчета остатков и сводки за день"""
+
+    def _run(self):
+        session = RecordingSession()
+        asyncio.run(MealDAO._refresh_day(session, 7, date(2026, 3, 1), Target))
+        return session.statements
+
+    def test_day_writes_are_serialized(self):
+        """Пересчет начинается с advisory-блокировки дня пользователя"""
+        statements = self._run()
+        assert "pg_advisory_xact_lock" in statements[0]
+
+    def test_remainders_single_window_update(self):
+        """Остатки считаются одним UPDATE ... FROM с нарастающей суммой"""
+        update = self._run()[1]
+        assert update.startswith("UPDATE meals SET")
+        assert "FROM (SELECT meals.id" in update
+        assert "OVER (ORDER BY meals.meal_datetime, meals.id ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)" in update
+
+    def test_rollup_upsert(self):
+        """Сводка за день обновляется upsert-ом по (user_id, date)"""
+        upsert = self._run()[2]
+        assert upsert.startswith("INSERT INTO user_daily_nutrition")
+        assert "ON CONFLICT ON CONSTRAINT uq_user_daily_nutrition_user_date DO UPDATE" in upsert
+
+    def test_rollup_keyed_by_user_and_date(self):
+        """Ключ сводки — (user_id, date)"""
+        constraints = {c.name: [col.name for col in c.columns] for c in UserDailyNutrition.__table__.constraints if c.name}
+        assert constraints["uq_user_daily_nutrition_user_date"] == ["user_id", "date"]
+
+
+class MealWriteSession(RecordingSession):
+    """Сессия записи приема пищи: первый запрос (_get_for_write) возвращает meal"""
+
+    def __init__(self, meal):
+        super().__init__()
+        self.meal = meal
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def begin(self):
+        return self
+
+    async def flush(self):
+        pass
+
+    async def execute(self, statement):
+        await super().execute(statement)
+        return SimpleNamespace(scalar_one_or_none=lambda: self.meal)
+
+
+class TestUpdateMeal:
+    """Тесты обновления приема пищи"""
+
+    def _update(self, monkeypatch, **values):
+        meal = SimpleNamespace(user_id=7, meal_datetime=datetime(2026, 3, 1, 9, 0), name="Завтрак", calories=400.0)
+        monkeypatch.setattr(food_progress_dao, "async_session_maker", lambda: MealWriteSession(meal))
+        asyncio.run(MealDAO.update_meal("meal-uuid", Target, **values))
+        return meal
+
+    def test_explicit_null_clears_optional_field(self, monkeypatch):
+        """Явный null очищает необязательное поле"""
+        meal = self._update(monkeypatch, name=None)
+        assert meal.name is None
+        assert meal.calories == 400.0
+
+    def test_null_for_required_field_rejected(self, monkeypatch):
+        """null для обязательного поля — 400, запись не меняется"""
+        with pytest.raises(HTTPException) as exc_info:
+            self._update(monkeypatch, calories=None)
+        assert exc_info.value.status_code == 400
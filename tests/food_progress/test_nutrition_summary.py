@@ -0,0 +1,157 @@
+import asyncio
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.food_progress import dao as food_progress_dao
+from app.food_progress.dao import UserDailyNutritionDAO
+from app.food_progress.router import _build_summary_periods, _etag_matches
+from app.main import app
+
+client = TestClient(app)
+
+
+class Target:
+    target_calories = 2000.0
+    target_proteins = 100.0
+    target_fats = 70.0
+    target_carbs = 250.0
+
+
+def _row(period_start, calories):
+    return {
+        "period_start": period_start,
+        "calories": calories,
+        "proteins": 10.0,
+        "fats": 5.0,
+        "carbs": 20.0,
+        "meals_count": 2,
+        "days_with_meals": 1,
+    }
+
+
+class TestNutritionSummaryPeriods:
+    """Тесты построения рядов сводки КБЖУ"""
+
+    def test_days_are_continuous(self):
+        """Дни без приемов пищи заполняются нулями"""
+        periods = _build_summary_periods([_row(date(2026, 3, 2), 1500.0)], date(2026, 3, 1), date(2026, 3, 3), "day", Target)
+        assert [p["period_start"] for p in periods] == [date(2026, 3, 1), date(2026, 3, 2), date(2026, 3, 3)]
+        assert [p["eaten_calories"] for p in periods] == [0.0, 1500.0, 0.0]
+        assert all(p["target_calories"] == 2000.0 for p in periods)
+
+    def test_weeks_start_on_monday_and_clip_target(self):
+        """Недели начинаются с понедельника, цель считается по дням внутри диапазона"""
+        # 2026-03-04 — среда
+        periods = _build_summary_periods([], date(2026, 3, 4), date(2026, 3, 10), "week", Target)
+        assert [p["period_start"] for p in periods] == [date(2026, 3, 2), date(2026, 3, 9)]
+        assert [p["days"] for p in periods] == [5, 2]
+        assert periods[0]["target_calories"] == 10000.0
+        assert periods[1]["period_end"] == date(2026, 3, 10)
+
+    def test_months(self):
+        """Месяцы переходят через конец года"""
+        periods = _build_summary_periods([_row(date(2027, 1, 1), 30000.0)], date(2026, 12, 15), date(2027, 1, 31), "month", Target)
+        assert [p["period_start"] for p in periods] == [date(2026, 12, 1), date(2027, 1, 1)]
+        assert [p["days"] for p in periods] == [17, 31]
+        assert periods[1]["eaten_calories"] == 30000.0
+
+
+class SummaryRow:
+    """Строка результата GROUP BY: period приходит из БД уже как date"""
+
+    def __init__(self, period):
+        self.period = period
+        self.calories = 1800.0
+        self.proteins = 90.0
+        self.fats = 60.0
+        self.carbs = 200.0
+        self.meals_count = 3
+        self.days_with_meals = 1
+
+
+class SummaryResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class SummarySession:
+    """Сессия, которая компилирует запрос и отдает заранее заданные строки"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return SummaryResult(self.rows)
+
+
+@pytest.fixture
+def summary_session(monkeypatch):
+    def install(rows):
+        session = SummarySession(rows)
+        monkeypatch.setattr(food_progress_dao, "async_session_maker", lambda: session)
+        return session
+    return install
+
+
+class TestNutritionSummaryQuery:
+    """Тесты ключей периодов в запросе сводки"""
+
+    def _summary(self, summary_session, rows, date_from, date_to, bucket):
+        session = summary_session(rows)
+        result = asyncio.run(UserDailyNutritionDAO.get_summary(7, date_from, date_to, bucket))
+        return session.statements[0], result
+
+    def test_period_cast_to_date_in_sql(self, summary_session):
+        """Начало периода приводится к DATE в SQL, а не берется из timestamptz"""
+        statement, _ = self._summary(summary_session, [], date(2026, 3, 1), date(2026, 3, 31), "week")
+        assert "SELECT CAST(date_trunc(" in statement
+        assert "user_daily_nutrition.date) AS DATE) AS period" in statement
+        assert "GROUP BY CAST(date_trunc(" in statement
+
+    def test_week_key_matches_periods(self, summary_session):
+        """Ключ недели совпадает с началом недели в ряду сводки"""
+        rows = [SummaryRow(date(2026, 3, 9))]
+        _, result = self._summary(summary_session, rows, date(2026, 3, 4), date(2026, 3, 15), "week")
+        assert result[0]["period_start"] == date(2026, 3, 9)
+        periods = _build_summary_periods(result, date(2026, 3, 4), date(2026, 3, 15), "week", Target)
+        assert [p["eaten_calories"] for p in periods] == [0.0, 1800.0]
+
+    def test_month_key_matches_periods(self, summary_session):
+        """Ключ месяца совпадает с началом месяца в ряду сводки"""
+        rows = [SummaryRow(date(2026, 12, 1)), SummaryRow(date(2027, 1, 1))]
+        _, result = self._summary(summary_session, rows, date(2026, 12, 15), date(2027, 1, 31), "month")
+        periods = _build_summary_periods(result, date(2026, 12, 15), date(2027, 1, 31), "month", Target)
+        assert [p["period_start"] for p in periods] == [date(2026, 12, 1), date(2027, 1, 1)]
+        assert [p["eaten_calories"] for p in periods] == [1800.0, 1800.0]
+        assert [p["meals_count"] for p in periods] == [3, 3]
+
+
+class TestNutritionSummaryEtag:
+    """Тесты сравнения ETag"""
+
+    def test_etag_matches(self):
+        """If-None-Match сравнивается с учетом списка значений и слабых ETag"""
+        assert _etag_matches('"abc"', '"abc"')
+        assert _etag_matches('"x", W/"abc"', '"abc"')
+        assert _etag_matches("*", '"abc"')
+        assert not _etag_matches('"x"', '"abc"')
+        assert not _etag_matches(None, '"abc"')
+
+    def test_summary_protection(self):
+        """Эндпоинт сводки требует аутентификации"""
+        response = client.get("/api/food-progress/summary", params={"from": "2026-03-01", "to": "2026-03-31"})
+        assert response.status_code in [401, 403]
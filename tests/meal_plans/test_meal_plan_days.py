@@ -0,0 +1,47 @@
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.main import app
+from app.meal_plans.models import MealPlan
+
+client = TestClient(app)
+
+
+class TestMealPlanDaysEndpoints:
+    """Тесты эндпоинтов чтения отдельных дней программы питания"""
+
+    def test_meal_plan_day_protection(self):
+        """Эндпоинт одного дня требует аутентификации"""
+        response = client.get(f"/api/meal-plans/{uuid4()}/days/1")
+        assert response.status_code in [401, 403]
+
+    def test_meal_plan_days_range_protection(self):
+        """Эндпоинт диапазона дней требует аутентификации"""
+        response = client.get(f"/api/meal-plans/{uuid4()}/days", params={"from_day": 1, "to_day": 3})
+        assert response.status_code in [401, 403]
+
+
+class TestMealPlanJsonbColumns:
+    """Тесты хранения программы питания в JSONB"""
+
+    def test_plan_columns_are_jsonb(self):
+        """target_nutrition и response_data хранятся как JSONB"""
+        columns = MealPlan.__table__.c
+        assert isinstance(columns.target_nutrition.type, postgresql.JSONB)
+        assert isinstance(columns.response_data.type, postgresql.JSONB)
+
+    def test_to_dict_returns_stored_objects(self):
+        """to_dict отдаёт JSONB-поля как есть, без повторного парсинга"""
+        plan_data = {"days": [{"day": 1, "meals": []}]}
+        plan = MealPlan(
+            user_id=1,
+            meals_per_day=3,
+            days_count=1,
+            target_nutrition={"calories": 2000.0},
+            response_data=plan_data,
+        )
+        result = plan.to_dict()
+        assert result["response_data"] == plan_data
+        assert result["target_nutrition"] == {"calories": 2000.0}
@@ -0,0 +1,45 @@
+import random
+import time
+
+import pytest
+
+from app.meal_plans.recipe_index import build_recipe_index
+from app.meal_plans.service import MealPlanService, _generate_day_pairs
+from tests.meal_plans.test_recipe_index import CATALOG
+
+TARGET = {"calories": 2000, "proteins": 140, "fats": 60, "carbs": 200}
+
+
+class TestMealPlanDayPairs:
+    """Тесты для генерации пар дней batch cooking (то, что выполняется в процессах пула)"""
+
+    def test_pair_shares_batches(self):
+        catalog = build_recipe_index(CATALOG).for_user(1)
+        days = MealPlanService._generate_day_pair(catalog, TARGET, day_start=0, days_count=2)
+        assert [idx for idx, _ in days] == [0, 1]
+        first, second = days[0][1], days[1][1]
+        assert first["meals"][0]["recipes"] == second["meals"][0]["recipes"]
+
+    def test_odd_days_count_last_pair_is_single_day(self):
+        catalog = build_recipe_index(CATALOG).for_user(1)
+        days = _generate_day_pairs(catalog, TARGET, [0, 2], days_count=3, seed=None, deadline=time.time() + 60)
+        assert [idx for idx, _ in days] == [0, 1, 2]
+
+    def test_deadline(self):
+        catalog = build_recipe_index(CATALOG).for_user(1)
+        with pytest.raises(TimeoutError):
+            _generate_day_pairs(catalog, TARGET, [0], days_count=2, seed=None, deadline=time.time() - 1)
+
+    def test_same_seed_same_plan(self):
+        catalog = build_recipe_index(CATALOG).for_user(1)
+        first = _generate_day_pairs(catalog, TARGET, [0, 2, 4], days_count=6, seed=7, deadline=time.time() + 60)
+        second = _generate_day_pairs(catalog, TARGET, [4, 0, 2], days_count=6, seed=7, deadline=time.time() + 60)
+        assert sorted(first, key=lambda d: d[0]) == sorted(second, key=lambda d: d[0])
+
+    def test_choose_candidate(self):
+        scores = [10.0, 10.5, 11.0, 30.0]
+        assert MealPlanService._choose_candidate(scores) == 0
+        rng = random.Random(1)
+        picks = {MealPlanService._choose_candidate(scores, rng) for _ in range(50)}
+        # Кандидат с оценкой 30 отстаёт от лучшего больше чем на SELECTION_TOLERANCE
+        assert picks == {0, 1, 2}
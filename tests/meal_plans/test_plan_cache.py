@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+
+from app.meal_plans.plan_cache import meal_plan_cache_key
+from app.meal_plans.recipe_index import build_recipe_index
+from tests.meal_plans.test_recipe_index import CATALOG
+
+TARGET = {"calories": 2000.2, "proteins": 140, "fats": 60, "carbs": 200}
+
+
+class TestMealPlanCacheKey:
+    """Тесты для ключа кэша сгенерированных программ питания"""
+
+    def test_key_is_canonical(self):
+        key = meal_plan_cache_key(TARGET, ["b", "a"], 7, "v1", None)
+        assert key == meal_plan_cache_key({**TARGET, "calories": 1999.8}, ["a", "b"], 7, "v1", None)
+        assert len(key) == 64
+
+    def test_key_depends_on_inputs(self):
+        base = meal_plan_cache_key(TARGET, None, 7, "v1", None)
+        assert base != meal_plan_cache_key(TARGET, None, 8, "v1", None)
+        assert base != meal_plan_cache_key(TARGET, None, 7, "v2", None)
+        assert base != meal_plan_cache_key(TARGET, None, 7, "v1", 1)
+        assert base != meal_plan_cache_key({**TARGET, "proteins": 150}, None, 7, "v1", None)
+
+    def test_catalog_version_tracks_visible_recipes(self):
+        version = build_recipe_index(CATALOG).for_user(1).version()
+        assert version == build_recipe_index(CATALOG).for_user(1).version()
+
+        # Чужой рецепт изменился — версия каталога пользователя 1 та же
+        changed_foreign = [r if r.uuid != "u2" else SimpleNamespace(**{**vars(r), "calories_per_portion": 900}) for r in CATALOG]
+        assert build_recipe_index(changed_foreign).for_user(1).version() == version
+
+        # Изменился доступный рецепт — версия другая
+        changed_own = [r if r.uuid != "u1" else SimpleNamespace(**{**vars(r), "calories_per_portion": 900}) for r in CATALOG]
+        assert build_recipe_index(changed_own).for_user(1).version() != version
@@ -0,0 +1,67 @@
+from itertools import product
+
+import numpy as np
+
+from app.meal_plans.portion_optimizer import macro_matrix, optimize_portions, target_vector, valid_mask
+from app.meal_plans.service import MealPlanService
+
+
+def _meal(uuid, calories, proteins, fats, carbs):
+    return {
+        "uuid": uuid,
+        "name": uuid,
+        "category": "",
+        "calories_per_portion": calories,
+        "proteins_per_portion": proteins,
+        "fats_per_portion": fats,
+        "carbs_per_portion": carbs,
+        "portions": 1,
+    }
+
+
+def _totals(meals, portions):
+    return {
+        k: sum(m[f"{k}_per_portion"] * p for m, p in zip(meals, portions))
+        for k in ("calories", "proteins", "fats", "carbs")
+    }
+
+
+class TestPortionOptimizer:
+    """Тесты для векторного подбора порций слота"""
+
+    def test_matches_brute_force(self):
+        meals = [_meal("main", 320, 28, 12, 25), _meal("side", 90, 3, 6, 7)]
+        target = {"calories": 740, "proteins": 58, "fats": 30, "carbs": 57}
+        portions, penalty, valid = optimize_portions(meals, target)
+
+        candidates = []
+        for combo in product(range(1, 6), repeat=2):
+            totals = _totals(meals, combo)
+            candidates.append((
+                not MealPlanService._is_slot_valid(totals, target),
+                MealPlanService._calculate_macro_penalty(totals, target),
+                combo,
+            ))
+        expected = min(candidates, key=lambda c: (c[0], c[1]))
+        assert tuple(portions) == expected[2]
+        assert abs(penalty - expected[1]) < 1e-9
+        assert valid == (not expected[0])
+
+    def test_valid_mask_matches_is_slot_valid(self):
+        meals = [_meal("a", 250, 20, 9, 22), _meal("b", 120, 4, 7, 10)]
+        for target in (
+            {"calories": 600, "proteins": 45, "fats": 20, "carbs": 50},
+            {"calories": 900, "proteins": 60, "fats": 30, "carbs": 80},
+            {"calories": 500, "proteins": 0, "fats": 20, "carbs": 40},
+        ):
+            for combo in product(range(1, 6), repeat=2):
+                totals = _totals(meals, combo)
+                mask = valid_mask(np.array([combo], dtype=float) @ macro_matrix(meals), target_vector(target))
+                assert bool(mask[0]) == MealPlanService._is_slot_valid(totals, target)
+
+    def test_optimize_slot_output(self):
+        meals = [_meal("main", 300, 25, 10, 30)]
+        target = {"calories": 900, "proteins": 75, "fats": 30, "carbs": 90}
+        result = MealPlanService._optimize_slot(meals, target)
+        assert result[0]["portions"] == 3
+        assert result[0]["calories"] == 900
@@ -0,0 +1,79 @@
+import pickle
+from types import SimpleNamespace
+
+from app.meal_plans.recipe_index import build_recipe_index
+from app.meal_plans.service import MealPlanService
+
+
+def _recipe(uuid, category, calories, proteins, fats, carbs, user_id=None, type=None):
+    return SimpleNamespace(
+        uuid=uuid,
+        user_id=user_id,
+        name=f"Рецепт {uuid}",
+        type=type,
+        category=category,
+        calories_per_portion=calories,
+        proteins_per_portion=proteins,
+        fats_per_portion=fats,
+        carbs_per_portion=carbs,
+    )
+
+
+CATALOG = [
+    _recipe("b1", "завтрак", 400, 25, 15, 40),
+    _recipe("l1", "обед", 600, 40, 20, 60),
+    _recipe("d1", "ужин", 450, 35, 15, 30),
+    _recipe("s1", "салат", 150, 5, 10, 10),
+    _recipe("u1", "ужин", 500, 45, 15, 35, user_id=1),
+    _recipe("u2", "ужин", 500, 45, 15, 35, user_id=2),
+]
+
+
+class TestRecipeIndex:
+    """Тесты для кэшируемого индекса рецептов генератора питания"""
+
+    def test_buckets_follow_category_rules(self):
+        index = build_recipe_index(CATALOG)
+        catalog = index.for_user(1)
+        main = {index.uuids[p] for p in catalog.positions("dinner", MealPlanService.ROLE_MAIN)}
+        side = {index.uuids[p] for p in catalog.positions("dinner", MealPlanService.ROLE_SIDE)}
+        assert main == {"d1", "u1"}
+        assert side == {"s1"}
+        lunch_main = {index.uuids[p] for p in catalog.positions("lunch", MealPlanService.ROLE_MAIN)}
+        assert lunch_main == {"l1", "d1", "u1"}
+
+    def test_user_mask(self):
+        index = build_recipe_index(CATALOG)
+        assert len(index.for_user(1)) == 5
+        assert "u2" not in {index.uuids[p] for p in index.for_user(1).positions("dinner")}
+        # Чужой рецепт не становится доступен через allowed_recipe_uuids
+        allowed = index.for_user(1, ["d1", "u2"])
+        assert [index.uuids[p] for p in allowed.positions("dinner")] == ["d1"]
+
+    def test_pick_main_dish_uses_best_fit(self):
+        index = build_recipe_index(CATALOG)
+        catalog = index.for_user(2)
+        target = {"calories": 500, "proteins": 45, "fats": 15, "carbs": 35}
+        dish = MealPlanService._pick_main_dish(catalog, "dinner", target)
+        assert dish["uuid"] == "u2"
+        # В индексе лежит исходный словарь, наружу отдаётся копия
+        dish["portions"] = 3
+        assert index.recipes[index.position_by_uuid["u2"]]["portions"] == 1
+
+    def test_build_meal_slot(self):
+        index = build_recipe_index(CATALOG)
+        catalog = index.for_user(1)
+        target = MealPlanService._calculate_slot_target(
+            {"calories": 2000, "proteins": 140, "fats": 60, "carbs": 200}, "dinner"
+        )
+        meals = MealPlanService._build_meal_slot("dinner", catalog, target, day_idx=0, days_count=2)
+        assert meals
+        assert {m["uuid"] for m in meals} <= {"d1", "u1", "s1"}
+
+    def test_snapshot_is_compact_and_picklable(self):
+        index = build_recipe_index(CATALOG)
+        snapshot = pickle.loads(pickle.dumps(index.for_user(2).snapshot()))
+        assert len(snapshot.index) == 5
+        assert snapshot.index.uuids == ["b1", "l1", "d1", "s1", "u2"]
+        main = [snapshot.index.uuids[p] for p in snapshot.positions("dinner", MealPlanService.ROLE_MAIN)]
+        assert main == ["d1", "u2"]
@@ -0,0 +1,160 @@
+import asyncio
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from app.cache import PerUserTTLCache, TTLCache
+from app.exercises import replacement_service
+
+
+class TestTTLCache:
+    """Тесты для in-memory TTL/LRU кэша"""
+
+    def test_get_set(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert "a" in cache
+
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # "a" становится самым свежим
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_ttl_expiration(self):
+        cache = TTLCache(maxsize=2, ttl=0.01)
+        cache.set("a", 1)
+        time.sleep(0.02)
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_discard_where(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set((1, 10, "main"), [1])
+        cache.set((1, 10, "core"), [2])
+        cache.set((1, 11, "main"), [3])
+        assert cache.discard_where(lambda k: k[1] == 10) == 2
+        assert cache.get((1, 11, "main")) == [3]
+
+
+class TestPerUserTTLCache:
+    """Тесты для кэша с разбиением по пользователям"""
+
+    def test_users_are_isolated(self):
+        cache = PerUserTTLCache(max_users=10, per_user_maxsize=2, ttl=60)
+        cache.set(1, "k", "user1")
+        cache.set(2, "k", "user2")
+        assert cache.get(1, "k") == "user1"
+        assert cache.get(2, "k") == "user2"
+        cache.invalidate_user(1)
+        assert cache.get(1, "k") is None
+        assert cache.get(2, "k") == "user2"
+
+    def test_per_user_bound(self):
+        cache = PerUserTTLCache(max_users=10, per_user_maxsize=2, ttl=60)
+        for i in range(5):
+            cache.set(1, i, i)
+        assert cache.get(1, 0) is None
+        assert cache.get(1, 4) == 4
+
+    def test_discard_where_across_users(self):
+        cache = PerUserTTLCache(max_users=10, per_user_maxsize=10, ttl=60)
+        cache.set(1, (5, 100, "main"), [1])
+        cache.set(2, (6, 100, "main"), [2])
+        cache.set(2, (6, 200, "main"), [3])
+        assert cache.discard_where(lambda k: k[1] == 100) == 2
+        assert cache.get(2, (6, 200, "main")) == [3]
+
+
+@pytest.fixture
+def replacement_world(monkeypatch):
+    """Упражнение в тренировке плана пользователя 7; ранжирование кандидатов считает вызовы"""
+    exercise = SimpleNamespace(slot_type="main", exercise_reference_id=11, pool_difficulty_level=2)
+    training = SimpleNamespace(id=5, user_id=7, training_type="strength")
+    plan = SimpleNamespace(id=3, updated_at=datetime(2026, 10, 19, 12, 0))
+    rankings = []
+    world = SimpleNamespace(
+        training=training, plan=plan, rankings=rankings, exercises_signature=(4, datetime(2026, 10, 19, 12, 0))
+    )
+
+    async def load_exercise_training_plan(exercise_uuid):
+        return exercise, training, plan
+
+    async def load_training_exercises_signature(training_id):
+        return world.exercises_signature
+
+    async def find_composition_rule(plan, training_type):
+        return object()
+
+    async def sibling_exercise_reference_ids(training_id):
+        return {11}
+
+    async def build_training_builder_context(*args):
+        return object()
+
+    async def rank_replacement_pools(**kwargs):
+        rankings.append(kwargs["training"].id)
+        return [SimpleNamespace(id=i) for i in (101, 102, 103)]
+
+    async def pools_with_references(pool_ids):
+        return {}
+
+    monkeypatch.setattr(replacement_service, "load_exercise_training_plan", load_exercise_training_plan)
+    monkeypatch.setattr(replacement_service, "_load_training_exercises_signature", load_training_exercises_signature)
+    monkeypatch.setattr(replacement_service, "_find_composition_rule", find_composition_rule)
+    monkeypatch.setattr(replacement_service, "sibling_exercise_reference_ids", sibling_exercise_reference_ids)
+    monkeypatch.setattr(replacement_service, "build_training_builder_context", build_training_builder_context)
+    monkeypatch.setattr(replacement_service, "_rank_replacement_pools", rank_replacement_pools)
+    monkeypatch.setattr(replacement_service, "_pools_with_references", pools_with_references)
+    replacement_service._replacement_cache.clear()
+    yield world
+    replacement_service._replacement_cache.clear()
+
+
+class TestReplacementCandidatesCache:
+    """Тесты кэша кандидатов замены упражнения"""
+
+    def _candidates(self, page=1):
+        return asyncio.run(replacement_service.get_replacement_candidates(uuid4(), "replace", 7, page=page, page_size=2))
+
+    def test_hit_then_miss_after_exercise_write(self, replacement_world):
+        """Пагинация отдается из кэша, запись упражнения тренировки сбрасывает его"""
+        assert self._candidates()["total"] == 3
+        assert self._candidates(page=2)["total"] == 3
+        assert replacement_world.rankings == [5]
+
+        replacement_service.invalidate_replacement_cache(replacement_world.training.id)
+        self._candidates()
+        assert replacement_world.rankings == [5, 5]
+
+    def test_miss_after_plan_write(self, replacement_world):
+        """Изменение плана (updated_at) дает новый ключ кэша"""
+        self._candidates()
+        replacement_world.plan.updated_at = datetime(2026, 10, 19, 13, 0)
+        self._candidates()
+        assert replacement_world.rankings == [5, 5]
+
+    def test_miss_after_write_elsewhere(self, replacement_world):
+        """Запись упражнений без сброса кэша (перегенерация, другой воркер) меняет сигнатуру и ключ"""
+        self._candidates()
+        replacement_world.exercises_signature = (4, datetime(2026, 10, 19, 12, 5))
+        self._candidates()
+        replacement_world.exercises_signature = (3, datetime(2026, 10, 19, 12, 5))
+        self._candidates()
+        assert replacement_world.rankings == [5, 5, 5]
+
+    def test_other_training_not_invalidated(self, replacement_world):
+        """Запись в другой тренировке не сбрасывает кэш"""
+        self._candidates()
+        replacement_service.invalidate_replacement_cache(999)
+        self._candidates()
+        assert replacement_world.rankings == [5]
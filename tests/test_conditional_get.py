@@ -0,0 +1,160 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+import app.conditional_get as conditional_get_module
+from app.conditional_get import conditional_get, etag_matches, make_etag, table_version
+from app.recipes.models import Recipe
+
+
+def _client():
+    """Приложение с одним эндпоинтом: версия данных и число вызовов обработчика в state"""
+    state = {"version": (3, datetime(2026, 10, 19, 12, 30, 15, 123456)), "calls": 0}
+
+    async def source(request, user):
+        return state["version"]
+
+    api = FastAPI()
+
+    @api.get("/items", dependencies=[Depends(conditional_get(source, public=True))])
+    async def items():
+        state["calls"] += 1
+        return [1, 2, 3]
+
+    return TestClient(api), state
+
+
+class TestEtag:
+    """Тесты построения и сравнения ETag"""
+
+    def test_etag_matches(self):
+        """Сравнение с If-None-Match: список, слабые ETag и *"""
+        assert etag_matches('"abc"', '"abc"')
+        assert etag_matches('"x", W/"abc"', '"abc"')
+        assert etag_matches("*", '"abc"')
+        assert not etag_matches('"x"', '"abc"')
+        assert not etag_matches(None, '"abc"')
+
+    def test_make_etag_depends_on_parts(self):
+        """ETag стабилен для одинаковых данных и меняется вместе с версией"""
+        assert make_etag("/a", (1, None)) == make_etag("/a", (1, None))
+        assert make_etag("/a", (1, None)) != make_etag("/a", (2, None))
+
+
+class TestConditionalGet:
+    """Тесты зависимости условного GET"""
+
+    def test_validators_on_first_response(self):
+        """Первый ответ полный, с ETag и Last-Modified"""
+        client, state = _client()
+        response = client.get("/items")
+        assert response.status_code == 200
+        assert response.json() == [1, 2, 3]
+        assert response.headers["etag"].startswith('"')
+        assert response.headers["last-modified"] == "Mon, 19 Oct 2026 12:30:15 GMT"
+        assert response.headers["cache-control"] == "private, no-cache"
+
+    def test_not_modified_skips_handler(self):
+        """Совпадение If-None-Match дает 304 без тела и без вызова обработчика"""
+        client, state = _client()
+        etag = client.get("/items").headers["etag"]
+        response = client.get("/items", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        assert state["calls"] == 1
+
+    def test_changed_version(self):
+        """После изменения данных старый ETag не подходит"""
+        client, state = _client()
+        etag = client.get("/items").headers["etag"]
+        state["version"] = (4, datetime(2026, 10, 19, 13, 0))
+        response = client.get("/items", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+    def test_query_params_in_etag(self):
+        """Разные параметры запроса — разные ETag"""
+        client, _ = _client()
+        assert client.get("/items?page=1").headers["etag"] != client.get("/items?page=2").headers["etag"]
+
+
+class TestTableVersion:
+    """Тесты источника версии по таблице"""
+
+    def test_signature_query(self, monkeypatch):
+        """Версия — count и max(updated_at) по строкам из where"""
+        statements = []
+
+        class Result:
+            def one(self):
+                return (5, None)
+
+        class Session:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, statement):
+                statements.append(str(statement.compile(dialect=postgresql.dialect())))
+                return Result()
+
+        monkeypatch.setattr(conditional_get_module, "async_session_maker", Session)
+        source = table_version(Recipe, where=lambda request, user: [Recipe.user_id == user])
+
+        assert asyncio.run(source(None, 7)) == (5, None)
+        assert statements[0].startswith("SELECT count(recipes.id) AS count_1, max(recipes.updated_at) AS max_1")
+        assert "WHERE recipes.user_id = " in statements[0]
+
+
+class TestEndpointVersions:
+    """Тесты версий конкретных эндпоинтов: только строки пользователя, без сканирования таблиц"""
+
+    def test_trainings_limited_to_user_trainings(self):
+        """Версия шаблонов тренировок считается только по тренировкам пользователя из фильтра"""
+        from app.trainings.models import Training
+        from app.user_training.models import UserTraining
+        from app.user_training.router import _referenced_by_filtered_user
+
+        where = _referenced_by_filtered_user(Training, UserTraining.training_id)
+        request = SimpleNamespace(query_params={"user_uuid": "5f0c3e0e-2b1a-4c55-9a59-0d1f3c1b2a10"})
+        (condition,) = where(request, None)
+        sql = str(condition.compile(dialect=postgresql.dialect()))
+        assert sql.startswith("training.id IN (SELECT user_training.training_id")
+        assert "WHERE user_training.user_id = (SELECT" in sql
+        assert where(SimpleNamespace(query_params={}), None) == []
+
+    def test_own_exercises_by_user(self):
+        """Собственные упражнения — текущего пользователя, если в пути и фильтре нет user_uuid"""
+        from app.exercise_reference.router import _own_exercises
+
+        request = SimpleNamespace(path_params={}, query_params={})
+        (condition,) = _own_exercises(request, SimpleNamespace(id=7))
+        compiled = condition.compile(dialect=postgresql.dialect())
+        assert str(compiled).startswith("exercise_reference.user_id = ")
+        assert 7 in compiled.params.values()
+
+    def test_catalog_version_from_index(self, monkeypatch):
+        """Версия системного справочника берется из индекса названий без запросов к БД"""
+        import time
+
+        from app.exercise_reference import caption_index
+
+        index = caption_index.CaptionIndex([], signature=(12, datetime(2026, 10, 19, 12, 0)))
+        index.popularity = {1: 5, 2: 3}
+        monkeypatch.setattr(caption_index, "_index", index)
+        monkeypatch.setattr(caption_index, "_index_stale", False)
+        monkeypatch.setattr(caption_index, "_last_signature_check", time.monotonic())
+        monkeypatch.setattr(caption_index, "_last_popularity_refresh", time.monotonic())
+        monkeypatch.setattr(caption_index, "async_session_maker", None)
+
+        version = asyncio.run(caption_index.catalog_version())
+        assert version[0] == index.signature
+        index.popularity = {1: 5, 2: 4}
+        assert asyncio.run(caption_index.catalog_version()) != version
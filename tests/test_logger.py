@@ -0,0 +1,122 @@
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from app.logger import BatchedJsonSink, configure_worker_logging, logger, request_id_var
+
+
+def read_events(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def log_to(sink, *messages, level="INFO"):
+    handler_id = logger.add(sink.emit, level="DEBUG", format="{message}", catch=False)
+    try:
+        for message in messages:
+            logger.log(level, message)
+    finally:
+        logger.remove(handler_id)
+
+
+def _pool_worker_logging_state():
+    """Выполняется в процессе пула: пишет событие и возвращает имена потоков"""
+    logger.warning("Событие из процесса пула")
+    return [thread.name for thread in threading.enumerate()]
+
+
+class TestBatchedJsonSink:
+    """Тесты JSON-логов с фоновой записью"""
+
+    def test_events_are_json_lines(self, tmp_path):
+        """Каждое событие — JSON-строка с полями bind и идентификатором запроса"""
+        sink = BatchedJsonSink(str(tmp_path / "app_{date}.log"), retention_days=10, flush_interval=0.05)
+        handler_id = logger.add(sink.emit, format="{message}", catch=False)
+        token = request_id_var.set("req-12345678")
+        try:
+            logger.bind(user_id=7).info("Тренировка {} завершена", "abc")
+        finally:
+            request_id_var.reset(token)
+            logger.remove(handler_id)
+        sink.stop()
+
+        (path,) = tmp_path.glob("app_*.log")
+        (event,) = read_events(path)
+        assert event["msg"] == "Тренировка abc завершена"
+        assert event["level"] == "INFO"
+        assert event["request_id"] == "req-12345678"
+        assert event["user_id"] == 7
+        assert event["logger"] == __name__
+
+    def test_exception_included(self, tmp_path):
+        """Traceback попадает в поле exc"""
+        sink = BatchedJsonSink(str(tmp_path / "errors_{date}.log"), retention_days=90, flush_interval=0.05)
+        handler_id = logger.add(sink.emit, format="{message}", catch=False)
+        try:
+            try:
+                raise ValueError("плохие данные")
+            except ValueError:
+                logger.opt(exception=True).error("Ошибка")
+        finally:
+            logger.remove(handler_id)
+        sink.stop()
+
+        (event,) = read_events(next(tmp_path.glob("errors_*.log")))
+        assert "request_id" not in event
+        assert "ValueError: плохие данные" in event["exc"]
+
+    def test_full_queue_drops_and_reports(self, tmp_path):
+        """При переполненной очереди события отбрасываются, их число пишется отдельным событием"""
+        sink = BatchedJsonSink(str(tmp_path / "app_{date}.log"), retention_days=10, queue_size=1, flush_interval=0.05)
+        entered, release = threading.Event(), threading.Event()
+        write = sink._write
+
+        def slow_write(batch):
+            entered.set()
+            release.wait(5)
+            write(batch)
+
+        sink._write = slow_write
+        log_to(sink, "первое")
+        assert entered.wait(5)
+        log_to(sink, "второе", "третье")
+        release.set()
+        sink.stop()
+
+        events = read_events(next(tmp_path.glob("app_*.log")))
+        assert [e["msg"] for e in events[:2]] == ["первое", "второе"]
+        assert events[2]["dropped"] == 1
+
+    def test_writer_thread_starts_on_first_event(self, tmp_path):
+        """Фоновый поток запускается первым событием, а не при создании sink"""
+        sink = BatchedJsonSink(str(tmp_path / "app_{date}.log"), retention_days=10, flush_interval=0.05)
+        assert sink._thread is None
+        sink.stop()
+        log_to(sink, "событие")
+        assert sink._thread.is_alive()
+        sink.stop()
+        assert [e["msg"] for e in read_events(next(tmp_path.glob("app_*.log")))] == ["событие"]
+
+    def test_old_files_removed_on_rotation(self, tmp_path):
+        """Файлы старше retention_days удаляются при открытии файла дня"""
+        old = tmp_path / "app_2000-01-01.log"
+        old.write_text("{}\n")
+        sink = BatchedJsonSink(str(tmp_path / "app_{date}.log"), retention_days=10, flush_interval=0.05)
+        log_to(sink, "событие")
+        sink.stop()
+        assert not old.exists()
+        assert len(list(tmp_path.glob("app_*.log"))) == 1
+
+
+class TestWorkerLogging:
+    """Тесты логгера процессов пула"""
+
+    def test_pool_worker_has_no_file_sinks(self):
+        """Процесс spawn-пула с configure_worker_logging не запускает потоки записи файлов"""
+        with ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=configure_worker_logging,
+        ) as executor:
+            thread_names = executor.submit(_pool_worker_logging_state).result(timeout=60)
+        assert not [name for name in thread_names if name.startswith("log-writer")]
@@ -0,0 +1,132 @@
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+import app.request_logging as request_logging
+from app.request_logging import BodyPreview, RequestLoggingMiddleware, sample_rate
+
+
+class RecordingLogger:
+    def __init__(self):
+        self.lines = []
+        self.fields = []
+
+    def bind(self, **fields):
+        self.fields.append(fields)
+        return self
+
+    def info(self, message):
+        self.lines.append(("INFO", message))
+
+    def warning(self, message):
+        self.lines.append(("WARNING", message))
+
+    def error(self, message):
+        self.lines.append(("ERROR", message))
+
+
+@pytest.fixture
+def log(monkeypatch):
+    recorder = RecordingLogger()
+    monkeypatch.setattr(request_logging, "logger", recorder)
+    return recorder
+
+
+@pytest.fixture
+def client():
+    api = FastAPI()
+    api.add_middleware(RequestLoggingMiddleware)
+
+    @api.post("/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    @api.get("/files/file/{uuid}")
+    async def download(uuid: str):
+        return {"uuid": uuid}
+
+    @api.get("/forbidden")
+    async def forbidden():
+        raise HTTPException(status_code=403, detail="Нет доступа")
+
+    @api.get("/broken")
+    async def broken():
+        raise HTTPException(status_code=503, detail="Недоступно")
+
+    return TestClient(api)
+
+
+class TestRequestLogging:
+    """Тесты ASGI-логирования запросов"""
+
+    def test_summary_line(self, log, client):
+        """Одна строка на запрос: метод, путь, статус и длительность"""
+        client.post("/echo?x=1", json={"weight": 80})
+        assert len(log.lines) == 1
+        level, line = log.lines[0]
+        assert level == "INFO"
+        assert line.startswith("POST /echo?x=1 200 ")
+        assert "ms" in line
+        assert 'body={"weight":80}' in line
+
+    def test_structured_fields(self, log, client):
+        """Метод, путь, статус и длительность передаются полями события"""
+        client.post("/echo", json={})
+        fields = log.fields[0]
+        assert (fields["method"], fields["path"], fields["status"]) == ("POST", "/echo", 200)
+        assert fields["duration_ms"] >= 0
+
+    def test_request_id(self, log, client):
+        """Идентификатор запроса берется из X-Request-ID или создается и возвращается клиенту"""
+        assert client.get("/files/file/abc", headers={"X-Request-ID": "req-12345678"}).headers["x-request-id"] == "req-12345678"
+        generated = client.get("/files/file/abc", headers={"X-Request-ID": "bad id"}).headers["x-request-id"]
+        assert len(generated) == 32
+
+    def test_body_preview_limited_without_buffering(self, log, client, monkeypatch):
+        """В лог попадают первые байты тела, обработчик получает тело целиком"""
+        monkeypatch.setattr(request_logging, "REQUEST_LOG_BODY_BYTES", 10)
+        response = client.post("/echo", content=b"a" * 5000, headers={"Content-Type": "text/plain"})
+        assert response.json() == {"size": 5000}
+        assert log.lines[0][1].endswith("body=aaaaaaaaaa... [truncated]")
+
+    def test_binary_body_not_logged(self, log, client):
+        """Тело multipart-загрузки не попадает в лог"""
+        response = client.post("/echo", files={"file": ("a.jpg", b"\xff\xd8" * 100, "image/jpeg")})
+        assert response.status_code == 200
+        assert "body=" not in log.lines[0][1]
+
+    def test_route_sampling(self, log, client, monkeypatch):
+        """Запросы маршрута с нулевой долей выборки не логируются"""
+        monkeypatch.setattr(request_logging, "REQUEST_LOG_SAMPLE_RATES", (("/files/file/", 0.0),))
+        assert client.get("/files/file/abc").status_code == 200
+        assert log.lines == []
+
+    def test_server_errors_always_logged(self, log, client, monkeypatch):
+        """Ошибки 5xx логируются вне выборки"""
+        monkeypatch.setattr(request_logging, "REQUEST_LOG_DEFAULT_SAMPLE_RATE", 0.0)
+        client.get("/broken")
+        assert log.lines[0][0] == "ERROR"
+        assert log.lines[0][1].startswith("GET /broken 503 ")
+
+    def test_forbidden_deletes_access_token_cookie(self, log, client):
+        """Ответ 403 удаляет cookie с токеном"""
+        response = client.get("/forbidden")
+        assert response.status_code == 403
+        cookie = response.headers["set-cookie"]
+        assert cookie.startswith("users_access_token=")
+        assert "Max-Age=0" in cookie
+
+    def test_sample_rate_by_prefix(self, monkeypatch):
+        """Доля выборки берется по первому совпавшему префиксу"""
+        monkeypatch.setattr(request_logging, "REQUEST_LOG_SAMPLE_RATES", (("/files/", 0.1), ("/files/file/", 0.5)))
+        monkeypatch.setattr(request_logging, "REQUEST_LOG_DEFAULT_SAMPLE_RATE", 0.7)
+        assert sample_rate("/files/file/x") == 0.1
+        assert sample_rate("/users/me") == 0.7
+
+    def test_preview_counts_all_chunks(self):
+        """Превью хранит не больше лимита, но считает весь объем"""
+        preview = BodyPreview(4)
+        preview.feed(b"abc")
+        preview.feed(b"defgh")
+        assert bytes(preview.data) == b"abcd"
+        assert preview.total == 8
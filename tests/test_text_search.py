@@ -0,0 +1,167 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.food_progress.dao import MealDAO
+from app.food_progress.models import Meal
+from app.recipes.dao import RecipeDAO
+from app.text_search import decode_cursor, encode_cursor, name_search, search_vector_expression, search_words
+
+
+class SearchRow(tuple):
+    """Строка результата: объект и значения ключа сортировки"""
+
+    @property
+    def sort_key(self):
+        return self[1]
+
+
+class SearchResult:
+    def __init__(self, rows=(), count=0):
+        self.rows = list(rows)
+        self.count = count
+
+    def scalar(self):
+        return self.count
+
+    def unique(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class SearchSession:
+    """async_session_maker: первый запрос — подсчет, второй — страница; SQL запоминается"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        self.statements.append(statement.compile(dialect=postgresql.dialect()))
+        if len(self.statements) == 1:
+            return SearchResult(count=10)
+        return SearchResult(self.rows)
+
+    def expunge(self, obj):
+        pass
+
+
+class TestSearchWords:
+    """Тесты разбора поискового запроса"""
+
+    def test_lowercase_and_strip_operators(self):
+        """Слова приводятся к нижнему регистру, спецсимволы tsquery отбрасываются"""
+        assert search_words("Куриный  СУП & (лапша) | !x:*") == ["куриный", "суп", "лапша", "x"]
+
+    def test_empty(self):
+        """Пустой запрос и запрос из одних знаков дают пустой список"""
+        assert search_words("") == []
+        assert search_words("  !&| ") == []
+        assert search_words(None) == []
+
+
+class TestNameSearch:
+    """Тесты построения условия поиска"""
+
+    def test_prefix_query_in_both_configs(self):
+        """Все слова ищутся как префиксы в конфигурациях russian и simple, плюс триграммный запасной вариант"""
+        condition, rank = name_search(Meal.search_vector, Meal.name, "Куриный суп")
+        compiled = condition.compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+        assert "meals.search_vector @@" in sql
+        assert "meals.name %%> " in sql
+        assert "куриный:* & суп:*" in compiled.params.values()
+        assert {"russian", "simple"} <= set(compiled.params.values())
+        rank_sql = str(rank.compile(dialect=postgresql.dialect()))
+        assert "ts_rank_cd" in rank_sql and "word_similarity" in rank_sql
+
+    def test_empty_query_rejected(self):
+        """Пустой запрос не превращается в условие"""
+        with pytest.raises(ValueError):
+            name_search(Meal.search_vector, Meal.name, "  ")
+
+    def test_generated_column_expression(self):
+        """Генерируемая колонка совпадает с выражением миграции"""
+        assert search_vector_expression("name") == (
+            "to_tsvector('russian'::regconfig, coalesce(name, '')) || "
+            "to_tsvector('simple'::regconfig, coalesce(name, ''))"
+        )
+
+
+class TestCursor:
+    """Тесты keyset-курсора"""
+
+    def test_round_trip(self):
+        """Курсор восстанавливает ключ сортировки и id"""
+        assert decode_cursor(encode_cursor(0.123456789, 42)) == (0.123456789, 42)
+        assert decode_cursor(encode_cursor("2026-03-01T08:30:00", 7)) == ("2026-03-01T08:30:00", 7)
+
+    def test_invalid_cursor(self):
+        """Поврежденный курсор — ValueError"""
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+
+
+class TestKeysetSearch:
+    """Тесты постраничного поиска по курсору"""
+
+    def test_meal_search_by_cursor(self, monkeypatch):
+        """Следующая страница приемов пищи выбирается условием по (рангу, id), без OFFSET"""
+        rows = [SearchRow((SimpleNamespace(id=i), 0.9 - i / 10)) for i in (5, 4, 3)]
+        session = SearchSession(rows)
+        monkeypatch.setattr("app.food_progress.dao.async_session_maker", session)
+
+        result = asyncio.run(MealDAO.search_by_name(7, "суп", size=2, cursor=encode_cursor(0.95, 6)))
+
+        sql = str(session.statements[1])
+        assert "(ts_rank_cd(meals.search_vector" in sql and ", meals.id) < (" in sql
+        assert "OFFSET" not in sql
+        assert [item.id for item in result["items"]] == [5, 4]
+        assert result["pagination"]["has_next"] is True
+        assert decode_cursor(result["pagination"]["next_cursor"]) == (0.5, 4)
+
+    def test_meal_search_rejects_broken_cursor(self, monkeypatch):
+        """Поврежденный курсор — ValueError (роутер отвечает 400)"""
+        monkeypatch.setattr("app.food_progress.dao.async_session_maker", SearchSession([]))
+        with pytest.raises(ValueError):
+            asyncio.run(MealDAO.search_by_name(7, "суп", cursor="not-a-cursor"))
+
+    def test_recipe_search_by_cursor(self, monkeypatch):
+        """Рецепты листаются курсором по (избранное, ранг, дата создания, id)"""
+        created_at = datetime(2026, 3, 1, 8, 30)
+        rows = [SearchRow((SimpleNamespace(id=i), 1, 0.5, created_at)) for i in (9, 8)]
+        session = SearchSession(rows)
+        monkeypatch.setattr("app.recipes.dao.async_session_maker", session)
+        cursor = encode_cursor([1, 0.7, created_at.isoformat()], 12)
+
+        recipes, total_count, next_cursor = asyncio.run(
+            RecipeDAO.find_user_available_recipes(user_id=7, name="суп", size=1, cursor=cursor)
+        )
+
+        compiled = session.statements[1]
+        assert ", recipes.created_at, recipes.id) < (" in str(compiled)
+        assert "OFFSET" not in str(compiled)
+        assert created_at in compiled.params.values()
+        assert [r.id for r in recipes] == [9] and total_count == 10
+        assert decode_cursor(next_cursor) == ([1, 0.5, created_at.isoformat()], 9)
+
+    def test_recipe_cursor_must_match_sort_key(self, monkeypatch):
+        """Курсор поиска не подходит для выдачи без поиска (другой ключ сортировки)"""
+        monkeypatch.setattr("app.recipes.dao.async_session_maker", SearchSession([]))
+        cursor = encode_cursor([1, 0.7, "2026-03-01T08:30:00"], 12)
+        with pytest.raises(ValueError):
+            asyncio.run(RecipeDAO.find_user_available_recipes(user_id=7, cursor=cursor))
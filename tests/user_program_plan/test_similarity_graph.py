@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.exercise_builder_pool.dao import ExerciseBuilderPoolDAO
+from app.user_program_plan import similarity_graph
+from app.user_program_plan.similarity_graph import build_similarity_graph, similarity_score
+
+
+def _pool(pid, ref_id, vg, muscle, diff, role="main"):
+    return SimpleNamespace(
+        id=pid,
+        exercise_id=ref_id,
+        variation_group_code=vg,
+        primary_muscle_group=muscle,
+        auxiliary_muscle_groups=None,
+        preferred_role=role,
+        uses_external_load=True,
+        is_time_based=False,
+        difficulty_level=diff,
+    )
+
+
+class TestSimilarityGraph:
+    """Тесты для графа похожести упражнений пула"""
+
+    def test_same_variation_group_is_closer(self):
+        a = _pool(1, 101, "squat", "legs", "beginner")
+        b = _pool(2, 102, "squat", "legs", "beginner")
+        c = _pool(3, 103, "lunge", "legs", "beginner")
+        eq = {1: ["barbell"], 2: ["barbell"], 3: ["dumbbells"]}
+        assert similarity_score(a, b, eq) > similarity_score(a, c, eq)
+
+    def test_neighbours_grouped_by_difficulty(self):
+        items = [
+            _pool(1, 101, "squat", "legs", "intermediate"),
+            _pool(2, 102, "squat", "legs", "beginner"),
+            _pool(3, 103, "squat", "legs", "advanced"),
+            _pool(4, 104, "press", "chest", "beginner"),
+        ]
+        graph = build_similarity_graph(items, {})
+        assert graph.pool_id_for_reference(101) == 1
+        assert graph.similar(1, ["beginner"]) == [2]
+        assert graph.similar(1, ["advanced"]) == [3]
+        # Нет общих корзин (variation group / мышцы) — не соседи
+        assert 4 not in graph.similar(1)
+
+    def test_top_k_limit(self):
+        items = [_pool(i, 100 + i, "squat", "legs", "beginner") for i in range(1, 11)]
+        graph = build_similarity_graph(items, {}, top_k=3)
+        assert len(graph.similar(1, ["beginner"])) == 3
+
+
+@pytest.fixture
+def graph_sources(monkeypatch):
+    """Пул и сигнатура без БД; записывает потоки, в которых строился граф"""
+    state = SimpleNamespace(signature=(2, "t1", 0, None), builds=[])
+    items = [_pool(1, 101, "squat", "legs", "beginner"), _pool(2, 102, "squat", "legs", "beginner")]
+
+    async def load_signature():
+        return state.signature
+
+    async def find_all(**kwargs):
+        return items
+
+    async def load_equipment_map():
+        return {}
+
+    def build(*args, **kwargs):
+        state.builds.append(threading.current_thread())
+        return build_similarity_graph(*args, **kwargs)
+
+    monkeypatch.setattr(similarity_graph, "_load_pool_signature", load_signature)
+    monkeypatch.setattr(ExerciseBuilderPoolDAO, "find_all", find_all)
+    monkeypatch.setattr(similarity_graph, "_load_pool_equipment_map", load_equipment_map)
+    monkeypatch.setattr(similarity_graph, "build_similarity_graph", build)
+    monkeypatch.setattr(similarity_graph, "_graph", None)
+    monkeypatch.setattr(similarity_graph, "_graph_stale", True)
+    monkeypatch.setattr(similarity_graph, "_rebuild_lock", asyncio.Lock())
+    return state
+
+
+class TestSimilarityGraphRebuild:
+    """Тесты перестроения графа в воркере"""
+
+    def test_built_off_event_loop(self, graph_sources):
+        """Граф строится не в потоке event loop"""
+        graph = asyncio.run(similarity_graph.get_similarity_graph())
+        assert graph.similar(1) == [2]
+        assert graph_sources.builds and graph_sources.builds[0] is not threading.main_thread()
+
+    def test_queued_callers_reuse_rebuilt_graph(self, graph_sources):
+        """Одновременные запросы после инвалидации перестраивают граф один раз"""
+        async def scenario():
+            await similarity_graph.get_similarity_graph()
+            similarity_graph.invalidate_similarity_graph()
+            return await asyncio.gather(*(similarity_graph.get_similarity_graph() for _ in range(5)))
+
+        graphs = asyncio.run(scenario())
+        assert len(graph_sources.builds) == 2
+        assert all(g is graphs[0] for g in graphs)
+
+    def test_signature_change_rebuilds(self, graph_sources):
+        """Смена сигнатуры пула приводит к перестроению"""
+        first = asyncio.run(similarity_graph.rebuild_similarity_graph())
+        assert asyncio.run(similarity_graph.rebuild_similarity_graph()) is first
+        graph_sources.signature = (3, "t2", 0, None)
+        assert asyncio.run(similarity_graph.rebuild_similarity_graph()) is not first
+        assert len(graph_sources.builds) == 2
+
+    def test_invalidation_during_build_is_kept(self, graph_sources, monkeypatch):
+        """Инвалидация во время построения оставляет граф устаревшим"""
+        def build(*args, **kwargs):
+            graph_sources.builds.append(threading.current_thread())
+            similarity_graph.invalidate_similarity_graph()
+            return build_similarity_graph(*args, **kwargs)
+
+        monkeypatch.setattr(similarity_graph, "build_similarity_graph", build)
+        asyncio.run(similarity_graph.rebuild_similarity_graph())
+        assert similarity_graph._graph_stale